@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Speculative Balance Prefetch for Cashu Telegram Bot
+
+A send flow needs the wallet balance twice: to refuse an amount the
+wallet can't cover, and again when the user confirms. The read is started
+as soon as a send intent is recognized, while the confirmation is being
+rendered and read, so insufficient funds are reported without waiting for
+"YES" and the confirmation finds the balance already there. Chats share
+the one read in flight. Prefetches are dropped when the flow is cancelled
+or goes stale, and counted as hits or waste.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+Fetch = Callable[[], Awaitable[Any]]
+
+
+class _Prefetch:
+    __slots__ = ("task", "started_at")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.started_at = time.monotonic()
+
+
+class BalancePrefetcher:
+    """Per-chat balance reads started ahead of a send confirmation."""
+
+    def __init__(self, fetch: Fetch, cache=None, cache_key: str = "", ttl: float = 5.0, max_age: float = 120.0):
+        """
+        Args:
+            fetch: Reads the balances from the wallet
+            cache: Cache checked before fetching and filled with the result, optional
+            cache_key: Key of the balances in `cache`
+            ttl: Seconds a fetched balance stays in `cache`
+            max_age: Seconds a prefetched balance is kept for the chat's confirmation
+        """
+        self.fetch = fetch
+        self.cache = cache
+        self.cache_key = cache_key
+        self.ttl = ttl
+        self.max_age = max_age
+        self._chats: Dict[int, _Prefetch] = {}
+        self._in_flight: Optional[asyncio.Task] = None
+        self.started = 0
+        self.joined = 0
+        self.from_cache = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+        self.cancelled = 0
+        self.errors = 0
+
+    def start(self, chat_id: int):
+        """Starts reading the balance for a chat's send flow, replacing the chat's previous one."""
+        self.discard(chat_id)
+        self._expire()
+        if self._in_flight is None or self._in_flight.done():
+            self._in_flight = asyncio.ensure_future(self._read())
+            self._in_flight.add_done_callback(self._settled)
+            self.started += 1
+        else:
+            self.joined += 1
+        self._chats[chat_id] = _Prefetch(self._in_flight)
+
+    async def peek(self, chat_id: int, timeout: float) -> Optional[Any]:
+        """
+        Waits for the chat's prefetched balance and leaves it for the confirmation.
+
+        Returns:
+            The balances, or None when nothing was prefetched, the read failed or took too long
+        """
+        prefetch = self._chats.get(chat_id)
+        if prefetch is None:
+            return None
+        try:
+            # Shielded, giving up on the wait doesn't cancel a read other chats may share
+            return await asyncio.wait_for(asyncio.shield(prefetch.task), timeout)
+        except asyncio.TimeoutError:
+            return None
+        except asyncio.CancelledError:
+            if prefetch.task.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
+
+    async def take(self, chat_id: int, timeout: float) -> Optional[Any]:
+        """
+        The chat's prefetched balance, consumed by its confirmation.
+
+        Returns:
+            The balances, or None on a miss: nothing prefetched, too old, failed or too slow
+        """
+        prefetch = self._chats.get(chat_id)
+        if prefetch is None or time.monotonic() - prefetch.started_at > self.max_age:
+            self.discard(chat_id)
+            self.misses += 1
+            return None
+        balances = await self.peek(chat_id, timeout)
+        if self._chats.get(chat_id) is prefetch:
+            del self._chats[chat_id]
+        if balances is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return balances
+
+    def discard(self, chat_id: int):
+        """Drops the chat's prefetch, e.g. when the send is cancelled, counting it as waste."""
+        prefetch = self._chats.pop(chat_id, None)
+        if prefetch is None:
+            return
+        if prefetch.task.done():
+            self.wasted += 1
+            return
+        self.cancelled += 1
+        # The read is only cancelled when no other chat waits for it
+        if not any(other.task is prefetch.task for other in self._chats.values()):
+            prefetch.task.cancel()
+
+    def close(self):
+        """Cancels the read in flight and forgets every chat."""
+        for chat_id in list(self._chats):
+            self.discard(chat_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        used = self.hits + self.misses
+        return {
+            "pending": len(self._chats),
+            "fetches": self.started,
+            "joined": self.joined,
+            "from_cache": self.from_cache,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / used, 3) if used else 0.0,
+            "wasted": self.wasted,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+        }
+
+    async def _read(self) -> Any:
+        if self.cache is not None:
+            cached = await self.cache.get(self.cache_key)
+            if cached is not None:
+                self.from_cache += 1
+                return cached
+        balances = await self.fetch()
+        if self.cache is not None:
+            await self.cache.set(self.cache_key, balances, self.ttl)
+        return balances
+
+    def _settled(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+            logger.warning("Balance prefetch failed: %s", task.exception(), extra={"event": "balance_prefetch_error"})
+
+    def _expire(self):
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, prefetch in self._chats.items()
+                        if now - prefetch.started_at > self.max_age]:
+            self.discard(chat_id)
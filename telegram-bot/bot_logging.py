@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Logging Pipeline for Cashu Telegram Bot
+
+Handlers only enqueue log records, formatting and I/O happen on a
+background `QueueListener` thread so the event loop never waits on disk.
+Records are emitted as JSON, high-volume events can be sampled and wads
+are redacted before anything is written.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from command_patterns import CommandPatterns
+
+WAD_PREFIX = "cashuB"
+
+# Attributes every LogRecord has, anything else was passed through `extra`
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "taskName"}
+
+
+def redact_wads(text: str) -> str:
+    """Replace wads by their length, a substring check skips the regex in the common case."""
+    if WAD_PREFIX not in text:
+        return text
+    return CommandPatterns.WAD_PATTERN.sub(lambda match: f"cashuB<redacted {len(match.group())} chars>", text)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, with `extra` fields included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact_wads(record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = redact_wads(value) if isinstance(value, str) else value
+        if record.exc_info:
+            entry["exc"] = redact_wads(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RedactingFormatter(logging.Formatter):
+    """Plain text formatter that redacts wads."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact_wads(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one record out of N for sampled events.
+
+    A record is sampled when it was logged with `extra={"event": name}` and
+    `name` has a rate configured. Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counters: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        rate = self.rates.get(event) if event else None
+        if not rate or rate <= 1 or record.levelno >= logging.WARNING:
+            return True
+
+        count = self._counters.get(event, 0)
+        self._counters[event] = count + 1
+        if count % rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock implementation formats the message in the calling thread
+        return record
+
+
+class _BackgroundListener(QueueListener):
+    """QueueListener whose stop() can be called more than once."""
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def parse_sample_rates(spec: Optional[str]) -> Dict[str, int]:
+    """Parse rates like "message_received=10,document_received=2"."""
+    rates: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = int(rate)
+    return rates
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    json_format: bool = True,
+    sample_rates: Optional[Dict[str, int]] = None,
+    stream=None,
+) -> QueueListener:
+    """
+    Routes every log record through a queue to a background writer.
+
+    Args:
+        level: Root logger level
+        json_format: Emit JSON lines instead of plain text
+        sample_rates: Keep one record out of N, per event name
+        stream: Output stream, stderr by default
+
+    Returns:
+        The started listener, stopped automatically at exit
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    if json_format:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(RedactingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(records)
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = _BackgroundListener(records, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Bot API HTTP Transport for Cashu Telegram Bot
+
+Builds the HTTPXRequest objects the Application talks to Telegram with:
+one pool for outbound calls (replies, chunks, documents) and a separate
+single connection for the getUpdates long poll, so a burst of sends never
+waits behind polling. Idle connections are kept alive long enough to
+survive the gaps between bursts, and HTTP/2 multiplexes concurrent sends
+over one connection when the `h2` package is installed.
+"""
+
+import logging
+from typing import Optional
+
+import httpx
+from telegram.ext import ApplicationBuilder
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_request(
+    pool_size: int,
+    keepalive_expiry: float = 60.0,
+    http_version: str = "1.1",
+    pool_timeout: Optional[float] = 5.0,
+    read_timeout: Optional[float] = 5.0,
+) -> HTTPXRequest:
+    """
+    A Bot API request object with explicit pool and keep-alive settings.
+
+    Args:
+        pool_size: Connections kept open to the Bot API
+        keepalive_expiry: Seconds an idle connection stays open
+        http_version: "1.1" or "2", HTTP/2 falls back to 1.1 without `h2`
+        pool_timeout: Seconds a call waits for a free connection
+        read_timeout: Seconds to wait for a response
+    """
+    if http_version in ("2", "2.0") and not http2_available():
+        logger.warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+        http_version = "1.1"
+
+    return HTTPXRequest(
+        connection_pool_size=pool_size,
+        http_version=http_version,
+        pool_timeout=pool_timeout,
+        read_timeout=read_timeout,
+        httpx_kwargs={
+            "limits": httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        },
+    )
+
+
+def configure_transport(
+    builder: ApplicationBuilder,
+    pool_size: int = 64,
+    keepalive_expiry: float = 60.0,
+    http_version: str = "1.1",
+    pool_timeout: Optional[float] = 5.0,
+) -> ApplicationBuilder:
+    """Sets the outbound pool and the dedicated getUpdates connection on an ApplicationBuilder."""
+    return (
+        builder
+        .request(build_request(pool_size, keepalive_expiry, http_version, pool_timeout))
+        # The long poll holds its connection, it gets one of its own
+        .get_updates_request(build_request(1, keepalive_expiry, http_version, pool_timeout))
+    )
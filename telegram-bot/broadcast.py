@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Broadcast Engine for Cashu Telegram Bot
+
+Delivers batches of (chat_id, message) notifications, such as received
+token alerts after a payout, concurrently while staying under Telegram's
+limits: a global messages-per-second budget and a minimum interval
+between two messages to the same chat. Messages to one chat keep their
+order. Every delivery is recorded in SQLite as it completes, so a
+broadcast interrupted by a crash resumes with what is left instead of
+sending everything again. Messages may carry spendable wads: the text of
+a delivery is blanked once it is final, and a finished broadcast is
+deleted. A broadcast of such messages is submitted `at_most_once`, a
+send that timed out may have arrived and is not retried.
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import sqlite3
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError, TimedOut
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    broadcast_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    at_most_once INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (broadcast_id, seq)
+);
+CREATE INDEX IF NOT EXISTS deliveries_pending ON deliveries (status, broadcast_id);
+"""
+
+
+class DeliveryStatus:
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    # Timed out, it may or may not have arrived
+    UNKNOWN = "unknown"
+
+
+class _TokenBucket:
+    """Global send budget, paused as a whole when Telegram asks to retry later."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class Broadcaster:
+    """Rate-limited, resumable delivery of notification batches."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        state_path: str,
+        rate: float = 25.0,
+        chat_interval: float = 1.0,
+        group_interval: float = 3.0,
+        concurrency: int = 32,
+        max_attempts: int = 5,
+        backoff: float = 1.0,
+    ):
+        """
+        Args:
+            bot: Bot used to send the messages
+            state_path: SQLite file recording each delivery
+            rate: Messages per second across all chats
+            chat_interval: Seconds between two messages to one private chat
+            group_interval: Seconds between two messages to one group
+            concurrency: Sends in flight at once
+            max_attempts: Attempts before a message is marked failed
+            backoff: First retry delay of network errors, doubled on each attempt
+        """
+        self.bot = bot
+        self.state_path = state_path
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="broadcast")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._resumed: Set[asyncio.Task] = set()
+
+    async def start(self):
+        await self._run(self._open)
+
+    async def resume_unfinished(self) -> List[str]:
+        """Runs the unfinished broadcasts in the background, returns their ids."""
+        broadcast_ids = await self.unfinished()
+        for broadcast_id in broadcast_ids:
+            task = asyncio.get_running_loop().create_task(self.run(broadcast_id))
+            self._resumed.add(task)
+            task.add_done_callback(self._resumed.discard)
+        return broadcast_ids
+
+    async def close(self):
+        """Stops resumed broadcasts, their progress is kept for the next start."""
+        for task in list(self._resumed):
+            task.cancel()
+        await asyncio.gather(*self._resumed, return_exceptions=True)
+        if self._connection:
+            await self._run(self._connection.close)
+        self._executor.shutdown()
+
+    async def submit(self, jobs: Iterable[Tuple[int, str]], at_most_once: bool = False) -> str:
+        """
+        Records a batch of (chat_id, text) jobs, returns the broadcast id to `run`.
+
+        Args:
+            jobs: (chat_id, text) of each message
+            at_most_once: Messages that must not arrive twice, such as wads: a timed out send is
+                marked unknown instead of retried
+        """
+        broadcast_id = uuid.uuid4().hex[:12]
+        rows = [(broadcast_id, seq, chat_id, text, int(at_most_once)) for seq, (chat_id, text) in enumerate(jobs)]
+        await self._run(self._insert, rows)
+        return broadcast_id
+
+    async def unfinished(self) -> List[str]:
+        """Broadcasts with messages still pending, e.g. after a crash."""
+        return await self._run(self._unfinished)
+
+    async def broadcast(self, jobs: Iterable[Tuple[int, str]], at_most_once: bool = False) -> Dict[str, Any]:
+        return await self.run(await self.submit(jobs, at_most_once))
+
+    async def run(self, broadcast_id: str) -> Dict[str, Any]:
+        """
+        Delivers the pending messages of a broadcast, and deletes it once every message is final.
+
+        Returns:
+            Report with sent, failed, unknown and retried counts and the throughput
+        """
+        rows = await self._run(self._pending, broadcast_id)
+        chats: Dict[int, Deque[List[Any]]] = {}
+        for seq, chat_id, text, attempts, at_most_once in rows:
+            chats.setdefault(chat_id, deque()).append([seq, text, attempts, at_most_once])
+
+        report = {"broadcast_id": broadcast_id, "total": len(rows), "sent": 0, "failed": 0, "unknown": 0,
+                  "retries": 0}
+        started = time.monotonic()
+        ready: List[Tuple[float, int]] = [(started, chat_id) for chat_id in chats]
+        heapq.heapify(ready)
+        bucket = _TokenBucket(self.rate)
+        slots = asyncio.Semaphore(self.concurrency)
+        wakeup = asyncio.Event()
+        remaining = len(rows)
+        in_flight = set()
+
+        async def deliver(chat_id: int):
+            nonlocal remaining
+            queue = chats[chat_id]
+            seq, text, attempts, at_most_once = queue[0]
+            delay = self.group_interval if chat_id < 0 else self.chat_interval
+            status = None
+            try:
+                await self.bot.send_message(chat_id, text)
+                status = DeliveryStatus.SENT
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                bucket.pause(retry_after)
+                delay = retry_after
+            except (BadRequest, Forbidden) as e:
+                # Blocked bot, deleted chat, invalid text: retrying can't help
+                logger.warning("Broadcast %s to chat %s failed: %s", broadcast_id, chat_id, e)
+                status = DeliveryStatus.FAILED
+            except TimedOut as e:
+                if at_most_once:
+                    # The message may have arrived, a second one would be a second copy of its wads
+                    logger.warning("Broadcast %s to chat %s timed out, not retried: %s", broadcast_id, chat_id, e)
+                    status = DeliveryStatus.UNKNOWN
+                elif attempts + 1 >= self.max_attempts:
+                    logger.warning("Broadcast %s to chat %s gave up: %s", broadcast_id, chat_id, e)
+                    status = DeliveryStatus.FAILED
+                else:
+                    delay = self.backoff * 2 ** attempts * (1 + random.random() / 2)
+            except TelegramError as e:
+                if attempts + 1 >= self.max_attempts:
+                    logger.warning("Broadcast %s to chat %s gave up: %s", broadcast_id, chat_id, e)
+                    status = DeliveryStatus.FAILED
+                else:
+                    delay = self.backoff * 2 ** attempts * (1 + random.random() / 2)
+            except Exception as e:
+                logger.error("Broadcast %s to chat %s failed: %s", broadcast_id, chat_id, e)
+                status = DeliveryStatus.FAILED
+            finally:
+                slots.release()
+
+            attempts += 1
+            try:
+                await self._run(self._mark, broadcast_id, seq, status or DeliveryStatus.PENDING, attempts)
+            except Exception as e:
+                # Unrecorded, the message must still leave the queue or the broadcast never ends
+                logger.error("Broadcast %s could not record message %d: %s", broadcast_id, seq, e)
+                status = status or DeliveryStatus.FAILED
+            if status is None:
+                queue[0][2] = attempts
+                report["retries"] += 1
+            else:
+                queue.popleft()
+                remaining -= 1
+                report[status] += 1
+
+            if queue:
+                heapq.heappush(ready, (time.monotonic() + delay, chat_id))
+            wakeup.set()
+
+        try:
+            while remaining:
+                if not ready:
+                    wakeup.clear()
+                    await wakeup.wait()
+                    continue
+                delay = ready[0][0] - time.monotonic()
+                if delay > 0:
+                    wakeup.clear()
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                _, chat_id = heapq.heappop(ready)
+                await bucket.acquire()
+                await slots.acquire()
+                task = asyncio.get_running_loop().create_task(deliver(chat_id))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        finally:
+            # Sends already made must be recorded, even when the broadcast is cancelled
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        try:
+            await self._run(self._purge, broadcast_id)
+        except Exception as e:
+            # Deleted on the next start instead
+            logger.error("Broadcast %s could not be deleted: %s", broadcast_id, e)
+
+        elapsed = time.monotonic() - started
+        report["seconds"] = round(elapsed, 3)
+        report["per_second"] = round(report["sent"] / elapsed, 1) if elapsed else 0.0
+        logger.info(
+            "Broadcast %s: %d sent, %d failed in %.1fs", broadcast_id, report["sent"], report["failed"], elapsed,
+            extra={"event": "broadcast_done", **report},
+        )
+        return report
+
+    def _run(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _open(self):
+        self._connection = sqlite3.connect(self.state_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(deliveries)")}
+        if "at_most_once" not in columns:
+            self._connection.execute("ALTER TABLE deliveries ADD COLUMN at_most_once INTEGER NOT NULL DEFAULT 0")
+        # Finished before the last stop, or written by a version that kept them
+        self._purge()
+
+    def _insert(self, rows: List[Tuple[str, int, int, str, int]]):
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO deliveries (broadcast_id, seq, chat_id, text, at_most_once) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def _unfinished(self) -> List[str]:
+        rows = self._connection.execute(
+            "SELECT DISTINCT broadcast_id FROM deliveries WHERE status = ?", (DeliveryStatus.PENDING,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _pending(self, broadcast_id: str) -> List[Tuple[int, int, str, int, int]]:
+        return self._connection.execute(
+            "SELECT seq, chat_id, text, attempts, at_most_once FROM deliveries "
+            "WHERE broadcast_id = ? AND status = ? ORDER BY seq",
+            (broadcast_id, DeliveryStatus.PENDING),
+        ).fetchall()
+
+    def _mark(self, broadcast_id: str, seq: int, status: str, attempts: int):
+        # The text is only needed to send the message again, it may hold wads
+        with self._connection:
+            if status == DeliveryStatus.PENDING:
+                self._connection.execute(
+                    "UPDATE deliveries SET attempts = ? WHERE broadcast_id = ? AND seq = ?",
+                    (attempts, broadcast_id, seq),
+                )
+            else:
+                self._connection.execute(
+                    "UPDATE deliveries SET status = ?, attempts = ?, text = '' WHERE broadcast_id = ? AND seq = ?",
+                    (status, attempts, broadcast_id, seq),
+                )
+
+    def _purge(self, broadcast_id: Optional[str] = None):
+        """Deletes the finished broadcasts, or the given one when it is finished."""
+        query = ("DELETE FROM deliveries WHERE broadcast_id NOT IN "
+                 "(SELECT broadcast_id FROM deliveries WHERE status = ?)")
+        parameters: Tuple[str, ...] = (DeliveryStatus.PENDING,)
+        if broadcast_id is not None:
+            query += " AND broadcast_id = ?"
+            parameters += (broadcast_id,)
+        with self._connection:
+            self._connection.execute(query, parameters)
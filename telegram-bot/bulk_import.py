@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Bulk Wad Import for Cashu Telegram Bot
+
+Receives every wad of an uploaded file, one wad per line or in a CSV
+column. The file is read line by line from the downloaded buffer, each
+wad is validated locally, and the valid ones are grouped by mint into
+batches sent to `receive_wads` with a bounded number of calls in flight.
+The wallet receives the wads of a call in order and stops at the first
+one the mint refuses, so the wads before it are already in the wallet.
+A refused batch is retried one wad at a time: the wads after the one
+that failed it are received or refused for good, while those refused
+before the first one received can't be told apart from it, and are
+reported as unknown. So are the wads of a batch the wallet didn't answer
+for (timeout, open circuit, lost connection), which may have been
+received anyway. The user checks the balance rather than sending them
+again. Every line gets a status for the summary document sent back to
+the user.
+"""
+
+import asyncio
+import csv
+import io
+import logging
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from command_patterns import CommandPatterns, get_unit_registry, receipt_currency
+from mcp_client import McpError
+from wad_validator import InvalidWadError, WadSummary, validate_wad
+from wallet_resilience import INVALID_PARAMS
+
+logger = logging.getLogger(__name__)
+
+# The wallet server refuses malformed wads as invalid params, and wads the mint won't
+# take (spent, unknown keyset) as an internal error with this message
+INTERNAL_ERROR = -32603
+RECEIVE_WAD_FAILED = "failed to receive a wad"
+
+
+class LineStatus:
+    RECEIVED = "received"
+    INVALID = "invalid"
+    FAILED = "failed"
+    UNKNOWN = "unknown"
+    SKIPPED = "skipped"
+
+
+def is_wad_rejection(error: Exception) -> bool:
+    """Whether the wallet answered that it refuses the wads, as opposed to not answering."""
+    if not isinstance(error, McpError):
+        return False
+    return error.code == INVALID_PARAMS or (error.code == INTERNAL_ERROR and str(error) == RECEIVE_WAD_FAILED)
+
+
+class ImportLine:
+    """One wad of the file, or a line without any."""
+
+    __slots__ = ("line_no", "wad", "summary", "status", "amount", "currency", "mint_url", "memo", "detail")
+
+    def __init__(self, line_no: int, wad: Optional[str] = None, summary: Optional[WadSummary] = None):
+        self.line_no = line_no
+        self.wad = wad
+        self.summary = summary
+        self.status: Optional[str] = None
+        self.amount = summary.amount if summary else None
+        self.currency = None
+        if summary:
+            unit, label = get_unit_registry().from_wad_unit(summary.unit)
+            self.currency = unit.key if unit else label
+        self.mint_url = summary.mint_url if summary else None
+        self.memo = summary.memo if summary else None
+        self.detail = ""
+
+
+def iter_lines(content: bytes) -> Iterator[Tuple[int, str]]:
+    """(line number, text) of a downloaded file, decoded one line at a time."""
+    start = 0
+    line_no = 0
+    while start < len(content):
+        end = content.find(b"\n", start)
+        if end < 0:
+            end = len(content)
+        line_no += 1
+        yield line_no, bytes(content[start:end]).decode("utf-8", errors="replace").rstrip("\r")
+        start = end + 1
+
+
+def contains_wads(content: bytes, probe: int = 64 * 1024) -> bool:
+    """Whether the start of a file holds a wad, i.e. it is meant to be imported rather than echoed."""
+    return CommandPatterns.WAD_PATTERN.search(bytes(content[:probe]).decode("utf-8", errors="replace")) is not None
+
+
+def parse_lines(lines: Iterable[Tuple[int, str]]) -> List[ImportLine]:
+    """
+    Finds and validates the wads of each line.
+
+    Blank lines are ignored, lines without a wad (e.g. a CSV header) are
+    kept as skipped so the summary accounts for every line.
+    """
+    entries: List[ImportLine] = []
+    for line_no, text in lines:
+        wads = CommandPatterns.WAD_PATTERN.findall(text)
+        if not wads:
+            if text.strip():
+                entry = ImportLine(line_no)
+                entry.status = LineStatus.SKIPPED
+                entry.detail = "no wad"
+                entries.append(entry)
+            continue
+        for wad in wads:
+            try:
+                entries.append(ImportLine(line_no, wad, validate_wad(wad)))
+            except InvalidWadError as e:
+                entry = ImportLine(line_no, wad)
+                entry.status = LineStatus.INVALID
+                entry.detail = str(e)
+                entries.append(entry)
+    return entries
+
+
+def batches_by_mint(entries: List[ImportLine], batch_size: int) -> List[List[ImportLine]]:
+    """Valid wads grouped by mint, cut into batches of at most `batch_size`."""
+    by_mint: Dict[str, List[ImportLine]] = {}
+    for entry in entries:
+        if entry.status is None:
+            by_mint.setdefault(entry.summary.mint_url, []).append(entry)
+    return [
+        wads[i:i + batch_size]
+        for wads in by_mint.values()
+        for i in range(0, len(wads), batch_size)
+    ]
+
+
+def summary_csv(entries: List[ImportLine]) -> str:
+    """Per-line status of an import, one CSV row per wad or skipped line."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["line", "status", "mint_url", "currency", "amount", "detail"])
+    for entry in entries:
+        writer.writerow([entry.line_no, entry.status, entry.mint_url or "", entry.currency or "",
+                         "" if entry.amount is None else entry.amount, entry.detail])
+    return out.getvalue()
+
+
+class BulkImporter:
+    """Receives the wads of a file in batches, a few `receive_wads` calls at a time."""
+
+    def __init__(self, client, batch_size: int = 20, concurrency: int = 4):
+        """
+        Args:
+            client: Object with an async `call_tool(name, arguments)` method
+            batch_size: Wads sent in one `receive_wads` call, all from the same mint
+            concurrency: `receive_wads` calls in flight for one import
+        """
+        self.client = client
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    async def run(self, lines: Iterable[Tuple[int, str]]) -> Tuple[List[ImportLine], Dict[str, Any]]:
+        """
+        Imports the wads found in `lines`.
+
+        Returns:
+            Every entry with its status, and a report with the counts, the
+            number of tool calls and the throughput
+        """
+        return await self.receive(parse_lines(lines), time.monotonic())
+
+    async def receive(
+        self, entries: List[ImportLine], started: Optional[float] = None
+    ) -> Tuple[List[ImportLine], Dict[str, Any]]:
+        """
+        Imports already parsed entries, e.g. parsed by `parse_lines` in a worker process.
+
+        Args:
+            entries: Entries of `parse_lines`
+            started: When the import started, now if not given
+        """
+        if started is None:
+            started = time.monotonic()
+        batches = batches_by_mint(entries, self.batch_size)
+        slots = asyncio.Semaphore(self.concurrency)
+        calls = 0
+
+        async def receive(batch: List[ImportLine]):
+            nonlocal calls
+            async with slots:
+                calls += 1
+                try:
+                    result = await self.client.call_tool("receive_wads", {"wads": ":".join(e.wad for e in batch)})
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+                else:
+                    self._apply_receipts(batch, result.get("wads_received", []))
+                    return
+            if not is_wad_rejection(error):
+                # Maybe received before the answer was lost, sending them again is the user's call
+                for entry in batch:
+                    entry.status = LineStatus.UNKNOWN
+                    entry.detail = f"no answer from the wallet ({error}), check your balance"
+            elif len(batch) > 1:
+                # Wads up to the one that failed the batch were received by it and are refused again,
+                # only a wad received now shows that the refused ones after it really are spent
+                await asyncio.gather(*(receive([entry]) for entry in batch))
+                first_received = next(
+                    (index for index, entry in enumerate(batch) if entry.status == LineStatus.RECEIVED), len(batch)
+                )
+                for entry in batch[:first_received]:
+                    if entry.status == LineStatus.FAILED:
+                        entry.status = LineStatus.UNKNOWN
+                        entry.detail = (
+                            f"maybe received before the wallet refused its batch ({error}), check your balance"
+                        )
+            else:
+                batch[0].status = LineStatus.FAILED
+                batch[0].detail = str(error)
+
+        await asyncio.gather(*(receive(batch) for batch in batches))
+
+        elapsed = time.monotonic() - started
+        counts = {status: 0 for status in (LineStatus.RECEIVED, LineStatus.INVALID, LineStatus.FAILED,
+                                           LineStatus.UNKNOWN, LineStatus.SKIPPED)}
+        for entry in entries:
+            counts[entry.status] += 1
+        wads = len(entries) - counts[LineStatus.SKIPPED]
+        report = {
+            "wads": wads, **counts, "batches": len(batches), "calls": calls,
+            "seconds": round(elapsed, 3), "wads_per_second": round(wads / elapsed, 1) if elapsed else 0.0,
+        }
+        logger.info(
+            "Bulk import: %d/%d wads received in %.1fs", counts[LineStatus.RECEIVED], wads, elapsed,
+            extra={"event": "bulk_import_done", **report},
+        )
+        return entries, report
+
+    @staticmethod
+    def _apply_receipts(batch: List[ImportLine], receipts: List[Dict[str, Any]]):
+        # Receipts come back in the order of the wads, when they don't the local summary stands
+        matched = len(receipts) == len(batch)
+        for index, entry in enumerate(batch):
+            entry.status = LineStatus.RECEIVED
+            if matched:
+                receipt = receipts[index]
+                entry.amount = receipt.get("amount", entry.amount)
+                if "unit" in receipt:
+                    entry.currency = receipt_currency(receipt["unit"])
+                entry.mint_url = receipt.get("mint_url", entry.mint_url)
+                entry.memo = receipt.get("memo", entry.memo)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Bulk Payouts for Cashu Telegram Bot
+
+Creates many wads for one request, such as "create 50 wads of 100 sats"
+or a CSV file of amounts. The `create_wads` calls share the wallet's MCP
+session and are pipelined: up to `window` requests are in flight at once
+instead of waiting for each reply before sending the next. Results are
+written in request order to one CSV document as they arrive, so the
+reply never holds every wad in a single string. A CSV row may end with a
+recipient's chat id, the bot then also sends that row's wad to the chat.
+"""
+
+import asyncio
+import csv
+import io
+import logging
+import re
+import tempfile
+import time
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
+
+from command_patterns import CommandParser, to_asset_amount
+
+logger = logging.getLogger(__name__)
+
+# Trailing cell of a payout row naming the chat that gets the wad
+_CHAT_ID = re.compile(r"-?\d{5,}")
+
+
+class PayoutRequest:
+    """One wad to create, and its outcome."""
+
+    __slots__ = ("index", "amount", "currency", "asset_amount", "asset", "recipient", "wads", "error")
+
+    def __init__(self, index: int, amount: float, currency: str, asset_amount: str, asset: str,
+                 recipient: Optional[int] = None):
+        self.index = index
+        self.amount = amount
+        self.currency = currency
+        self.asset_amount = asset_amount
+        self.asset = asset
+        self.recipient = recipient
+        self.wads: Optional[str] = None
+        self.error: Optional[str] = None
+
+
+def requests_from_count(count: int, amount: float, currency: str) -> List[PayoutRequest]:
+    """`count` identical payouts, for "create 50 wads of 100 sats"."""
+    asset_amount, asset = to_asset_amount(amount, currency)
+    return [PayoutRequest(index, amount, currency, asset_amount, asset) for index in range(1, count + 1)]
+
+
+def requests_from_csv(lines: Iterable[Tuple[int, str]],
+                      default_currency: Optional[str] = None) -> Tuple[List[PayoutRequest], List[int]]:
+    """
+    Payouts from "amount,currency[,chat id]" rows, the currency defaulting to the caption's.
+
+    Returns:
+        The payouts, and the numbers of the lines that aren't one (e.g. a header)
+    """
+    requests: List[PayoutRequest] = []
+    skipped: List[int] = []
+    for line_no, text in lines:
+        cells = [cell.strip() for cell in next(csv.reader([text]), []) if cell.strip()]
+        recipient = int(cells.pop()) if len(cells) > 1 and _CHAT_ID.fullmatch(cells[-1]) else None
+        row = " ".join(cells)
+        if not row:
+            continue
+        if default_currency and row.replace(".", "", 1).isdigit():
+            row = f"{row} {default_currency}"
+        # Rows are read like the amount of a create command
+        parsed = CommandParser.parse_create_command(f"create {row}")
+        asset_amount = to_asset_amount(*parsed) if parsed else None
+        if not asset_amount:
+            skipped.append(line_no)
+            continue
+        requests.append(PayoutRequest(len(requests) + 1, parsed[0], parsed[1], *asset_amount, recipient))
+    return requests, skipped
+
+
+class BulkPayout:
+    """Pipelined `create_wads` calls over one MCP session, written out as one CSV document."""
+
+    def __init__(self, client, window: int = 16, spool_size: int = 1024 * 1024):
+        """
+        Args:
+            client: Object with an async `call_tool(name, arguments)` method
+            window: `create_wads` requests in flight at once
+            spool_size: Bytes of output kept in memory before it moves to a temporary file
+        """
+        self.client = client
+        self.window = window
+        self.spool_size = spool_size
+
+    async def run(self, requests: List[PayoutRequest]) -> Tuple[IO[bytes], Dict[str, Any]]:
+        """
+        Creates the wads of every request.
+
+        Returns:
+            The CSV document, rewound, and a report with the counts and the time per wad
+        """
+        started = time.monotonic()
+        document = tempfile.SpooledTemporaryFile(max_size=self.spool_size, mode="w+b")
+        text = io.TextIOWrapper(document, encoding="utf-8", newline="")
+        out = csv.writer(text)
+        out.writerow(["index", "amount", "currency", "status", "wads", "recipient"])
+
+        slots = asyncio.Semaphore(self.window)
+        done: Dict[int, PayoutRequest] = {}
+        next_index = 1
+
+        async def create(request: PayoutRequest):
+            nonlocal next_index
+            async with slots:
+                try:
+                    result = await self.client.call_tool(
+                        "create_wads", {"amount": request.asset_amount, "asset": request.asset}
+                    )
+                    request.wads = result["wads"]
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    request.error = str(e)
+            # Rows are written in request order, the ones that finish early wait here
+            done[request.index] = request
+            while next_index in done:
+                finished = done.pop(next_index)
+                out.writerow([finished.index, finished.amount, finished.currency,
+                              "created" if finished.wads else "failed", finished.wads or finished.error,
+                              finished.recipient if finished.recipient is not None else ""])
+                next_index += 1
+
+        await asyncio.gather(*(create(request) for request in requests))
+
+        created = sum(1 for request in requests if request.wads)
+        elapsed = time.monotonic() - started
+        report = {
+            "requested": len(requests), "created": created, "failed": len(requests) - created,
+            "seconds": round(elapsed, 3),
+            "ms_per_wad": round(elapsed / len(requests) * 1000, 2) if requests else 0.0,
+        }
+        logger.info(
+            "Bulk payout: %d/%d wads created in %.1fs", created, len(requests), elapsed,
+            extra={"event": "bulk_payout_done", **report},
+        )
+        text.flush()
+        text.detach()
+        document.seek(0)
+        return document, report
+
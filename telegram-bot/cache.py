@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Two-Tier Cache for Cashu Telegram Bot
+
+Values are looked up in an in-process LRU first, then in an optional
+shared backend that every bot instance on the host can read: a SQLite
+file in WAL mode. Entries carry a TTL, reads and writes go by batches, and
+invalidations are appended to a log that each instance polls, so a key
+dropped by one instance is dropped from the LRU of the others.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invalidations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+"""
+
+
+class LRUCache:
+    """In-process backend, least recently used entries are evicted first."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get_many(self, keys: Iterable[str], now: float) -> Dict[str, Any]:
+        found = {}
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry[0] <= now:
+                del self._entries[key]
+                continue
+            self._entries.move_to_end(key)
+            found[key] = entry[1]
+        return found
+
+    def set_many(self, items: Dict[str, Any], expires_at: float):
+        for key, value in items.items():
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete_many(self, keys: Iterable[str]):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Shared backend, a SQLite file used by every instance on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.origin = uuid.uuid4().hex
+        self._connection: Optional[sqlite3.Connection] = None
+        # SQLite calls are blocking, they run on one dedicated thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache")
+        self._last_seq = 0
+
+    async def open(self):
+        await self._run(self._open)
+
+    async def close(self):
+        if self._connection:
+            await self._run(self._connection.close)
+        self._executor.shutdown()
+
+    async def get_many(self, keys: List[str], now: float) -> Dict[str, Any]:
+        return await self._run(self._get_many, keys, now)
+
+    async def set_many(self, items: Dict[str, Any], expires_at: float):
+        rows = [(key, json.dumps(value), expires_at) for key, value in items.items()]
+        await self._run(self._set_many, rows)
+
+    async def invalidate(self, keys: List[str]):
+        await self._run(self._invalidate, keys, time.time())
+
+    async def poll_invalidations(self) -> List[str]:
+        """Keys invalidated by other instances since the last poll."""
+        return await self._run(self._poll_invalidations)
+
+    async def purge(self, now: float, keep_log_seconds: float = 3600.0):
+        """Drop expired entries and old invalidations."""
+        await self._run(self._purge, now, now - keep_log_seconds)
+
+    def _run(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _open(self):
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        # Only invalidations issued after this instance started matter
+        self._last_seq = self._connection.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+
+    def _get_many(self, keys: List[str], now: float) -> Dict[str, Any]:
+        found = {}
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._connection.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                (*chunk, now),
+            ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def _set_many(self, rows: List[Tuple[str, str, float]]):
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                rows,
+            )
+
+    def _invalidate(self, keys: List[str], ts: float):
+        with self._connection:
+            self._connection.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+            self._connection.executemany(
+                "INSERT INTO invalidations (key, origin, ts) VALUES (?, ?, ?)",
+                [(key, self.origin, ts) for key in keys],
+            )
+
+    def _poll_invalidations(self) -> List[str]:
+        rows = self._connection.execute(
+            "SELECT seq, key, origin FROM invalidations WHERE seq > ? ORDER BY seq", (self._last_seq,)
+        ).fetchall()
+        if rows:
+            self._last_seq = rows[-1][0]
+        return [key for _, key, origin in rows if origin != self.origin]
+
+    def _purge(self, now: float, log_before: float):
+        with self._connection:
+            self._connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._connection.execute("DELETE FROM invalidations WHERE ts < ?", (log_before,))
+
+
+class Cache:
+    """LRU in front of an optional shared backend, with hit rate counters."""
+
+    def __init__(self, local: Optional[LRUCache] = None, shared: Optional[SQLiteCache] = None,
+                 poll_interval: float = 1.0, purge_interval: float = 300.0):
+        """
+        Args:
+            local: In-process tier
+            shared: Tier shared between instances, None for a single instance
+            poll_interval: Seconds between reads of the invalidation log
+            purge_interval: Seconds between removals of expired shared entries
+        """
+        self.local = local or LRUCache()
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._poller: Optional[asyncio.Task] = None
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.remote_invalidations = 0
+
+    async def start(self):
+        if self.shared:
+            await self.shared.open()
+            self._poller = asyncio.get_running_loop().create_task(self._poll_loop())
+
+    async def close(self):
+        if self._poller:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        if self.shared:
+            await self.shared.close()
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Cached values of `keys`, missing or expired keys are left out."""
+        keys = list(keys)
+        now = time.time()
+        found = self.local.get_many(keys, now)
+        self.local_hits += len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared:
+            from_shared = await self.shared.get_many(missing, now)
+            self.shared_hits += len(from_shared)
+            # The local copy expires quickly so remote updates show up without an invalidation
+            self.local.set_many(from_shared, now + self.poll_interval)
+            found.update(from_shared)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def set_many(self, items: Dict[str, Any], ttl: float):
+        """Stores JSON-serializable values for `ttl` seconds."""
+        expires_at = time.time() + ttl
+        self.local.set_many(items, expires_at)
+        if self.shared:
+            await self.shared.set_many(items, expires_at)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.set_many({key: value}, ttl)
+
+    async def invalidate(self, *keys: str):
+        """Drops keys here and, through the shared log, in every other instance."""
+        self.local.delete_many(keys)
+        if self.shared:
+            await self.shared.invalidate(list(keys))
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "backend": "lru+sqlite" if self.shared else "lru",
+            "entries": len(self.local),
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.local_hits + self.shared_hits) / lookups, 3) if lookups else 0.0,
+            "remote_invalidations": self.remote_invalidations,
+        }
+
+    async def _poll_loop(self):
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                keys = await self.shared.poll_invalidations()
+                if keys:
+                    self.local.delete_many(keys)
+                    self.remote_invalidations += len(keys)
+                if time.monotonic() - last_purge >= self.purge_interval:
+                    await self.shared.purge(time.time())
+                    last_purge = time.monotonic()
+            except sqlite3.Error as e:
+                logger.warning("Cache invalidation poll failed: %s", e)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Startup Catch-up for Cashu Telegram Bot
+
+After a deploy or a crash, updates pile up on Telegram's side. Instead of
+letting `run_polling` replay them one at a time, the backlog is pulled in
+bulk, grouped per chat and redundant read-only requests (a user asking for
+their balance five times) are collapsed into a single reply. Wallet
+mutations are always kept, in their original order.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from command_patterns import CommandParser, Intent
+
+logger = logging.getLogger(__name__)
+
+# Maximum batch size accepted by the getUpdates Bot API method
+GET_UPDATES_LIMIT = 100
+
+
+def update_intent(update: Any) -> Optional[str]:
+    """Intent of a text message update, None for any other kind of update."""
+    message = getattr(update, "message", None)
+    text = getattr(message, "text", None) if message else None
+    if not text:
+        return None
+    return CommandParser.detect_intent(text)
+
+
+def update_chat_id(update: Any) -> Optional[int]:
+    chat = getattr(update, "effective_chat", None)
+    return chat.id if chat else None
+
+
+def coalesce_chat_updates(updates: List[Any]) -> Tuple[List[Any], int]:
+    """
+    Drops redundant read-only requests from one chat's updates.
+
+    Only the last occurrence of each read-only intent is kept so that a
+    balance asked after a receive still reflects it. Everything else keeps
+    its position.
+
+    Returns:
+        The updates to process, in order, and the number dropped
+    """
+    intents = [update_intent(update) for update in updates]
+    last_seen: Dict[str, int] = {}
+    for index, intent in enumerate(intents):
+        if intent in Intent.READ_ONLY:
+            last_seen[intent] = index
+
+    kept = [
+        update for index, (update, intent) in enumerate(zip(updates, intents))
+        if intent not in Intent.READ_ONLY or last_seen[intent] == index
+    ]
+    return kept, len(updates) - len(kept)
+
+
+def plan_catch_up(updates: List[Any]) -> Tuple[Dict[Optional[int], List[Any]], int]:
+    """
+    Groups the backlog per chat and coalesces each group.
+
+    Updates without a chat are grouped under None and never coalesced.
+
+    Returns:
+        Updates to process per chat, in first-seen chat order, and the number dropped
+    """
+    per_chat: Dict[Optional[int], List[Any]] = {}
+    for update in updates:
+        per_chat.setdefault(update_chat_id(update), []).append(update)
+
+    dropped = 0
+    for chat_id, chat_updates in per_chat.items():
+        if chat_id is not None:
+            per_chat[chat_id], chat_dropped = coalesce_chat_updates(chat_updates)
+            dropped += chat_dropped
+    return per_chat, dropped
+
+
+async def fetch_backlog(bot, max_updates: int) -> List[Any]:
+    """
+    Pulls every pending update in batches of 100.
+
+    Each getUpdates call confirms the previous batch, so once this returns
+    `run_polling` will only see updates that arrived afterwards.
+    """
+    updates: List[Any] = []
+    offset = None
+    while len(updates) < max_updates:
+        batch = await bot.get_updates(offset=offset, limit=GET_UPDATES_LIMIT, timeout=0)
+        if not batch:
+            return updates
+        updates.extend(batch)
+        offset = batch[-1].update_id + 1
+
+    # Confirm the last batch, whatever is returned stays for run_polling
+    await bot.get_updates(offset=offset, limit=1, timeout=0)
+    return updates
+
+
+async def catch_up_backlog(application, concurrency: int = 32, max_updates: int = 100000) -> Dict[str, Any]:
+    """
+    Drains the pending backlog before polling starts.
+
+    Chats are processed concurrently, the updates of a chat sequentially.
+
+    Args:
+        application: The initialized bot application
+        concurrency: Number of chats processed at the same time
+        max_updates: Maximum number of updates pulled from the backlog
+
+    Returns:
+        Catch-up statistics
+    """
+    started = time.perf_counter()
+    updates = await fetch_backlog(application.bot, max_updates)
+    if not updates:
+        return {"fetched": 0, "processed": 0, "coalesced": 0, "chats": 0, "seconds": 0.0}
+
+    per_chat, dropped = plan_catch_up(updates)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def drain_chat(chat_updates: List[Any]):
+        async with semaphore:
+            for update in chat_updates:
+                try:
+                    await application.process_update(update)
+                except Exception as e:
+                    logger.error("Catch-up failed for update %d: %s", update.update_id, e,
+                                 extra={"event": "catch_up_failed"})
+
+    await asyncio.gather(*(drain_chat(chat_updates) for chat_updates in per_chat.values()))
+
+    stats = {
+        "fetched": len(updates),
+        "processed": len(updates) - dropped,
+        "coalesced": dropped,
+        "chats": len(per_chat),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(
+        "Caught up on %d updates from %d chats (%d coalesced) in %ss",
+        stats["fetched"], stats["chats"], stats["coalesced"], stats["seconds"],
+        extra={"event": "catch_up_done"},
+    )
+    return stats
@@ -7,13 +7,84 @@ for the Cashu MCP Wallet Telegram Bot.
 """
 
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 from datetime import datetime
 import random
 
+from unit_registry import UnitRegistry
+
+# Display name, emoji and approximate USD price of each base token
+TOKEN_DISPLAY = {
+    "WBTC": ("🪙", "Bitcoin", 25000.0),
+    "ETH": ("⚡", "Ethereum", 0.5),
+    "USDC": ("💵", "USDC", 1.0),
+    "USDT": ("💵", "USDT", 1.0),
+    "STRK": ("🌐", "Starknet", None),
+}
+
+# Units known to the bot, replaced at startup by the server's published units
+_unit_registry = UnitRegistry.builtin()
+
+def get_unit_registry() -> UnitRegistry:
+    """Return the active unit registry."""
+    return _unit_registry
+
+def set_unit_registry(registry: UnitRegistry):
+    """Activate a unit registry and recompile the patterns that depend on it."""
+    global _unit_registry
+    _unit_registry = registry
+    CommandPatterns.compile(registry)
+
+def get_phrase_matcher() -> "PhraseMatcher":
+    """Return the matcher holding the phrases of every active locale."""
+    return _phrase_matcher
+
+def set_phrase_matcher(matcher: "PhraseMatcher"):
+    """Activate a matcher, usually built by `locales.activate_locale`."""
+    global _phrase_matcher
+    _phrase_matcher = matcher
+
+class Intent:
+    """Intents recognized in user messages."""
+    
+    BALANCE = "balance"
+    SECURITY = "security"
+    HELP = "help"
+    START = "start"
+    SEND = "send"
+    CREATE = "create"
+    RECEIVE = "receive"
+    ECHO = "echo"
+    
+    # Intents that don't change the wallet, answering them twice gives the same reply
+    READ_ONLY = frozenset({BALANCE, SECURITY, HELP, START})
+
 class CommandPatterns:
     """Natural language command patterns for the Cashu bot."""
     
+    # Keywords used for quick intent detection on free text
+    BALANCE_KEYWORDS = ["show my balance", "check my wallet", "how much do i have", "what's in my wallet", "balance", "wallet", "funds"]
+    SECURITY_KEYWORDS = ["help security", "security help", "how to stay safe", "safety guide"]
+    HELP_KEYWORDS = ["help", "what can you do", "how to use", "commands", "guide"]
+    SEND_KEYWORDS = ["send", "pay", "transfer", "give"]
+    CREATE_KEYWORDS = ["create", "mint", "generate", "make"]
+    
+    @classmethod
+    def keyword_phrases(cls) -> Dict[str, List[str]]:
+        """The English keyword lists, keyed by intent."""
+        return {
+            Intent.BALANCE: cls.BALANCE_KEYWORDS,
+            Intent.SECURITY: cls.SECURITY_KEYWORDS,
+            Intent.HELP: cls.HELP_KEYWORDS,
+            Intent.SEND: cls.SEND_KEYWORDS,
+            Intent.CREATE: cls.CREATE_KEYWORDS,
+        }
+    
+    # Slash commands mapped to their intent
+    COMMAND_INTENTS = {"start": Intent.START, "help": Intent.HELP}
+    
+    WAD_PATTERN = re.compile(r"cashuB[A-Za-z0-9_\-+/=]+")
+    
     # Balance commands
     BALANCE_PATTERNS = [
         r"show\s+my\s+balance",
@@ -25,22 +96,71 @@ class CommandPatterns:
         r"funds"
     ]
     
-    # Send money commands
-    SEND_PATTERNS = [
-        r"send\s+(\d+(?:\.\d+)?)\s*(usd|dollars?|sats?|gwei|micro\s*usdc?|micro\s*usdt?)\s+to\s+@(\w+)",
-        r"pay\s+@(\w+)\s+(\d+(?:\.\d+)?)\s*(usd|dollars?|sats?|gwei|micro\s*usdc?|micro\s*usdt?)",
-        r"transfer\s+(\d+(?:\.\d+)?)\s*(usd|dollars?|sats?|gwei|micro\s*usdc?|micro\s*usdt?)\s+to\s+@(\w+)",
-        r"give\s+@(\w+)\s+(\d+(?:\.\d+)?)\s*(usd|dollars?|sats?|gwei|micro\s*usdc?|micro\s*usdt?)"
+    # Send money commands, {units} is filled from the unit registry
+    SEND_PATTERN_TEMPLATES = [
+        r"send\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})\s+to\s+@(?P<recipient>\w+)",
+        r"pay\s+@(?P<recipient>\w+)\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})",
+        r"transfer\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})\s+to\s+@(?P<recipient>\w+)",
+        r"give\s+@(?P<recipient>\w+)\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})"
     ]
     
     # Create/mint tokens
-    CREATE_PATTERNS = [
-        r"create\s+(\d+(?:\.\d+)?)\s*(usd|dollars?|sats?|gwei|micro\s*usdc?|micro\s*usdt?)",
-        r"mint\s+(\d+(?:\.\d+)?)\s*(usd|dollars?|sats?|gwei|micro\s*usdc?|micro\s*usdt?)",
-        r"generate\s+(\d+(?:\.\d+)?)\s*(usd|dollars?|sats?|gwei|micro\s*usdc?|micro\s*usdt?)",
-        r"make\s+(\d+(?:\.\d+)?)\s*(usd|dollars?|sats?|gwei|micro\s*usdc?|micro\s*usdt?)"
+    CREATE_PATTERN_TEMPLATES = [
+        r"create\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})",
+        r"mint\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})",
+        r"generate\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})",
+        r"make\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})"
     ]
     
+    # Inline queries: "100 sats", or "100" and "100 s" while the unit is still being typed
+    INLINE_AMOUNT_PATTERN = re.compile(r"^\s*(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>[^\d]*?)\s*$")
+    INLINE_MAX_SUGGESTIONS = 5
+    
+    # Replies to a send confirmation
+    CONFIRM_WORDS = frozenset({"yes", "y", "confirm", "ok"})
+    CANCEL_WORDS = frozenset({"no", "n", "cancel", "stop"})
+    
+    # Caption of a CSV file of payout amounts: "/payout" or "/payout sats"
+    PAYOUT_CAPTION = re.compile(r"^/?payout\b\s*(?P<currency>\S+)?", re.IGNORECASE)
+    
+    # Bulk payouts: "create 50 wads of 100 sats"
+    BULK_CREATE_PATTERN_TEMPLATE = (
+        r"(?:create|mint|generate|make)\s+(?P<count>\d+)\s+wads?\s+(?:of|with)\s+"
+        r"(?P<amount>\d+(?:\.\d+)?)\s*(?P<currency>{units})"
+    )
+    
+    # Send and create templates of the active locale packs, see add_locale_templates()
+    LOCALE_SEND_TEMPLATES: List[str] = []
+    LOCALE_CREATE_TEMPLATES: List[str] = []
+    
+    # Filled by compile()
+    SEND_PATTERNS: List[str] = []
+    CREATE_PATTERNS: List[str] = []
+    SEND_REGEXES: List[re.Pattern] = []
+    CREATE_REGEXES: List[re.Pattern] = []
+    BULK_CREATE_REGEX: re.Pattern = re.compile(r"$^")
+    UNIT_WORD_REGEX: re.Pattern = re.compile(r"$^")
+    
+    @classmethod
+    def compile(cls, registry: UnitRegistry):
+        """Build the unit-dependent patterns from the registry aliases."""
+        units = registry.unit_regex
+        send_templates = cls.SEND_PATTERN_TEMPLATES + cls.LOCALE_SEND_TEMPLATES
+        create_templates = cls.CREATE_PATTERN_TEMPLATES + cls.LOCALE_CREATE_TEMPLATES
+        cls.SEND_PATTERNS = [template.format(units=units) for template in send_templates]
+        cls.CREATE_PATTERNS = [template.format(units=units) for template in create_templates]
+        cls.SEND_REGEXES = [re.compile(pattern) for pattern in cls.SEND_PATTERNS]
+        cls.CREATE_REGEXES = [re.compile(pattern) for pattern in cls.CREATE_PATTERNS]
+        cls.BULK_CREATE_REGEX = re.compile(cls.BULK_CREATE_PATTERN_TEMPLATE.format(units=units))
+        cls.UNIT_WORD_REGEX = re.compile(rf"\b(?:{units})\b")
+    
+    @classmethod
+    def add_locale_templates(cls, templates: Dict[str, List[str]]):
+        """Add a locale pack's send and create templates, keyed by intent, and recompile."""
+        cls.LOCALE_SEND_TEMPLATES = cls.LOCALE_SEND_TEMPLATES + templates.get(Intent.SEND, [])
+        cls.LOCALE_CREATE_TEMPLATES = cls.LOCALE_CREATE_TEMPLATES + templates.get(Intent.CREATE, [])
+        cls.compile(get_unit_registry())
+    
     # Help commands
     HELP_PATTERNS = [
         r"help",
@@ -58,6 +178,82 @@ class CommandPatterns:
         r"safety\s+guide"
     ]
 
+class PhraseMatcher:
+    """
+    Command phrases of all active locales compiled into one lookup table.
+    
+    A message is scanned once, word n-grams are looked up in a dict, so the
+    cost per message doesn't grow with the number of phrases or locales.
+    Help phrases only match a whole message.
+    """
+    
+    TOKEN_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+    # Commands are short, long pastes are only scanned at their start
+    MAX_SCAN_TOKENS = 64
+    
+    def __init__(self, phrase_sets: Iterable[Dict[str, List[str]]]):
+        """
+        Args:
+            phrase_sets: One {intent: phrases} mapping per locale
+        """
+        ngrams: Dict[str, Set[str]] = {}
+        self.exact: Dict[str, str] = {}
+        self.max_words = 1
+        # First words of multi-word phrases, longer n-grams are only tried from them
+        self.phrase_starts: Set[str] = set()
+        for phrases in phrase_sets:
+            for intent, intent_phrases in phrases.items():
+                for phrase in intent_phrases:
+                    words = self.tokenize(phrase.lower())
+                    key = " ".join(words)
+                    if intent == Intent.HELP:
+                        self.exact[key] = intent
+                        continue
+                    ngrams.setdefault(key, set()).add(intent)
+                    self.max_words = max(self.max_words, len(words))
+                    if len(words) > 1:
+                        self.phrase_starts.add(words[0])
+        self.ngrams: Dict[str, FrozenSet[str]] = {key: frozenset(value) for key, value in ngrams.items()}
+    
+    @classmethod
+    def tokenize(cls, text: str, limit: Optional[int] = None) -> List[str]:
+        if not limit or len(text) < 1000:
+            return cls.TOKEN_PATTERN.findall(text)[:limit]
+        tokens = []
+        for match in cls.TOKEN_PATTERN.finditer(text):
+            tokens.append(match.group())
+            if limit and len(tokens) >= limit:
+                break
+        return tokens
+    
+    def phrases(self) -> List[str]:
+        return list(self.ngrams) + list(self.exact)
+    
+    def intents(self, text_lower: str) -> Set[str]:
+        """Intents whose phrases appear in an already lowercased message."""
+        tokens = self.tokenize(text_lower, self.MAX_SCAN_TOKENS)
+        found: Set[str] = set()
+        
+        whole = " ".join(tokens)
+        if whole in self.exact:
+            found.add(self.exact[whole])
+        
+        ngrams = self.ngrams
+        for start, token in enumerate(tokens):
+            intents = ngrams.get(token)
+            if intents is None and token.endswith("s"):
+                # "wallets", "balances"
+                intents = ngrams.get(token[:-1])
+            if intents:
+                found.update(intents)
+            
+            if token in self.phrase_starts:
+                for size in range(2, min(self.max_words, len(tokens) - start) + 1):
+                    intents = ngrams.get(" ".join(tokens[start:start + size]))
+                    if intents:
+                        found.update(intents)
+        return found
+
 class ResponseTemplates:
     """Response templates for different bot interactions."""
     
@@ -83,45 +279,182 @@ class ResponseTemplates:
     @staticmethod
     def balance_display(balances: Dict[str, float]) -> str:
         """Display user's wallet balance."""
+        registry = get_unit_registry()
         total_usd = 0
         balance_text = "💰 Your Cashu Wallet Balance:\n\n"
         
         for currency, amount in balances.items():
-            if currency == "sats":
-                usd_value = amount * 0.00025  # Approximate BTC price
-                balance_text += f"🪙 Bitcoin: {amount:,.0f} sats (${usd_value:.2f})\n"
-            elif currency == "gwei":
-                usd_value = amount * 0.0000000005  # Approximate ETH price
-                balance_text += f"⚡ Ethereum: {amount:,.0f} gwei (${usd_value:.2f})\n"
-            elif currency == "micro_usdc":
-                usd_value = amount * 0.000001
-                balance_text += f"💵 USDC: {amount:,.0f} micro USDC (${usd_value:.2f})\n"
-            elif currency == "micro_usdt":
-                usd_value = amount * 0.000001
-                balance_text += f"💵 USDT: {amount:,.0f} micro USDT (${usd_value:.2f})\n"
+            unit = registry.resolve(currency)
+            if not unit:
+                balance_text += f"❔ {amount:,.0f} {currency}\n"
+                continue
+            
+            emoji, name, price = TOKEN_DISPLAY.get(unit.base_token, ("🪙", unit.base_token, None))
+            if price is None:
+                balance_text += f"{emoji} {name}: {amount:,.0f} {unit.label}\n"
+                continue
             
+            usd_value = amount * price / 10 ** unit.decimals
+            balance_text += f"{emoji} {name}: {amount:,.0f} {unit.label} (${usd_value:.2f})\n"
             total_usd += usd_value
         
         balance_text += f"\n💵 Total Value: ~${total_usd:.2f} USD"
         return balance_text
     
+    @staticmethod
+    def wallet_balance(mint_balances: List[Dict[str, Any]]) -> str:
+        """Display the balances returned by the `get_all_nodes_balances` tool."""
+        balances = balance_totals(mint_balances)
+        if not balances:
+            return "💰 Your Cashu wallet is empty.\n\n💡 Send me a cashuB wad to receive funds!"
+        return ResponseTemplates.balance_display(balances)
+    
+    @staticmethod
+    def wads_created(amount: float, currency: str, wads: str) -> str:
+        """Message carrying freshly created wads."""
+        return (
+            f"🪙 Created {format_currency_amount(amount, currency)} in Cashu wads:\n\n"
+            f"{wads}\n\n"
+            f"⚠️ Anyone holding these wads can spend them, share carefully!"
+        )
+    
+    @staticmethod
+    def wads_received(receipts: List[Dict[str, Any]]) -> str:
+        """Summary of the wads stored by the `receive_wads` tool."""
+        lines = ["✅ Wads received!\n"]
+        for receipt in receipts:
+            currency = receipt_currency(receipt["unit"])
+            lines.append(f"💰 {format_currency_amount(receipt['amount'], currency)} from {receipt['mint_url']}")
+        lines.append("\n💡 Check your balance: \"Show my balance\"")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def history_page(entries: List[Any], first_page: bool) -> str:
+        """One page of a user's transaction history, newest first."""
+        if not entries:
+            return "📜 No transactions yet." if first_page else "📜 No older transactions."
+        icons = {"received": "📥", "created": "🪙", "sent": "📤"}
+        lines = ["📜 Transaction history\n"]
+        for entry in entries:
+            line = (
+                f"{icons.get(entry.kind, '•')} {datetime.fromtimestamp(entry.ts).strftime('%Y-%m-%d %H:%M')} "
+                f"{entry.kind} {format_currency_amount(entry.amount, entry.currency)}"
+            )
+            if entry.mint_url:
+                line += f" from {entry.mint_url}"
+            lines.append(f"{line}\n   🔗 {entry.tx_id}")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def wads_preview(summaries: List[Any]) -> str:
+        """What is being received, decoded locally from the wads."""
+        registry = get_unit_registry()
+        parts = []
+        for summary in summaries:
+            unit, label = registry.from_wad_unit(summary.unit)
+            currency = unit.key if unit else label
+            parts.append(f"{format_currency_amount(summary.amount, currency)} from mint {summary.mint_url}")
+        return "Receiving " + ", ".join(parts)
+    
+    @staticmethod
+    def invalid_wad(reason: str) -> str:
+        """Error message for a wad rejected before reaching the mint."""
+        return f"❌ This wad is invalid ({reason}). Please check that it was copied completely."
+    
+    @staticmethod
+    def bulk_import_summary(report: Dict[str, Any]) -> str:
+        """Outcome of a bulk wad import, the per-line detail goes in the attached document."""
+        lines = [f"📥 Import finished: {report['received']} of {report['wads']} wads received"]
+        if report["invalid"]:
+            lines.append(f"❌ {report['invalid']} invalid")
+        if report["failed"]:
+            lines.append(f"⚠️ {report['failed']} refused by the mint")
+        if report["unknown"]:
+            lines.append(f"❓ {report['unknown']} unconfirmed, maybe received (see the summary file): check your "
+                         f"balance before sending them again")
+        if report["skipped"]:
+            lines.append(f"ℹ️ {report['skipped']} lines without a wad")
+        lines.append(f"\n⏱️ {report['seconds']:.1f}s, {report['wads_per_second']:.0f} wads/s")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def bulk_payout_summary(report: Dict[str, Any]) -> str:
+        """Outcome of a bulk payout, the wads themselves are in the attached document."""
+        lines = [f"🪙 Payout finished: {report['created']} of {report['requested']} wads created"]
+        if report["failed"]:
+            lines.append(f"⚠️ {report['failed']} could not be created, see the status column")
+        lines.append(f"\n⏱️ {report['seconds']:.1f}s, {report['ms_per_wad']:.0f}ms per wad")
+        lines.append("⚠️ Anyone holding these wads can spend them, share carefully!")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def bulk_payout_delivered(report: Dict[str, Any]) -> str:
+        """Outcome of sending the wads of a payout to their recipients."""
+        lines = [f"📣 {report['sent']} of {report['total']} wads sent to their recipients"]
+        if report["failed"]:
+            lines.append(f"⚠️ {report['failed']} could not be delivered (chat unknown or bot blocked), "
+                         f"those wads are only in the document")
+        if report.get("unknown"):
+            lines.append(f"❓ {report['unknown']} timed out and may not have arrived, check with the recipient "
+                         f"before sending those wads again")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def bulk_payout_confirmation(count: int, totals: Dict[str, float]) -> str:
+        """Confirmation message for a bulk payout, with its total per currency."""
+        total = ", ".join(format_currency_amount(amount, currency) for currency, amount in totals.items())
+        return (
+            f"🔒 Payout Check:\n\n"
+            f"Wads: {count}\n"
+            f"Total: {total}\n\n"
+            f"⚠️ The total is taken from the wallet once you confirm, anyone holding the wads can spend them."
+        )
+    
+    @staticmethod
+    def bulk_payout_cancelled() -> str:
+        """Reply to "No" on a payout confirmation."""
+        return "🚫 Payout cancelled, nothing was spent."
+    
+    @staticmethod
+    def bulk_payout_expired() -> str:
+        """Reply to a payout confirmation that came too late."""
+        return "⌛ This payout confirmation expired, nothing was spent. Send the request again to retry."
+    
+    @staticmethod
+    def bulk_payout_undelivered() -> str:
+        """Reply when the document of a payout could not be sent, its wads went back to the wallet."""
+        return "⚠️ The payout document could not be sent, its wads were received back into the wallet."
+    
+    @staticmethod
+    def bulk_payout_too_large(max_wads: int) -> str:
+        """Error message for a payout over the per-request limit."""
+        return f"❌ A payout can create at most {max_wads} wads at once, please split it."
+    
+    @staticmethod
+    def job_queued(action: str) -> str:
+        """Quick acknowledgement for a queued wallet operation."""
+        return f"⏳ {action}... I'll reply here as soon as it's done."
+    
+    @staticmethod
+    def wad_fragments_pending() -> str:
+        """Acknowledgement for the first fragment of a split wad."""
+        return "🧩 Long wad detected, waiting for the rest of it..."
+    
+    @staticmethod
+    def wad_too_long() -> str:
+        """Error message for a split wad over the buffering limit."""
+        return "❌ This wad is too long to be reassembled. Please send it as a file instead."
+    
     @staticmethod
     def send_confirmation(amount: float, currency: str, recipient: str) -> str:
         """Confirmation message for sending money."""
-        currency_symbols = {
-            "usd": "USD",
-            "dollars": "USD",
-            "sats": "sats",
-            "gwei": "gwei",
-            "micro_usdc": "micro USDC",
-            "micro_usdt": "micro USDT"
-        }
+        unit = get_unit_registry().resolve(currency)
         
         return (
             f"🔒 Security Check:\n\n"
-            f"Amount: {amount:,.0f} {currency_symbols.get(currency, currency)}\n"
+            f"Amount: {format_currency_amount(amount, currency)}\n"
             f"Recipient: @{recipient}\n"
-            f"Network: {currency.upper()}\n\n"
+            f"Network: {unit.base_token if unit else currency.upper()}\n\n"
             f"⚠️ Please confirm:\n"
             f"• Amount is correct\n"
             f"• Recipient is correct\n"
@@ -141,15 +474,48 @@ class ResponseTemplates:
             f"🎉 Your payment is on its way!"
         )
     
+    @staticmethod
+    def send_ready(amount: float, currency: str, recipient: str, wads: str) -> str:
+        """Wads created for a confirmed send, to be forwarded to the recipient."""
+        return (
+            f"✅ Payment for @{recipient} ready!\n\n"
+            f"💰 Amount: {format_currency_amount(amount, currency)}\n\n"
+            f"{wads}\n\n"
+            f"📨 Forward these wads to @{recipient}, anyone holding them can spend them."
+        )
+    
+    @staticmethod
+    def send_cancelled() -> str:
+        """Reply to "NO" on a send confirmation."""
+        return "🚫 Send cancelled, nothing was spent."
+    
+    @staticmethod
+    def send_expired() -> str:
+        """Reply to a confirmation that came too late."""
+        return "⌛ This send confirmation expired, nothing was spent. Send the request again to retry."
+    
+    @staticmethod
+    def inline_wad_pending(amount: float, currency: str) -> str:
+        """Inline message shown while its wad is being created."""
+        return f"🪙 Creating a wad of {format_currency_amount(amount, currency)}..."
+    
+    @staticmethod
+    def inline_wad_too_long(amount: float, currency: str) -> str:
+        """Inline message of a wad too long to fit, sent to the user's private chat instead."""
+        return (
+            f"🪙 A wad of {format_currency_amount(amount, currency)} was created, but it is too long "
+            f"for an inline message.\n\n📨 It was sent to you in a private chat with the bot."
+        )
+    
     @staticmethod
     def insufficient_funds(requested: float, available: float, currency: str) -> str:
         """Error message for insufficient funds."""
         shortage = requested - available
         return (
             f"❌ Insufficient Funds\n\n"
-            f"Your balance: ${available:.2f} USD\n"
-            f"Requested: ${requested:.2f} USD\n"
-            f"Shortage: ${shortage:.2f} USD\n\n"
+            f"Your balance: {format_currency_amount(available, currency)}\n"
+            f"Requested: {format_currency_amount(requested, currency)}\n"
+            f"Shortage: {format_currency_amount(shortage, currency)}\n\n"
             f"💡 Options:\n"
             f"• Send a smaller amount\n"
             f"• Add funds to your wallet\n"
@@ -207,6 +573,36 @@ class ResponseTemplates:
             f"• Security issues"
         )
     
+    @staticmethod
+    def wallet_not_allowed() -> str:
+        """Refusal for a user who isn't on the wallet's allowlist."""
+        return (
+            f"🔒 Private Wallet\n\n"
+            f"This bot runs its owner's wallet, only the users they allowed can "
+            f"check its balance, receive or send wads.\n\n"
+            f"💡 Ask the bot's operator to add your Telegram user ID to WALLET_USER_IDS."
+        )
+    
+    @staticmethod
+    def inline_wallet_not_allowed() -> str:
+        """Inline message of a result chosen by a user who isn't on the wallet's allowlist."""
+        return "🔒 This wallet is private, no wad was created."
+    
+    @staticmethod
+    def did_you_mean(text: str) -> str:
+        """Question asked before running a command guessed from a message with typos."""
+        return f"🤔 Did you mean:\n\n\"{text}\"\n\nNothing is done until you confirm."
+    
+    @staticmethod
+    def suggestion_dismissed() -> str:
+        """Reply when a guessed command is turned down."""
+        return "👍 Okay, nothing was done."
+    
+    @staticmethod
+    def suggestion_expired() -> str:
+        """Reply to a guessed command confirmed too late."""
+        return "⌛ This question expired, nothing was done. Send the command again to retry."
+    
     @staticmethod
     def help_message() -> str:
         """Help message with available commands."""
@@ -252,28 +648,54 @@ class ResponseTemplates:
         )
     
     @staticmethod
-    def received_tokens(amount: float, currency: str, sender: str, tx_id: str) -> str:
-        """Message for received tokens."""
+    def received_tokens(amount: float, currency: str, sender: str, wads: str) -> str:
+        """Message bringing a recipient the wads of a payout."""
         return (
             f"🎁 You received Cashu tokens!\n\n"
-            f"💰 Amount: {amount:,.0f} {currency}\n"
-            f"👤 From: @{sender}\n"
-            f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}\n"
-            f"🔗 Transaction: `{tx_id}`\n\n"
+            f"💰 Amount: {format_currency_amount(amount, currency)}\n"
+            f"👤 From: {sender}\n"
+            f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}\n\n"
+            f"{wads}\n\n"
             f"💡 What are Cashu tokens?\n"
             f"• Digital cash that's private and fast\n"
             f"• Can be spent instantly without banks\n"
             f"• Works with Bitcoin, Ethereum, and stablecoins\n\n"
             f"⚠️ Security Tips:\n"
             f"• Keep your tokens safe like cash\n"
-            f"• Don't share private keys\n"
+            f"• Anyone holding the wads above can spend them\n"
             f"• Verify amounts before spending\n\n"
-            f"🚀 Ready to spend? Use these tokens to pay others or convert to other currencies!"
+            f"🚀 Paste the wads to me to add them to your wallet!"
         )
 
 class CommandParser:
     """Parse natural language commands."""
     
+    @staticmethod
+    def detect_intent(text: str) -> str:
+        """Classify a message with the same keyword checks the bot uses to route it."""
+        if text.startswith("/"):
+            command = text[1:].split(maxsplit=1)[0].split("@")[0].lower() if len(text) > 1 else ""
+            return CommandPatterns.COMMAND_INTENTS.get(command, Intent.ECHO)
+        
+        if CommandPatterns.WAD_PATTERN.search(text):
+            return Intent.RECEIVE
+        
+        text_lower = text.lower().strip()
+        intents = _phrase_matcher.intents(text_lower)
+        if not intents:
+            return Intent.ECHO
+        if Intent.BALANCE in intents:
+            return Intent.BALANCE
+        if Intent.SECURITY in intents:
+            return Intent.SECURITY
+        if Intent.HELP in intents:
+            return Intent.HELP
+        if Intent.SEND in intents and "@" in text:
+            return Intent.SEND
+        if Intent.CREATE in intents and CommandPatterns.UNIT_WORD_REGEX.search(text_lower):
+            return Intent.CREATE
+        return Intent.ECHO
+    
     @staticmethod
     def parse_balance_command(text: str) -> bool:
         """Check if text is a balance command."""
@@ -288,28 +710,12 @@ class CommandParser:
         """Parse send command and return (amount, currency, recipient)."""
         text_lower = text.lower().strip()
         
-        for pattern in CommandPatterns.SEND_PATTERNS:
-            match = re.match(pattern, text_lower)
+        for regex in CommandPatterns.SEND_REGEXES:
+            match = regex.match(text_lower)
             if match:
-                if len(match.groups()) == 3:
-                    amount = float(match.group(1))
-                    currency = match.group(2)
-                    recipient = match.group(3)
-                else:
-                    recipient = match.group(1)
-                    amount = float(match.group(2))
-                    currency = match.group(3)
-                
-                # Normalize currency
-                currency = currency.replace(" ", "_")
-                if currency in ["usd", "dollars", "dollar"]:
-                    currency = "usd"
-                elif currency in ["micro_usdc", "micro_usdc"]:
-                    currency = "micro_usdc"
-                elif currency in ["micro_usdt", "micro_usdt"]:
-                    currency = "micro_usdt"
-                
-                return (amount, currency, recipient)
+                amount = float(match.group("amount"))
+                currency = get_unit_registry().normalize(match.group("currency"))
+                return (amount, currency, match.group("recipient"))
         
         return None
     
@@ -318,25 +724,63 @@ class CommandParser:
         """Parse create/mint command and return (amount, currency)."""
         text_lower = text.lower().strip()
         
-        for pattern in CommandPatterns.CREATE_PATTERNS:
-            match = re.match(pattern, text_lower)
+        for regex in CommandPatterns.CREATE_REGEXES:
+            match = regex.match(text_lower)
             if match:
-                amount = float(match.group(1))
-                currency = match.group(2)
-                
-                # Normalize currency
-                currency = currency.replace(" ", "_")
-                if currency in ["usd", "dollars", "dollar"]:
-                    currency = "usd"
-                elif currency in ["micro_usdc", "micro_usdc"]:
-                    currency = "micro_usdc"
-                elif currency in ["micro_usdt", "micro_usdt"]:
-                    currency = "micro_usdt"
-                
+                amount = float(match.group("amount"))
+                currency = get_unit_registry().normalize(match.group("currency"))
                 return (amount, currency)
         
         return None
     
+    @staticmethod
+    def parse_bulk_create_command(text: str) -> Optional[Tuple[int, float, str]]:
+        """Parse a bulk payout such as "create 50 wads of 100 sats", return (count, amount, currency)."""
+        match = CommandPatterns.BULK_CREATE_REGEX.match(text.lower().strip())
+        if not match:
+            return None
+        currency = get_unit_registry().normalize(match.group("currency"))
+        return (int(match.group("count")), float(match.group("amount")), currency)
+    
+    @staticmethod
+    def parse_confirmation(text: str) -> Optional[bool]:
+        """True for "YES", False for "NO", None for any other reply."""
+        answer = text.strip().lower().rstrip("!.")
+        if answer in CommandPatterns.CONFIRM_WORDS:
+            return True
+        if answer in CommandPatterns.CANCEL_WORDS:
+            return False
+        return None
+    
+    @staticmethod
+    def parse_inline_amounts(text: str) -> List[Tuple[float, str]]:
+        """
+        Amounts an inline query may stand for, as (amount, currency) pairs.
+        
+        "100 sats" is one amount; "100" or "100 s" are the amount in each
+        currency whose words start with what was typed so far.
+        """
+        match = CommandPatterns.INLINE_AMOUNT_PATTERN.match(text.lower())
+        if not match:
+            return []
+        amount = float(match.group("amount"))
+        if amount <= 0:
+            return []
+        registry = get_unit_registry()
+        typed = re.sub(r"\s+", " ", match.group("unit"))
+        currency = registry.normalize(typed) if typed else None
+        if currency:
+            return [(amount, currency)]
+        
+        currencies: List[str] = []
+        for word in sorted(set(registry.by_alias) | set(registry.asset_aliases)):
+            currency = registry.normalize(word)
+            if word.startswith(typed) and currency and currency not in currencies:
+                currencies.append(currency)
+        # Sats first, the unit most wads are made of, then units before whole tokens
+        currencies.sort(key=lambda currency: (currency != "sat", currency not in registry.by_key))
+        return [(amount, currency) for currency in currencies[:CommandPatterns.INLINE_MAX_SUGGESTIONS]]
+    
     @staticmethod
     def parse_help_command(text: str) -> str:
         """Parse help command and return appropriate help type."""
@@ -357,18 +801,29 @@ def generate_transaction_id() -> str:
     import uuid
     return f"cashu_{str(uuid.uuid4())[:8]}"
 
+def to_asset_amount(amount: float, currency: str) -> Optional[Tuple[str, str]]:
+    """Convert a parsed amount to the (asset amount, asset) pair `create_wads` expects."""
+    return get_unit_registry().to_asset_amount(amount, currency)
+
+def receipt_currency(unit_value: Any) -> str:
+    """Currency key for a serialized server `Unit`, its raw label for `Other` units."""
+    unit, label = get_unit_registry().from_server_unit(unit_value)
+    return unit.key if unit else label
+
+def balance_totals(mint_balances: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Total per currency of the balances returned by the `get_all_nodes_balances` tool."""
+    registry = get_unit_registry()
+    balances: Dict[str, float] = {}
+    for mint in mint_balances:
+        for balance in mint.get("balances", []):
+            unit, label = registry.from_server_unit(balance["unit"])
+            currency = unit.key if unit else label
+            balances[currency] = balances.get(currency, 0) + balance["amount"]
+    return balances
+
 def format_currency_amount(amount: float, currency: str) -> str:
     """Format currency amount for display."""
-    if currency == "usd":
-        return f"${amount:.2f} USD"
-    elif currency == "sats":
-        return f"{amount:,.0f} sats"
-    elif currency == "gwei":
-        return f"{amount:,.0f} gwei"
-    elif currency == "micro_usdc":
-        return f"{amount:,.0f} micro USDC"
-    elif currency == "micro_usdt":
-        return f"{amount:,.0f} micro USDT"
-    else:
-        return f"{amount:,.0f} {currency}"
+    return get_unit_registry().format_amount(amount, currency)
 
+CommandPatterns.compile(_unit_registry)
+_phrase_matcher = PhraseMatcher([CommandPatterns.keyword_phrases()])
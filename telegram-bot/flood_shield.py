@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Inbound Flood Shield for Cashu Telegram Bot
+
+Runs before any handler and drops abusive traffic: too many messages,
+too many bytes or a document too large to ever be processed. Each user
+costs a fixed amount of memory (a sliding-window counter and a byte
+bucket) and idle users are evicted. The continuation fragments of a wad
+split across messages count for a share of a message, and the reassembler
+caps how many a wad can have, so a wad fits in a window's message count
+but fragments can't be used to get around it.
+"""
+
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class Verdict:
+    """Why an update was shed."""
+
+    RATE = "rate"
+    BYTES = "bytes"
+    OVERSIZE = "oversize"
+
+
+class _UserState:
+    """Sliding-window counter plus byte token bucket, O(1) per user."""
+
+    __slots__ = ("window_start", "previous_count", "current_count", "byte_tokens", "refilled_at", "notified_at")
+
+    def __init__(self, now: float, byte_budget: int):
+        self.window_start = now
+        self.previous_count = 0
+        self.current_count = 0
+        self.byte_tokens = float(byte_budget)
+        self.refilled_at = now
+        self.notified_at = 0.0
+
+
+class FloodShield:
+    """Per-user admission control for inbound updates."""
+
+    def __init__(
+        self,
+        max_messages: int = 20,
+        window_seconds: float = 60.0,
+        byte_budget: int = 64 * 1024 * 1024,
+        max_document_bytes: int = 50 * 1024 * 1024,
+        max_users: int = 100000,
+        fragment_weight: float = 0.1,
+    ):
+        """
+        Args:
+            max_messages: Updates allowed per user per window
+            window_seconds: Length of the sliding window
+            byte_budget: Bytes (text and documents) allowed per user per window
+            max_document_bytes: Larger documents are rejected from their file_size
+            max_users: Tracked users before idle ones are evicted
+            fragment_weight: Share of a message the continuation fragment of a split wad counts for
+        """
+        self.max_messages = max_messages
+        self.fragment_weight = fragment_weight
+        self.window_seconds = window_seconds
+        self.byte_budget = byte_budget
+        self.byte_refill_rate = byte_budget / window_seconds
+        self.max_document_bytes = max_document_bytes
+        self.max_users = max_users
+        self._users: Dict[int, _UserState] = {}
+        self.admitted = 0
+        self.shed: Dict[str, int] = {Verdict.RATE: 0, Verdict.BYTES: 0, Verdict.OVERSIZE: 0}
+        self.shed_bytes = 0
+
+    @staticmethod
+    def update_cost(update: Any) -> Tuple[Optional[int], int, int]:
+        """
+        Sender and size of an update, read from metadata only.
+
+        Returns:
+            (user id, text size, declared document size)
+        """
+        user = getattr(update, "effective_user", None)
+        message = getattr(update, "effective_message", None)
+        if message is None:
+            return (user.id if user else None, 0, 0)
+
+        text = message.text or message.caption or ""
+        document = message.document
+        document_size = (document.file_size or 0) if document else 0
+        return (user.id if user else None, len(text), document_size)
+
+    def check(self, user_id: Optional[int], text_size: int, document_size: int,
+              now: Optional[float] = None, fragment: bool = False) -> Optional[str]:
+        """
+        Decides whether an update may be processed.
+
+        Args:
+            fragment: Continuation fragment of a split wad, counted at `fragment_weight`
+
+        Returns:
+            None if admitted, otherwise the Verdict it was shed for
+        """
+        if user_id is None:
+            self.admitted += 1
+            return None
+
+        now = time.monotonic() if now is None else now
+        state = self._users.get(user_id)
+        if state is None:
+            if len(self._users) >= self.max_users:
+                self._evict_idle(now)
+            state = self._users[user_id] = _UserState(now, self.byte_budget)
+
+        # Decided from the declared file_size, the document is never downloaded
+        if document_size > self.max_document_bytes:
+            return self._shed(Verdict.OVERSIZE, document_size)
+
+        # Roll the window, counts older than two windows are forgotten
+        elapsed = now - state.window_start
+        if elapsed >= self.window_seconds:
+            windows = int(elapsed // self.window_seconds)
+            state.previous_count = state.current_count if windows == 1 else 0
+            state.current_count = 0
+            state.window_start += windows * self.window_seconds
+            elapsed = now - state.window_start
+
+        weight = 1 - elapsed / self.window_seconds
+        if state.previous_count * weight + state.current_count >= self.max_messages:
+            return self._shed(Verdict.RATE, text_size + document_size)
+
+        state.byte_tokens = min(
+            self.byte_budget, state.byte_tokens + (now - state.refilled_at) * self.byte_refill_rate
+        )
+        state.refilled_at = now
+        size = text_size + document_size
+        if size > state.byte_tokens:
+            return self._shed(Verdict.BYTES, size)
+
+        state.byte_tokens -= size
+        state.current_count += self.fragment_weight if fragment else 1
+        self.admitted += 1
+        return None
+
+    def should_notify(self, user_id: int, now: Optional[float] = None) -> bool:
+        """Tell a shed user at most once per window, replies must not amplify a flood."""
+        state = self._users.get(user_id)
+        now = time.monotonic() if now is None else now
+        if state is None or now - state.notified_at < self.window_seconds:
+            return False
+        state.notified_at = now
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "shed_rate": self.shed[Verdict.RATE],
+            "shed_bytes": self.shed[Verdict.BYTES],
+            "shed_oversize": self.shed[Verdict.OVERSIZE],
+            "shed_payload_bytes": self.shed_bytes,
+            "tracked_users": len(self._users),
+        }
+
+    def _shed(self, verdict: str, size: int) -> str:
+        self.shed[verdict] += 1
+        self.shed_bytes += size
+        return verdict
+
+    def _evict_idle(self, now: float):
+        idle_after = 2 * self.window_seconds
+        for user_id in [uid for uid, state in self._users.items() if now - state.window_start >= idle_after]:
+            del self._users[user_id]
+        if len(self._users) >= self.max_users:
+            # Everyone is active, drop the oldest windows
+            for user_id in sorted(self._users, key=lambda uid: self._users[uid].window_start)[:self.max_users // 10]:
+                del self._users[user_id]
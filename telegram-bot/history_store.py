@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Transaction History Store for Cashu Telegram Bot
+
+Wallet operations are recorded in a SQLite database in WAL mode. Records
+are buffered in memory and written in batches by a dedicated thread, so
+the event loop never waits on disk. Pages are read with keyset pagination
+on the (user_id, ts, id) index: loading any page costs the same whether a
+user has ten entries or a million.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    tx_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    mint_url TEXT,
+    memo TEXT
+);
+CREATE INDEX IF NOT EXISTS history_user_ts ON history (user_id, ts, id);
+CREATE INDEX IF NOT EXISTS history_tx ON history (tx_id);
+"""
+
+_INSERT = (
+    "INSERT INTO history (tx_id, user_id, ts, kind, amount, currency, mint_url, memo) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_COLUMNS = "id, tx_id, user_id, ts, kind, amount, currency, mint_url, memo"
+
+
+class HistoryKind:
+    """What a history entry records."""
+
+    RECEIVED = "received"
+    CREATED = "created"
+    SENT = "sent"
+
+
+class HistoryEntry:
+    """One wallet operation of a user."""
+
+    __slots__ = ("id", "tx_id", "user_id", "ts", "kind", "amount", "currency", "mint_url", "memo")
+
+    def __init__(self, id: Optional[int], tx_id: str, user_id: int, ts: float, kind: str,
+                 amount: float, currency: str, mint_url: Optional[str] = None, memo: Optional[str] = None):
+        self.id = id
+        self.tx_id = tx_id
+        self.user_id = user_id
+        self.ts = ts
+        self.kind = kind
+        self.amount = amount
+        self.currency = currency
+        self.mint_url = mint_url
+        self.memo = memo
+
+    def row(self) -> Tuple[Any, ...]:
+        return (self.tx_id, self.user_id, self.ts, self.kind, self.amount, self.currency, self.mint_url, self.memo)
+
+
+def encode_cursor(entry: HistoryEntry) -> str:
+    """Opaque position after `entry`, short enough for callback data."""
+    return f"{entry.ts!r}:{entry.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    ts, _, row_id = cursor.partition(":")
+    return float(ts), int(row_id)
+
+
+class HistoryStore:
+    """SQLite history with batched background writes and keyset pages."""
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 0.5):
+        """
+        Args:
+            path: SQLite database file
+            batch_size: Entries written per transaction
+            flush_interval: Longest time an entry waits in memory
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[HistoryEntry] = []
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        # One thread per connection, WAL lets the reader run beside the writer
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-write")
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-read")
+        self._write_connection: Optional[sqlite3.Connection] = None
+        self._read_connection: Optional[sqlite3.Connection] = None
+        self.written = 0
+        self.batches = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._write_executor, self._open_writer)
+        await loop.run_in_executor(self._read_executor, self._open_reader)
+        self._writer = loop.create_task(self._write_loop())
+
+    async def close(self):
+        """Write what is still pending and close both connections."""
+        if self._writer:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        loop = asyncio.get_running_loop()
+        if self._pending:
+            await self._flush(loop)
+        if self._write_connection:
+            await loop.run_in_executor(self._write_executor, self._write_connection.close)
+        if self._read_connection:
+            await loop.run_in_executor(self._read_executor, self._read_connection.close)
+        self._write_executor.shutdown()
+        self._read_executor.shutdown()
+
+    def record(self, user_id: int, kind: str, amount: float, currency: str, tx_id: str,
+               mint_url: Optional[str] = None, memo: Optional[str] = None):
+        """Buffers an entry, it reaches disk with the next batch."""
+        self._pending.append(HistoryEntry(None, tx_id, user_id, time.time(), kind, amount, currency, mint_url, memo))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def page(self, user_id: int, cursor: Optional[str] = None,
+                   limit: int = 10) -> Tuple[List[HistoryEntry], Optional[str]]:
+        """
+        A page of a user's history, newest first.
+
+        Args:
+            user_id: Telegram user id
+            cursor: Position returned with the previous page, None for the first page
+            limit: Entries per page
+
+        Returns:
+            (entries, cursor of the next page or None on the last page)
+        """
+        position = decode_cursor(cursor) if cursor else None
+        rows = await asyncio.get_running_loop().run_in_executor(
+            self._read_executor, self._read_page, user_id, position, limit + 1
+        )
+        entries = [HistoryEntry(*row) for row in rows[:limit]]
+        next_cursor = encode_cursor(entries[-1]) if len(rows) > limit else None
+        return entries, next_cursor
+
+    def metrics(self) -> Dict[str, int]:
+        return {"pending": len(self._pending), "written": self.written, "batches": self.batches}
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _open_writer(self):
+        self._write_connection = self._connect()
+        self._write_connection.executescript(_SCHEMA)
+
+    def _open_reader(self):
+        self._read_connection = self._connect()
+
+    def _write_batches(self, entries: List[HistoryEntry]) -> int:
+        batches = 0
+        for start in range(0, len(entries), self.batch_size):
+            with self._write_connection:
+                self._write_connection.executemany(
+                    _INSERT, [entry.row() for entry in entries[start:start + self.batch_size]]
+                )
+            batches += 1
+        return batches
+
+    def _read_page(self, user_id: int, position: Optional[Tuple[float, int]], limit: int) -> List[tuple]:
+        if position is None:
+            return self._read_connection.execute(
+                f"SELECT {_COLUMNS} FROM history WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        return self._read_connection.execute(
+            f"SELECT {_COLUMNS} FROM history WHERE user_id = ? AND (ts, id) < (?, ?) "
+            f"ORDER BY ts DESC, id DESC LIMIT ?",
+            (user_id, position[0], position[1], limit),
+        ).fetchall()
+
+    async def _flush(self, loop: asyncio.AbstractEventLoop):
+        entries, self._pending = self._pending, []
+        try:
+            self.batches += await loop.run_in_executor(self._write_executor, self._write_batches, entries)
+        except sqlite3.Error as e:
+            logger.error("Failed to write %d history entries: %s", len(entries), e)
+            return
+        self.written += len(entries)
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending:
+                await self._flush(loop)
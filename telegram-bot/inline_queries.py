@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Inline Query Answers for Cashu Telegram Bot
+
+"@bot 100 sats" sends an inline query on nearly every keystroke. Each
+user's queries are debounced: a query is answered only once the user
+stopped typing for a moment, the ones it replaced are never answered,
+since the client only shows the latest. Queries are reduced to a key
+(the amounts they may stand for), so "100 sat" and "100 sats " share one
+result list, built once and kept in a small per-user cache. Answering
+never calls the wallet: the wad is only created once a result is chosen.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Answer = Callable[[List[Any]], Awaitable[Any]]
+
+
+class InlineQueries:
+    """Debounced, per-user cached answers to inline queries."""
+
+    def __init__(
+        self,
+        key: Callable[[str], Hashable],
+        build: Callable[[Hashable], List[Any]],
+        debounce: float = 0.3,
+        ttl: float = 600.0,
+        max_users: int = 10000,
+        max_lists_per_user: int = 16,
+    ):
+        """
+        Args:
+            key: Reduces a query text to what its results depend on, cheaply
+            build: Builds the result list of a key
+            debounce: Seconds without a newer query from the user before one is answered
+            ttl: Seconds a built result list is reused
+            max_users: Users with cached result lists, the least recent are dropped
+            max_lists_per_user: Result lists kept per user
+        """
+        self.key = key
+        self.build = build
+        self.debounce = debounce
+        self.ttl = ttl
+        self.max_users = max_users
+        self.max_lists_per_user = max_lists_per_user
+        self._pending: Dict[int, asyncio.TimerHandle] = {}
+        self._users: "OrderedDict[int, OrderedDict[Hashable, Tuple[float, List[Any]]]]" = OrderedDict()
+        self._answering: Set[asyncio.Task] = set()
+        self.received = 0
+        self.superseded = 0
+        self.answered = 0
+        self.hits = 0
+        self.builds = 0
+        self.failed = 0
+
+    def submit(self, user_id: int, text: str, answer: Answer):
+        """Answers the user's query once they stop typing, dropping the query it replaces."""
+        self.received += 1
+        previous = self._pending.pop(user_id, None)
+        if previous is not None:
+            previous.cancel()
+            self.superseded += 1
+        self._pending[user_id] = asyncio.get_running_loop().call_later(
+            self.debounce, self._answer, user_id, text, answer
+        )
+
+    def results(self, user_id: int, text: str) -> List[Any]:
+        """The result list of a query, built only when the user has none for its key."""
+        key = self.key(text)
+        now = time.monotonic()
+        lists = self._users.get(user_id)
+        if lists is None:
+            if len(self._users) >= self.max_users:
+                self._users.popitem(last=False)
+            lists = self._users[user_id] = OrderedDict()
+        else:
+            self._users.move_to_end(user_id)
+        cached = lists.get(key)
+        if cached is not None and now - cached[0] < self.ttl:
+            lists.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        results = self.build(key)
+        self.builds += 1
+        lists[key] = (now, results)
+        lists.move_to_end(key)
+        while len(lists) > self.max_lists_per_user:
+            lists.popitem(last=False)
+        return results
+
+    async def close(self):
+        for handle in self._pending.values():
+            handle.cancel()
+        self._pending.clear()
+        if self._answering:
+            await asyncio.gather(*self._answering, return_exceptions=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "superseded": self.superseded,
+            "answered": self.answered,
+            "failed": self.failed,
+            "cache_hits": self.hits,
+            "builds": self.builds,
+            "users": len(self._users),
+            "pending": len(self._pending),
+        }
+
+    def _answer(self, user_id: int, text: str, answer: Answer):
+        del self._pending[user_id]
+        task = asyncio.ensure_future(self._send(answer, self.results(user_id, text)))
+        self._answering.add(task)
+        task.add_done_callback(self._answering.discard)
+
+    async def _send(self, answer: Answer, results: List[Any]):
+        try:
+            await answer(results)
+            self.answered += 1
+        except Exception as e:
+            # Usually a query that expired while the user kept typing, nothing to retry
+            self.failed += 1
+            logger.warning("Inline query answer failed: %s", e, extra={"event": "inline_answer_failed"})
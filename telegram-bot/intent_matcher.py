@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Fuzzy Intent Matcher for Cashu Telegram Bot
+
+Messages that miss the exact keyword checks ("balnce", "sned 10 sats to
+@bob") are corrected word by word against the command vocabulary, then
+classified again with the exact rules. Vocabulary lookups go through a
+table of single-edit variants and a BK-tree, both built once at startup,
+so a message is matched in microseconds. Only the corrected words are
+rewritten, the rest of the message (recipients, case) is kept as typed.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from command_patterns import CommandParser, Intent, get_phrase_matcher
+
+_TOKEN = re.compile(r"\S+")
+_WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+_ALPHABET = "abcdefghijklmnopqrstuvwxyz'áéíóúñü"
+
+
+def single_edits(word: str) -> Iterable[str]:
+    """Every string one deletion, transposition, substitution or insertion away."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    for left, right in splits:
+        if right:
+            yield left + right[1:]
+            if len(right) > 1:
+                yield left + right[1] + right[0] + right[2:]
+            for char in _ALPHABET:
+                yield left + char + right[1:]
+        for char in _ALPHABET:
+            yield left + char + right
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus transpositions).
+
+    Only the diagonal band of width `limit` is computed, any distance above
+    `limit` is returned as `limit + 1`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    out_of_band = limit + 1
+    previous_previous: List[int] = []
+    previous = [j if j <= limit else out_of_band for j in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        current = [out_of_band] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            char_b = b[j - 1]
+            cost = 0 if char_a == char_b else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return out_of_band
+        previous_previous, previous = previous, current
+    return min(previous[-1], out_of_band)
+
+
+class BKTree:
+    """Burkhard-Keller tree of words, queried by maximum edit distance."""
+
+    def __init__(self, words: Iterable[str]):
+        self._root: Optional[Tuple[str, Dict[int, tuple]]] = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        if self._root is None:
+            self._root = (word, {})
+            return
+
+        node_word, children = self._root
+        while True:
+            distance = edit_distance(word, node_word, max(len(word), len(node_word)))
+            if distance == 0:
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (word, {})
+                return
+            node_word, children = child
+
+    def closest(self, word: str, max_distance: int) -> Optional[Tuple[str, int]]:
+        """Closest word within `max_distance`, ties go to the first inserted."""
+        if self._root is None:
+            return None
+
+        best: Optional[Tuple[str, int]] = None
+        stack = [self._root]
+        while stack:
+            node_word, children = stack.pop()
+            # Past this bound no child can be within range, so the distance can be capped
+            limit = max_distance + max(children, default=0)
+            distance = edit_distance(word, node_word, limit)
+            if distance <= max_distance and (best is None or distance < best[1]):
+                best = (node_word, distance)
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return best
+
+
+class FuzzyIntentMatcher:
+    """Corrects typos against the command vocabulary and returns the best intent."""
+
+    def __init__(self, phrases: Iterable[str], min_word_length: int = 4, max_tokens: int = 12,
+                 max_message_length: int = 200, min_confidence: float = 0.7):
+        """
+        Args:
+            phrases: Command phrases, their words form the vocabulary
+            min_word_length: Shorter words are never corrected (too ambiguous)
+            max_tokens: Only the first tokens of a message are corrected
+            max_message_length: Longer messages are never matched
+            min_confidence: Matches below this score are discarded
+        """
+        self.vocabulary = {
+            word for phrase in phrases for word in _WORD.findall(phrase.lower())
+        }
+        self.min_word_length = min_word_length
+        self.max_tokens = max_tokens
+        self.max_message_length = max_message_length
+        self.min_confidence = min_confidence
+        self._tree = BKTree(sorted(self.vocabulary))
+        self._corrections: Dict[str, Optional[Tuple[str, int]]] = {}
+
+        # Most typos are one edit away, those are answered by a precomputed table
+        # and only longer words fall back to the BK-tree
+        self._one_edit: Dict[str, str] = {}
+        for word in sorted(self.vocabulary):
+            for variant in single_edits(word):
+                if variant in self.vocabulary:
+                    continue
+                # Ambiguous variants prefer a substitution or transposition ("hsow" is "show", not "how")
+                known = self._one_edit.get(variant)
+                if known is None or (len(word) == len(variant) and len(known) != len(variant)):
+                    self._one_edit[variant] = word
+
+    @staticmethod
+    def max_distance(word: str) -> int:
+        return 1 if len(word) < 8 else 2
+
+    def correct_word(self, word: str) -> Optional[Tuple[str, int]]:
+        """Vocabulary word close to `word` and its distance, memoized."""
+        if word in self._corrections:
+            return self._corrections[word]
+
+        correction = None
+        if len(word) >= self.min_word_length and word not in self.vocabulary:
+            if word in self._one_edit:
+                correction = (self._one_edit[word], 1)
+            elif self.max_distance(word) > 1:
+                correction = self._tree.closest(word, self.max_distance(word))
+        if len(self._corrections) < 100000:
+            self._corrections[word] = correction
+        return correction
+
+    def match(self, text: str) -> Optional[Tuple[str, float, str]]:
+        """
+        Finds the intent of a message with typos.
+
+        Returns:
+            (intent, confidence, corrected text), or None when nothing matches
+        """
+        if len(text) > self.max_message_length:
+            return None
+
+        pieces = []
+        end = 0
+        edits = 0
+        corrected_chars = 0
+        for token in _TOKEN.finditer(text):
+            if len(pieces) // 2 >= self.max_tokens:
+                break
+            typed = token.group().strip(".,!?;:")
+            word = typed.lower()
+            correction = self.correct_word(word) if _WORD.fullmatch(word) else None
+            pieces.append(text[end:token.start()])
+            pieces.append(token.group().replace(typed, correction[0]) if correction else token.group())
+            end = token.end()
+            if correction:
+                edits += correction[1]
+                corrected_chars += len(correction[0])
+
+        if not edits:
+            return None
+
+        corrected = "".join(pieces) + text[end:]
+        intent = CommandParser.detect_intent(corrected)
+        if intent == Intent.ECHO:
+            return None
+
+        confidence = 1 - edits / corrected_chars
+        if confidence < self.min_confidence:
+            return None
+        return (intent, round(confidence, 3), corrected)
+
+
+def build_intent_matcher(registry=None, **kwargs) -> FuzzyIntentMatcher:
+    """Build the matcher from the active locales' command phrases and the unit aliases."""
+    phrases: List[str] = get_phrase_matcher().phrases()
+    if registry is not None:
+        phrases = phrases + sorted(registry.by_alias) + sorted(registry.asset_aliases)
+    return FuzzyIntentMatcher(phrases, **kwargs)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Locale Pattern Packs for Cashu Telegram Bot
+
+English command phrases come from `CommandPatterns`, other languages ship
+as JSON packs in `locale_packs/`. A pack is only read the first time a chat
+needs it; the phrases of every active locale are then compiled together
+into the single `PhraseMatcher` used by `CommandParser.detect_intent`.
+Send and create phrases only route when the pack also has the templates
+that parse their amounts, otherwise the English-only parser would fail.
+Packs activated while the bot runs are loaded and compiled off the event
+loop, the new matchers replace the old ones once built.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from command_patterns import CommandPatterns, Intent, PhraseMatcher, set_phrase_matcher
+
+logger = logging.getLogger(__name__)
+
+LOCALE_PACKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locale_packs")
+DEFAULT_LOCALE = "en"
+
+
+class LocalePacks:
+    """Lazily loaded locale packs and the set of active locales."""
+
+    def __init__(self, packs_dir: str = LOCALE_PACKS_DIR):
+        self.packs_dir = packs_dir
+        self.available = {DEFAULT_LOCALE}
+        if os.path.isdir(packs_dir):
+            self.available.update(name[:-len(".json")] for name in os.listdir(packs_dir) if name.endswith(".json"))
+        self.active: List[str] = []
+        self._loaded: Dict[str, Dict[str, List[str]]] = {}
+        self._templates: Dict[str, Dict[str, List[str]]] = {}
+
+    def load(self, code: str) -> Dict[str, List[str]]:
+        """Phrases of a locale, keyed by intent, read on first use."""
+        if code not in self._loaded:
+            if code == DEFAULT_LOCALE:
+                self._loaded[code] = CommandPatterns.keyword_phrases()
+            else:
+                with open(os.path.join(self.packs_dir, f"{code}.json"), "r", encoding="utf-8") as f:
+                    pack = json.load(f)
+                templates = pack.get("templates", {})
+                self._templates[code] = templates
+                self._loaded[code] = {
+                    intent: phrases for intent, phrases in pack["intents"].items()
+                    if intent not in (Intent.SEND, Intent.CREATE) or templates.get(intent)
+                }
+                logger.info("Loaded locale pack '%s'", code, extra={"event": "locale_loaded"})
+        return self._loaded[code]
+
+    def activate(self, code: str) -> bool:
+        """
+        Adds a locale to the combined matcher.
+
+        Returns:
+            True if the matcher was rebuilt
+        """
+        if code in self.active or code not in self.available:
+            return False
+
+        self.load(code)
+        active = self.active + [code]
+        # Parsing before routing, and `active` last: a locale listed there is fully usable
+        CommandPatterns.add_locale_templates(self._templates.get(code, {}))
+        set_phrase_matcher(PhraseMatcher(self._loaded[locale] for locale in active))
+        self.active = active
+        return True
+
+
+class LocaleDetector:
+    """Per-chat locale, detected once and cached."""
+
+    def __init__(self, packs: LocalePacks, max_chats: int = 10000):
+        self.packs = packs
+        self.max_chats = max_chats
+        self._chats: "OrderedDict[int, str]" = OrderedDict()
+        self._activating = asyncio.Lock()
+
+    def detect(self, language_code: Optional[str]) -> str:
+        """Locale for a Telegram `language_code` such as "es-AR"."""
+        code = (language_code or "").split("-")[0].lower()
+        return code if code in self.packs.available else DEFAULT_LOCALE
+
+    def locale_for(self, chat_id: int, language_code: Optional[str]) -> str:
+        locale = self._chats.get(chat_id)
+        if locale is not None:
+            self._chats.move_to_end(chat_id)
+            return locale
+
+        locale = self.detect(language_code)
+        self._chats[chat_id] = locale
+        if len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+        return locale
+
+    async def ensure_chat_locale(self, chat_id: int, language_code: Optional[str],
+                                 rebuild: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Makes sure the chat's locale is active, reading and compiling a new pack in a thread.
+
+        Args:
+            rebuild: Builds what depends on the active phrases, called in the same thread
+                after a new locale is activated
+
+        Returns:
+            What `rebuild` returned (True without it) if a new locale was activated, None otherwise
+        """
+        code = self.locale_for(chat_id, language_code)
+        if code in self.packs.active or code not in self.packs.available:
+            return None
+
+        # Chats of the new locale wait for it, the others are answered meanwhile
+        async with self._activating:
+            if code in self.packs.active:
+                return None
+            return await asyncio.get_running_loop().run_in_executor(None, self._activate, code, rebuild)
+
+    def _activate(self, code: str, rebuild: Optional[Callable[[], Any]]) -> Any:
+        self.packs.activate(code)
+        return rebuild() if rebuild else True
+
+
+def setup_locales(preload: List[str]) -> LocaleDetector:
+    """Activate the preloaded locales, English always being one of them."""
+    packs = LocalePacks()
+    for code in [DEFAULT_LOCALE] + [code for code in preload if code != DEFAULT_LOCALE]:
+        packs.activate(code)
+    return LocaleDetector(packs)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Event Loop Watchdog for Cashu Telegram Bot
+
+Every handler shares one event loop, so a blocking call (decoding a 50MB
+document, a regex over a huge paste) delays every user at once. A
+heartbeat task sleeps for a short interval and records how late it woke
+up: the loop lag, kept for percentiles. A monitor thread watches the
+heartbeat, and when it is late by more than the threshold it captures the
+stack of the event loop thread, the code that is blocking it, and logs
+it. A long C call holds the GIL until it returns, the stack is then
+captured right after it, still in the function that made it.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Frames kept of a blocking stack, innermost last
+MAX_STACK_FRAMES = 30
+
+
+class LoopStall:
+    """One time the event loop was blocked longer than the threshold."""
+
+    __slots__ = ("at", "seconds", "stack")
+
+    def __init__(self, at: float, seconds: float, stack: List[str]):
+        self.at = at
+        self.seconds = seconds
+        self.stack = stack
+
+    @property
+    def location(self) -> str:
+        """Innermost frame of the blocking stack."""
+        return self.stack[-1] if self.stack else "unknown"
+
+
+class LoopWatchdog:
+    """Measures event loop lag and captures the stacks of blocking code."""
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, window: int = 600, max_stalls: int = 20):
+        """
+        Args:
+            interval: Seconds between two heartbeats
+            threshold: Lag in seconds above which the blocking stack is captured
+            window: Lag samples kept for the percentiles, one per heartbeat
+            max_stalls: Captured stalls kept
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: Deque[float] = deque(maxlen=window)
+        self.stalls: Deque[LoopStall] = deque(maxlen=max_stalls)
+        self.stall_count = 0
+        self._last_beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._captured_beat = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._monitor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Starts the heartbeat on the running loop and the monitor thread."""
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.ensure_future(self._heartbeat())
+        self._monitor = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._monitor.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._monitor:
+            self._monitor.join()
+            self._monitor = None
+
+    def current_lag(self) -> float:
+        """How late the next heartbeat is right now, readable from any thread."""
+        return max(time.monotonic() - self._last_beat - self.interval, 0.0)
+
+    def percentiles(self) -> Dict[str, Optional[float]]:
+        """Lag percentiles over the window, in milliseconds."""
+        if not self.lags:
+            return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+        ordered = sorted(self.lags)
+
+        def at(fraction: float) -> float:
+            return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 1)
+
+        return {"p50_ms": at(0.5), "p90_ms": at(0.9), "p99_ms": at(0.99), "max_ms": round(ordered[-1] * 1000, 1)}
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = dict(self.percentiles())
+        metrics["stalls"] = self.stall_count
+        if self.stalls:
+            last = self.stalls[-1]
+            metrics["last_stall"] = f"{last.seconds * 1000:.0f}ms in {last.location}"
+        return metrics
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - self._last_beat - self.interval, 0.0)
+            self.lags.append(lag)
+            stall = self.stalls[-1] if self.stalls else None
+            if stall is not None and self._captured_beat == self._last_beat:
+                # The stall is over, its full length is now known
+                stall.seconds = lag
+                logger.warning(
+                    "Event loop blocked for %.0fms in %s", lag * 1000, stall.location,
+                    extra={"event": "loop_stall", "lag_ms": round(lag * 1000, 1), "stack": "\n".join(stall.stack)},
+                )
+            self._last_beat = now
+
+    def _watch(self):
+        # Polls often enough to catch a stall soon after it crosses the threshold
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._last_beat
+            lag = time.monotonic() - beat - self.interval
+            if lag < self.threshold or beat == self._captured_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = [
+                f"{summary.filename}:{summary.lineno} in {summary.name}"
+                for summary in traceback.extract_stack(frame)[-MAX_STACK_FRAMES:]
+            ]
+            self._captured_beat = beat
+            self.stalls.append(LoopStall(time.time(), lag, stack))
+            self.stall_count += 1
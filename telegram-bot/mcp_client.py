@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+MCP Client for the Cashu Wallet Server
+
+This module talks to the Rust `server` binary over the MCP stdio transport
+(newline-delimited JSON-RPC 2.0) and exposes its wallet tools to the bot.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MCP_PROTOCOL_VERSION = "2025-03-26"
+# Wads can be very long, make sure a single JSON-RPC line always fits
+STREAM_LIMIT = 64 * 1024 * 1024
+
+
+class McpError(Exception):
+    """Error returned by the MCP server or raised by the transport."""
+
+    def __init__(self, message: str, code: Optional[int] = None, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class McpClient:
+    """Async client for the wallet MCP server, spawned as a subprocess."""
+
+    def __init__(self, command: List[str], request_timeout: float = 120.0):
+        """
+        Args:
+            command: Command line used to spawn the MCP server
+            request_timeout: Seconds to wait for any single response
+        """
+        self.command = command
+        self.request_timeout = request_timeout
+        self.server_info: Dict[str, Any] = {}
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._write_lock = asyncio.Lock()
+        self._reader_task: Optional[asyncio.Task] = None
+        self._stderr_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self):
+        """Spawn the server and perform the MCP initialization handshake."""
+        self._process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+        )
+        self._reader_task = asyncio.create_task(self._read_responses())
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+
+        result = await self.request("initialize", {
+            "protocolVersion": MCP_PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": "cashu-telegram-bot", "version": "0.1.0"},
+        })
+        self.server_info = result.get("serverInfo", {})
+        await self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        logger.info("Connected to MCP server %s", self.server_info.get("name", "?"), extra={"event": "mcp_connected"})
+
+    async def close(self):
+        """Terminate the server and fail any request still in flight."""
+        if self._process is None:
+            return
+
+        if self._process.stdin:
+            self._process.stdin.close()
+        try:
+            await asyncio.wait_for(self._process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            self._process.kill()
+            await self._process.wait()
+
+        for task in (self._reader_task, self._stderr_task):
+            if task:
+                task.cancel()
+        self._fail_pending(McpError("MCP server stopped"))
+        self._process = None
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Sends a JSON-RPC request and waits for its result.
+
+        Many requests can be in flight at once, responses are matched by id.
+        """
+        if not self.running:
+            raise McpError("MCP server is not running")
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+
+        try:
+            await self._send(message)
+            return await asyncio.wait_for(future, timeout=self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def list_tools(self) -> List[Dict[str, Any]]:
+        """Return the tool definitions, including their JSON schemas."""
+        tools: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            result = await self.request("tools/list", {"cursor": cursor} if cursor else {})
+            tools.extend(result.get("tools", []))
+            cursor = result.get("nextCursor")
+            if not cursor:
+                return tools
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Calls a tool and returns its structured content.
+
+        Raises:
+            McpError: if the call failed or the tool reported an error
+        """
+        result = await self.request("tools/call", {"name": name, "arguments": arguments or {}})
+
+        if result.get("isError"):
+            raise McpError(f"Tool {name} failed: {self._text_content(result)}")
+
+        if "structuredContent" in result:
+            return result["structuredContent"]
+
+        text = self._text_content(result)
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+    # Wallet tools exposed by server/src/lib.rs
+
+    async def get_all_nodes_balances(self) -> List[Dict[str, Any]]:
+        return await self.call_tool("get_all_nodes_balances")
+
+    async def create_wads(self, amount: str, asset: str) -> str:
+        result = await self.call_tool("create_wads", {"amount": amount, "asset": asset})
+        return result["wads"]
+
+    async def receive_wads(self, wads: str) -> List[Dict[str, Any]]:
+        result = await self.call_tool("receive_wads", {"wads": wads})
+        return result["wads_received"]
+
+    @staticmethod
+    def _text_content(result: Dict[str, Any]) -> str:
+        return "".join(
+            item.get("text", "") for item in result.get("content", []) if item.get("type") == "text"
+        )
+
+    async def _send(self, message: Dict[str, Any]):
+        line = json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+        async with self._write_lock:
+            self._process.stdin.write(line)
+            await self._process.stdin.drain()
+
+    async def _read_responses(self):
+        try:
+            while True:
+                line = await self._process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logger.warning("Ignoring non JSON line from MCP server")
+                    continue
+
+                future = self._pending.get(message.get("id"))
+                if future is None or future.done():
+                    # Server notifications and late responses
+                    continue
+
+                if "error" in message:
+                    error = message["error"]
+                    future.set_exception(McpError(
+                        error.get("message", "unknown error"),
+                        code=error.get("code"),
+                        data=error.get("data"),
+                    ))
+                else:
+                    future.set_result(message.get("result"))
+        finally:
+            self._fail_pending(McpError("MCP server closed the connection"))
+
+    async def _drain_stderr(self):
+        # The server logs to stderr, it would block once the pipe is full
+        while True:
+            line = await self._process.stderr.readline()
+            if not line:
+                return
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("mcp-server: %s", line.decode("utf-8", "replace").rstrip())
+
+    def _fail_pending(self, error: McpError):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Payload Executor for Cashu Telegram Bot
+
+Decoding a multi-MB document or validating the thousands of wads it
+holds takes the event loop for hundreds of milliseconds, during which no
+other user is answered. `PayloadExecutor.run` keeps payloads under a size
+threshold inline, where a process hop would cost more than the work, and
+sends larger ones to a pool of worker processes. A large payload is
+copied once into shared memory, which the worker maps by name, instead of
+being pickled through the pool's pipe. Results (counts, summaries, the
+wads found) come back pickled, which costs the loop far less than the
+work did. The functions run by the pool are module level, so workers
+find them by name. Workers get the bot's unit registry when they start,
+wads from units the server added are validated the same way in and out
+of the pool.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from bulk_import import ImportLine, contains_wads, iter_lines, parse_lines
+from command_patterns import CommandPatterns, set_unit_registry
+from unit_registry import UnitRegistry
+from wad_validator import WadSummary, validate_wads
+
+logger = logging.getLogger(__name__)
+
+Payload = Union[bytes, bytearray, memoryview, str]
+
+# Bytes copied into shared memory between two yields to the loop, the first write of a page is slow
+COPY_CHUNK = 1024 * 1024
+
+
+def inspect_document(content: Union[bytes, bytearray]) -> Tuple[bool, Optional[int]]:
+    """
+    Whether an uploaded file holds wads, and otherwise its length in characters.
+
+    Raises:
+        UnicodeDecodeError: When a file without wads isn't UTF-8
+    """
+    if contains_wads(content):
+        return True, None
+    return False, len(bytes(content).decode("utf-8"))
+
+
+def parse_document(content: Union[bytes, bytearray]) -> List[ImportLine]:
+    """Finds and validates the wads of every line of an uploaded file."""
+    return parse_lines(iter_lines(content))
+
+
+def scan_wads(text: str) -> Tuple[str, List[WadSummary]]:
+    """
+    The wads pasted in a message, colon separated as `receive_wads` takes them, with their summaries.
+
+    Raises:
+        InvalidWadError: On the first malformed wad
+    """
+    wads = ":".join(CommandPatterns.WAD_PATTERN.findall(text))
+    return wads, validate_wads(wads)
+
+
+def _init_worker(registry: Optional[Dict[str, Any]]):
+    # Ctrl+C reaches the whole process group, the bot shuts the pool down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if registry:
+        set_unit_registry(UnitRegistry.from_cache(registry))
+
+
+def _warm() -> bool:
+    return True
+
+
+def _run_shared(function: Callable[..., Any], name: str, size: int, text: bool, args: Tuple[Any, ...]) -> Any:
+    # Runs in a worker: maps the parent's buffer, copies it out and releases it before the work
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        payload = bytes(block.buf[:size])
+    finally:
+        block.close()
+    return function(payload.decode("utf-8") if text else payload, *args)
+
+
+class PayloadExecutor:
+    """Runs payload functions inline when small, in worker processes through shared memory when large."""
+
+    def __init__(self, threshold: int = 1024 * 1024, workers: int = 2, max_shared_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            threshold: Payload size in bytes (characters for text) from which work leaves the loop
+            workers: Worker processes, 0 keeps every payload inline
+            max_shared_bytes: Shared memory in use at once, larger payloads beyond it are pickled
+                to the workers instead, /dev/shm is often small in containers
+        """
+        self.threshold = threshold
+        self.workers = workers
+        self.max_shared_bytes = max_shared_bytes
+        self.shared_bytes = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.inline = 0
+        self.offloaded = 0
+        self.offloaded_bytes = 0
+        self.pickled = 0
+
+    async def start(self, registry: Optional[UnitRegistry] = None):
+        """
+        Starts the worker processes, so the first large payload doesn't wait for them.
+
+        Args:
+            registry: Unit registry the workers use, the builtin one when None
+        """
+        if not self.workers:
+            return
+        # Not forked from the bot, whose threads (logging, watchdog) would be copied mid-flight.
+        # The fork server preloads only the worker functions, not the bot's main module
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(registry.to_cache() if registry else None,),
+        )
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _warm) for _ in range(self.workers)))
+
+    async def close(self):
+        if self._pool:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+
+    async def run(self, function: Callable[..., Any], payload: Payload, *args: Any) -> Any:
+        """
+        Calls `function(payload, *args)`, in a worker process when the payload is large.
+
+        Args:
+            function: Module level function, importable by the workers
+            payload: Bytes, or text which the worker gets back as text
+            args: Small, picklable extra arguments
+
+        Raises:
+            Whatever `function` raises
+        """
+        if self._pool is None or len(payload) < self.threshold:
+            self.inline += 1
+            return function(payload, *args)
+
+        text = isinstance(payload, str)
+        data = payload.encode("utf-8") if text else payload
+        size = len(data)
+        self.offloaded += 1
+        self.offloaded_bytes += size
+        loop = asyncio.get_running_loop()
+        if self.shared_bytes + size > self.max_shared_bytes:
+            self.pickled += 1
+            return await loop.run_in_executor(self._pool, function, payload, *args)
+
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.shared_bytes += size
+        try:
+            source = memoryview(data)
+            for offset in range(0, size, COPY_CHUNK):
+                block.buf[offset:offset + COPY_CHUNK] = source[offset:offset + COPY_CHUNK]
+                await asyncio.sleep(0)
+            source.release()
+            return await loop.run_in_executor(self._pool, _run_shared, function, block.name, size, text, args)
+        finally:
+            self.shared_bytes -= size
+            block.close()
+            block.unlink()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers if self._pool else 0,
+            "threshold_kb": self.threshold // 1024,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+            "offloaded_mb": round(self.offloaded_bytes / 1024 / 1024, 1),
+            "pickled": self.pickled,
+            "shared_mb": round(self.shared_bytes / 1024 / 1024, 1),
+        }
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Readiness Endpoint for Cashu Telegram Bot
+
+`GET /ready` answers 200 when the instance can take traffic and 503 when
+it should be pulled out of rotation: its event loop is blocked right now
+or lags at p99, or its wallet backend is unreachable. The server runs on
+its own thread, so a stalled loop still gets its 503 instead of a hung
+probe. Probes never call the backend: its reachability is cached from the
+wallet's own calls, refreshed on the loop every second, and a balance read
+is only made when the wallet was idle for a whole probe interval.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from loop_watchdog import LoopWatchdog
+from wallet_jobs import JobKind
+
+logger = logging.getLogger(__name__)
+
+
+class _ReadinessHandler(BaseHTTPRequestHandler):
+    server: "_ReadinessHTTPServer"
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/ready":
+            self.send_error(404)
+            return
+        ready, status = self.server.readiness.status()
+        body = json.dumps(status).encode()
+        self.send_response(200 if ready else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any):
+        # Orchestrators probe every few seconds, one log line each would be noise
+        logger.debug("Readiness probe: " + format, *args)
+
+
+class _ReadinessHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    readiness: "ReadinessServer"
+
+
+class ReadinessServer:
+    """HTTP readiness endpoint reporting loop lag and cached backend reachability."""
+
+    def __init__(
+        self,
+        watchdog: LoopWatchdog,
+        wallet: Callable[[], Optional[Any]],
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        max_lag: float = 0.5,
+        probe_interval: float = 30.0,
+    ):
+        """
+        Args:
+            watchdog: Watchdog of the event loop
+            wallet: Returns the ResilientWallet, None while no backend is configured
+            host: Address the endpoint listens on
+            port: Port the endpoint listens on, 0 picks a free one
+            max_lag: Current or p99 loop lag in seconds above which the instance is not ready
+            probe_interval: Seconds without a wallet call after which the balance is read to check it
+        """
+        self.watchdog = watchdog
+        self.wallet = wallet
+        self.host = host
+        self.port = port
+        self.max_lag = max_lag
+        self.probe_interval = probe_interval
+        self.probes = 0
+        self._backend: Dict[str, Any] = {"configured": False}
+        self._server: Optional[_ReadinessHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Starts the HTTP thread and the backend refresh on the running loop."""
+        self._refresh_backend()
+        self._server = _ReadinessHTTPServer((self.host, self.port), _ReadinessHandler)
+        self._server.readiness = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="readiness", daemon=True)
+        self._thread.start()
+        self._task = asyncio.ensure_future(self._refresh())
+        logger.info("Readiness endpoint on %s:%d/ready", self.host, self.port, extra={"event": "readiness_started"})
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._server:
+            # shutdown() waits for serve_forever to return, off the loop
+            await asyncio.get_running_loop().run_in_executor(None, self._server.shutdown)
+            self._server.server_close()
+            self._server = None
+
+    def status(self) -> Tuple[bool, Dict[str, Any]]:
+        """Whether the instance is ready, and why, readable from any thread."""
+        lag = self.watchdog.current_lag()
+        percentiles = self.watchdog.percentiles()
+        p99 = percentiles["p99_ms"]
+        reasons = []
+        if lag > self.max_lag:
+            reasons.append("event loop blocked")
+        elif p99 is not None and p99 > self.max_lag * 1000:
+            reasons.append("event loop lagging")
+        backend = dict(self._backend)
+        if backend["configured"] and not backend.get("reachable"):
+            reasons.append("wallet backend unreachable")
+        status = {
+            "ready": not reasons,
+            "reasons": reasons,
+            "loop": {"lag_ms": round(lag * 1000, 1), **percentiles, "stalls": self.watchdog.stall_count},
+            "backend": backend,
+        }
+        return not reasons, status
+
+    async def _refresh(self):
+        while True:
+            await asyncio.sleep(1.0)
+            wallet = self.wallet()
+            reachability = wallet.reachability() if wallet is not None else None
+            idle = reachability is not None and (
+                reachability["last_call_s"] is None or reachability["last_call_s"] >= self.probe_interval
+            )
+            if idle:
+                self.probes += 1
+                try:
+                    await wallet.call_tool(JobKind.BALANCE.value, {})
+                except Exception as e:
+                    # Recorded by the wallet as a failed call, which is the answer
+                    logger.warning("Wallet readiness probe failed: %s", e, extra={"event": "readiness_probe_failed"})
+            self._refresh_backend()
+
+    def _refresh_backend(self):
+        wallet = self.wallet()
+        if wallet is None:
+            self._backend = {"configured": False}
+            return
+        self._backend = {"configured": True, **wallet.reachability(), "refreshed": round(time.time(), 1)}
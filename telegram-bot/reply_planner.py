@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Reply Planner for Cashu Telegram Bot
+
+A reply longer than one message goes out either as numbered chunks or as
+one document. Chunks read better but cost one Bot API call and one slot
+of the chat's rate budget each; a document is one call whose time grows
+with its size. The planner keeps the measured latencies of both kinds of
+call, fits the document time to its size, and tracks each chat's budget
+(refilled at Telegram's per-chat pace, emptied by a 429). For a payload it
+simulates the chunked sends against the budget and the upload, and picks
+whichever delivers the whole reply sooner. Chunked sends wait on the same
+budget, so the estimate is also what happens.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Measured calls needed before they replace the prior latencies
+MIN_SAMPLES = 5
+
+
+class ReplyKind:
+    CHUNKS = "chunks"
+    DOCUMENT = "document"
+
+
+class ReplyPlan:
+    """The chosen way to send one reply, with the estimates it was chosen on."""
+
+    __slots__ = ("kind", "chunks", "chunks_seconds", "document_seconds")
+
+    def __init__(self, kind: str, chunks: int, chunks_seconds: float, document_seconds: float):
+        self.kind = kind
+        self.chunks = chunks
+        self.chunks_seconds = chunks_seconds
+        self.document_seconds = document_seconds
+
+
+class _ChatBudget:
+    """A chat's send budget, paused as a whole when Telegram asks to retry later."""
+
+    __slots__ = ("tokens", "updated", "paused_until")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+        self.paused_until = 0.0
+
+
+class ReplyPlanner:
+    """Chooses chunks or a document for long replies from live call costs and chat budgets."""
+
+    def __init__(
+        self,
+        chunk_size: int = 4000,
+        chat_interval: float = 1.0,
+        group_interval: float = 3.0,
+        burst: float = 3.0,
+        message_seconds: float = 0.15,
+        document_seconds: float = 0.4,
+        document_bytes_per_second: float = 1024 * 1024,
+        max_chunks: int = 50,
+        window: int = 64,
+        max_chats: int = 10000,
+    ):
+        """
+        Args:
+            chunk_size: Characters per chunk, as LongMessageHandler cuts them
+            chat_interval: Seconds between two messages to one private chat, once the burst is spent
+            group_interval: Seconds between two messages to one group
+            burst: Messages a chat with an idle budget takes at once
+            message_seconds: Prior latency of a message, until enough are measured
+            document_seconds: Prior latency of a small document
+            document_bytes_per_second: Prior upload throughput of documents
+            max_chunks: Replies that would need more chunks always go as a document
+            window: Measured calls kept per kind
+            max_chats: Chat budgets kept, full ones are dropped first
+        """
+        self.chunk_size = chunk_size
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.burst = burst
+        self.prior_message_seconds = message_seconds
+        self.prior_document_seconds = document_seconds
+        self.prior_document_bytes_per_second = document_bytes_per_second
+        self.max_chunks = max_chunks
+        self.max_chats = max_chats
+        self._messages: Deque[float] = deque(maxlen=window)
+        self._documents: Deque[Tuple[int, float]] = deque(maxlen=window)
+        self._chats: Dict[int, _ChatBudget] = {}
+        self.planned = {ReplyKind.CHUNKS: 0, ReplyKind.DOCUMENT: 0}
+        self.retry_after = 0
+
+    def plan(self, chat_id: int, chars: int, document_bytes: int) -> ReplyPlan:
+        """
+        Picks how to send a reply longer than one message.
+
+        Args:
+            chat_id: Chat the reply goes to, negative for groups
+            chars: Characters of the reply when chunked, prefix and headers included
+            document_bytes: Size of the reply as a document
+        """
+        chunks = (chars + self.chunk_size - 1) // self.chunk_size
+        now = time.monotonic()
+        chunks_seconds = self._send_seconds(chat_id, chunks, self.message_seconds(), now)
+        document_seconds = self._send_seconds(chat_id, 1, self.document_seconds(document_bytes), now)
+        if chunks > self.max_chunks or document_seconds < chunks_seconds:
+            kind = ReplyKind.DOCUMENT
+        else:
+            kind = ReplyKind.CHUNKS
+        self.planned[kind] += 1
+        logger.info(
+            "Reply of %d characters as %s: %.2fs in %d chunks, %.2fs as a document",
+            chars, kind, chunks_seconds, chunks, document_seconds,
+            extra={
+                "event": "reply_plan", "chat_id": chat_id, "chars": chars, "plan": kind, "chunks": chunks,
+                "chunks_seconds": round(chunks_seconds, 3), "document_seconds": round(document_seconds, 3),
+            },
+        )
+        return ReplyPlan(kind, chunks, chunks_seconds, document_seconds)
+
+    async def acquire(self, chat_id: int):
+        """Waits for the chat's budget to allow one more message."""
+        while True:
+            now = time.monotonic()
+            budget = self._budget(chat_id, now)
+            if now < budget.paused_until:
+                await asyncio.sleep(budget.paused_until - now)
+                continue
+            if budget.tokens >= 1:
+                budget.tokens -= 1
+                return
+            await asyncio.sleep((1 - budget.tokens) * self._interval(chat_id))
+
+    def record_message(self, seconds: float):
+        self._messages.append(seconds)
+
+    def record_document(self, size: int, seconds: float):
+        self._documents.append((size, seconds))
+
+    def record_retry_after(self, chat_id: int, seconds: float):
+        """Telegram refused a send to the chat for `seconds`."""
+        self.retry_after += 1
+        budget = self._budget(chat_id, time.monotonic())
+        budget.tokens = 0.0
+        budget.paused_until = max(budget.paused_until, time.monotonic() + seconds)
+
+    def message_seconds(self) -> float:
+        """Median latency of a message send."""
+        if len(self._messages) < MIN_SAMPLES:
+            return self.prior_message_seconds
+        ordered = sorted(self._messages)
+        return ordered[len(ordered) // 2]
+
+    def document_seconds(self, size: int) -> float:
+        """Expected upload time of a document of `size` bytes, fitted to the measured uploads."""
+        base, per_byte = self.prior_document_seconds, 1 / self.prior_document_bytes_per_second
+        if len(self._documents) >= MIN_SAMPLES:
+            # Least squares line through (size, seconds)
+            count = len(self._documents)
+            mean_size = sum(s for s, _ in self._documents) / count
+            mean_seconds = sum(t for _, t in self._documents) / count
+            spread = sum((s - mean_size) ** 2 for s, _ in self._documents)
+            # Uploads all of one size say nothing of the throughput, the prior slope stays
+            if spread > 0:
+                slope = sum((s - mean_size) * (t - mean_seconds) for s, t in self._documents) / spread
+                per_byte = max(slope, 0.0)
+            base = max(mean_seconds - per_byte * mean_size, 0.0)
+        return base + per_byte * size
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "planned_chunks": self.planned[ReplyKind.CHUNKS],
+            "planned_document": self.planned[ReplyKind.DOCUMENT],
+            "message_ms": round(self.message_seconds() * 1000, 1),
+            "document_100kb_ms": round(self.document_seconds(100 * 1024) * 1000, 1),
+            "retry_after": self.retry_after,
+            "chats": len(self._chats),
+        }
+
+    def _send_seconds(self, chat_id: int, count: int, call_seconds: float, now: float) -> float:
+        # Sequential sends against a copy of the chat's budget
+        budget = self._chats.get(chat_id)
+        interval = self._interval(chat_id)
+        if budget is None:
+            tokens, elapsed = self.burst, 0.0
+        else:
+            tokens = min(self.burst, budget.tokens + (now - budget.updated) / interval)
+            elapsed = max(budget.paused_until - now, 0.0)
+        for _ in range(count):
+            if tokens < 1:
+                elapsed += (1 - tokens) * interval
+                tokens = 1.0
+            tokens = min(self.burst, tokens - 1 + call_seconds / interval)
+            elapsed += call_seconds
+        return elapsed
+
+    def _budget(self, chat_id: int, now: float) -> _ChatBudget:
+        budget = self._chats.get(chat_id)
+        if budget is None:
+            if len(self._chats) >= self.max_chats:
+                self._prune(now)
+            budget = self._chats[chat_id] = _ChatBudget(self.burst, now)
+        else:
+            budget.tokens = min(self.burst, budget.tokens + (now - budget.updated) / self._interval(chat_id))
+        budget.updated = now
+        return budget
+
+    def _prune(self, now: float):
+        # A refilled budget is the same as none
+        for chat_id, budget in list(self._chats.items()):
+            if now >= budget.paused_until and budget.tokens + (now - budget.updated) / self._interval(chat_id) >= self.burst:
+                del self._chats[chat_id]
+        # Still full of busy chats, the oldest go
+        while len(self._chats) >= self.max_chats:
+            del self._chats[next(iter(self._chats))]
+
+    def _interval(self, chat_id: int) -> float:
+        return self.group_interval if chat_id < 0 else self.chat_interval
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Sampling Profiler for Cashu Telegram Bot
+
+Operators profile the running bot with `/profile <seconds>` instead of
+redeploying it under a profiler. A profiling timer interrupts the process
+every few milliseconds of CPU time and the signal handler, which runs on
+the event loop thread, records the stack it interrupted: the handler
+coroutine being stepped, or the loop waiting for I/O while another thread
+used the CPU. Nothing is hooked into the interpreter, so handlers run at
+full speed between samples and the overhead is bounded by the interval.
+Samples are aggregated as collapsed stacks, the input of flame graph
+tools, and as a table of the functions the samples were taken in.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Leaf frame of the samples taken while the event loop waited for I/O
+IDLE_MODULES = ("selectors.py",)
+TRUNCATED = "(truncated)"
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class ProfileReport:
+    """Samples of one profiling window."""
+
+    __slots__ = ("stacks", "samples", "duration", "interval", "sampling_seconds")
+
+    def __init__(self, stacks: Counter, samples: int, duration: float, interval: float, sampling_seconds: float):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+        self.sampling_seconds = sampling_seconds
+
+    @property
+    def idle(self) -> int:
+        """Samples taken while the loop waited for I/O."""
+        return sum(count for stack, count in self.stacks.items() if stack.rsplit(";", 1)[-1].startswith(IDLE_MODULES))
+
+    def collapsed(self) -> str:
+        """One `frame;frame;frame count` line per distinct stack, outermost frame first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def top_functions(self, limit: int = 30) -> List[Tuple[str, int, int]]:
+        """
+        The functions the samples were taken in.
+
+        Returns:
+            (function, self samples, total samples) tuples, most self samples first
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            # A recursive function counts once per sample
+            for frame in set(frames):
+                total[frame] += count
+        return [(function, count, total[function]) for function, count in own.most_common(limit)]
+
+    def summary(self, limit: int = 30) -> str:
+        busy = self.samples - self.idle
+        lines = [
+            f"Samples: {self.samples} over {self.duration:.1f}s, every {self.interval * 1000:.1f}ms of CPU time",
+            f"CPU time sampled: {self.samples * self.interval:.2f}s, "
+            f"{busy / self.samples if self.samples else 0:.1%} of it on the event loop thread",
+            f"Sampling cost: {self.sampling_seconds * 1000:.1f}ms "
+            f"({self.sampling_seconds / self.duration:.2%} of the window)" if self.duration else "",
+            "",
+            f"{'self':>7} {'self %':>7} {'total':>7} {'total %':>8}  function",
+        ]
+        for function, own, total in self.top_functions(limit):
+            lines.append(f"{own:>7} {own / self.samples:>7.1%} {total:>7} {total / self.samples:>8.1%}  {function}")
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples the stack of the event loop thread on a CPU time timer."""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64, max_stacks: int = 20000):
+        """
+        Args:
+            interval: Seconds of CPU time between samples
+            max_depth: Innermost frames kept of each stack
+            max_stacks: Distinct stacks kept, further ones are counted as truncated
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self._previous_handler = None
+        self._finish: Optional[asyncio.Event] = None
+        self._labels: Dict[CodeType, str] = {}
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._sampling_seconds = 0.0
+        self._started_at = 0.0
+        self.running = False
+        self.profiles = 0
+
+    def start(self):
+        """
+        Starts sampling, from the thread running the event loop (the main thread).
+
+        Raises:
+            ProfilerBusyError: when a profile is already running
+        """
+        if self.running:
+            raise ProfilerBusyError("A profile is already running")
+        self._stacks = Counter()
+        self._samples = 0
+        self._sampling_seconds = 0.0
+        self._finish = asyncio.Event()
+        self._started_at = time.perf_counter()
+        # Sampled by a signal rather than from another thread: that one would only get the GIL
+        # when the loop releases it in select(), and every sample would look idle
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.running = True
+        self.profiles += 1
+        logger.info("Profiler started", extra={"event": "profile_start", "interval": self.interval})
+
+    def stop(self) -> ProfileReport:
+        """Stops sampling and returns what was sampled since `start`."""
+        if not self.running:
+            raise RuntimeError("No profile is running")
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self._previous_handler = None
+        self.running = False
+        self._finish = None
+        report = ProfileReport(
+            self._stacks, self._samples, time.perf_counter() - self._started_at, self.interval, self._sampling_seconds
+        )
+        logger.info(
+            "Profiler stopped after %d samples", report.samples,
+            extra={"event": "profile_stop", "samples": report.samples, "duration": round(report.duration, 3)},
+        )
+        return report
+
+    async def wait(self, seconds: float) -> ProfileReport:
+        """Lets the started profile run for `seconds` from its start, or until `finish`, then stops it."""
+        remaining = seconds - (time.perf_counter() - self._started_at)
+        try:
+            await asyncio.wait_for(self._finish.wait(), max(remaining, 0))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            report = self.stop()
+        return report
+
+    def finish(self) -> bool:
+        """Ends the running profile early, returns whether one was running."""
+        if self._finish is None:
+            return False
+        self._finish.set()
+        return True
+
+    def _sample(self, signum: int, frame: Optional[FrameType]):
+        started = time.perf_counter()
+        stack = self._collapse(frame)
+        if stack in self._stacks or len(self._stacks) < self.max_stacks:
+            self._stacks[stack] += 1
+        else:
+            self._stacks[TRUNCATED] += 1
+        self._samples += 1
+        self._sampling_seconds += time.perf_counter() - started
+
+    def _collapse(self, frame: Optional[FrameType]) -> str:
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def _label(self, code: CodeType) -> str:
+        # Labels are built once per code object, sampling a known stack allocates no strings
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+            self._labels[code] = label
+        return label
@@ -7,34 +7,187 @@ Cashu tokens can be lengthy hex strings that exceed Telegram's 4096 character li
 """
 
 import os
+import shlex
 import logging
 import asyncio
-from typing import Optional
+import time
+from typing import IO, Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from telegram import Update, Document
+from telegram import (
+    Update,
+    Document,
+    User,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+)
+from telegram.error import RetryAfter, TelegramError
 from telegram.ext import (
     Application, 
+    ApplicationHandlerStop,
+    CallbackQueryHandler,
+    ChosenInlineResultHandler,
     CommandHandler, 
+    InlineQueryHandler,
     MessageHandler, 
+    TypeHandler,
     filters, 
     ContextTypes
 )
 
+from command_patterns import (
+    CommandParser,
+    CommandPatterns,
+    Intent,
+    ResponseTemplates,
+    balance_totals,
+    format_currency_amount,
+    generate_transaction_id,
+    get_unit_registry,
+    receipt_currency,
+    set_unit_registry,
+    to_asset_amount,
+)
+from balance_prefetch import BalancePrefetcher
+from bot_logging import parse_sample_rates, setup_logging
+from bot_transport import configure_transport
+from broadcast import Broadcaster
+from bulk_import import BulkImporter, LineStatus, iter_lines, summary_csv
+from bulk_payout import BulkPayout, PayoutRequest, requests_from_count, requests_from_csv
+from cache import Cache, LRUCache, SQLiteCache
+from catch_up import catch_up_backlog
+from flood_shield import FloodShield, Verdict
+from history_store import HistoryKind, HistoryStore
+from inline_queries import InlineQueries
+from intent_matcher import FuzzyIntentMatcher, build_intent_matcher
+from locales import LocaleDetector, setup_locales
+from loop_watchdog import LoopWatchdog
+from mcp_client import McpClient, McpError
+from payload_executor import PayloadExecutor, inspect_document, parse_document, scan_wads
+from readiness import ReadinessServer
+from reply_planner import ReplyKind, ReplyPlanner
+from sampling_profiler import ProfilerBusyError, SamplingProfiler
+from unit_registry import load_unit_registry
+from update_recorder import UpdateRecorder
+from wad_reassembly import FragmentStatus, WadReassembler
+from wad_validator import InvalidWadError
+from wallet_jobs import JobKind, QueueFullError, WalletJobQueue
+from wallet_resilience import ResilientWallet
+
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Constants
 TELEGRAM_MAX_MESSAGE_LENGTH = 4096
 CHUNK_SIZE = 4000  # Safe chunk size for splitting messages
+LONG_MESSAGE_DOCUMENT_THRESHOLD = 20000  # Longer replies go as a document when no planner measures the costs
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+# Bot API HTTP transport
+BOT_HTTP_POOL_SIZE = int(os.getenv("BOT_HTTP_POOL_SIZE", "64"))
+BOT_HTTP_KEEPALIVE = float(os.getenv("BOT_HTTP_KEEPALIVE", "60"))
+BOT_HTTP_VERSION = os.getenv("BOT_HTTP_VERSION", "1.1")
+BOT_HTTP_POOL_TIMEOUT = float(os.getenv("BOT_HTTP_POOL_TIMEOUT", "5"))
+
+# Wallet backend (the Rust MCP server), mock responses are used when unset
+MCP_SERVER_COMMAND = os.getenv("MCP_SERVER_COMMAND")
+WALLET_READ_WORKERS = int(os.getenv("WALLET_READ_WORKERS", "2"))
+WALLET_WRITE_WORKERS = int(os.getenv("WALLET_WRITE_WORKERS", "4"))
+WALLET_QUEUE_SIZE = int(os.getenv("WALLET_QUEUE_SIZE", "100"))
+WALLET_JOBS_PER_CHAT = int(os.getenv("WALLET_JOBS_PER_CHAT", "3"))
+UNIT_REGISTRY_CACHE = os.getenv("UNIT_REGISTRY_CACHE", ".unit_registry.json")
+
+# Wallet call resilience: read timeouts follow the recent p99 within these bounds (writes
+# are never cut short), circuits open when half the recent calls failed, slow balance
+# reads get a second request
+WALLET_MIN_TIMEOUT = float(os.getenv("WALLET_MIN_TIMEOUT", "2"))
+WALLET_MAX_TIMEOUT = float(os.getenv("WALLET_MAX_TIMEOUT", "120"))
+WALLET_BREAKER_ERROR_RATE = float(os.getenv("WALLET_BREAKER_ERROR_RATE", "0.5"))
+WALLET_BREAKER_COOLDOWN = float(os.getenv("WALLET_BREAKER_COOLDOWN", "15"))
+WALLET_HEDGE_READS = os.getenv("WALLET_HEDGE_READS", "true").lower() == "true"
+
+# Locales active from startup, others are loaded when a chat needs them
+PRELOADED_LOCALES = [code.strip() for code in os.getenv("LOCALES", "en").split(",") if code.strip()]
+
+# Startup catch-up of the updates that piled up while the bot was down
+CATCH_UP_ON_START = os.getenv("CATCH_UP_ON_START", "true").lower() == "true"
+CATCH_UP_CONCURRENCY = int(os.getenv("CATCH_UP_CONCURRENCY", "32"))
+CATCH_UP_MAX_UPDATES = int(os.getenv("CATCH_UP_MAX_UPDATES", "100000"))
+
+# Inbound flood shield, per user
+FLOOD_MAX_MESSAGES = int(os.getenv("FLOOD_MAX_MESSAGES", "20"))
+FLOOD_WINDOW_SECONDS = float(os.getenv("FLOOD_WINDOW_SECONDS", "60"))
+FLOOD_BYTE_BUDGET = int(os.getenv("FLOOD_BYTE_BUDGET", str(64 * 1024 * 1024)))
+FLOOD_FRAGMENT_WEIGHT = float(os.getenv("FLOOD_FRAGMENT_WEIGHT", "0.1"))
+
+# Cache shared by every instance on the host when CACHE_PATH is set
+CACHE_PATH = os.getenv("CACHE_PATH")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", "5"))
+BALANCE_CACHE_KEY = "wallet:balances"
+
+# Transaction history database
+HISTORY_DB = os.getenv("HISTORY_DB", "history.db")
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+
+# Notification broadcasts, progress is kept to resume after a restart
+BROADCAST_DB = os.getenv("BROADCAST_DB", "broadcasts.db")
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+
+# Bulk wad import from documents: wads per receive_wads call, calls in flight
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "20"))
+BULK_IMPORT_CONCURRENCY = int(os.getenv("BULK_IMPORT_CONCURRENCY", "4"))
+
+# Bulk payouts: most wads per request, create_wads requests in flight on the MCP session
+BULK_PAYOUT_MAX_WADS = int(os.getenv("BULK_PAYOUT_MAX_WADS", "1000"))
+BULK_PAYOUT_WINDOW = int(os.getenv("BULK_PAYOUT_WINDOW", "16"))
+
+# Send confirmations: seconds a "YES" (or a "Did you mean" or payout answer) is accepted, seconds waited for the prefetched balance
+SEND_CONFIRM_TIMEOUT = float(os.getenv("SEND_CONFIRM_TIMEOUT", "120"))
+SEND_PREFETCH_WAIT = float(os.getenv("SEND_PREFETCH_WAIT", "5"))
+
+# Inline mode ("@bot 100 sats"): seconds of typing pause before answering, seconds Telegram and the bot reuse results
+INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE", "0.3"))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+INLINE_RESULTS_TTL = float(os.getenv("INLINE_RESULTS_TTL", "600"))
+
+# Long replies: messages a chat takes at once before Telegram's ~1/s pace, chunks beyond which a document is sent
+REPLY_CHAT_BURST = float(os.getenv("REPLY_CHAT_BURST", "3"))
+REPLY_MAX_CHUNKS = int(os.getenv("REPLY_MAX_CHUNKS", "50"))
+
+# Operators (Telegram user IDs, comma-separated) allowed to run /profile, unset to disable it
+OPERATOR_IDS = [int(user_id) for user_id in os.getenv("OPERATOR_IDS", "").split(",") if user_id.strip()]
+# Users (Telegram user IDs, comma-separated) allowed to use the wallet besides the operators, unset for operators only
+WALLET_USER_IDS = [int(user_id) for user_id in os.getenv("WALLET_USER_IDS", "").split(",") if user_id.strip()]
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+
+# Event loop watchdog: lag above which the blocking stack is logged, readiness endpoint port (unset to disable)
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.25"))
+READY_PORT = int(os.getenv("READY_PORT", "0"))
+READY_HOST = os.getenv("READY_HOST", "0.0.0.0")
+READY_MAX_LAG = float(os.getenv("READY_MAX_LAG", "0.5"))
+READY_PROBE_INTERVAL = float(os.getenv("READY_PROBE_INTERVAL", "30"))
+
+# Payloads from this size (bytes, characters for text) are decoded and scanned in worker processes,
+# 0 workers keeps them all inline
+PAYLOAD_OFFLOAD_BYTES = int(os.getenv("PAYLOAD_OFFLOAD_BYTES", str(1024 * 1024)))
+PAYLOAD_WORKERS = int(os.getenv("PAYLOAD_WORKERS", "2"))
+PAYLOAD_SHARED_MEMORY_BYTES = int(os.getenv("PAYLOAD_SHARED_MEMORY_BYTES", str(256 * 1024 * 1024)))
+
+# Log of the incoming updates (wads redacted) for tests/replay_updates.py, unset to disable
+RECORD_UPDATES = os.getenv("RECORD_UPDATES")
+
+# Wads split across several messages
+WAD_FRAGMENT_TIMEOUT = float(os.getenv("WAD_FRAGMENT_TIMEOUT", "3"))
+WAD_MAX_CHAT_CHARS = int(os.getenv("WAD_MAX_CHAT_CHARS", str(1024 * 1024)))
+WAD_MAX_TOTAL_CHARS = int(os.getenv("WAD_MAX_TOTAL_CHARS", str(32 * 1024 * 1024)))
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN environment variable is required!")
 
@@ -42,31 +195,65 @@ class LongMessageHandler:
     """Handles message processing with support for long content."""
     
     @staticmethod
-    async def send_long_message(update: Update, text: str, context: ContextTypes.DEFAULT_TYPE):
+    async def send_reply(update: Update, text: str, context: ContextTypes.DEFAULT_TYPE, prefix: str = "",
+                         filename: str = "long_message.txt"):
         """
-        Sends a long message by splitting it into chunks.
+        Sends a reply of any length: one message, chunks, or a document when that is quicker.
         
         Args:
             update: Telegram update object
             text: The text to send
             context: Bot context
+            prefix: Put before the text when it goes out as messages
+            filename: Name of the document, if one is sent
         """
-        if len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH:
-            await update.message.reply_text(text)
+        length = len(prefix) + len(text)
+        if length <= TELEGRAM_MAX_MESSAGE_LENGTH:
+            await LongMessageHandler.send_long_message(update, text, context, prefix)
             return
         
-        # Split into chunks
-        chunks = [text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)]
+        planner: Optional[ReplyPlanner] = context.application.bot_data.get("reply_planner")
+        if planner:
+            # UTF-8 bytes of the document, without encoding the text to count them
+            size = length if text.isascii() else len(text.encode("utf-8"))
+            as_document = planner.plan(update.effective_chat.id, length, size).kind == ReplyKind.DOCUMENT
+        else:
+            as_document = len(text) > LONG_MESSAGE_DOCUMENT_THRESHOLD
+        
+        if as_document:
+            await LongMessageHandler.send_as_document(update, text, filename, context)
+        else:
+            await LongMessageHandler.send_long_message(update, text, context, prefix)
+    
+    @staticmethod
+    async def send_long_message(update: Update, text: str, context: ContextTypes.DEFAULT_TYPE, prefix: str = ""):
+        """
+        Sends a long message by splitting it into chunks.
         
-        for i, chunk in enumerate(chunks):
+        Args:
+            update: Telegram update object
+            text: The text to send
+            context: Bot context
+            prefix: Put before the text, kept apart so an emoji in it doesn't widen a copy of the whole text
+        """
+        length = len(prefix) + len(text)
+        if length <= TELEGRAM_MAX_MESSAGE_LENGTH:
+            await LongMessageHandler._paced(update, context, lambda: update.message.reply_text(prefix + text))
+            return
+        
+        # Chunks are cut one at a time, only the one being sent is held on top of the text
+        total = (length + CHUNK_SIZE - 1) // CHUNK_SIZE
+        for i in range(total):
+            start = max(i * CHUNK_SIZE - len(prefix), 0)
+            end = (i + 1) * CHUNK_SIZE - len(prefix)
             if i == 0:
                 # First chunk with header
-                message = f"📄 Long message (part {i+1}/{len(chunks)}):\n\n{chunk}"
+                message = f"📄 Long message (part {i+1}/{total}):\n\n{prefix}{text[:end]}"
             else:
                 # Subsequent chunks
-                message = f"📄 Part {i+1}/{len(chunks)}:\n\n{chunk}"
+                message = f"📄 Part {i+1}/{total}:\n\n{text[start:end]}"
             
-            await update.message.reply_text(message)
+            await LongMessageHandler._paced(update, context, lambda: update.message.reply_text(message))
     
     @staticmethod
     async def send_as_document(update: Update, text: str, filename: str, context: ContextTypes.DEFAULT_TYPE):
@@ -84,10 +271,99 @@ class LongMessageHandler:
         file_obj = BytesIO(text.encode('utf-8'))
         file_obj.name = filename
         
-        await update.message.reply_document(
-            document=file_obj,
-            caption=f"📎 {filename} ({len(text)} characters)"
-        )
+        async def send():
+            file_obj.seek(0)
+            return await update.message.reply_document(
+                document=file_obj,
+                caption=f"📎 {filename} ({len(text)} characters)"
+            )
+        
+        await LongMessageHandler._paced(update, context, send, size=file_obj.getbuffer().nbytes)
+    
+    @staticmethod
+    async def _paced(update: Update, context: ContextTypes.DEFAULT_TYPE, send: Callable[[], Awaitable[Any]],
+                     size: Optional[int] = None):
+        """Sends within the chat's budget and times the call for the reply planner, a document when `size` is set."""
+        planner: Optional[ReplyPlanner] = context.application.bot_data.get("reply_planner")
+        if planner is None:
+            await send()
+            return
+        
+        chat_id = update.effective_chat.id
+        while True:
+            await planner.acquire(chat_id)
+            started = time.monotonic()
+            try:
+                await send()
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                planner.record_retry_after(chat_id, retry_after)
+                continue
+            break
+        if size is None:
+            planner.record_message(time.monotonic() - started)
+        else:
+            planner.record_document(size, time.monotonic() - started)
+
+def may_use_wallet(context: ContextTypes.DEFAULT_TYPE, user: Optional[User]) -> bool:
+    """Whether a Telegram user is allowed to use the operator's wallet, nobody when no allowlist is set."""
+    allowed = context.application.bot_data.get("wallet_users", frozenset())
+    return user is not None and user.id in allowed
+
+async def submit_wallet_job(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    kind: JobKind,
+    arguments: Dict[str, Any],
+    render: Callable[[Any], str],
+    action: str,
+    history: Optional[Callable[[Any], List[Tuple[str, float, str, Optional[str], Optional[str]]]]] = None,
+):
+    """
+    Queues a wallet operation and acknowledges it right away.
+    
+    Args:
+        update: Telegram update object
+        context: Bot context
+        kind: The wallet operation to run
+        arguments: Arguments of the MCP tool call
+        render: Builds the reply from the tool result
+        action: Short description used in the acknowledgement
+        history: Builds the (kind, amount, currency, mint_url, memo) history entries from the result
+    """
+    wallet_jobs: WalletJobQueue = context.application.bot_data["wallet_jobs"]
+    if not may_use_wallet(context, update.effective_user):
+        await update.message.reply_text(ResponseTemplates.wallet_not_allowed())
+        return
+    
+    async def on_result(result: Any):
+        # Reads are cached for the next request, writes make the cached balance stale
+        cache: Cache = context.application.bot_data["cache"]
+        if kind.read_only:
+            await cache.set(BALANCE_CACHE_KEY, result, BALANCE_CACHE_TTL)
+        else:
+            await cache.invalidate(BALANCE_CACHE_KEY)
+        
+        store: Optional[HistoryStore] = context.application.bot_data.get("history")
+        if store and history:
+            tx_id = generate_transaction_id()
+            for entry_kind, amount, currency, mint_url, memo in history(result):
+                store.record(update.effective_user.id, entry_kind, amount, currency, tx_id, mint_url, memo)
+        await LongMessageHandler.send_long_message(update, render(result), context)
+    
+    async def on_error(error: Exception):
+        if isinstance(error, McpError) and error.code == -32602:  # Invalid params
+            await update.message.reply_text(f"❌ The wallet rejected this request: {error}")
+        else:
+            await update.message.reply_text(ResponseTemplates.network_error())
+    
+    try:
+        wallet_jobs.submit(kind, update.effective_chat.id, arguments, on_result, on_error)
+    except QueueFullError:
+        await update.message.reply_text(ResponseTemplates.rate_limit())
+        return
+    
+    await update.message.reply_text(ResponseTemplates.job_queued(action))
 
 # Bot command handlers
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -154,14 +430,120 @@ async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Please send some text to echo!")
         return
     
-    # Log message length for debugging
-    logger.info(f"Received message: {len(text)} characters")
+    # Log message length for debugging, sampled under load
+    logger.info(
+        "Received message: %d characters", len(text),
+        extra={"event": "message_received", "chat_id": update.effective_chat.id, "chars": len(text)}
+    )
+    
+    # Wads longer than one message arrive in fragments, collect them first
+    reassembler: Optional[WadReassembler] = context.application.bot_data.get("wad_reassembler")
+    if reassembler:
+        status, joined = reassembler.feed(
+            update.effective_chat.id, text, lambda joined_text: handle_text(update, context, joined_text)
+        )
+        if status == FragmentStatus.STARTED:
+            await update.message.reply_text(ResponseTemplates.wad_fragments_pending())
+            return
+        if status == FragmentStatus.APPENDED:
+            return
+        if status == FragmentStatus.OVERFLOW:
+            # Answered once per window like a shed update, the rest of the wad keeps coming
+            shield: Optional[FloodShield] = context.application.bot_data.get("flood_shield")
+            user = update.effective_user
+            if shield is None or (user and shield.should_notify(user.id)):
+                await update.message.reply_text(ResponseTemplates.wad_too_long())
+            return
+        if status == FragmentStatus.COMPLETE:
+            text = joined
+    
+    await handle_text(update, context, text)
+
+async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+    """Route a complete message (possibly reassembled from fragments) to its intent."""
+    wallet_jobs: Optional[WalletJobQueue] = context.application.bot_data.get("wallet_jobs")
+    
+    # Make sure the chat's language phrases are part of the matcher
+    locales: Optional[LocaleDetector] = context.application.bot_data.get("locales")
+    user = update.effective_user
+    if locales:
+        # New phrases, typo matching must know their words too, both are built in a thread
+        rebuilt = await locales.ensure_chat_locale(
+            update.effective_chat.id, user.language_code if user else None,
+            lambda: build_intent_matcher(get_unit_registry()),
+        )
+        if rebuilt:
+            context.application.bot_data["intent_matcher"] = rebuilt
+    
+    # "YES" or "NO" answers the chat's pending send confirmation, only from who asked for the send
+    pending = context.chat_data.get("pending_send") if context.chat_data is not None else None
+    if pending and user and user.id == pending[4]:
+        confirmed = CommandParser.parse_confirmation(text)
+        if confirmed is not None:
+            await answer_send_confirmation(update, context, confirmed)
+            return
     
     # Check for natural language commands
-    text_lower = text.lower().strip()
+    intent = CommandParser.detect_intent(text)
+    
+    # Give typos a second chance before echoing
+    intent_matcher: Optional[FuzzyIntentMatcher] = context.application.bot_data.get("intent_matcher")
+    if intent == Intent.ECHO and intent_matcher:
+        fuzzy_match = intent_matcher.match(text)
+        if fuzzy_match:
+            fuzzy_intent, confidence, corrected = fuzzy_match
+            logger.info(
+                "Fuzzy intent %s (%.2f)", fuzzy_intent, confidence,
+                extra={"event": "fuzzy_intent", "intent": fuzzy_intent, "confidence": confidence}
+            )
+            # Ordinary chat can look like a typo'd command ("take 100 sats"), only reads run on a guess
+            if fuzzy_intent in Intent.READ_ONLY:
+                intent = fuzzy_intent
+            elif may_use_wallet(context, user):
+                await suggest_command(update, context, corrected)
+                return
+    
+    # The wallet is the operator's, only the users they allowed reach it
+    wallet_intent = intent in (Intent.RECEIVE, Intent.BALANCE, Intent.SEND, Intent.CREATE)
+    if wallet_intent and (wallet_jobs or context.application.bot_data.get("wallet_client")):
+        if not may_use_wallet(context, user):
+            await update.message.reply_text(ResponseTemplates.wallet_not_allowed())
+            return
+    
+    # Wads pasted in the message are received into the wallet
+    if intent == Intent.RECEIVE and wallet_jobs:
+        # Malformed wads are rejected here rather than by the mint
+        try:
+            wads, summaries = await run_payload(context, scan_wads, text)
+        except InvalidWadError as e:
+            await update.message.reply_text(ResponseTemplates.invalid_wad(str(e)))
+            return
+        await submit_wallet_job(
+            update, context, JobKind.RECEIVE_WADS, {"wads": wads},
+            lambda result: ResponseTemplates.wads_received(result["wads_received"]),
+            ResponseTemplates.wads_preview(summaries),
+            history=lambda result: [
+                (HistoryKind.RECEIVED, receipt["amount"], receipt_currency(receipt["unit"]),
+                 receipt["mint_url"], receipt.get("memo"))
+                for receipt in result["wads_received"]
+            ],
+        )
+        return
     
     # Balance commands
-    if any(phrase in text_lower for phrase in ["show my balance", "check my wallet", "how much do i have", "what's in my wallet", "balance", "wallet", "funds"]):
+    if intent == Intent.BALANCE:
+        if wallet_jobs:
+            cache: Cache = context.application.bot_data["cache"]
+            balances = await cache.get(BALANCE_CACHE_KEY)
+            if balances is not None:
+                await LongMessageHandler.send_long_message(update, ResponseTemplates.wallet_balance(balances), context)
+                return
+            await submit_wallet_job(
+                update, context, JobKind.BALANCE, {},
+                ResponseTemplates.wallet_balance, "Checking your balance"
+            )
+            return
+        
         # Mock balance response for now
         balance_response = (
             "💰 Your Cashu Wallet Balance:\n\n"
@@ -176,7 +558,7 @@ async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Help commands
-    elif any(phrase in text_lower for phrase in ["help security", "security help", "how to stay safe", "safety guide"]):
+    elif intent == Intent.SECURITY:
         security_response = (
             "🔐 Security Guide\n\n"
             "💡 Best Practices:\n\n"
@@ -197,8 +579,18 @@ async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(security_response)
         return
     
-    # Send money commands (basic detection)
-    elif any(word in text_lower for word in ["send", "pay", "transfer", "give"]) and "@" in text:
+    elif intent == Intent.HELP:
+        await update.message.reply_text(ResponseTemplates.help_message())
+        return
+    
+    # Send money commands
+    elif intent == Intent.SEND:
+        parsed = CommandParser.parse_send_command(text)
+        prefetcher: Optional[BalancePrefetcher] = context.application.bot_data.get("balance_prefetch")
+        if wallet_jobs and prefetcher and parsed and to_asset_amount(*parsed[:2]):
+            await start_send(update, context, prefetcher, *parsed)
+            return
+        
         await update.message.reply_text(
             "💸 Send Money Feature\n\n"
             "🔒 Security Check:\n\n"
@@ -212,7 +604,30 @@ async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Create/mint commands
-    elif any(word in text_lower for word in ["create", "mint", "generate", "make"]) and any(word in text_lower for word in ["sats", "gwei", "usdc", "usdt"]):
+    elif intent == Intent.CREATE:
+        # "create 50 wads of 100 sats"
+        bulk = CommandParser.parse_bulk_create_command(text)
+        if bulk and wallet_jobs and to_asset_amount(*bulk[1:]):
+            count, amount, currency = bulk
+            if count > BULK_PAYOUT_MAX_WADS:
+                await update.message.reply_text(ResponseTemplates.bulk_payout_too_large(BULK_PAYOUT_MAX_WADS))
+                return
+            await start_bulk_payout(update, context, requests_from_count(count, amount, currency))
+            return
+        
+        parsed = CommandParser.parse_create_command(text)
+        asset_amount = to_asset_amount(*parsed) if parsed else None
+        if wallet_jobs and asset_amount:
+            amount, currency = parsed
+            await submit_wallet_job(
+                update, context, JobKind.CREATE_WADS,
+                {"amount": asset_amount[0], "asset": asset_amount[1]},
+                lambda result: ResponseTemplates.wads_created(amount, currency, result["wads"]),
+                "Creating your wads",
+                history=lambda result: [(HistoryKind.CREATED, amount, currency, None, None)],
+            )
+            return
+        
         await update.message.reply_text(
             "🪙 Create Tokens Feature\n\n"
             "⚠️ This feature is coming soon!\n\n"
@@ -224,62 +639,729 @@ async def echo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Default: Handle as long message echo
-    if len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH:
-        # Short message - send directly
-        await update.message.reply_text(f"📤 Echo: {text}")
-    elif len(text) <= 20000:
-        # Medium-long message - split into chunks
-        await LongMessageHandler.send_long_message(update, f"📤 Echo: {text}", context)
-    else:
-        # Very long message - send as document
-        await LongMessageHandler.send_as_document(
-            update, 
-            text, 
-            "long_message.txt", 
-            context
-        )
+    # Default: Handle as long message echo, chunked or as a document
+    await LongMessageHandler.send_reply(update, text, context, prefix="📤 Echo: ")
+
+async def suggest_command(update: Update, context: ContextTypes.DEFAULT_TYPE, corrected: str):
+    """Ask whether a message with typos meant a command that changes the wallet, it only runs once confirmed."""
+    message_id = update.message.message_id
+    context.chat_data["suggested_command"] = (update, corrected, time.monotonic())
+    markup = InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ Yes", callback_data=f"suggestion:yes:{message_id}"),
+        InlineKeyboardButton("✖️ No", callback_data=f"suggestion:no:{message_id}"),
+    ]])
+    await update.message.reply_text(ResponseTemplates.did_you_mean(corrected), reply_markup=markup)
+
+async def suggestion_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the buttons of a "Did you mean" question, only the user who was asked can answer."""
+    query = update.callback_query
+    _, answer, message_id = query.data.split(":")
+    suggested = context.chat_data.get("suggested_command") if context.chat_data is not None else None
+    if (not suggested or str(suggested[0].message.message_id) != message_id
+            or suggested[0].effective_user.id != query.from_user.id):
+        await query.answer("This question isn't yours, or it was replaced by a newer one.")
+        return
+    original, corrected, asked_at = context.chat_data.pop("suggested_command")
+    await query.answer()
+    await query.edit_message_reply_markup(None)
+    if answer != "yes":
+        await original.message.reply_text(ResponseTemplates.suggestion_dismissed())
+        return
+    if time.monotonic() - asked_at > SEND_CONFIRM_TIMEOUT:
+        await original.message.reply_text(ResponseTemplates.suggestion_expired())
+        return
+    await handle_text(original, context, corrected)
+
+async def start_send(update: Update, context: ContextTypes.DEFAULT_TYPE, prefetcher: BalancePrefetcher,
+                     amount: float, currency: str, recipient: str):
+    """Ask to confirm a send, reading the balance while the confirmation is sent and read."""
+    prefetcher.start(update.effective_chat.id)
+    pending = (amount, currency, recipient, time.monotonic(), update.effective_user.id)
+    context.chat_data["pending_send"] = pending
+    await update.message.reply_text(ResponseTemplates.send_confirmation(amount, currency, recipient))
+    context.application.create_task(check_send_funds(update, context, prefetcher, pending), update=update)
+
+async def check_send_funds(update: Update, context: ContextTypes.DEFAULT_TYPE, prefetcher: BalancePrefetcher,
+                           pending: Tuple[float, str, str, float, int]):
+    """Refuse a send the wallet can't cover as soon as the prefetched balance arrives."""
+    chat_id = update.effective_chat.id
+    balances = await prefetcher.peek(chat_id, SEND_PREFETCH_WAIT)
+    # Answered or replaced by another send in the meantime
+    if balances is None or context.chat_data.get("pending_send") is not pending:
+        return
+    amount, currency = pending[:2]
+    available = balance_totals(balances).get(currency, 0)
+    if available < amount:
+        del context.chat_data["pending_send"]
+        await prefetcher.take(chat_id, 0)
+        await update.message.reply_text(ResponseTemplates.insufficient_funds(amount, available, currency))
+
+async def answer_send_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE, confirmed: bool):
+    """Create the wads of a confirmed send, for the user to forward to the recipient."""
+    chat_id = update.effective_chat.id
+    amount, currency, recipient, asked_at, _ = context.chat_data.pop("pending_send")
+    prefetcher: BalancePrefetcher = context.application.bot_data["balance_prefetch"]
+    if not confirmed:
+        prefetcher.discard(chat_id)
+        await update.message.reply_text(ResponseTemplates.send_cancelled())
+        return
+    if time.monotonic() - asked_at > SEND_CONFIRM_TIMEOUT:
+        prefetcher.discard(chat_id)
+        await update.message.reply_text(ResponseTemplates.send_expired())
+        return
+    
+    # Usually warm, the read started with the confirmation
+    balances = await prefetcher.take(chat_id, SEND_PREFETCH_WAIT)
+    if balances is not None:
+        available = balance_totals(balances).get(currency, 0)
+        if available < amount:
+            await update.message.reply_text(ResponseTemplates.insufficient_funds(amount, available, currency))
+            return
+    
+    asset_amount, asset = to_asset_amount(amount, currency)
+    await submit_wallet_job(
+        update, context, JobKind.CREATE_WADS, {"amount": asset_amount, "asset": asset},
+        lambda result: ResponseTemplates.send_ready(amount, currency, recipient, result["wads"]),
+        f"Preparing your payment to @{recipient}",
+        history=lambda result: [(HistoryKind.SENT, amount, currency, None, f"@{recipient}")],
+    )
 
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle document uploads."""
     document: Document = update.message.document
     
-    if document.file_size and document.file_size > 50 * 1024 * 1024:  # 50MB limit
+    if document.file_size and document.file_size > MAX_DOCUMENT_BYTES:
         await update.message.reply_text("❌ File too large! Maximum 50MB allowed.")
         return
     
     try:
         file = await context.bot.get_file(document.file_id)
         file_content = await file.download_as_bytearray()
-        text_content = file_content.decode('utf-8')
+        
+        # A CSV of amounts captioned "/payout" becomes one wad per row
+        client: Optional[ResilientWallet] = context.application.bot_data.get("wallet_client")
+        wallet_jobs: Optional[WalletJobQueue] = context.application.bot_data.get("wallet_jobs")
+        payout = CommandPatterns.PAYOUT_CAPTION.match(update.message.caption or "")
+        if wallet_jobs and payout:
+            if not may_use_wallet(context, update.effective_user):
+                await update.message.reply_text(ResponseTemplates.wallet_not_allowed())
+                return
+            default_currency = payout.group("currency")
+            if default_currency:
+                default_currency = get_unit_registry().normalize(default_currency)
+            requests, _ = requests_from_csv(iter_lines(file_content), default_currency)
+            await start_bulk_payout(update, context, requests)
+            return
+        
+        # Files of wads are received into the wallet, in the background as it takes a while
+        has_wads, chars = await run_payload(context, inspect_document, file_content)
+        if client and has_wads:
+            if not may_use_wallet(context, update.effective_user):
+                await update.message.reply_text(ResponseTemplates.wallet_not_allowed())
+                return
+            await update.message.reply_text(ResponseTemplates.job_queued(f"Importing the wads of {document.file_name}"))
+            context.application.create_task(bulk_import(update, context, client, file_content), update=update)
+            return
+        if chars is None:
+            chars = len(file_content.decode('utf-8'))
         
         await update.message.reply_text(f"📄 Document received: {document.file_name}")
-        await update.message.reply_text(f"📊 File size: {len(text_content)} characters")
+        await update.message.reply_text(f"📊 File size: {chars} characters")
         
         # Echo the document content
         await echo_message(update, context)
         
     except Exception as e:
-        logger.error(f"Error processing document: {e}")
+        logger.error("Error processing document: %s", e, extra={"event": "document_error"})
         await update.message.reply_text("❌ Error processing document. Please try again.")
 
+async def run_payload(context: ContextTypes.DEFAULT_TYPE, function: Callable[..., Any], payload: Any, *args: Any):
+    """Run CPU-heavy payload work, in a worker process when it is large and the executor is configured."""
+    executor: Optional[PayloadExecutor] = context.application.bot_data.get("payload_executor")
+    if executor is None:
+        return function(payload, *args)
+    return await executor.run(function, payload, *args)
+
+async def bulk_import(update: Update, context: ContextTypes.DEFAULT_TYPE, client: ResilientWallet, content: bytearray):
+    """Receive every wad of an uploaded file and reply with a per-line summary document."""
+    importer = BulkImporter(client, batch_size=BULK_IMPORT_BATCH_SIZE, concurrency=BULK_IMPORT_CONCURRENCY)
+    started = time.monotonic()
+    entries, report = await importer.receive(await run_payload(context, parse_document, content), started)
+    
+    # Unconfirmed wads may have been received too, the balance is read again either way
+    if report[LineStatus.RECEIVED] or report[LineStatus.UNKNOWN]:
+        await context.application.bot_data["cache"].invalidate(BALANCE_CACHE_KEY)
+        store: Optional[HistoryStore] = context.application.bot_data.get("history")
+        if store:
+            tx_id = generate_transaction_id()
+            for entry in entries:
+                if entry.status == LineStatus.RECEIVED:
+                    store.record(update.effective_user.id, HistoryKind.RECEIVED, entry.amount, entry.currency,
+                                 tx_id, entry.mint_url, entry.memo)
+    
+    await update.message.reply_text(ResponseTemplates.bulk_import_summary(report))
+    await LongMessageHandler.send_as_document(update, summary_csv(entries), "import_summary.csv", context)
+
+async def start_bulk_payout(update: Update, context: ContextTypes.DEFAULT_TYPE, requests: List[PayoutRequest]):
+    """Check the size of a payout and ask to confirm its total, nothing is created before."""
+    if not requests:
+        await update.message.reply_text("❌ No amounts found. Send one amount per line, e.g. \"100,sats\".")
+        return
+    if len(requests) > BULK_PAYOUT_MAX_WADS:
+        await update.message.reply_text(ResponseTemplates.bulk_payout_too_large(BULK_PAYOUT_MAX_WADS))
+        return
+    totals: Dict[str, float] = {}
+    for request in requests:
+        totals[request.currency] = totals.get(request.currency, 0) + request.amount
+    message_id = update.message.message_id
+    context.chat_data["pending_payout"] = (update, requests, time.monotonic())
+    markup = InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ Confirm", callback_data=f"payout:yes:{message_id}"),
+        InlineKeyboardButton("✖️ Cancel", callback_data=f"payout:no:{message_id}"),
+    ]])
+    await update.message.reply_text(ResponseTemplates.bulk_payout_confirmation(len(requests), totals),
+                                    reply_markup=markup)
+
+async def payout_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the buttons of a payout confirmation, only the user who asked for the payout can answer."""
+    query = update.callback_query
+    _, answer, message_id = query.data.split(":")
+    pending = context.chat_data.get("pending_payout") if context.chat_data is not None else None
+    if (not pending or str(pending[0].message.message_id) != message_id
+            or pending[0].effective_user.id != query.from_user.id):
+        await query.answer("This payout isn't yours, or it was replaced by a newer one.")
+        return
+    original, requests, asked_at = context.chat_data.pop("pending_payout")
+    await query.answer()
+    await query.edit_message_reply_markup(None)
+    if answer != "yes":
+        await original.message.reply_text(ResponseTemplates.bulk_payout_cancelled())
+        return
+    if time.monotonic() - asked_at > SEND_CONFIRM_TIMEOUT:
+        await original.message.reply_text(ResponseTemplates.bulk_payout_expired())
+        return
+    
+    # One job for the whole payout, it counts against the chat and the write lane like any other
+    wallet_jobs: WalletJobQueue = context.application.bot_data["wallet_jobs"]
+    
+    async def on_result(outcome: Tuple[IO[bytes], Dict[str, Any]]):
+        await deliver_bulk_payout(original, context, requests, *outcome)
+    
+    async def on_error(error: Exception):
+        await original.message.reply_text(ResponseTemplates.network_error())
+    
+    try:
+        wallet_jobs.submit(JobKind.CREATE_WADS, original.effective_chat.id, None, on_result, on_error,
+                           run=lambda client: BulkPayout(client, window=BULK_PAYOUT_WINDOW).run(requests))
+    except QueueFullError:
+        await original.message.reply_text(ResponseTemplates.rate_limit())
+        return
+    await original.message.reply_text(ResponseTemplates.job_queued(f"Creating {len(requests)} wads"))
+
+async def deliver_bulk_payout(update: Update, context: ContextTypes.DEFAULT_TYPE, requests: List[PayoutRequest],
+                              document: IO[bytes], report: Dict[str, Any]):
+    """Reply with the wads of a payout as one document, then send each to its recipient."""
+    try:
+        # Read whole by the upload anyway, and an in-memory spool has no name to give it
+        content = document.read()
+    finally:
+        document.close()
+    if report["created"]:
+        await context.application.bot_data["cache"].invalidate(BALANCE_CACHE_KEY)
+    
+    try:
+        await update.message.reply_text(ResponseTemplates.bulk_payout_summary(report))
+        await update.message.reply_document(document=content, filename="payout.csv",
+                                            caption=f"📎 payout.csv ({report['created']} wads)")
+    except TelegramError as e:
+        # The document is the only copy of the wads, they would be lost with this process
+        logger.warning("Payout document not delivered, receiving its wads back: %s", e,
+                       extra={"event": "bulk_payout_undelivered"})
+        if report["created"]:
+            await receive_payout_back(update, context, content)
+        return
+    
+    store: Optional[HistoryStore] = context.application.bot_data.get("history")
+    if store and report["created"]:
+        tx_id = generate_transaction_id()
+        for request in requests:
+            if request.wads:
+                store.record(update.effective_user.id, HistoryKind.CREATED, request.amount, request.currency, tx_id)
+    context.application.create_task(send_payout_wads(update, context, requests), update=update)
+
+async def receive_payout_back(update: Update, context: ContextTypes.DEFAULT_TYPE, content: bytes):
+    """Receive the wads of an undelivered payout document back into the wallet."""
+    client: ResilientWallet = context.application.bot_data["wallet_client"]
+    importer = BulkImporter(client, batch_size=BULK_IMPORT_BATCH_SIZE, concurrency=BULK_IMPORT_CONCURRENCY)
+    _, report = await importer.receive(await run_payload(context, parse_document, content))
+    if report[LineStatus.RECEIVED] < report["wads"]:
+        logger.error(
+            "%d wads of an undelivered payout could not be received back", report["wads"] - report[LineStatus.RECEIVED],
+            extra={"event": "bulk_payout_lost"},
+        )
+    try:
+        await update.message.reply_text(ResponseTemplates.bulk_payout_undelivered())
+    except TelegramError:
+        pass
+
+async def send_payout_wads(update: Update, context: ContextTypes.DEFAULT_TYPE, requests: List[PayoutRequest]):
+    """Send the wad of each payout row naming a chat to that chat."""
+    # Rows naming a chat have their wad sent there, within Telegram's rate limits
+    broadcaster: Optional[Broadcaster] = context.application.bot_data.get("broadcaster")
+    user = update.effective_user
+    sender = f"@{user.username}" if user.username else user.first_name
+    notifications = [
+        (request.recipient, ResponseTemplates.received_tokens(request.amount, request.currency, sender, request.wads))
+        for request in requests if request.recipient is not None and request.wads
+    ]
+    if broadcaster and notifications:
+        delivered = await broadcaster.broadcast(notifications, at_most_once=True)
+        await update.message.reply_text(ResponseTemplates.bulk_payout_delivered(delivered))
+
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Append every update, shed ones included, to the replay log."""
+    recorder: UpdateRecorder = context.application.bot_data["update_recorder"]
+    recorder.record(update.to_dict())
+
+async def shield_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Drop flooding users before any other handler parses the update."""
+    # Inline queries come with every keystroke, they are debounced rather than counted
+    if update.inline_query:
+        return
+    shield: FloodShield = context.application.bot_data["flood_shield"]
+    user_id, text_size, document_size = shield.update_cost(update)
+    # A long wad is split into many messages, each counts for a share of a message
+    reassembler: Optional[WadReassembler] = context.application.bot_data.get("wad_reassembler")
+    message = update.effective_message
+    continuation = bool(reassembler and message and update.effective_chat
+                        and reassembler.is_continuation(update.effective_chat.id, message.text))
+    verdict = shield.check(user_id, text_size, document_size, fragment=continuation)
+    if verdict is None:
+        return
+    
+    # Logged and answered once per window, a flood must not turn into a flood of replies
+    if update.effective_message and shield.should_notify(user_id):
+        logger.warning(
+            "Shedding updates from user %s (%s)", user_id, verdict,
+            extra={"event": "update_shed", "verdict": verdict},
+        )
+        if verdict == Verdict.OVERSIZE:
+            await update.effective_message.reply_text("❌ File too large! Maximum 50MB allowed.")
+        else:
+            await update.effective_message.reply_text(ResponseTemplates.rate_limit())
+    raise ApplicationHandlerStop
+
+def build_inline_results(amounts: Tuple[Tuple[float, str], ...]) -> List[InlineQueryResultArticle]:
+    """One result per amount an inline query may stand for, its wad is created once chosen."""
+    # The button gives the sent message an inline_message_id, which the wad is edited into
+    markup = InlineKeyboardMarkup([[InlineKeyboardButton("⏳ Creating the wad...", callback_data="inline_wad")]])
+    return [
+        InlineQueryResultArticle(
+            id=f"wad:{amount:g}:{currency}",
+            title=f"🪙 Send a wad of {format_currency_amount(amount, currency)}",
+            description="A fresh Cashu wad is created from the wallet when you pick this",
+            input_message_content=InputTextMessageContent(ResponseTemplates.inline_wad_pending(amount, currency)),
+            reply_markup=markup,
+        )
+        for amount, currency in amounts
+    ]
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle "@bot 100 sats" - offer wads to create, debounced and without calling the wallet."""
+    query = update.inline_query
+    inline_queries: InlineQueries = context.application.bot_data["inline_queries"]
+    
+    # Nothing to offer to users who can't spend from the wallet, the button opens the bot
+    if not may_use_wallet(context, query.from_user):
+        button = InlineQueryResultsButton(text="🔒 Private wallet", start_parameter="private")
+        await query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True, button=button)
+        return
+    
+    async def answer(results: List[InlineQueryResultArticle]):
+        button = None if results else InlineQueryResultsButton(text="Type an amount, e.g. 100 sats", start_parameter="inline")
+        await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True, button=button)
+    
+    inline_queries.submit(query.from_user.id, query.query, answer)
+
+async def inline_wad_chosen(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Create the wad of a chosen inline result and edit it into the inline message."""
+    chosen = update.chosen_inline_result
+    kind, _, rest = chosen.result_id.partition(":")
+    amount_text, _, currency = rest.partition(":")
+    try:
+        amount = float(amount_text)
+    except ValueError:
+        return
+    asset_amount = to_asset_amount(amount, currency)
+    inline_message_id = chosen.inline_message_id
+    if kind != "wad" or not asset_amount or not inline_message_id:
+        return
+    
+    async def edit(text: str):
+        await context.bot.edit_message_text(text, inline_message_id=inline_message_id)
+    
+    wallet_jobs: Optional[WalletJobQueue] = context.application.bot_data.get("wallet_jobs")
+    if not wallet_jobs:
+        await edit("ℹ️ The wallet is not available right now, nothing was spent.")
+        return
+    # Results may be chosen from an old answer, or forged, the allowlist is checked again
+    if not may_use_wallet(context, chosen.from_user):
+        await edit(ResponseTemplates.inline_wallet_not_allowed())
+        return
+    user_id = chosen.from_user.id
+    
+    async def on_result(result: Any):
+        await context.application.bot_data["cache"].invalidate(BALANCE_CACHE_KEY)
+        if await deliver_inline_wad(context, inline_message_id, user_id, amount, currency, result["wads"]):
+            store: Optional[HistoryStore] = context.application.bot_data.get("history")
+            if store:
+                store.record(user_id, HistoryKind.CREATED, amount, currency, generate_transaction_id(), None, None)
+    
+    async def on_error(error: Exception):
+        if isinstance(error, McpError) and error.code == -32602:  # Invalid params
+            await edit(f"❌ The wallet rejected this request: {error}")
+        else:
+            await edit(ResponseTemplates.network_error())
+    
+    try:
+        wallet_jobs.submit(JobKind.CREATE_WADS, user_id, {"amount": asset_amount[0], "asset": asset_amount[1]},
+                           on_result, on_error)
+    except QueueFullError:
+        await edit(ResponseTemplates.rate_limit())
+
+async def deliver_inline_wad(context: ContextTypes.DEFAULT_TYPE, inline_message_id: str, user_id: int,
+                             amount: float, currency: str, wads: str) -> bool:
+    """
+    Put created wads in their inline message, or the user's private chat when they don't fit.
+    
+    Returns:
+        Whether the wads were delivered, undeliverable wads are received back into the wallet
+    """
+    text = ResponseTemplates.wads_created(amount, currency, wads)
+    try:
+        if len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+            await context.bot.edit_message_text(text, inline_message_id=inline_message_id)
+            return True
+        await context.bot.send_document(user_id, wads.encode("utf-8"), filename="wad.txt",
+                                        caption=f"🪙 {format_currency_amount(amount, currency)}")
+        await context.bot.edit_message_text(ResponseTemplates.inline_wad_too_long(amount, currency),
+                                            inline_message_id=inline_message_id)
+        return True
+    except TelegramError as e:
+        # Unsent wads would be lost with this process, they go back to the wallet
+        logger.warning("Inline wad not delivered, receiving it back: %s", e, extra={"event": "inline_wad_undelivered"})
+    try:
+        await context.application.bot_data["wallet_client"].call_tool(JobKind.RECEIVE_WADS.value, {"wads": wads})
+    except McpError as e:
+        logger.error("Undelivered inline wad could not be received back: %s", e, extra={"event": "inline_wad_lost"})
+    return False
+
+async def inline_wad_pending_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle taps on an inline message whose wad is still being created."""
+    await update.callback_query.answer("⏳ The wad is being created.")
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /history command - show the newest transactions."""
+    await send_history_page(update, context, None)
+
+async def history_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the "Older" button of a history page."""
+    query = update.callback_query
+    await query.answer()
+    await send_history_page(update, context, query.data.split(":", 1)[1])
+
+async def send_history_page(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor: Optional[str]):
+    """Show a page of the user's history, editing the previous page when paging."""
+    store: Optional[HistoryStore] = context.application.bot_data.get("history")
+    if not store:
+        await update.effective_message.reply_text("ℹ️ Transaction history is not available.")
+        return
+    
+    try:
+        entries, next_cursor = await store.page(update.effective_user.id, cursor, HISTORY_PAGE_SIZE)
+    except ValueError:
+        await update.effective_message.reply_text("❌ This history page is no longer valid, use /history.")
+        return
+    
+    text = ResponseTemplates.history_page(entries, first_page=cursor is None)
+    markup = None
+    if next_cursor:
+        markup = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Older", callback_data=f"history:{next_cursor}")]])
+    
+    if update.callback_query:
+        await update.callback_query.edit_message_text(text, reply_markup=markup)
+    else:
+        await update.message.reply_text(text, reply_markup=markup)
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /stats command - show flood shield, cache and wallet queue metrics."""
+    shield: FloodShield = context.application.bot_data["flood_shield"]
+    lines = ["🛡️ Flood shield"]
+    lines.extend(f"• {name}: {value}" for name, value in shield.metrics().items())
+    lines.append("\n🗃️ Cache")
+    lines.extend(f"• {name}: {value}" for name, value in context.application.bot_data["cache"].metrics().items())
+    watchdog: Optional[LoopWatchdog] = context.application.bot_data.get("loop_watchdog")
+    if watchdog:
+        lines.append("\n⏱️ Event loop lag")
+        lines.extend(f"• {name}: {value if value is not None else 'n/a'}" for name, value in watchdog.metrics().items())
+    lines.append("\n🧩 Wad fragments")
+    lines.extend(f"• {name}: {value}" for name, value in context.application.bot_data["wad_reassembler"].metrics().items())
+    inline_queries: Optional[InlineQueries] = context.application.bot_data.get("inline_queries")
+    if inline_queries:
+        lines.append("\n🔎 Inline queries")
+        lines.extend(f"• {name}: {value}" for name, value in inline_queries.metrics().items())
+    executor: Optional[PayloadExecutor] = context.application.bot_data.get("payload_executor")
+    if executor:
+        lines.append("\n🏭 Payload workers")
+        lines.extend(f"• {name}: {value}" for name, value in executor.metrics().items())
+    planner: Optional[ReplyPlanner] = context.application.bot_data.get("reply_planner")
+    if planner:
+        lines.append("\n📨 Long replies")
+        lines.extend(f"• {name}: {value}" for name, value in planner.metrics().items())
+    
+    wallet_jobs: Optional[WalletJobQueue] = context.application.bot_data.get("wallet_jobs")
+    if not wallet_jobs:
+        lines.append("\nℹ️ Wallet backend not configured.")
+        await update.message.reply_text("\n".join(lines))
+        return
+    
+    lines.append("\n🔮 Balance prefetch")
+    lines.extend(f"• {name}: {value}" for name, value in context.application.bot_data["balance_prefetch"].metrics().items())
+    
+    lines.append("\n🩺 Wallet calls")
+    wallet: ResilientWallet = context.application.bot_data["wallet_client"]
+    for name, value in wallet.metrics().items():
+        if isinstance(value, dict):
+            p99 = f"{value['p99_ms']}ms" if value["p99_ms"] is not None else "n/a"
+            lines.append(f"• {name}: {value['state']}, {value['calls']} calls, {value['failures']} failed, "
+                         f"p99 {p99}, timeout {value['timeout_s']}s")
+        else:
+            lines.append(f"• {name}: {value}")
+    
+    lines.append("\n📊 Wallet queue")
+    for lane, metrics in wallet_jobs.metrics().items():
+        lines.append(f"\n{lane}:")
+        lines.extend(f"• {name}: {value}" for name, value in metrics.items())
+    await update.message.reply_text("\n".join(lines))
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /profile <seconds> and /profile stop - sample the event loop (operators only)."""
+    profiler: SamplingProfiler = context.application.bot_data["profiler"]
+    if context.args and context.args[0].lower() in ("stop", "off"):
+        if profiler.finish():
+            await update.message.reply_text("⏹️ Stopping the profile, the report follows.")
+        else:
+            await update.message.reply_text("ℹ️ No profile is running.")
+        return
+    
+    try:
+        seconds = float(context.args[0]) if context.args else 10.0
+    except ValueError:
+        seconds = 0.0
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        await update.message.reply_text(f"Usage: /profile <seconds, up to {PROFILE_MAX_SECONDS:.0f}> or /profile stop")
+        return
+    try:
+        profiler.start()
+    except ProfilerBusyError:
+        await update.message.reply_text("⏳ A profile is already running, end it with /profile stop.")
+        return
+    
+    # Not an application task, those would hold the shutdown until the window ends
+    context.application.bot_data["profile_task"] = asyncio.ensure_future(run_profile(update, context, profiler, seconds))
+    await update.message.reply_text(f"🔬 Profiling the event loop for {seconds:g}s...")
+
+async def run_profile(update: Update, context: ContextTypes.DEFAULT_TYPE, profiler: SamplingProfiler, seconds: float):
+    """Wait for the end of the window, then send the collapsed stacks and the top functions."""
+    report = await profiler.wait(seconds)
+    try:
+        if not report.samples:
+            await update.message.reply_text("ℹ️ The profile ended before the first sample.")
+            return
+        await LongMessageHandler.send_as_document(update, report.summary(), "profile_top.txt", context)
+        await LongMessageHandler.send_as_document(update, report.collapsed(), "profile_stacks.txt", context)
+    except Exception as e:
+        logger.error("Sending the profile failed: %s", e, exc_info=e, extra={"event": "profile_error"})
+
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors."""
-    logger.error(f"Update {update} caused error {context.error}")
+    # Only identifiers are logged, the full Update repr is large and may contain wads
+    logger.error(
+        "Update %s caused error %s", getattr(update, "update_id", None), context.error,
+        exc_info=context.error,
+        extra={"event": "handler_error", "chat_id": update.effective_chat.id if update and update.effective_chat else None},
+    )
     if update and update.message:
         await update.message.reply_text("❌ An error occurred. Please try again.")
 
-def main():
-    """Initialize and run the bot."""
-    logger.info("Starting Cashu MCP Wallet Telegram Bot...")
+async def start_wallet(application: Application):
+    """Connect to the wallet MCP server and start the job workers."""
+    if not MCP_SERVER_COMMAND:
+        logger.warning("MCP_SERVER_COMMAND not set, wallet commands use mock data")
+        set_unit_registry(await load_unit_registry(None, UNIT_REGISTRY_CACHE))
+        return
     
-    # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+    client = McpClient(shlex.split(MCP_SERVER_COMMAND))
+    await client.start()
+    set_unit_registry(await load_unit_registry(client, UNIT_REGISTRY_CACHE))
+    
+    # Every wallet call goes through the timeouts and circuit breakers
+    wallet = ResilientWallet(
+        client,
+        read_only_tools=[kind.value for kind in JobKind if kind.read_only],
+        min_timeout=WALLET_MIN_TIMEOUT,
+        max_timeout=WALLET_MAX_TIMEOUT,
+        breaker_error_rate=WALLET_BREAKER_ERROR_RATE,
+        breaker_cooldown=WALLET_BREAKER_COOLDOWN,
+        hedge_reads=WALLET_HEDGE_READS,
+    )
+    wallet_jobs = WalletJobQueue(
+        wallet,
+        read_workers=WALLET_READ_WORKERS,
+        write_workers=WALLET_WRITE_WORKERS,
+        max_queue_size=WALLET_QUEUE_SIZE,
+        max_jobs_per_chat=WALLET_JOBS_PER_CHAT,
+    )
+    await wallet_jobs.start()
+    
+    application.bot_data["mcp_client"] = client
+    application.bot_data["wallet_client"] = wallet
+    application.bot_data["wallet_jobs"] = wallet_jobs
+    application.bot_data["wallet_users"] = frozenset(WALLET_USER_IDS + OPERATOR_IDS)
+    if not application.bot_data["wallet_users"]:
+        logger.warning("Neither WALLET_USER_IDS nor OPERATOR_IDS is set, wallet commands are refused to every user",
+                       extra={"event": "wallet_users_unset"})
+    application.bot_data["balance_prefetch"] = BalancePrefetcher(
+        lambda: wallet.call_tool(JobKind.BALANCE.value, {}),
+        cache=application.bot_data["cache"],
+        cache_key=BALANCE_CACHE_KEY,
+        ttl=BALANCE_CACHE_TTL,
+        max_age=SEND_CONFIRM_TIMEOUT,
+    )
+
+async def post_init(application: Application):
+    """Start the wallet backend, then answer the updates received while offline."""
+    cache = Cache(LRUCache(CACHE_MAX_ENTRIES), SQLiteCache(CACHE_PATH) if CACHE_PATH else None)
+    await cache.start()
+    application.bot_data["cache"] = cache
+    
+    # Watched from the start, the catch-up below is when the loop is busiest
+    watchdog = application.bot_data.get("loop_watchdog")
+    if watchdog:
+        watchdog.start()
+    
+    recorder = application.bot_data.get("update_recorder")
+    if recorder:
+        await recorder.start()
+    
+    await start_wallet(application)
+    # Started once the server's units are known, the workers validate wads with them
+    executor = application.bot_data.get("payload_executor")
+    if executor:
+        await executor.start(get_unit_registry())
+    
+    history = HistoryStore(HISTORY_DB)
+    await history.start()
+    application.bot_data["history"] = history
+    
+    broadcaster = Broadcaster(application.bot, BROADCAST_DB, rate=BROADCAST_RATE)
+    await broadcaster.start()
+    application.bot_data["broadcaster"] = broadcaster
+    for broadcast_id in await broadcaster.resume_unfinished():
+        logger.info("Resuming broadcast %s", broadcast_id)
+    application.bot_data["locales"] = setup_locales(PRELOADED_LOCALES)
+    application.bot_data["intent_matcher"] = build_intent_matcher(get_unit_registry())
+    
+    readiness = application.bot_data.get("readiness")
+    if readiness:
+        await readiness.start()
+    
+    if CATCH_UP_ON_START:
+        await catch_up_backlog(
+            application,
+            concurrency=CATCH_UP_CONCURRENCY,
+            max_updates=CATCH_UP_MAX_UPDATES,
+        )
+
+async def post_shutdown(application: Application):
+    """Stop the job workers and the wallet MCP server, then flush the history."""
+    application.bot_data["wad_reassembler"].close()
+    
+    readiness = application.bot_data.pop("readiness", None)
+    if readiness:
+        await readiness.close()
+    
+    inline_queries = application.bot_data.get("inline_queries")
+    if inline_queries:
+        await inline_queries.close()
+    
+    prefetcher = application.bot_data.pop("balance_prefetch", None)
+    if prefetcher:
+        prefetcher.close()
+    
+    wallet_jobs = application.bot_data.pop("wallet_jobs", None)
+    if wallet_jobs:
+        await wallet_jobs.stop()
+    
+    application.bot_data.pop("wallet_client", None)
+    client = application.bot_data.pop("mcp_client", None)
+    if client:
+        await client.close()
+    
+    history = application.bot_data.pop("history", None)
+    if history:
+        await history.close()
+    
+    broadcaster = application.bot_data.pop("broadcaster", None)
+    if broadcaster:
+        await broadcaster.close()
+    
+    cache = application.bot_data.pop("cache", None)
+    if cache:
+        await cache.close()
+    
+    recorder = application.bot_data.pop("update_recorder", None)
+    if recorder:
+        await recorder.close()
+    
+    executor = application.bot_data.pop("payload_executor", None)
+    if executor:
+        await executor.close()
+    
+    # A running profile is dropped, which stops its timer
+    profile_task = application.bot_data.pop("profile_task", None)
+    if profile_task and not profile_task.done():
+        profile_task.cancel()
+        await asyncio.gather(profile_task, return_exceptions=True)
+    
+    watchdog = application.bot_data.pop("loop_watchdog", None)
+    if watchdog:
+        await watchdog.stop()
+
+def add_handlers(application: Application):
+    """Register the bot's handlers, shared with the replay tool."""
+    # Record traffic as it arrives, before anything is shed
+    if "update_recorder" in application.bot_data:
+        application.add_handler(TypeHandler(Update, record_update), group=-2)
+    
+    # Shed abusive traffic before any other handler runs
+    application.add_handler(TypeHandler(Update, shield_update), group=-1)
     
     # Add command handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("test_long", test_long_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("history", history_command))
+    application.add_handler(CallbackQueryHandler(history_page_callback, pattern=r"^history:"))
+    application.add_handler(CallbackQueryHandler(suggestion_callback, pattern=r"^suggestion:(yes|no):\d+$"))
+    application.add_handler(CallbackQueryHandler(payout_callback, pattern=r"^payout:(yes|no):\d+$"))
+    if "inline_queries" in application.bot_data:
+        application.add_handler(InlineQueryHandler(inline_query))
+        application.add_handler(ChosenInlineResultHandler(inline_wad_chosen, pattern=r"^wad:"))
+        application.add_handler(CallbackQueryHandler(inline_wad_pending_callback, pattern=r"^inline_wad$"))
+    if "profiler" in application.bot_data:
+        application.add_handler(CommandHandler("profile", profile_command, filters=filters.User(user_id=OPERATOR_IDS)))
     
     # Add message handlers
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, echo_message))
@@ -287,6 +1369,90 @@ def main():
     
     # Add error handler
     application.add_error_handler(error_handler)
+
+def main():
+    """Initialize and run the bot."""
+    # Configured here rather than at import, payload workers import this module too
+    # and must not start a logging thread of their own
+    setup_logging(
+        level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO),
+        json_format=os.getenv("LOG_FORMAT", "json") == "json",
+        sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "message_received=10")),
+    )
+    # httpx logs every Bot API request at INFO level
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logger.info("Starting Cashu MCP Wallet Telegram Bot...")
+    
+    # Create application
+    builder = configure_transport(
+        Application.builder().token(BOT_TOKEN),
+        pool_size=BOT_HTTP_POOL_SIZE,
+        keepalive_expiry=BOT_HTTP_KEEPALIVE,
+        http_version=BOT_HTTP_VERSION,
+        pool_timeout=BOT_HTTP_POOL_TIMEOUT,
+    )
+    application = (
+        builder
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    application.bot_data["flood_shield"] = FloodShield(
+        max_messages=FLOOD_MAX_MESSAGES,
+        window_seconds=FLOOD_WINDOW_SECONDS,
+        byte_budget=FLOOD_BYTE_BUDGET,
+        max_document_bytes=MAX_DOCUMENT_BYTES,
+        fragment_weight=FLOOD_FRAGMENT_WEIGHT,
+    )
+    
+    application.bot_data["wad_reassembler"] = WadReassembler(
+        idle_timeout=WAD_FRAGMENT_TIMEOUT,
+        fragment_length=CHUNK_SIZE,
+        max_chat_chars=WAD_MAX_CHAT_CHARS,
+        max_total_chars=WAD_MAX_TOTAL_CHARS,
+        # A whole wad costs at most a window's message count
+        max_fragments=int(FLOOD_MAX_MESSAGES / FLOOD_FRAGMENT_WEIGHT),
+    )
+    
+    application.bot_data["inline_queries"] = InlineQueries(
+        lambda text: tuple(CommandParser.parse_inline_amounts(text)),
+        build_inline_results,
+        debounce=INLINE_DEBOUNCE,
+        ttl=INLINE_RESULTS_TTL,
+    )
+    
+    application.bot_data["reply_planner"] = ReplyPlanner(
+        chunk_size=CHUNK_SIZE,
+        burst=REPLY_CHAT_BURST,
+        max_chunks=REPLY_MAX_CHUNKS,
+    )
+    
+    if PAYLOAD_WORKERS:
+        application.bot_data["payload_executor"] = PayloadExecutor(
+            threshold=PAYLOAD_OFFLOAD_BYTES,
+            workers=PAYLOAD_WORKERS,
+            max_shared_bytes=PAYLOAD_SHARED_MEMORY_BYTES,
+        )
+    
+    watchdog = LoopWatchdog(threshold=LOOP_STALL_THRESHOLD)
+    application.bot_data["loop_watchdog"] = watchdog
+    if READY_PORT:
+        application.bot_data["readiness"] = ReadinessServer(
+            watchdog,
+            lambda: application.bot_data.get("wallet_client"),
+            host=READY_HOST,
+            port=READY_PORT,
+            max_lag=READY_MAX_LAG,
+            probe_interval=READY_PROBE_INTERVAL,
+        )
+    
+    if OPERATOR_IDS:
+        application.bot_data["profiler"] = SamplingProfiler(interval=PROFILE_INTERVAL)
+    
+    if RECORD_UPDATES:
+        application.bot_data["update_recorder"] = UpdateRecorder(RECORD_UPDATES)
+    
+    add_handlers(application)
     
     # Start the bot
     logger.info("Bot started. Press Ctrl+C to stop.")
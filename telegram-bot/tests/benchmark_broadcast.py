@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the broadcast engine
+
+Delivers a batch of received-token alerts through a local fake Bot API
+server, with some chats answering 429 (retry later) and some having
+blocked the bot, and compares the throughput with a sequential send loop.
+Limits are scaled up from Telegram's (30 messages/s, 1 per chat per
+second) to keep the run short. A second run is interrupted halfway and
+resumed by a new engine to check that nothing is sent twice, and a third
+one fails to record some deliveries and must still finish. The state file
+must hold no text of a delivered message, and nothing of a finished
+broadcast. Last, sends that time out after reaching the chat are retried
+in a plain broadcast, and not in one of wads.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from telegram import Bot
+from telegram.error import TelegramError, TimedOut
+
+from bot_transport import build_request
+from broadcast import Broadcaster
+from command_patterns import ResponseTemplates
+from fake_bot_api import FakeBotApi
+
+CHATS = 500
+PER_CHAT = 4
+RATE = 400.0
+CHAT_INTERVAL = 0.05
+
+# Blocked chats are expected here, keep their warnings out of the report
+logging.getLogger("broadcast").setLevel(logging.ERROR)
+
+
+class TimingOutBot:
+    """Delivers every message, but the first send to each of some chats times out after arriving."""
+
+    def __init__(self, timing_out: range):
+        self.timing_out = set(timing_out)
+        self.received: Counter = Counter()
+
+    async def send_message(self, chat_id: int, text: str):
+        self.received[chat_id] += 1
+        if chat_id in self.timing_out:
+            self.timing_out.discard(chat_id)
+            raise TimedOut()
+
+
+def stored(state: str) -> tuple:
+    """Rows in the state file, and texts kept for messages already final."""
+    with sqlite3.connect(state) as connection:
+        rows = connection.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
+        texts = connection.execute("SELECT COUNT(*) FROM deliveries WHERE status != 'pending' AND text != ''").fetchone()[0]
+    return rows, texts
+
+
+def alerts():
+    return [
+        (chat_id, ResponseTemplates.received_tokens(100 * (index + 1), "sat", "@payout_bot", f"cashuB{chat_id:06d}{index}"))
+        for index in range(PER_CHAT) for chat_id in range(1, CHATS + 1)
+    ]
+
+
+async def main():
+    print("🧪 BROADCAST BENCHMARK")
+    print("=" * 50)
+
+    api = FakeBotApi(latency=0.03)
+    await api.start()
+    bot = Bot("123:fake", base_url=api.base_url, request=build_request(64))
+    await bot.initialize()
+    jobs = alerts()
+    print(f"{len(jobs)} alerts to {CHATS} chats, limits {RATE:.0f}/s global and "
+          f"{1 / CHAT_INTERVAL:.0f}/s per chat, 30ms per Bot API call")
+
+    started = time.perf_counter()
+    for chat_id, text in jobs[:200]:
+        try:
+            await bot.send_message(chat_id, text)
+        except TelegramError:
+            pass
+    sequential = 200 / (time.perf_counter() - started)
+    print(f"\n🐌 Sequential loop: {sequential:.0f} messages/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        state = os.path.join(directory, "broadcasts.db")
+        api.sent.clear()
+        api.blocked.update(range(1, 11))
+        api.retry_after.update({chat_id: 1 for chat_id in range(11, 31)})
+
+        broadcaster = Broadcaster(bot, state, rate=RATE, chat_interval=CHAT_INTERVAL, backoff=0.1)
+        await broadcaster.start()
+        report = await broadcaster.broadcast(jobs)
+        print(f"🚀 Broadcast engine: {report}")
+        order_ok = all(
+            [sent["text"] for sent in api.sent if sent["chat_id"] == chat_id]
+            == [text for job_chat, text in jobs if job_chat == chat_id]
+            for chat_id in range(31, CHATS + 1)
+        )
+        print(f"   Per-chat order kept: {order_ok}")
+        finished_rows, _ = stored(state)
+        print(f"   Rows left in the state file: {finished_rows}")
+
+        # Interrupted run, resumed by a fresh engine on the same state file
+        api.sent.clear()
+        api.blocked.clear()
+        broadcast_id = await broadcaster.submit(jobs)
+        run = asyncio.ensure_future(broadcaster.run(broadcast_id))
+        await asyncio.sleep(2)
+        run.cancel()
+        await asyncio.sleep(0.5)
+        await broadcaster.close()
+        before_crash = len(api.sent)
+        interrupted_rows, kept_texts = stored(state)
+
+        resumed = Broadcaster(bot, state, rate=RATE, chat_interval=CHAT_INTERVAL)
+        await resumed.start()
+        unfinished = await resumed.unfinished()
+        report = await resumed.run(unfinished[0])
+        await resumed.close()
+        duplicates = sum(count - 1 for count in Counter((s["chat_id"], s["text"]) for s in api.sent).values())
+        print(f"\n💥 Interrupted after {before_crash} messages, resumed {report['sent']} more")
+        print(f"   Total delivered {len(api.sent)}/{len(jobs)}, duplicates {duplicates}")
+        print(f"   State file at the interruption: {interrupted_rows} rows, {kept_texts} texts of final messages")
+
+        # The state file refuses every 10th write, the messages it concerns are given up
+        api.retry_after.update({chat_id: 1 for chat_id in range(1, 21)})
+        flaky = Broadcaster(bot, state, rate=RATE, chat_interval=CHAT_INTERVAL)
+        await flaky.start()
+        mark, writes = flaky._mark, 0
+
+        def failing_mark(*args):
+            nonlocal writes
+            writes += 1
+            if writes % 10 == 0:
+                raise sqlite3.OperationalError("disk I/O error")
+            mark(*args)
+
+        flaky._mark = failing_mark
+        try:
+            flaky_report = await asyncio.wait_for(flaky.broadcast(jobs), 60)
+        except asyncio.TimeoutError:
+            flaky_report = None
+        await flaky.close()
+        print(f"\n💾 Every 10th write failing: {flaky_report}")
+
+        print("\n⏱️  The first send to 20 chats times out after the message arrived")
+        received = {}
+        for at_most_once in (False, True):
+            timing_out = TimingOutBot(range(1, 21))
+            engine = Broadcaster(timing_out, os.path.join(directory, "timeouts.db"), rate=RATE,
+                                 chat_interval=CHAT_INTERVAL, backoff=0.01)
+            await engine.start()
+            timeout_report = await engine.broadcast([(chat_id, f"cashuB{chat_id}") for chat_id in range(1, 101)],
+                                                    at_most_once=at_most_once)
+            await engine.close()
+            received[at_most_once] = (sum(timing_out.received.values()), timeout_report)
+            print(f"   {'at most once' if at_most_once else 'plain':<13} messages received {received[at_most_once][0]}, "
+                  f"sent {timeout_report['sent']}, unknown {timeout_report['unknown']}")
+
+    await bot.shutdown()
+    await api.stop()
+
+    failures = []
+    if not order_ok:
+        failures.append("per-chat order")
+    if duplicates:
+        failures.append("no duplicates after resume")
+    if flaky_report is None or flaky_report["sent"] + flaky_report["failed"] != len(jobs):
+        failures.append("broadcast finishes when deliveries can't be recorded")
+    if finished_rows or not interrupted_rows or kept_texts:
+        failures.append("no wads kept in the state file")
+    if received[True][0] != 100 or received[True][1]["unknown"] != 20 or received[False][0] != 120:
+        failures.append("timed out wads not sent twice")
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark for bulk wad import
+
+Imports a CSV file of wads from three mints, with a header, a few
+malformed wads and a few already spent ones, through a stub wallet whose
+`receive_wads` calls cost a fixed round-trip plus a little per wad and
+receive the wads in order like the wallet server, stopping at the first
+spent one. Compares one call per wad with batched imports at several
+batch sizes and concurrencies, and checks every line's status against
+what the wallet really received: no received wad reported failed, none
+reported received that wasn't. A last import runs against a wallet that
+times out on one mint's batches, whose wads must be reported unknown
+without being sent again.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bulk_import import INTERNAL_ERROR, RECEIVE_WAD_FAILED, BulkImporter, LineStatus, iter_lines, summary_csv
+from cbor_helpers import encode_wad
+from mcp_client import McpError
+from wad_validator import validate_wads
+from wallet_resilience import WalletTimeoutError
+
+WADS = 500
+MINTS = ["https://mint-a.example.com", "https://mint-b.example.com", "http://localhost:3338"]
+SPENT = 10
+MALFORMED = 5
+CALL_LATENCY = 0.03
+PER_WAD_LATENCY = 0.002
+
+
+class StubWallet:
+    """Receives the wads of a call one after another, the ones before a spent wad stay received."""
+
+    def __init__(self, spent: set):
+        self.spent = set(spent)
+        self.received: set = set()
+        self.calls = 0
+
+    async def call_tool(self, name: str, arguments: dict):
+        self.calls += 1
+        wads = arguments["wads"].split(":")
+        await asyncio.sleep(CALL_LATENCY + PER_WAD_LATENCY * len(wads))
+        receipts = []
+        for wad, s in zip(wads, validate_wads(arguments["wads"])):
+            if wad in self.spent:
+                raise McpError(RECEIVE_WAD_FAILED, code=INTERNAL_ERROR, data="Token already spent")
+            self.spent.add(wad)
+            self.received.add(wad)
+            receipts.append({"mint_url": s.mint_url, "amount": s.amount, "unit": "Satoshi", "memo": s.memo})
+        return {"wads_received": receipts}
+
+
+def misreported(entries, wallet: StubWallet) -> int:
+    """Lines whose status contradicts what the wallet did, a received wad must never be reported failed."""
+    wrong = 0
+    for entry in entries:
+        received = entry.wad in wallet.received
+        if entry.status == LineStatus.RECEIVED and not received or entry.status == LineStatus.FAILED and received:
+            wrong += 1
+    return wrong
+
+
+def make_wad(rng: random.Random, mint: str) -> str:
+    proofs = [{"a": 1 << rng.randrange(10), "s": rng.randbytes(32).hex(), "c": bytes([2]) + rng.randbytes(32)}
+              for _ in range(3)]
+    token = {"m": mint, "u": "sat", "t": [{"i": rng.randbytes(8), "p": proofs}]}
+    return encode_wad(token)
+
+
+def build_file(rng: random.Random):
+    wads = [make_wad(rng, MINTS[index % len(MINTS)]) for index in range(WADS)]
+    spent = set(rng.sample(wads, SPENT))
+    lines = ["label,wad"]
+    for index, wad in enumerate(wads):
+        if index < MALFORMED:
+            wad = wad[:len(wad) // 2]
+        lines.append(f"payout {index},{wad}")
+    return "\n".join(lines).encode(), spent
+
+
+async def main():
+    print("🧪 BULK WAD IMPORT BENCHMARK")
+    print("=" * 50)
+    content, spent = build_file(random.Random(3))
+    print(f"{WADS} wads from {len(MINTS)} mints in a {len(content) / 1024:.0f}KB CSV, {MALFORMED} malformed, "
+          f"{SPENT} spent; receive_wads costs {CALL_LATENCY * 1000:.0f}ms + {PER_WAD_LATENCY * 1000:.0f}ms per wad")
+
+    print(f"\n{'mode':<32} {'seconds':>8} {'wads/s':>8} {'calls':>6} {'received':>9} {'invalid':>8} "
+          f"{'failed':>7} {'unknown':>8} {'wrong':>6}")
+    for label, batch_size, concurrency in (
+        ("one call per wad", 1, 1),
+        ("batches of 20, 1 in flight", 20, 1),
+        ("batches of 20, 4 in flight", 20, 4),
+        ("batches of 50, 8 in flight", 50, 8),
+    ):
+        wallet = StubWallet(spent)
+        started = time.perf_counter()
+        entries, report = await BulkImporter(wallet, batch_size, concurrency).run(iter_lines(content))
+        elapsed = time.perf_counter() - started
+        wrong = misreported(entries, wallet)
+        print(f"{label:<32} {elapsed:>8.2f} {report['wads'] / elapsed:>8.0f} {wallet.calls:>6} "
+              f"{report['received']:>9} {report['invalid']:>8} {report['failed']:>7} {report['unknown']:>8} {wrong:>6}")
+        assert not wrong
+        assert len(wallet.received) == WADS - MALFORMED - SPENT
+        assert report["received"] + report["unknown"] >= len(wallet.received)
+        assert report["skipped"] == 1
+        assert all(entry.status in (LineStatus.FAILED, LineStatus.UNKNOWN) for entry in entries if entry.wad in spent)
+        if batch_size == 1:
+            assert report["received"] == len(wallet.received) and report["failed"] == SPENT
+
+    rows = summary_csv(entries).count("\n")
+    print(f"\n📄 Summary document: {rows} rows: column names, the skipped CSV header and one per wad")
+
+    # The wallet stops answering for one mint: its wads may or may not have been received
+    wallet = StubWallet(spent)
+    call_tool = wallet.call_tool
+    timeouts = 0
+
+    async def timing_out(name: str, arguments: dict):
+        nonlocal timeouts
+        if all(s.mint_url == MINTS[0] for s in validate_wads(arguments["wads"])):
+            timeouts += 1
+            raise WalletTimeoutError("Wallet receive_wads timed out after 10.0s")
+        return await call_tool(name, arguments)
+
+    wallet.call_tool = timing_out
+    entries, report = await BulkImporter(wallet, 20, 4).run(iter_lines(content))
+    lost = [entry for entry in entries if entry.mint_url == MINTS[0] and entry.status != LineStatus.INVALID]
+    print(f"⌛ {MINTS[0]} timing out: {report['unknown']} unknown, {report['received']} received, "
+          f"{report['failed']} failed, {timeouts} calls timed out")
+    assert lost and all(entry.status == LineStatus.UNKNOWN for entry in lost)
+    assert report["unknown"] >= len(lost)
+    assert not misreported(entries, wallet)
+    # One call per batch of that mint, none of its wads is sent again
+    assert timeouts == -(-len(lost) // 20)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
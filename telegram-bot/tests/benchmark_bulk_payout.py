@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark for bulk payouts
+
+Creates 10, 100 and 1000 wads through the real McpClient talking to the
+fake wallet server (tests/fake_wallet_server.py) over stdio, whose
+`create_wads` takes a fixed time like a mint round-trip. Compares one
+request at a time on the session with pipelined requests, and reports
+the time per wad and the size of the resulting document. Then uploads a
+payout CSV whose rows name recipient chats through the bot's handlers,
+and checks that nothing is created before the payer confirms the total,
+that each recipient is sent its own wad by the broadcaster, and that
+the wads of a payout whose document can't be sent go back to the wallet.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Update
+from telegram.error import TimedOut
+from telegram.ext import Application
+
+from broadcast import Broadcaster
+from bulk_payout import BulkPayout, requests_from_count
+from cache import Cache, LRUCache
+from fake_bot_api import FakeBotRequest
+from fake_wallet_server import FakeWallet
+from flood_shield import FloodShield
+from mcp_client import McpClient
+from telegram_bot import add_handlers
+from wad_reassembly import WadReassembler
+from wallet_jobs import WalletJobQueue
+
+CREATE_LATENCY = 0.02
+
+FAKE_WALLET = os.path.join(os.path.dirname(__file__), "fake_wallet_server.py")
+
+
+async def main():
+    print("🧪 BULK PAYOUT BENCHMARK")
+    print("=" * 50)
+    print(f"Fake wallet server over stdio, create_wads takes {CREATE_LATENCY * 1000:.0f}ms")
+
+    client = McpClient([sys.executable, FAKE_WALLET, "--balance", "http://localhost:3338=Satoshi:1000000",
+                        "--latency", f"create_wads={CREATE_LATENCY}"])
+    await client.start()
+
+    print(f"\n{'wads':>6} {'window':>7} {'seconds':>8} {'ms/wad':>8} {'document':>10}")
+    try:
+        for count in (10, 100, 1000):
+            for window in (1, 16, 64):
+                document, report = await BulkPayout(client, window=window).run(
+                    requests_from_count(count, 100, "sat")
+                )
+                rows = list(csv.reader(io.TextIOWrapper(document, encoding="utf-8", newline="")))
+                assert report["created"] == count
+                assert [int(row[0]) for row in rows[1:]] == list(range(1, count + 1)), "rows out of order"
+                size = sum(len(",".join(row)) + 2 for row in rows)
+                print(f"{count:>6} {window:>7} {report['seconds']:>8.2f} {report['ms_per_wad']:>8.2f} "
+                      f"{size / 1024:>8.0f}KB")
+    finally:
+        await client.close()
+
+    failures = await payout_to_recipients()
+    failures += await undelivered_payout()
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+class NumberedWallet:
+    """Creates a distinct wad per call, so each recipient's wad can be told apart."""
+
+    def __init__(self):
+        self.created = 0
+
+    async def call_tool(self, name: str, arguments: dict):
+        self.created += 1
+        return {"wads": f"cashuBwad{self.created:04d}"}
+
+
+async def payout_to_recipients():
+    """A /payout CSV naming recipient chats, uploaded through the handlers."""
+    recipients = [100000 + index for index in range(20)]
+    rows = ["amount,currency,chat"] + [f"{10 * (index + 1)},sats,{chat_id}" for index, chat_id in enumerate(recipients)]
+    rows.append("5,sats")
+    csv_file = "\n".join(rows).encode()
+    messages = {}
+    request = FakeBotRequest(
+        files={"payout": csv_file},
+        on_message=lambda chat_id, text: messages.setdefault(chat_id, []).append(text),
+    )
+    application = (
+        Application.builder().token("123:fake").request(request)
+        .get_updates_request(FakeBotRequest()).updater(None).build()
+    )
+    application.bot_data["flood_shield"] = FloodShield()
+    application.bot_data["wad_reassembler"] = WadReassembler()
+    cache = Cache(LRUCache(100))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    wallet = NumberedWallet()
+    application.bot_data["wallet_client"] = wallet
+    wallet_jobs = WalletJobQueue(wallet)
+    await wallet_jobs.start()
+    application.bot_data["wallet_jobs"] = wallet_jobs
+    payer, other = 42, 43
+    application.bot_data["wallet_users"] = frozenset([payer, other])
+    add_handlers(application)
+    await application.initialize()
+    await application.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        broadcaster = Broadcaster(application.bot, os.path.join(directory, "broadcasts.db"), rate=1000)
+        await broadcaster.start()
+        application.bot_data["broadcaster"] = broadcaster
+        await application.process_update(Update.de_json({"update_id": 1, "message": {
+            "message_id": 1, "date": int(time.time()), "chat": {"id": payer, "type": "private"},
+            "from": {"id": payer, "is_bot": False, "first_name": "payer", "username": "payer"},
+            "caption": "/payout",
+            "document": {"file_id": "payout", "file_unique_id": "payout", "file_name": "payout.csv",
+                         "file_size": len(csv_file)},
+        }}, application.bot))
+        asked = messages.get(payer, [""])[-1]
+        before_confirmed = wallet.created
+        await tap(application, other, payer, "payout:yes:1")
+        hijacked = wallet.created
+        await tap(application, payer, payer, "payout:yes:1")
+        started = time.perf_counter()
+        while not any(text.startswith("📣") for text in messages.get(payer, [])) and time.perf_counter() - started < 10:
+            await asyncio.sleep(0.05)
+        await broadcaster.close()
+
+    await application.stop()
+    await wallet_jobs.stop()
+    await application.shutdown()
+    await cache.close()
+    application.bot_data["wad_reassembler"].close()
+
+    delivered = {chat_id: texts for chat_id, texts in messages.items() if chat_id in recipients}
+    wads = {text.split("cashuBwad", 1)[1][:4] for texts in delivered.values() for text in texts}
+    summary = [text for text in messages.get(payer, []) if text.startswith("📣")]
+    print(f"\n▶️  /payout of {len(rows) - 2} rows naming a recipient and 1 without")
+    print(f"  asked: {asked.splitlines()[3]!r}, wads created before the payer confirmed: {before_confirmed}, "
+          f"after another user's tap: {hijacked}")
+    print(f"  recipients notified: {len(delivered)}, distinct wads: {len(wads)}, payer told: {summary}")
+    failures = []
+    if asked.splitlines()[3] != "Total: 2,105 sats" or before_confirmed or hijacked:
+        failures.append("payout created only once its total is confirmed")
+    if len(delivered) != len(recipients) or any(len(texts) != 1 for texts in delivered.values()) \
+            or len(wads) != len(recipients) or "@payer" not in next(iter(delivered.values()))[0]:
+        failures.append("each recipient gets its own wad")
+    if summary != [f"📣 {len(recipients)} of {len(recipients)} wads sent to their recipients"]:
+        failures.append("payer told about the deliveries")
+    return failures
+
+
+async def tap(application: Application, user: int, chat_id: int, data: str):
+    """A tap on a button of the bot's last message in the chat."""
+    await application.process_update(Update.de_json({"update_id": 10 ** 6 + user, "callback_query": {
+        "id": str(user), "chat_instance": "chat", "data": data,
+        "from": {"id": user, "is_bot": False, "first_name": f"user{user}"},
+        "message": {"message_id": 10 ** 6, "date": int(time.time()), "text": "🔒 Payout Check",
+                    "chat": {"id": chat_id, "type": "private"}},
+    }}, application.bot))
+    await asyncio.sleep(0.05)
+
+
+async def undelivered_payout():
+    """"create 20 wads of 100 sats" whose document upload times out."""
+    wallet = FakeWallet(balances={"http://localhost:3338": {"Satoshi": 10000}})
+    messages = []
+
+    def refuse(chat_id: int, filename: str, content: bytes):
+        raise TimedOut()
+
+    request = FakeBotRequest(on_message=lambda chat_id, text: messages.append(text), on_document=refuse)
+    application = (
+        Application.builder().token("123:fake").request(request)
+        .get_updates_request(FakeBotRequest()).updater(None).build()
+    )
+    application.bot_data["flood_shield"] = FloodShield()
+    application.bot_data["wad_reassembler"] = WadReassembler()
+    cache = Cache(LRUCache(100))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    application.bot_data["wallet_client"] = wallet
+    wallet_jobs = WalletJobQueue(wallet)
+    await wallet_jobs.start()
+    application.bot_data["wallet_jobs"] = wallet_jobs
+    payer = 42
+    application.bot_data["wallet_users"] = frozenset([payer])
+    add_handlers(application)
+    await application.initialize()
+    await application.start()
+
+    await application.process_update(Update.de_json({"update_id": 1, "message": {
+        "message_id": 1, "date": int(time.time()), "chat": {"id": payer, "type": "private"},
+        "from": {"id": payer, "is_bot": False, "first_name": "payer"}, "text": "create 20 wads of 100 sats",
+    }}, application.bot))
+    await tap(application, payer, payer, "payout:yes:1")
+    started = time.perf_counter()
+    while not any(text.startswith("⚠️ The payout document") for text in messages) and time.perf_counter() - started < 10:
+        await asyncio.sleep(0.05)
+
+    await application.stop()
+    await wallet_jobs.stop()
+    await application.shutdown()
+    await cache.close()
+    application.bot_data["wad_reassembler"].close()
+
+    balance = wallet.balances["http://localhost:3338"]["Satoshi"]
+    print("\n▶️  create 20 wads of 100 sats, the payout document upload times out")
+    print(f"  wads created: {wallet.calls['create_wads']}, received back: {len(wallet.spent)}, "
+          f"balance after: {balance} of 10000, payer told: {messages[-1]!r}")
+    if wallet.calls["create_wads"] != 20 or len(wallet.spent) != 20 or balance != 10000:
+        return ["undelivered payout received back"]
+    return []
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
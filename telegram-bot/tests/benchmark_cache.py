@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the two-tier cache
+
+Runs two Cache instances over the same SQLite file, as two bot processes
+on one host would, and reports batch get/set latency per tier, the hit
+rate of a skewed workload on a cold second instance, and how long an
+invalidation takes to reach the other instance.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cache import Cache, LRUCache, SQLiteCache
+
+KEYS = 20000
+BATCH = 100
+
+
+async def timed(label: str, coroutine_factory, rounds: int = 50):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await coroutine_factory()
+    elapsed = (time.perf_counter() - started) / rounds
+    print(f"{label:<36} {elapsed * 1000:>8.3f}ms per {BATCH} keys")
+
+
+async def main():
+    print("🧪 CACHE BENCHMARK")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.db")
+        first = Cache(LRUCache(KEYS), SQLiteCache(path), poll_interval=0.05)
+        second = Cache(LRUCache(KEYS // 10), SQLiteCache(path), poll_interval=0.05)
+        await first.start()
+        await second.start()
+
+        values = {f"balance:{index}": {"sat": index, "mint": "http://localhost:3338"} for index in range(KEYS)}
+        started = time.perf_counter()
+        items = list(values.items())
+        for start in range(0, KEYS, 1000):
+            await first.set_many(dict(items[start:start + 1000]), ttl=600)
+        print(f"✍️  {KEYS} entries stored in {(time.perf_counter() - started) * 1000:.1f}ms\n")
+
+        batch = [f"balance:{index}" for index in range(BATCH)]
+        await timed("first instance, local tier", lambda: first.get_many(batch))
+        await timed("second instance, shared tier (cold)", lambda: second.shared.get_many(batch, time.time()))
+        await timed("batch set through both tiers", lambda: first.set_many(dict(items[:BATCH]), ttl=600))
+
+        # Skewed lookups on the cold instance: most traffic hits a few hot keys
+        rng = random.Random(7)
+        for _ in range(200):
+            keys = {f"balance:{int(rng.paretovariate(1.2)) % (KEYS * 2)}" for _ in range(BATCH)}
+            await second.get_many(keys)
+        print(f"\n📊 Second instance after a skewed workload: {second.metrics()}")
+
+        # Invalidation broadcast
+        key = "balance:1"
+        await second.get(key)
+        started = time.perf_counter()
+        await first.invalidate(key)
+        while second.local.get_many([key], time.time()):
+            await asyncio.sleep(0.005)
+        print(f"📣 Invalidation reached the other instance in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+        await first.close()
+        await second.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the startup catch-up mode
+
+Drains a synthetic 10k-update backlog through a fake Bot API and compares
+the time against replaying every update one at a time, like run_polling does.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from catch_up import catch_up_backlog
+
+BACKLOG_SIZE = 10000
+CHATS = 500
+REPLY_LATENCY = 0.002  # Simulated Bot API round-trip per processed update
+
+MESSAGES = [
+    "show my balance", "balance", "help security", "what's in my wallet",
+    "/help", "/start", "create 1000 sats", "send 10 sats to @bob", "hello there",
+]
+
+
+def generate_backlog(size: int, chats: int):
+    random.seed(42)
+    return [
+        SimpleNamespace(
+            update_id=update_id,
+            effective_chat=SimpleNamespace(id=random.randrange(chats)),
+            message=SimpleNamespace(text=random.choice(MESSAGES)),
+        )
+        for update_id in range(1, size + 1)
+    ]
+
+
+class FakeBot:
+    """Serves the backlog like getUpdates does."""
+
+    def __init__(self, backlog):
+        self.backlog = backlog
+
+    async def get_updates(self, offset=None, limit=100, timeout=0):
+        start = 0 if offset is None else offset - 1
+        return self.backlog[start:start + limit]
+
+
+class FakeApplication:
+    def __init__(self, backlog):
+        self.bot = FakeBot(backlog)
+        self.processed = 0
+
+    async def process_update(self, update):
+        self.processed += 1
+        await asyncio.sleep(REPLY_LATENCY)
+
+
+async def benchmark_sequential(backlog):
+    application = FakeApplication(backlog)
+    started = time.perf_counter()
+    for update in backlog:
+        await application.process_update(update)
+    return time.perf_counter() - started, application.processed
+
+
+async def benchmark_catch_up(backlog):
+    application = FakeApplication(backlog)
+    stats = await catch_up_backlog(application, concurrency=32)
+    return stats["seconds"], application.processed
+
+
+async def main():
+    print("🧪 CATCH-UP BENCHMARK")
+    print("=" * 50)
+    backlog = generate_backlog(BACKLOG_SIZE, CHATS)
+    print(f"📦 Backlog: {BACKLOG_SIZE} updates from {CHATS} chats")
+
+    sequential_time, sequential_count = await benchmark_sequential(backlog)
+    print(f"\n🐢 Sequential: {sequential_count} replies in {sequential_time:.2f}s")
+
+    catch_up_time, catch_up_count = await benchmark_catch_up(backlog)
+    print(f"🚀 Catch-up:   {catch_up_count} replies in {catch_up_time:.2f}s")
+
+    print(f"\n📊 Speedup: {sequential_time / catch_up_time:.1f}x, "
+          f"{sequential_count - catch_up_count} redundant replies avoided")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
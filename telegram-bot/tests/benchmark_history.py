@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the transaction history store
+
+Fills a temporary database through the batched writer (one heavy user
+with 200k entries among many light users), then compares the latency of
+keyset pages with LIMIT/OFFSET pages at increasing depths.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from history_store import HistoryKind, HistoryStore
+
+HEAVY_USER = 1
+HEAVY_ENTRIES = 200_000
+LIGHT_USERS = 20_000
+LIGHT_ENTRIES = 100_000
+PAGE_SIZE = 10
+
+
+def offset_page(store: HistoryStore, offset: int):
+    return store._read_connection.execute(
+        "SELECT id FROM history WHERE user_id = ? ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+        (HEAVY_USER, PAGE_SIZE, offset),
+    ).fetchall()
+
+
+async def main():
+    print("🧪 TRANSACTION HISTORY BENCHMARK")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(os.path.join(directory, "history.db"))
+        await store.start()
+
+        started = time.perf_counter()
+        record_time = 0.0
+        for index in range(HEAVY_ENTRIES + LIGHT_ENTRIES):
+            user_id = HEAVY_USER if index % 3 != 2 else 2 + index % LIGHT_USERS
+            record_started = time.perf_counter()
+            store.record(user_id, HistoryKind.RECEIVED, 100 + index % 1000, "sat", f"cashu_{index:08x}",
+                         "http://localhost:3338")
+            record_time += time.perf_counter() - record_started
+            if index % 5000 == 0:
+                # Let the writer run, like an event loop serving other updates would
+                await asyncio.sleep(0)
+        await store.close()
+        total = HEAVY_ENTRIES + LIGHT_ENTRIES
+        print(f"✍️  {total} entries written in {time.perf_counter() - started:.2f}s, "
+              f"{record_time / total * 1e6:.2f}µs on the event loop per entry, {store.batches} batches")
+
+        store = HistoryStore(os.path.join(directory, "history.db"))
+        await store.start()
+        print(f"\n{'page':>8} {'keyset ms':>10} {'offset ms':>10}")
+        cursor = None
+        page_number = 0
+        for target in (1, 10, 100, 1000, 10000, 19999):
+            while page_number < target:
+                keyset_started = time.perf_counter()
+                entries, cursor = await store.page(HEAVY_USER, cursor, PAGE_SIZE)
+                keyset_ms = (time.perf_counter() - keyset_started) * 1000
+                page_number += 1
+            offset_started = time.perf_counter()
+            offset_page(store, (page_number - 1) * PAGE_SIZE)
+            offset_ms = (time.perf_counter() - offset_started) * 1000
+            print(f"{page_number:>8} {keyset_ms:>10.3f} {offset_ms:>10.3f}")
+        await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
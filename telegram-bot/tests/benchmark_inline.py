@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Benchmark and checks for inline mode ("@bot 100 sats")
+
+Users type inline queries one keystroke at a time ("1", "10", "100",
+"100 s", ... "100 sats"), sometimes deleting and retyping the unit, then
+pick a result. Every keystroke goes through the bot's own handlers as an
+inline query update, against an in-process fake Bot API and the fake
+wallet server. Answering every keystroke with a freshly built result list
+is compared with the debounced, per-user cached answers. Reports the
+answers sent, the result lists built, how soon the final query is
+answered, and the wallet calls made while typing and once a result is
+chosen. Then checks that a user outside the wallet's allowlist gets no
+results and can't have a wad created by choosing one anyway.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import RequestData
+
+from cache import Cache, LRUCache
+from command_patterns import CommandParser
+from fake_bot_api import FakeBotRequest
+from fake_wallet_server import FakeWallet
+from flood_shield import FloodShield
+from inline_queries import InlineQueries
+from telegram_bot import add_handlers, build_inline_results
+from wad_reassembly import WadReassembler
+from wallet_jobs import WalletJobQueue
+
+USERS = 200
+ARRIVAL_SECONDS = 3.0
+TYPO_RATE = 0.3
+AMOUNTS = ["100 sats", "21 sats", "5000 sat", "2.5 usd", "1000 gwei"]
+
+
+class InlineBotRequest(FakeBotRequest):
+    """Fake Bot API that keeps the inline answers and the edits of inline messages."""
+
+    def __init__(self):
+        super().__init__()
+        self.answers: Dict[str, dict] = {}
+        self.answered_at: Dict[str, float] = {}
+        self.edits: Dict[str, List[str]] = {}
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None, **kwargs):
+        name = url.rsplit("/", 1)[-1]
+        if name == "answerInlineQuery":
+            parameters = request_data.parameters
+            self.answers[parameters["inline_query_id"]] = parameters
+            self.answered_at[parameters["inline_query_id"]] = time.perf_counter()
+        elif name == "editMessageText" and "inline_message_id" in request_data.parameters:
+            parameters = request_data.parameters
+            self.edits.setdefault(parameters["inline_message_id"], []).append(parameters["text"])
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return 200, json.dumps({"ok": True, "result": True}).encode()
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+def keystrokes(query: str, rng: random.Random) -> List[str]:
+    """The successive texts of a query typed one key at a time, the unit sometimes deleted and retyped."""
+    texts = [query[:end] for end in range(1, len(query) + 1)]
+    if rng.random() < TYPO_RATE:
+        amount = query.split()[0]
+        texts += [query[:end] for end in range(len(query) - 1, len(amount), -1)] + texts[len(amount) + 1:]
+    return texts
+
+
+async def build(request: InlineBotRequest, debounce: float, ttl: float):
+    application = (
+        Application.builder().token("123:fake").request(request)
+        .get_updates_request(FakeBotRequest()).updater(None).build()
+    )
+    application.bot_data["flood_shield"] = FloodShield()
+    application.bot_data["wad_reassembler"] = WadReassembler()
+    cache = Cache(LRUCache(1000))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    wallet = FakeWallet(balances={"http://localhost:3338": {"Satoshi": 10 ** 9, "MicroUsdC": 10 ** 12,
+                                                           "Gwei": 10 ** 12}},
+                        latency="lognormal:0.05,0.3", seed=2)
+    wallet_jobs = WalletJobQueue(wallet, write_workers=8, max_jobs_per_chat=3)
+    await wallet_jobs.start()
+    application.bot_data["wallet_client"] = wallet
+    application.bot_data["wallet_jobs"] = wallet_jobs
+    application.bot_data["wallet_users"] = frozenset(range(1000, 1000 + USERS))
+    inline_queries = InlineQueries(
+        lambda text: tuple(CommandParser.parse_inline_amounts(text)), build_inline_results, debounce=debounce, ttl=ttl
+    )
+    application.bot_data["inline_queries"] = inline_queries
+    add_handlers(application)
+    await application.initialize()
+    await application.start()
+    return application, wallet
+
+
+async def teardown(application: Application):
+    await application.bot_data["wallet_jobs"].stop()
+    await application.bot_data["inline_queries"].close()
+    application.bot_data["wad_reassembler"].close()
+    await application.bot_data["cache"].close()
+    await application.stop()
+    await application.shutdown()
+
+
+async def run(label: str, debounce: float, ttl: float):
+    rng = random.Random(11)
+    request = InlineBotRequest()
+    application, wallet = await build(request, debounce, ttl)
+    inline_queries = application.bot_data["inline_queries"]
+
+    update_ids = iter(range(1, 10 ** 9))
+    final_queries: List[str] = []
+    last_keystroke: Dict[str, float] = {}
+    typing_wallet_calls = 0
+
+    async def user(index: int):
+        user_id = 1000 + index
+        sender = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        await asyncio.sleep(rng.uniform(0, ARRIVAL_SECONDS))
+        query = rng.choice(AMOUNTS)
+        texts = keystrokes(query, rng)
+        query_id = ""
+        for position, text in enumerate(texts):
+            query_id = f"{user_id}-{position}"
+            await application.process_update(Update.de_json({"update_id": next(update_ids), "inline_query": {
+                "id": query_id, "from": sender, "query": text, "offset": "",
+            }}, application.bot))
+            last_keystroke[query_id] = time.perf_counter()
+            await asyncio.sleep(rng.lognormvariate(-2.1, 0.4))
+        final_queries.append(query_id)
+
+        # Read the results, then pick the first one
+        await asyncio.sleep(0.8)
+        answer = request.answers.get(query_id)
+        if not answer:
+            return
+        results = json.loads(answer["results"]) if isinstance(answer["results"], str) else answer["results"]
+        await application.process_update(Update.de_json({"update_id": next(update_ids), "chosen_inline_result": {
+            "result_id": results[0]["id"], "from": sender, "query": texts[-1], "inline_message_id": f"im-{user_id}",
+        }}, application.bot))
+
+    async def watch_typing():
+        # Wallet calls before the first result is chosen were made while typing
+        nonlocal typing_wallet_calls
+        while not any(request.edits.values()) and not wallet.calls.get("create_wads"):
+            typing_wallet_calls = sum(wallet.calls.values())
+            await asyncio.sleep(0.01)
+
+    watcher = asyncio.ensure_future(watch_typing())
+    await asyncio.gather(*(user(index) for index in range(USERS)))
+    await asyncio.sleep(0.5)
+    watcher.cancel()
+
+    final_times = sorted(request.answered_at[query_id] - last_keystroke[query_id]
+                         for query_id in final_queries if query_id in request.answers)
+    metrics = inline_queries.metrics()
+    chosen_ok = sum(1 for texts in request.edits.values() if len(texts) == 1 and "cashuB" in texts[0])
+    answers = list(request.answers.values())
+    personal = all(str(answer.get("is_personal")).lower() == "true" and int(answer.get("cache_time", 0)) > 0
+                   for answer in answers)
+
+    print(f"\n▶️  {label}")
+    print(f"  keystroke queries: {metrics['received']}, answered: {len(request.answers)}, "
+          f"superseded: {metrics['superseded']}")
+    print(f"  result lists built: {metrics['builds']}, served from the cache: {metrics['cache_hits']}")
+    print(f"  final queries answered: {len(final_times)}/{len(final_queries)}, "
+          f"p50 {final_times[len(final_times) // 2] * 1000:.0f}ms after the last keystroke, "
+          f"wallet calls before the first pick: {typing_wallet_calls}")
+    print(f"  chosen results: create_wads {wallet.calls.get('create_wads', 0)}, "
+          f"inline messages edited with their wad {chosen_ok}")
+
+    await teardown(application)
+    return {
+        "received": metrics["received"], "answered": len(request.answers), "builds": metrics["builds"],
+        "final": len(final_times), "finals": len(final_queries), "typing_calls": typing_wallet_calls,
+        "created": wallet.calls.get("create_wads", 0), "edited": chosen_ok, "personal": personal,
+    }
+
+
+async def stranger() -> List[str]:
+    """A user outside WALLET_USER_IDS types an amount, then sends a chosen result anyway."""
+    request = InlineBotRequest()
+    application, wallet = await build(request, 0.3, 600.0)
+    sender = {"id": 666, "is_bot": False, "first_name": "stranger"}
+    await application.process_update(Update.de_json({"update_id": 1, "inline_query": {
+        "id": "stranger", "from": sender, "query": "100 sats", "offset": "",
+    }}, application.bot))
+    await application.process_update(Update.de_json({"update_id": 2, "chosen_inline_result": {
+        "result_id": "wad:100:sat", "from": sender, "query": "100 sats", "inline_message_id": "im-stranger",
+    }}, application.bot))
+    await asyncio.sleep(0.5)
+    await teardown(application)
+
+    answer = request.answers.get("stranger", {})
+    results = answer.get("results") or []
+    results = json.loads(results) if isinstance(results, str) else results
+    print("\n▶️  user outside WALLET_USER_IDS")
+    print(f"  results offered: {len(results)}, create_wads after choosing one: {wallet.calls.get('create_wads', 0)}, "
+          f"inline message: {request.edits.get('im-stranger')}")
+    if results or wallet.calls.get("create_wads") or not answer:
+        return ["users outside the allowlist can't create wads"]
+    return []
+
+
+async def main():
+    print("🧪 INLINE MODE BENCHMARK")
+    print("=" * 50)
+    print(f"{USERS} users typing one of {len(AMOUNTS)} amounts key by key, {TYPO_RATE:.0%} retype the unit")
+    every = await run("every keystroke answered, result list built each time", debounce=0.0, ttl=0.0)
+    debounced = await run("debounced 300ms, per-user cached result lists", debounce=0.3, ttl=600.0)
+
+    failures = []
+    if debounced["answered"] * 3 > every["answered"] or debounced["builds"] >= every["builds"]:
+        failures.append("debounce and cache")
+    if debounced["final"] != debounced["finals"]:
+        failures.append("final queries answered")
+    if debounced["typing_calls"] or every["typing_calls"]:
+        failures.append("no wallet calls while typing")
+    if not (debounced["created"] == debounced["edited"] == debounced["finals"]):
+        failures.append("one wad per chosen result")
+    if not debounced["personal"]:
+        failures.append("is_personal and cache_time")
+    failures += await stranger()
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
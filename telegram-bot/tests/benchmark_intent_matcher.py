@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the fuzzy intent matcher
+
+Generates a typo corpus from known commands (one deletion, insertion,
+substitution or transposition in a command word) plus ordinary chat
+messages that must keep being echoed, then reports accuracy and latency.
+Then sends chat that looks like typo'd commands through the bot's
+handlers, against a stub wallet: guessed reads are answered, guessed
+creates and sends only ask "Did you mean" and run once the user who was
+asked confirms, with the message as typed.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Update
+from telegram.ext import Application
+
+from balance_prefetch import BalancePrefetcher
+from cache import Cache, LRUCache
+from command_patterns import CommandParser, Intent, get_unit_registry
+from fake_bot_api import FakeBotRequest
+from flood_shield import FloodShield
+from intent_matcher import build_intent_matcher
+from telegram_bot import add_handlers
+from wad_reassembly import WadReassembler
+from wallet_jobs import WalletJobQueue
+
+COMMANDS = [
+    ("show my balance", Intent.BALANCE),
+    ("check my wallet", Intent.BALANCE),
+    ("balance", Intent.BALANCE),
+    ("help security", Intent.SECURITY),
+    ("security help", Intent.SECURITY),
+    ("send 10 sats to @bob", Intent.SEND),
+    ("transfer 100 gwei to @charlie", Intent.SEND),
+    ("create 1000 sats", Intent.CREATE),
+    ("generate 50 micro usdc", Intent.CREATE),
+    ("help", Intent.HELP),
+    ("commands", Intent.HELP),
+]
+
+CHAT = [
+    "hello there", "good morning", "thanks a lot!", "see you tomorrow",
+    "what time is it", "nice weather today", "who are you", "lol",
+    "I like pizza", "the meeting moved to friday", "ok", "hola bot",
+]
+
+# Chat one edit away from a command that spends
+LOOKALIKES = ["take 100 sats", "fake 500 sats", "mine 100 sats", "I walked on the sand with @bob"]
+
+
+class StubWallet:
+    def __init__(self):
+        self.calls: Dict[str, List[dict]] = {}
+
+    async def call_tool(self, name: str, arguments: dict):
+        self.calls.setdefault(name, []).append(arguments)
+        if name == "get_all_nodes_balances":
+            return [{"url": "http://localhost:3338", "balances": [{"unit": "Satoshi", "amount": 50000}]}]
+        return {"wads": "cashuB" + "A" * 100}
+
+
+def make_typo(word: str, rng: random.Random) -> str:
+    position = rng.randrange(len(word))
+    kind = rng.choice(["delete", "insert", "substitute", "transpose"])
+    if kind == "delete" and len(word) > 4:
+        return word[:position] + word[position + 1:]
+    if kind == "insert":
+        return word[:position] + rng.choice(string.ascii_lowercase) + word[position:]
+    if kind == "transpose" and position < len(word) - 1:
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1:]
+
+
+def build_corpus(size: int):
+    rng = random.Random(7)
+    corpus = []
+    for _ in range(size):
+        text, intent = rng.choice(COMMANDS)
+        words = text.split()
+        candidates = [i for i, word in enumerate(words) if len(word) >= 4 and word.isalpha()]
+        index = rng.choice(candidates)
+        words[index] = make_typo(words[index], rng)
+        corpus.append((" ".join(words), intent))
+    corpus.extend((text, Intent.ECHO) for text in CHAT)
+    return corpus
+
+
+async def through_the_handlers() -> List[str]:
+    """Lookalike chat, a typo'd balance read and typo'd commands confirmed by someone else, then their sender."""
+    replies: List[str] = []
+    wallet = StubWallet()
+    application = (
+        Application.builder().token("123:fake")
+        .request(FakeBotRequest(on_message=lambda chat_id, text: replies.append(text)))
+        .get_updates_request(FakeBotRequest()).updater(None).build()
+    )
+    application.bot_data["flood_shield"] = FloodShield()
+    application.bot_data["wad_reassembler"] = WadReassembler()
+    cache = Cache(LRUCache(100))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    wallet_jobs = WalletJobQueue(wallet)
+    await wallet_jobs.start()
+    application.bot_data["wallet_jobs"] = wallet_jobs
+    application.bot_data["balance_prefetch"] = BalancePrefetcher(lambda: wallet.call_tool("get_all_nodes_balances", {}))
+    application.bot_data["intent_matcher"] = build_intent_matcher(get_unit_registry())
+    group, sender, other = -1002, 1, 2
+    application.bot_data["wallet_users"] = frozenset([sender, other])
+    add_handlers(application)
+    await application.initialize()
+    await application.start()
+    update_ids = iter(range(1, 1000))
+
+    async def say(user: int, text: str) -> int:
+        update_id = next(update_ids)
+        await application.process_update(Update.de_json({"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "text": text,
+            "chat": {"id": group, "type": "group", "title": "chat"},
+            "from": {"id": user, "is_bot": False, "first_name": f"user{user}"},
+        }}, application.bot))
+        await asyncio.sleep(0.1)
+        return update_id
+
+    async def tap(user: int, data: str):
+        update_id = next(update_ids)
+        await application.process_update(Update.de_json({"update_id": update_id, "callback_query": {
+            "id": str(update_id), "chat_instance": "chat", "data": data,
+            "from": {"id": user, "is_bot": False, "first_name": f"user{user}"},
+            "message": {"message_id": 10 ** 6, "date": int(time.time()), "text": "🤔 Did you mean",
+                        "chat": {"id": group, "type": "group", "title": "chat"}},
+        }}, application.bot))
+        await asyncio.sleep(0.1)
+
+    for text in LOOKALIKES:
+        await say(sender, text)
+    asked = sum(reply.startswith("🤔 Did you mean") for reply in replies)
+    spent_on_chat = len(wallet.calls.get("create_wads", []))
+
+    await say(sender, "balnce")
+    balance_reads = len(wallet.calls.get("get_all_nodes_balances", []))
+
+    asked_at = await say(sender, "mine 100 sats")
+    await tap(other, f"suggestion:yes:{asked_at}")
+    hijacked = len(wallet.calls.get("create_wads", []))
+    await tap(sender, f"suggestion:yes:{asked_at}")
+    created = wallet.calls.get("create_wads", [])
+
+    asked_at = await say(sender, "sned 10 sats to @BobSmith")
+    await tap(sender, f"suggestion:yes:{asked_at}")
+    as_typed = any(reply.startswith("🤔") and "send 10 sats to @BobSmith" in reply for reply in replies)
+    send_started = replies[-1].startswith("🔒 Security Check")
+
+    await application.stop()
+    application.bot_data["balance_prefetch"].close()
+    await wallet_jobs.stop()
+    application.bot_data["wad_reassembler"].close()
+    await cache.close()
+    await application.shutdown()
+
+    print("\n▶️  through the handlers")
+    print(f"  lookalike chat: {asked}/{len(LOOKALIKES)} asked \"Did you mean\", create_wads {spent_on_chat}")
+    print(f"  \"balnce\": {balance_reads} balance read")
+    print(f"  confirmed by another member: create_wads {hijacked}, by the sender: {len(created)} {created}")
+    print(f"  \"sned 10 sats to @BobSmith\": suggested as typed {as_typed}, send confirmation asked {send_started}")
+    failures = []
+    if asked != len(LOOKALIKES) or spent_on_chat:
+        failures.append("guessed spends only suggested")
+    if balance_reads != 1:
+        failures.append("guessed reads answered")
+    if hijacked or len(created) != 1:
+        failures.append("only the sender confirms a suggestion")
+    if not (as_typed and send_started):
+        failures.append("suggestions keep the message as typed")
+    return failures
+
+
+def main():
+    print("🧪 FUZZY INTENT MATCHER BENCHMARK")
+    print("=" * 50)
+
+    started = time.perf_counter()
+    matcher = build_intent_matcher(get_unit_registry())
+    print(f"🏗️  Index built in {(time.perf_counter() - started) * 1000:.2f}ms "
+          f"({len(matcher.vocabulary)} words)")
+
+    corpus = build_corpus(2000)
+    correct = false_positives = 0
+    latencies = []
+    for text, expected in corpus:
+        # Exact rules first, like echo_message does
+        intent = CommandParser.detect_intent(text)
+        if intent == Intent.ECHO:
+            # Fresh memo per message, measure the cold lookup cost
+            matcher._corrections.clear()
+            started = time.perf_counter()
+            result = matcher.match(text)
+            latencies.append(time.perf_counter() - started)
+            intent = result[0] if result else Intent.ECHO
+
+        if intent == expected:
+            correct += 1
+        elif expected == Intent.ECHO:
+            false_positives += 1
+            print(f"⚠️  False positive: {text!r} -> {intent}")
+
+    latencies.sort()
+    typos = len(corpus) - len(CHAT)
+    print(f"\n📊 Accuracy: {correct / len(corpus):.1%} on {typos} typos + {len(CHAT)} chat messages")
+    print(f"📊 False positives: {false_positives}/{len(CHAT)}")
+    print(f"⏱️  {len(latencies)} fuzzy lookups: p50 {latencies[len(latencies) // 2] * 1e6:.1f}µs, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f}µs, "
+          f"max {latencies[-1] * 1e6:.1f}µs")
+
+    failures = asyncio.run(through_the_handlers())
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+if __name__ == "__main__":
+    main()
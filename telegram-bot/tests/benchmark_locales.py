@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark for multi-locale routing
+
+Compares the per-message cost of intent detection as locales are added:
+one linear keyword scan per locale (how CommandPatterns worked) against
+the combined PhraseMatcher. Extra locales are synthesized from the
+Spanish pack so the phrase count grows like real packs would. Then
+checks that Spanish send and create commands are parsed, that a pack
+without parse templates doesn't route them, and that activating a pack
+for a chat leaves the event loop free while the matchers are built.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from command_patterns import CommandParser, CommandPatterns, Intent, PhraseMatcher, get_unit_registry
+from intent_matcher import build_intent_matcher
+from locales import LOCALE_PACKS_DIR, LocaleDetector, LocalePacks
+
+MESSAGES = [
+    "show my balance", "¿cuánto tengo?", "send 10 sats to @bob", "crea 100 sats",
+    "hello there, how is it going today?", "ayuda", "what's in my wallet",
+    "the meeting moved to friday afternoon, see you there",
+]
+ROUNDS = 2000
+
+
+def synthetic_locales(count: int):
+    packs = LocalePacks()
+    english = CommandPatterns.keyword_phrases()
+    spanish = packs.load("es")
+    locales = [english, spanish]
+    for index in range(2, count):
+        locales.append({
+            intent: [f"{phrase} x{index}" for phrase in phrases] for intent, phrases in spanish.items()
+        })
+    return locales[:count]
+
+
+def linear_detect(locales, text: str) -> str:
+    text_lower = text.lower()
+    for phrases in locales:
+        if any(phrase in text_lower for phrase in phrases[Intent.BALANCE]):
+            return Intent.BALANCE
+        if any(phrase in text_lower for phrase in phrases[Intent.SECURITY]):
+            return Intent.SECURITY
+        if any(word in text_lower for word in phrases[Intent.SEND]) and "@" in text:
+            return Intent.SEND
+        if any(word in text_lower for word in phrases[Intent.CREATE]):
+            return Intent.CREATE
+    return Intent.ECHO
+
+
+def measure(function) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text in MESSAGES:
+            function(text)
+    return (time.perf_counter() - started) / (ROUNDS * len(MESSAGES)) * 1e6
+
+
+def main():
+    print("🧪 MULTI-LOCALE ROUTING BENCHMARK")
+    print("=" * 50)
+    print(f"{'locales':>8} {'phrases':>8} {'linear µs':>10} {'combined µs':>12}")
+
+    for count in (1, 2, 5, 10, 20):
+        locales = synthetic_locales(count)
+        matcher = PhraseMatcher(locales)
+        phrases = sum(len(p) for locale in locales for p in locale.values())
+
+        linear = measure(lambda text: linear_detect(locales, text))
+        combined = measure(lambda text: matcher.intents(text.lower()))
+        print(f"{count:>8} {phrases:>8} {linear:>10.2f} {combined:>12.2f}")
+
+    failures = asyncio.run(check_activation())
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+async def check_activation():
+    """Activates Spanish and a pack without templates for two chats, as handle_text does."""
+    failures = []
+    with tempfile.TemporaryDirectory() as packs_dir:
+        with open(os.path.join(LOCALE_PACKS_DIR, "es.json"), encoding="utf-8") as f:
+            spanish = json.load(f)
+        with open(os.path.join(packs_dir, "es.json"), "w", encoding="utf-8") as f:
+            json.dump(spanish, f)
+        # Same phrases, but nothing to parse send and create commands with
+        with open(os.path.join(packs_dir, "xx.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": "No templates", "intents": {"send": ["expedir"], "create": ["fabricar"]}}, f)
+
+        packs = LocalePacks(packs_dir)
+        packs.activate("en")
+        detector = LocaleDetector(packs)
+        threads = []
+
+        def rebuild():
+            threads.append(threading.current_thread())
+            return build_intent_matcher(get_unit_registry())
+
+        ticks = 0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticking = asyncio.ensure_future(ticker())
+        started = time.perf_counter()
+        matchers = await asyncio.gather(
+            detector.ensure_chat_locale(1, "es-AR", rebuild),
+            detector.ensure_chat_locale(2, "es", rebuild),
+            detector.ensure_chat_locale(3, "xx", rebuild),
+        )
+        elapsed = time.perf_counter() - started
+        done.set()
+        await ticking
+
+    built = [matcher for matcher in matchers if matcher]
+    print(f"\n▶️  activated {packs.active[1:]} in {elapsed * 1000:.1f}ms, matchers built: {len(built)}, "
+          f"loop ticks meanwhile: {ticks}")
+    if len(built) != 2 or any(thread is threading.main_thread() for thread in threads) or not ticks:
+        failures.append("packs activated once each, in a thread")
+
+    commands = {
+        "enviar 10 sats a @bob": (Intent.SEND, (10.0, "sat", "bob")),
+        "paga a @ana 5 sats": (Intent.SEND, (5.0, "sat", "ana")),
+        "crea 100 sats": (Intent.CREATE, (100.0, "sat")),
+        "expedir 10 sats a @bob": (Intent.ECHO, None),
+        "fabricar 100 sats": (Intent.ECHO, None),
+    }
+    for text, (intent, parsed) in commands.items():
+        detected = CommandParser.detect_intent(text)
+        result = CommandParser.parse_create_command(text) if intent == Intent.CREATE \
+            else CommandParser.parse_send_command(text)
+        print(f"  {text!r:28} {detected:7} {result}")
+        if detected != intent or result != parsed:
+            failures.append(f"routing of {text!r}")
+    return failures
+
+
+if __name__ == "__main__":
+    main()
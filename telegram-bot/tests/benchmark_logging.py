@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the logging pipeline
+
+Measures the CPU time spent on the calling thread (the event loop in the
+bot) per update: the old synchronous f-string logging to a file, against
+the queued JSON pipeline with sampling. Work done by the background writer
+thread is not counted, it doesn't delay the event loop.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bot_logging import setup_logging
+
+UPDATES = 50000
+TEXT = "Send 100 sats to @bob please, here is a wad cashuB" + "a" * 2000
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def benchmark_synchronous(path: str) -> float:
+    reset_root()
+    logging.basicConfig(
+        filename=path,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO,
+    )
+    logger = logging.getLogger("bench")
+
+    started = time.thread_time()
+    for _ in range(UPDATES):
+        logger.info(f"Received message: {len(TEXT)} characters")
+    return time.thread_time() - started
+
+
+def benchmark_pipeline(path: str, sample_rate: int) -> float:
+    reset_root()
+    with open(path, "w") as stream:
+        listener = setup_logging(sample_rates={"message_received": sample_rate}, stream=stream)
+        logger = logging.getLogger("bench")
+
+        started = time.thread_time()
+        for chat_id in range(UPDATES):
+            logger.info(
+                "Received message: %d characters", len(TEXT),
+                extra={"event": "message_received", "chat_id": chat_id, "chars": len(TEXT)}
+            )
+        elapsed = time.thread_time() - started
+        listener.stop()
+    return elapsed
+
+
+def main():
+    print("🧪 LOGGING OVERHEAD BENCHMARK")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bot.log")
+        results = [
+            ("Synchronous f-string", benchmark_synchronous(path)),
+            ("Queued JSON, no sampling", benchmark_pipeline(path, 1)),
+            ("Queued JSON, 1/10 sampled", benchmark_pipeline(path, 10)),
+        ]
+    reset_root()
+
+    baseline = results[0][1]
+    for name, elapsed in results:
+        per_update = elapsed / UPDATES * 1e6
+        print(f"📊 {name:28} {per_update:6.2f} µs/update  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
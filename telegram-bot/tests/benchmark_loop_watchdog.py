@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Benchmark and checks for the event loop watchdog and the readiness endpoint
+
+Chats exchange short messages through echo_message while, in turn, a
+50MB document goes through handle_document, whose UTF-8 decode runs on
+the loop, and a regex is run line by line over a 20MB paste. Reports the
+loop lag percentiles of each phase, the stalls the watchdog caught with
+the innermost frame of their stack, the answers of GET /ready (probed
+from another thread, as an orchestrator would, also while the loop is
+blocked), the wallet calls the probes cost, and what the watchdog costs
+an idle loop.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import string
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Bot, Update
+
+from fake_bot_api import FakeBotRequest
+from fake_wallet_server import FakeWallet
+from loop_watchdog import LoopWatchdog
+from readiness import ReadinessServer
+from telegram_bot import echo_message, handle_document
+from wad_reassembly import WadReassembler
+from wallet_resilience import ResilientWallet
+
+CHATS = 50
+PHASE_SECONDS = 2.0
+DOCUMENT_BYTES = 50 * 1024 * 1024
+PASTE_BYTES = 20 * 1024 * 1024
+# Amounts written before a wad, "100 sats cashuB...", a typical scan of pasted text
+MEMO_PATTERN = re.compile(r"\b\w+\s+\w+\s+cashu")
+
+
+def probe(port: int) -> Tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def message_update(bot: Bot, update_id: int, chat_id: int, text: str = None, document: dict = None) -> Update:
+    message = {
+        "message_id": update_id, "date": 0, "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+    }
+    if text is not None:
+        message["text"] = text
+    if document is not None:
+        message["document"] = document
+    return Update.de_json({"update_id": update_id, "message": message}, bot)
+
+
+def scan_paste(paste: str) -> int:
+    """Regex over a huge paste, one line at a time, as a handler inlining it would."""
+    return sum(1 for line in paste.splitlines() if MEMO_PATTERN.search(line))
+
+
+async def chatter(bot: Bot, context: SimpleNamespace, stop: asyncio.Event):
+    update_ids = iter(range(1, 10 ** 9))
+    rng = random.Random(5)
+
+    async def chat(chat_id: int):
+        while not stop.is_set():
+            await echo_message(message_update(bot, next(update_ids), chat_id, text="hello"), context)
+            await asyncio.sleep(rng.uniform(0.01, 0.05))
+
+    await asyncio.gather(*(chat(1000 + index) for index in range(CHATS)))
+
+
+async def phase(label: str, bot: Bot, context: SimpleNamespace, watchdog: LoopWatchdog, port: int,
+                work=None) -> dict:
+    """Runs the chats for a while with `work` in the middle, probing /ready from a thread."""
+    watchdog.lags.clear()
+    stalls_before = watchdog.stall_count
+    probes: List[Tuple[int, dict]] = []
+    done = threading.Event()
+
+    def orchestrator():
+        while not done.wait(0.1):
+            probes.append(probe(port))
+
+    thread = threading.Thread(target=orchestrator)
+    thread.start()
+    stop = asyncio.Event()
+    chats = asyncio.ensure_future(chatter(bot, context, stop))
+    await asyncio.sleep(PHASE_SECONDS / 2)
+    if work:
+        await work()
+    await asyncio.sleep(PHASE_SECONDS / 2)
+    stop.set()
+    await chats
+    done.set()
+    thread.join()
+
+    stalls = list(watchdog.stalls)[len(watchdog.stalls) - (watchdog.stall_count - stalls_before):] \
+        if watchdog.stall_count > stalls_before else []
+    percentiles = watchdog.percentiles()
+    not_ready = [status for status in probes if status[0] == 503]
+    print(f"\n▶️  {label}")
+    print(f"  lag p50 {percentiles['p50_ms']}ms, p99 {percentiles['p99_ms']}ms, max {percentiles['max_ms']}ms")
+    for stall in stalls:
+        print(f"  stall of {stall.seconds * 1000:.0f}ms caught in {stall.location.rsplit('/', 1)[-1]}")
+    reasons = sorted({reason for _, body in not_ready for reason in body["reasons"]})
+    print(f"  /ready probes: {len(probes)}, 503: {len(not_ready)} {reasons if reasons else ''}")
+    return {"stalls": stalls, "probes": probes, "not_ready": not_ready, "p99": percentiles["p99_ms"]}
+
+
+async def idle_cost() -> Tuple[float, float]:
+    """CPU seconds per second of an idle loop, without and with the watchdog."""
+    async def measure() -> float:
+        started, cpu = time.perf_counter(), time.process_time()
+        await asyncio.sleep(2.0)
+        return (time.process_time() - cpu) / (time.perf_counter() - started)
+
+    without = await measure()
+    watchdog = LoopWatchdog()
+    watchdog.start()
+    with_watchdog = await measure()
+    await watchdog.stop()
+    return without, with_watchdog
+
+
+async def main():
+    print("🧪 EVENT LOOP WATCHDOG BENCHMARK")
+    print("=" * 50)
+    print(f"{CHATS} chats echoing short messages, /ready probed every 100ms from another thread")
+
+    random.seed(DOCUMENT_BYTES)
+    chars = string.ascii_letters + string.digits + " " + "🚀💰💎🔥⚡🎯"
+    line = "".join(random.choices(chars, k=4095)) + "\n"
+    document = (line * (DOCUMENT_BYTES // len(line.encode()))).encode()
+    paste = ("".join(random.choices(string.ascii_letters + " ", k=99)) + "\n") * (PASTE_BYTES // 100)
+
+    request = FakeBotRequest(files={"big": document})
+    bot = Bot("123:fake", request=request)
+    await bot.initialize()
+    bot_data = {"wad_reassembler": WadReassembler()}
+    context = SimpleNamespace(bot=bot, chat_data={}, application=SimpleNamespace(bot_data=bot_data))
+
+    fake_wallet = FakeWallet(latency=0.01)
+    wallet = ResilientWallet(fake_wallet, breaker_min_calls=3, breaker_cooldown=60)
+    # The decode of 50MB takes ~0.2s here, under the default threshold
+    watchdog = LoopWatchdog(threshold=0.1)
+    watchdog.start()
+    readiness = ReadinessServer(watchdog, lambda: wallet, host="127.0.0.1", port=0, probe_interval=1.0)
+    await readiness.start()
+    await asyncio.sleep(1.5)
+
+    quiet = await phase("short messages only", bot, context, watchdog, readiness.port)
+
+    async def upload():
+        update = message_update(bot, 1, 42, document={
+            "file_id": "big", "file_unique_id": "big", "file_name": "big.txt", "file_size": len(document),
+        })
+        await handle_document(update, context)
+
+    async def paste_scan():
+        scan_paste(paste)
+
+    uploaded = await phase(f"{DOCUMENT_BYTES // 1024 // 1024}MB document through handle_document", bot, context,
+                           watchdog, readiness.port, upload)
+    scanned = await phase(f"regex over a {PASTE_BYTES // 1024 // 1024}MB paste on the loop", bot, context,
+                          watchdog, readiness.port, paste_scan)
+
+    calls_before = sum(fake_wallet.calls.values())
+    fake_wallet.error_rates = {tool: 1.0 for tool in fake_wallet.error_rates}
+    await asyncio.sleep(4.5)
+    down_status, down_body = probe(readiness.port)
+    print(f"\n▶️  wallet failing every call")
+    print(f"  /ready: {down_status} {down_body['reasons']}, circuits open: {down_body['backend']['open_circuits']}, "
+          f"probe calls: {sum(fake_wallet.calls.values()) - calls_before}")
+
+    without, with_watchdog = await idle_cost()
+    print(f"\n💤 idle loop CPU: {without * 100:.2f}% without the watchdog, {with_watchdog * 100:.2f}% with it")
+
+    await readiness.close()
+    await watchdog.stop()
+    context.application.bot_data["wad_reassembler"].close()
+    await bot.shutdown()
+
+    failures = []
+    if quiet["stalls"] or quiet["not_ready"]:
+        failures.append("no stall and ready while quiet")
+    if not any("handle_document" in frame for stall in uploaded["stalls"] for frame in stall.stack):
+        failures.append("document stall caught in handle_document")
+    if not any("scan_paste" in frame for stall in scanned["stalls"] for frame in stall.stack):
+        failures.append("paste stall caught in scan_paste")
+    if not any("event loop blocked" in body["reasons"] for _, body in scanned["not_ready"]):
+        failures.append("503 while the loop is blocked")
+    if down_status != 503 or "wallet backend unreachable" not in down_body["reasons"]:
+        failures.append("503 while the wallet is unreachable")
+    if with_watchdog - without > 0.02:
+        failures.append("idle cost under 2% of a core")
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Memory budget check for the large-payload paths
+
+Drives echo_message, handle_document, send_long_message and
+send_as_document with generated payloads up to the sizes the bot accepts
+(25k-character messages, 50MB documents) against an in-process fake Bot
+API, and records the peak memory each call needs on top of its input:
+Python allocations with tracemalloc, then the process RSS high-water mark
+in a second pass without tracing. Exits with status 1 when a path needs
+more than its budget: a multiple of the payload size as held in memory
+(a str with an emoji takes 4 bytes per character) plus a fixed allowance
+for the Update and request objects of one call.
+"""
+
+import asyncio
+import gc
+import os
+import random
+import string
+import sys
+from collections import defaultdict
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Bot, Update
+
+from fake_bot_api import FakeBotRequest
+from telegram_bot import LongMessageHandler, echo_message, handle_document
+from wad_reassembly import WadReassembler
+
+# Peak memory allowed per path, as a multiple of the payload size
+BUDGETS = {
+    "echo_message": 4.5,
+    "handle_document": 3.0,
+    "send_long_message": 2.0,
+    "send_as_document": 2.0,
+}
+# Per-call objects (Update, JSON request) that don't grow with the payload
+TRACED_SLACK = 32 * 1024
+# RSS moves in allocator arenas and pages
+RSS_SLACK = 4 * 1024 * 1024
+
+MESSAGE_SIZES = [4_000, 15_000, 25_000]
+DOCUMENT_SIZES = [1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+
+
+def generate_payload(size: int, kind: str) -> str:
+    # Hex like Cashu tokens, or mixed text whose emojis widen the whole str to 4 bytes per character
+    random.seed(size)
+    if kind == "hex":
+        return "".join(random.choices("0123456789abcdef", k=size))
+    chars = string.ascii_letters + string.digits + " " + "🚀💰💎🔥⚡🎯"
+    return "".join(random.choices(chars, k=size))
+
+
+def message_update(bot: Bot, text: str = None, document: dict = None) -> Update:
+    message = {
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Alice"},
+    }
+    if text is not None:
+        message["text"] = text
+    if document is not None:
+        message["document"] = document
+    return Update.de_json({"update_id": 1, "message": message}, bot)
+
+
+def build_context(bot: Bot) -> SimpleNamespace:
+    bot_data = {"wad_reassembler": WadReassembler()}
+    return SimpleNamespace(bot=bot, chat_data={}, application=SimpleNamespace(bot_data=bot_data))
+
+
+def scenarios(bot: Bot, request: FakeBotRequest):
+    """(path, label, payload bytes, coroutine factory) for every path and size."""
+    context = build_context(bot)
+    for kind in ("hex", "mixed"):
+        for size in MESSAGE_SIZES:
+            text = generate_payload(size, kind)
+            update = message_update(bot, text=text)
+            payload = sys.getsizeof(text)
+            label = f"{size // 1000}k {kind}"
+            yield "echo_message", label, payload, lambda u=update: echo_message(u, context)
+            yield "send_long_message", label, payload, \
+                lambda u=update, t=text: LongMessageHandler.send_long_message(u, t, context)
+
+    for size in DOCUMENT_SIZES:
+        label = f"{size // (1024 * 1024)}MB hex"
+        text = generate_payload(size, "hex")
+        file_id = f"doc{size}"
+        request.files[file_id] = text.encode("utf-8")
+        update = message_update(bot, document={
+            "file_id": file_id, "file_unique_id": file_id, "file_name": "wads.txt", "file_size": size,
+        })
+        yield "handle_document", label, size, lambda u=update: handle_document(u, context)
+        yield "send_as_document", label, size, \
+            lambda u=update, t=text: LongMessageHandler.send_as_document(u, t, "long_message.txt", context)
+
+
+def rss_high_water_reset() -> bool:
+    # Linux only: writing 5 to clear_refs resets VmHWM to the current RSS
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def rss_status() -> dict:
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "VmHWM"):
+                values[name] = int(value.split()[0]) * 1024
+    return values
+
+
+async def traced_peak(run) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await run()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+async def rss_peak(run) -> int:
+    gc.collect()
+    if not rss_high_water_reset():
+        return -1
+    before = rss_status()["VmRSS"]
+    await run()
+    return rss_status()["VmHWM"] - before
+
+
+async def main():
+    print("🧪 MEMORY BUDGET BENCHMARK")
+    print("=" * 50)
+    print("Peak memory per call on top of its input, budget as a multiple of the payload size")
+
+    request = FakeBotRequest()
+    bot = Bot("123:fake", request=request, get_updates_request=FakeBotRequest())
+    await bot.initialize()
+
+    by_path = defaultdict(list)
+    for path, label, payload, run in scenarios(bot, request):
+        by_path[path].append((label, payload, run))
+
+    failures = []
+    for path, runs in by_path.items():
+        print(f"\n📏 {path} (budget {BUDGETS[path]:.1f}x)")
+        for label, payload, run in runs:
+            await run()  # warm-up, imports and caches are not part of the budget
+            traced = await traced_peak(run)
+            rss = await rss_peak(run)
+
+            limit = BUDGETS[path] * payload
+            over = traced > limit + TRACED_SLACK or rss > limit + RSS_SLACK
+            if over:
+                failures.append(f"{path} {label}")
+            rss_text = f"{rss / 1024 / 1024:>6.1f}MB RSS" if rss >= 0 else "   n/a RSS"
+            print(f"  {label:<10} payload {payload / 1024:>8.0f}KB  peak {traced / 1024:>8.0f}KB "
+                  f"({traced / payload:>4.1f}x)  {rss_text}  {'❌ over budget' if over else '✅'}")
+
+    await bot.shutdown()
+    print()
+    if failures:
+        print(f"❌ Over budget: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All paths within budget")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmark and checks for the payload executor
+
+Chats exchange short messages through the bot's handlers while large
+documents are uploaded at the same time: text files whose UTF-8 decode
+runs in handle_document, and a file of wads bulk imported, which scans
+and validates every line. A few small documents are uploaded too. The
+run is repeated with everything inline on the event loop and with the
+executor, which sends payloads over 1MB to two worker processes through
+shared memory. Reports the loop lag measured by the watchdog, the reply
+latency of the chats, how long the uploads took, and which payloads
+left the loop. Last, checks that the workers validate wads with the unit
+registry the executor was started with, and that they run no logging
+thread of their own.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import statistics
+import string
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Update
+from telegram.ext import Application
+
+from benchmark_bulk_import import make_wad
+from cache import Cache, LRUCache
+from cbor_helpers import encode_wad
+from fake_bot_api import FakeBotRequest
+from flood_shield import FloodShield
+from loop_watchdog import LoopWatchdog
+from payload_executor import PayloadExecutor, parse_document
+from telegram_bot import add_handlers
+from unit_registry import UnitInfo, UnitRegistry
+from wad_reassembly import WadReassembler
+
+CHATS = 30
+TEXT_DOCUMENTS = 4
+TEXT_DOCUMENT_BYTES = 20 * 1024 * 1024
+UNIQUE_WADS = 2000
+WAD_FILE_REPEATS = 10
+SMALL_DOCUMENTS = 5
+SMALL_DOCUMENT_BYTES = 100 * 1024
+MINTS = ["https://mint-a.example.com", "https://mint-b.example.com"]
+
+
+class InstantWallet:
+    """Receives every wad at once, the benchmark is about the bot's own work."""
+
+    def __init__(self):
+        self.wads = 0
+
+    async def call_tool(self, name: str, arguments: dict):
+        self.wads += arguments["wads"].count(":") + 1
+        return {"wads_received": []}
+
+
+def build_files() -> Dict[str, bytes]:
+    rng = random.Random(7)
+    chars = string.ascii_letters + string.digits + " " + "🚀💰💎🔥⚡🎯"
+    files = {}
+    for index in range(TEXT_DOCUMENTS):
+        line = "".join(rng.choices(chars, k=1023)) + "\n"
+        files[f"text{index}"] = (line * (TEXT_DOCUMENT_BYTES // len(line.encode()))).encode()
+    wads = [make_wad(rng, MINTS[index % len(MINTS)]) for index in range(UNIQUE_WADS)]
+    files["wads"] = "\n".join(f"payout {index},{wad}" for index, wad in enumerate(wads * WAD_FILE_REPEATS)).encode()
+    for index in range(SMALL_DOCUMENTS):
+        files[f"small{index}"] = "".join(rng.choices(chars, k=SMALL_DOCUMENT_BYTES // 2)).encode()
+    return files
+
+
+def document_update(application: Application, update_id: int, chat_id: int, file_id: str, size: int) -> Update:
+    return Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+        "document": {"file_id": file_id, "file_unique_id": file_id, "file_name": f"{file_id}.txt", "file_size": size},
+    }}, application.bot)
+
+
+def text_update(application: Application, update_id: int, chat_id: int, text: str) -> Update:
+    return Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}, "text": text,
+    }}, application.bot)
+
+
+def worker_state(payload: bytes) -> tuple:
+    return len(logging.getLogger().handlers), threading.active_count()
+
+
+async def check_workers() -> List[str]:
+    """A unit only the server knows, and what the bot's setup left in the workers."""
+    units = list(UnitRegistry.builtin().units.values())
+    registry = UnitRegistry(units + [UnitInfo("MicroEurC", "A micro EURC", 6, "EURC")])
+    rng = random.Random(11)
+    token = {"m": MINTS[0], "u": "microeurc", "t": [{"i": rng.randbytes(8), "p": [
+        {"a": 64, "s": rng.randbytes(32).hex(), "c": bytes([2]) + rng.randbytes(32)}
+    ]}]}
+    wad = encode_wad(token)
+    content = "\n".join(f"payout {index},{wad}" for index in range(1024 * 1024 // len(wad) + 1)).encode()
+    executor = PayloadExecutor(threshold=1024 * 1024)
+    await executor.start(registry)
+    try:
+        currencies = {entry.currency for entry in await executor.run(parse_document, content)}
+        handlers, threads = await executor.run(worker_state, bytes(1024 * 1024))
+    finally:
+        await executor.close()
+    print("\n▶️  workers started with a registry holding MicroEurC")
+    print(f"  wads in microeurc imported as: {', '.join(sorted(currencies))}, "
+          f"worker log handlers: {handlers}, worker threads: {threads}")
+    failures = []
+    if currencies != {"micro_eurc"}:
+        failures.append("server unit registry in the workers")
+    if handlers or threads != 1:
+        failures.append("no logging setup in the workers")
+    return failures
+
+
+async def run(label: str, files: Dict[str, bytes], executor: Optional[PayloadExecutor]) -> dict:
+    replies: Dict[int, List[str]] = {}
+    imported = asyncio.Event()
+    request = FakeBotRequest(
+        files=files,
+        on_message=lambda chat_id, text: replies.setdefault(chat_id, []).append(text),
+        on_document=lambda chat_id, filename, content: imported.set() if filename == "import_summary.csv" else None,
+    )
+    application = (
+        Application.builder().token("123:fake").request(request)
+        .get_updates_request(FakeBotRequest()).updater(None).build()
+    )
+    application.bot_data["flood_shield"] = FloodShield(max_messages=10 ** 6, byte_budget=10 ** 12)
+    application.bot_data["wad_reassembler"] = WadReassembler()
+    cache = Cache(LRUCache(100))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    wallet = InstantWallet()
+    application.bot_data["wallet_client"] = wallet
+    application.bot_data["wallet_users"] = frozenset(range(2000, 2000 + len(files)))
+    if executor:
+        await executor.start()
+        application.bot_data["payload_executor"] = executor
+    add_handlers(application)
+    await application.initialize()
+    await application.start()
+
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.1, window=100000)
+    watchdog.start()
+    update_ids = iter(range(1, 10 ** 9))
+    latencies: List[float] = []
+    stop = asyncio.Event()
+
+    async def chat(chat_id: int):
+        rng = random.Random(chat_id)
+        while not stop.is_set():
+            # Latency from when the message is due, so time spent waiting for a blocked loop counts
+            delay = rng.uniform(0.02, 0.06)
+            due = time.perf_counter() + delay
+            await asyncio.sleep(delay)
+            await application.process_update(text_update(application, next(update_ids), chat_id, "hello"))
+            latencies.append(time.perf_counter() - due)
+
+    async def upload(chat_id: int, file_id: str):
+        await application.process_update(
+            document_update(application, next(update_ids), chat_id, file_id, len(files[file_id]))
+        )
+
+    chats = asyncio.ensure_future(asyncio.gather(*(chat(1000 + index) for index in range(CHATS))))
+    await asyncio.sleep(0.5)
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(2000 + index, file_id) for index, file_id in enumerate(files)))
+    await asyncio.wait_for(imported.wait(), 120)
+    uploads_seconds = time.perf_counter() - started
+    await asyncio.sleep(0.5)
+    stop.set()
+    await chats
+    await watchdog.stop()
+
+    percentiles = watchdog.percentiles()
+    ordered = sorted(latencies)
+    reply_p99 = ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)]
+    sizes = {chat_id: text for chat_id, texts in replies.items() if chat_id >= 2000
+             for text in texts if text.startswith("📊 File size")}
+    metrics = executor.metrics() if executor else {}
+    print(f"\n▶️  {label}")
+    print(f"  loop lag p50 {percentiles['p50_ms']}ms, p99 {percentiles['p99_ms']}ms, max {percentiles['max_ms']}ms, "
+          f"stalls over 100ms: {watchdog.stall_count}")
+    print(f"  chat replies: {len(latencies)}, p50 {statistics.median(ordered) * 1000:.1f}ms, "
+          f"p99 {reply_p99 * 1000:.1f}ms, max {ordered[-1] * 1000:.0f}ms")
+    print(f"  uploads done in {uploads_seconds:.2f}s, {wallet.wads} wads imported, {len(sizes)} sizes reported")
+    if metrics:
+        print(f"  payloads inline: {metrics['inline']}, offloaded: {metrics['offloaded']} "
+              f"({metrics['offloaded_mb']}MB through shared memory, {metrics['pickled']} pickled)")
+
+    if executor:
+        await executor.close()
+    application.bot_data["wad_reassembler"].close()
+    await cache.close()
+    await application.stop()
+    await application.shutdown()
+    return {
+        "lag_p99": percentiles["p99_ms"], "lag_max": percentiles["max_ms"], "reply_p99": reply_p99,
+        "uploads": uploads_seconds, "wads": wallet.wads, "sizes": sizes, "metrics": metrics,
+    }
+
+
+async def main():
+    print("🧪 PAYLOAD EXECUTOR BENCHMARK")
+    print("=" * 50)
+    files = build_files()
+    print(f"{CHATS} chats echoing short messages while {TEXT_DOCUMENTS} x {TEXT_DOCUMENT_BYTES // 1024 // 1024}MB "
+          f"text files, a {len(files['wads']) / 1024 / 1024:.1f}MB file of {UNIQUE_WADS * WAD_FILE_REPEATS} wads "
+          f"and {SMALL_DOCUMENTS} x {SMALL_DOCUMENT_BYTES // 1024}KB files are uploaded at once")
+    inline = await run("everything inline on the event loop", files, None)
+    offloaded = await run("payloads over 1MB in 2 worker processes", files, PayloadExecutor(threshold=1024 * 1024))
+
+    failures = []
+    if offloaded["lag_p99"] * 4 > inline["lag_p99"] or offloaded["lag_max"] * 4 > inline["lag_max"]:
+        failures.append("loop lag")
+    if offloaded["reply_p99"] * 4 > inline["reply_p99"]:
+        failures.append("chat reply p99")
+    if offloaded["sizes"] != inline["sizes"] or len(inline["sizes"]) != TEXT_DOCUMENTS + SMALL_DOCUMENTS:
+        failures.append("same document sizes reported")
+    if offloaded["wads"] != inline["wads"] or inline["wads"] != UNIQUE_WADS * WAD_FILE_REPEATS:
+        failures.append("same wads imported")
+    if offloaded["metrics"]["inline"] < SMALL_DOCUMENTS or offloaded["metrics"]["offloaded"] != TEXT_DOCUMENTS + 2:
+        failures.append("small payloads inline, large ones offloaded")
+    failures += await check_workers()
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
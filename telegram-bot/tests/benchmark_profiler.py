@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark and checks for the /profile sampling profiler
+
+Pushes text messages through the bot's own handlers against an in-process
+fake Bot API, without the profiler and while it samples every 5ms and
+every 1ms of CPU time, and reports the throughput and the time spent in
+the sampling handler. Then an operator runs
+`/profile` during the same traffic, once to the end of the window and
+once ended early with `/profile stop`, and a user who is not an operator
+tries it.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+OPERATOR = 42
+USER = 1000
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["OPERATOR_IDS"] = str(OPERATOR)
+
+from telegram import Update
+from telegram.ext import Application
+
+from cache import Cache, LRUCache
+from fake_bot_api import FakeBotRequest
+from flood_shield import FloodShield
+from sampling_profiler import ProfileReport, SamplingProfiler
+from telegram_bot import add_handlers
+from wad_reassembly import WadReassembler
+
+TEXTS = ["check my balance", "send 100 sats to @bob", "help", "what can you do?", "receive", "hello there"]
+MESSAGES = 6000
+
+
+def message(update_id: int, user: int, text: str) -> dict:
+    update = {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "text": text,
+        "chat": {"id": user, "type": "private"},
+        "from": {"id": user, "is_bot": False, "first_name": f"user{user}", "language_code": "en"},
+    }}
+    if text.startswith("/"):
+        update["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return update
+
+
+class Bot:
+    def __init__(self):
+        self.replies: Dict[int, List[str]] = {}
+        self.documents: Dict[int, List[Tuple[str, bytes, float]]] = {}
+        self.update_id = 0
+        self.application = None
+
+    async def start(self):
+        self.application = (
+            Application.builder().token("123:fake")
+            .request(FakeBotRequest(on_message=self._message, on_document=self._document))
+            .get_updates_request(FakeBotRequest()).updater(None).build()
+        )
+        # Flooding is what is measured, the shield would shed it
+        self.application.bot_data["flood_shield"] = FloodShield(max_messages=10 ** 9, byte_budget=10 ** 12)
+        self.application.bot_data["wad_reassembler"] = WadReassembler()
+        self.cache = Cache(LRUCache(1000))
+        await self.cache.start()
+        self.application.bot_data["cache"] = self.cache
+        self.application.bot_data["profiler"] = SamplingProfiler(interval=0.005)
+        add_handlers(self.application)
+        await self.application.initialize()
+        await self.application.start()
+
+    async def stop(self):
+        self.application.bot_data["wad_reassembler"].close()
+        await self.cache.close()
+        await self.application.stop()
+        await self.application.shutdown()
+
+    async def send(self, user: int, text: str):
+        self.update_id += 1
+        await self.application.process_update(
+            Update.de_json(message(self.update_id, user, text), self.application.bot)
+        )
+
+    async def traffic(self, count: int) -> float:
+        """Messages per second handled, one after the other."""
+        started = time.perf_counter()
+        for index in range(count):
+            await self.send(USER + index % 50, TEXTS[index % len(TEXTS)])
+            # Updates arrive from the network, other tasks run in between
+            await asyncio.sleep(0)
+        return count / (time.perf_counter() - started)
+
+    def _message(self, chat_id: int, text: str):
+        self.replies.setdefault(chat_id, []).append(text)
+
+    def _document(self, chat_id: int, filename: str, content: bytes):
+        self.documents.setdefault(chat_id, []).append((filename, content, time.perf_counter()))
+
+
+async def overhead(bot: Bot, checks: List[str]):
+    print(f"\n⏱️  {MESSAGES} text messages through the handlers, median of 5 interleaved runs")
+    print(f"  {'profiler':<12} {'msg/s':>8} {'samples':>8} {'µs/sample':>10} {'in handler':>11}")
+    await bot.traffic(500)
+    profilers = {"off": None, "every 5ms": SamplingProfiler(interval=0.005), "every 1ms": SamplingProfiler(interval=0.001)}
+    rates: Dict[str, List[float]] = {label: [] for label in profilers}
+    reports: Dict[str, List[ProfileReport]] = {label: [] for label in profilers}
+    for _ in range(5):
+        for label, profiler in profilers.items():
+            if profiler:
+                profiler.start()
+            rates[label].append(await bot.traffic(MESSAGES))
+            if profiler:
+                reports[label].append(profiler.stop())
+    for label in profilers:
+        line = f"  {label:<12} {statistics.median(rates[label]):>8.0f}"
+        if reports[label]:
+            samples = sum(report.samples for report in reports[label])
+            seconds = sum(report.sampling_seconds for report in reports[label])
+            # Wall-clock throughput varies more between runs than the profiler costs, its handler time is the cost
+            share = seconds / sum(report.duration for report in reports[label])
+            line += f" {samples // len(reports[label]):>8} {seconds / samples * 1e6:>10.1f} {share:>11.2%}"
+            if label == "every 5ms" and share > 0.02:
+                checks.append("profiler cost at 5ms")
+        print(line)
+
+
+async def profile_command(bot: Bot, checks: List[str]):
+    print("\n🔬 /profile 1 by the operator during the traffic")
+    await bot.send(OPERATOR, "/profile 1")
+    await bot.traffic(MESSAGES)
+    task = bot.application.bot_data.get("profile_task")
+    if task:
+        await task
+    documents = {filename: content for filename, content, _ in bot.documents.get(OPERATOR, [])}
+    stacks = documents.get("profile_stacks.txt", b"").decode()
+    top = documents.get("profile_top.txt", b"").decode()
+    print(f"  documents: {', '.join(documents) or 'none'}")
+    print("  " + "\n  ".join(top.splitlines()[:10]))
+    handler_lines = [line for line in stacks.splitlines() if "telegram_bot.py:" in line]
+    if not (top and stacks and handler_lines and all(line.rsplit(" ", 1)[-1].isdigit() for line in stacks.splitlines())):
+        checks.append("/profile report")
+
+    print("\n⏹️  /profile 30 ended early with /profile stop")
+    bot.documents.clear()
+    await bot.send(OPERATOR, "/profile 30")
+    await bot.traffic(MESSAGES // 3)
+    stopped = time.perf_counter()
+    await bot.send(OPERATOR, "/profile stop")
+    await bot.application.bot_data["profile_task"]
+    arrived = [at for _, _, at in bot.documents.get(OPERATOR, [])]
+    delay = max(arrived) - stopped if arrived else float("inf")
+    print(f"  report {len(arrived)} documents {delay * 1000:.1f}ms after /profile stop, "
+          f"profiler running: {bot.application.bot_data['profiler'].running}")
+    if len(arrived) != 2 or delay > 1.0 or bot.application.bot_data["profiler"].running:
+        checks.append("/profile stop")
+
+    print("\n🚫 /profile 1 by a user who is not an operator")
+    bot.replies.pop(USER + 7, None)
+    await bot.send(USER + 7, "/profile 1")
+    await asyncio.sleep(0.1)
+    answered = bot.replies.get(USER + 7, [])
+    print(f"  replies: {len(answered)}, profiler running: {bot.application.bot_data['profiler'].running}")
+    if answered or bot.application.bot_data["profiler"].running:
+        checks.append("operator only")
+
+
+async def main():
+    print("🧪 SAMPLING PROFILER BENCHMARK")
+    print("=" * 50)
+    bot = Bot()
+    await bot.start()
+    failures: List[str] = []
+    await overhead(bot, failures)
+    await profile_command(bot, failures)
+    await bot.stop()
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
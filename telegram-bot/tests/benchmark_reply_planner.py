@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the long reply planner
+
+Chats echo long payloads back through LongMessageHandler.send_reply
+against an in-process fake Bot API that enforces a per-chat pace like
+Telegram's and answers 429 with a retry delay when a chat is sent too
+much. Three links are simulated: quick messages and uploads, slow
+messages, and slow uploads. Each is run with the fixed rule (chunks up
+to 20000 characters, a document beyond) and with the planner, which
+chooses from the call costs it measures and paces the chats.
+
+Time runs 10 times faster than on Telegram: a chat takes one message per
+100ms after a burst of 3, a 429 holds it for 300ms, and every latency is
+scaled alike. Reports the time to deliver a whole reply, the 429s, the
+replies cut short by one, and what the planner chose.
+"""
+
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Bot, Update
+from telegram.error import RetryAfter
+from telegram.request import RequestData
+
+from fake_bot_api import FakeBotRequest
+from reply_planner import ReplyKind, ReplyPlanner
+from telegram_bot import CHUNK_SIZE, LongMessageHandler
+
+CHAT_INTERVAL = 0.1
+CHAT_BURST = 3
+RETRY_AFTER = 0.3
+CHATS = 20
+REPLIES_PER_CHAT = 4
+THINK_SECONDS = 0.2
+SIZES = [6000, 12000, 20000, 40000, 80000]
+
+# (label, message seconds, document seconds, document bytes per second)
+LINKS = [
+    ("quick link", 0.006, 0.03, 10 * 1024 * 1024),
+    ("slow messages", 0.04, 0.05, 5 * 1024 * 1024),
+    ("slow uploads", 0.006, 0.15, 256 * 1024),
+]
+
+
+class PacedBotRequest(FakeBotRequest):
+    """Fake Bot API with per-call latencies and Telegram's per-chat pace, 429 beyond it."""
+
+    def __init__(self, message_seconds: float, document_seconds: float, bytes_per_second: float, seed: int):
+        super().__init__()
+        self.message_seconds = message_seconds
+        self.document_seconds = document_seconds
+        self.bytes_per_second = bytes_per_second
+        self.rng = random.Random(seed)
+        self.budgets: Dict[int, Tuple[float, float]] = {}
+        self.refused = 0
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None, **kwargs):
+        name = url.rsplit("/", 1)[-1]
+        if name in ("sendMessage", "sendDocument"):
+            chat_id = int(request_data.parameters["chat_id"])
+            if not self._admit(chat_id):
+                self.refused += 1
+                return 429, json.dumps({
+                    "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {RETRY_AFTER}",
+                    "parameters": {"retry_after": RETRY_AFTER},
+                }).encode()
+            if name == "sendMessage":
+                seconds = self.message_seconds
+            else:
+                _, content, *_ = request_data.multipart_data["document"]
+                seconds = self.document_seconds + len(content) / self.bytes_per_second
+            await asyncio.sleep(seconds * self.rng.lognormvariate(0, 0.3))
+        return await super().do_request(url, method, request_data, **kwargs)
+
+    def _admit(self, chat_id: int) -> bool:
+        now = time.monotonic()
+        tokens, updated = self.budgets.get(chat_id, (CHAT_BURST, now))
+        tokens = min(CHAT_BURST, tokens + (now - updated) / CHAT_INTERVAL)
+        if tokens < 1:
+            # A refused send holds the chat, like Telegram's retry_after
+            self.budgets[chat_id] = (tokens - RETRY_AFTER / CHAT_INTERVAL, now)
+            return False
+        self.budgets[chat_id] = (tokens - 1, now)
+        return True
+
+
+def message(bot: Bot, chat_id: int, update_id: int) -> Update:
+    return Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "text": "long",
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+    }}, bot)
+
+
+async def run(link: Tuple[str, float, float, float], size: int, planner: Optional[ReplyPlanner]):
+    _, message_seconds, document_seconds, bytes_per_second = link
+    request = PacedBotRequest(message_seconds, document_seconds, bytes_per_second, seed=size)
+    bot = Bot("123:fake", request=request)
+    await bot.initialize()
+    bot_data = {"reply_planner": planner} if planner else {}
+    context = SimpleNamespace(bot=bot, application=SimpleNamespace(bot_data=bot_data))
+    rng = random.Random(size)
+    text = "".join(rng.choice("0123456789abcdef") for _ in range(size))
+    times: List[float] = []
+    cut_short = 0
+
+    async def chat(chat_id: int):
+        nonlocal cut_short
+        await asyncio.sleep(rng.uniform(0, THINK_SECONDS))
+        for index in range(REPLIES_PER_CHAT):
+            started = time.perf_counter()
+            try:
+                await LongMessageHandler.send_reply(message(bot, chat_id, index), text, context, prefix="📤 Echo: ")
+                times.append(time.perf_counter() - started)
+            except RetryAfter:
+                cut_short += 1
+            await asyncio.sleep(THINK_SECONDS)
+
+    await asyncio.gather(*(chat(1000 + index) for index in range(CHATS)))
+    await bot.shutdown()
+    return times, request.refused, cut_short
+
+
+async def main():
+    print("🧪 LONG REPLY PLANNER BENCHMARK")
+    print("=" * 50)
+    print(f"{CHATS} chats, {REPLIES_PER_CHAT} replies each, {THINK_SECONDS * 1000:.0f}ms apart, time 10x faster than Telegram")
+    for link in LINKS:
+        label, message_seconds, document_seconds, bytes_per_second = link
+        print(f"\n🔗 {label}: message {message_seconds * 1000:.0f}ms, document {document_seconds * 1000:.0f}ms "
+              f"+ {bytes_per_second / 1024 / 1024:.2f} MB/s")
+        print(f"  {'chars':>6}  {'fixed rule p50/p99 ms':>22} {'429s':>5} {'cut':>4}   "
+              f"{'planner p50/p99 ms':>19} {'429s':>5} {'cut':>4}  planner chose")
+        # One planner per link, it learns the link's costs across sizes as a running bot would
+        planner = ReplyPlanner(chunk_size=CHUNK_SIZE, chat_interval=CHAT_INTERVAL, burst=CHAT_BURST,
+                               message_seconds=0.015, document_seconds=0.04, document_bytes_per_second=1024 * 1024)
+        for size in SIZES:
+            fixed, fixed_refused, fixed_cut = await run(link, size, None)
+            before = dict(planner.planned)
+            planned, planned_refused, planned_cut = await run(link, size, planner)
+            chose = {kind: planner.planned[kind] - before[kind] for kind in (ReplyKind.CHUNKS, ReplyKind.DOCUMENT)}
+            print(f"  {size:>6}  {format_times(fixed):>22} {fixed_refused:>5} {fixed_cut:>4}   "
+                  f"{format_times(planned):>19} {planned_refused:>5} {planned_cut:>4}  "
+                  f"{chose[ReplyKind.CHUNKS]} chunked, {chose[ReplyKind.DOCUMENT]} documents")
+
+
+def format_times(times: List[float]) -> str:
+    if not times:
+        return "-"
+    ordered = sorted(times)
+    p99 = ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)]
+    return f"{statistics.median(ordered) * 1000:.0f}/{p99 * 1000:.0f}"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark and checks for the wallet call resilience layer
+
+Runs wallet calls against the in-process fake wallet server with injected
+stalls and failures, directly and through ResilientWallet:
+
+- balance reads where a few requests stall: tail latency with and
+  without hedging
+- balance reads where a few requests stall, without hedging: the
+  adaptive timeout and how long a stalled read holds its caller
+- receive_wads on a fast and a slow mint, and create_wads, where calls
+  stall: writes are never cut short, the per-mint latencies are kept
+- a backend outage: the circuit opens, calls fail fast, a probe closes it
+  once the backend is back
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fake_wallet_server import FakeWallet
+from mcp_client import McpError
+from wallet_resilience import CircuitState, ResilientWallet, WalletTimeoutError, WalletUnavailableError
+
+FAST_MINT = "https://fast.example.com"
+SLOW_MINT = "https://slow.example.com"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def timed_calls(client, count: int, concurrency: int, make_call) -> List[float]:
+    """Latency of `count` calls, `concurrency` at a time, failures included."""
+    latencies: List[float] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(index: int):
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await make_call(client, index)
+            except McpError:
+                pass
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return latencies
+
+
+async def hedged_reads(checks: List[str]):
+    print("\n📖 Balance reads, 20ms lognormal, 2% stall for 2s, 800 reads 10 at a time")
+    print(f"  {'client':<22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'requests':>9}")
+    results = {}
+    for label, resilient in (("direct", False), ("hedged", True)):
+        fake = FakeWallet(latency="lognormal:0.02,0.3", stall_rate=0.02, stall_seconds=2.0, seed=5)
+        client = ResilientWallet(fake, min_timeout=5.0) if resilient else fake
+        latencies = await timed_calls(client, 800, 10, lambda c, i: c.call_tool("get_all_nodes_balances"))
+        results[label] = percentile(latencies, 0.99)
+        print(f"  {label:<22} {percentile(latencies, 0.5) * 1000:>8.1f} {results[label] * 1000:>8.1f} "
+              f"{max(latencies) * 1000:>8.1f} {fake.calls['get_all_nodes_balances']:>9}")
+        if resilient:
+            print(f"  hedged {client.hedged} reads, the hedge answered first {client.hedge_wins} times")
+    if not results["hedged"] < 0.25 < 1.0 < results["direct"]:
+        checks.append("hedged balance reads p99")
+
+
+async def adaptive_timeouts(checks: List[str]):
+    print("\n⏱️  Balance reads, 20ms lognormal, 2% stall for 10s, 400 reads 20 at a time, no hedging")
+    fake = FakeWallet(latency="lognormal:0.02,0.3", seed=9)
+    wallet = ResilientWallet(fake, min_timeout=0.1, timeout_factor=2.0, hedge_reads=False)
+
+    # Warm up the latency window, then stall calls at random
+    await timed_calls(wallet, 200, 20, lambda c, i: c.call_tool("get_all_nodes_balances"))
+    fake.stall_rate, fake.stall_seconds = 0.02, 10.0
+    held: List[float] = []
+
+    async def read(client, index):
+        started = time.perf_counter()
+        try:
+            await client.call_tool("get_all_nodes_balances")
+        except WalletTimeoutError:
+            held.append(time.perf_counter() - started)
+
+    await timed_calls(wallet, 400, 20, read)
+    target = wallet.metrics()["get_all_nodes_balances"]
+    print(f"  p99 {target['p99_ms']:.1f}ms, timeout {target['timeout_s']:.2f}s, {fake.stalls} stalls, "
+          f"{len(held)} reads released after {max(held, default=0):.2f}s at most instead of 10s")
+    if not (held and len(held) == fake.stalls and max(held) < 3.0):
+        checks.append("adaptive read timeouts")
+
+
+async def uncut_writes(checks: List[str]):
+    print("\n✍️  receive_wads, fast mint 20ms, slow mint 300ms, 2% stall for 3s, 200 calls 20 at a time")
+    fake = FakeWallet(balances={FAST_MINT: {"Satoshi": 10 ** 6}, SLOW_MINT: {"Satoshi": 10 ** 6}},
+                      latency=0.0, mint_delays={FAST_MINT: "lognormal:0.02,0.3", SLOW_MINT: "lognormal:0.3,0.3"},
+                      seed=9)
+    rng = random.Random(2)
+    wads = [fake.mint_wad(rng.choice((FAST_MINT, SLOW_MINT)), "sat", rng.randrange(1, 1000)) for _ in range(400)]
+    wallet = ResilientWallet(fake, min_timeout=0.1, timeout_factor=2.0)
+
+    await timed_calls(wallet, 200, 20, lambda c, i: c.call_tool("receive_wads", {"wads": wads[i]}))
+    fake.stall_rate, fake.stall_seconds = 0.02, 3.0
+    received = 0
+    timeouts = 0
+
+    async def receive(client, index):
+        nonlocal received, timeouts
+        try:
+            await client.call_tool("receive_wads", {"wads": wads[200 + index]})
+            received += 1
+        except WalletTimeoutError:
+            timeouts += 1
+
+    latencies = await timed_calls(wallet, 200, 20, receive)
+    metrics = wallet.metrics()
+    fast, slow = metrics[f"receive_wads {FAST_MINT}"], metrics[f"receive_wads {SLOW_MINT}"]
+    print(f"  {'mint':<28} {'p99 ms':>8} {'timeout':>8} {'timeouts':>9}")
+    for mint, target in ((FAST_MINT, fast), (SLOW_MINT, slow)):
+        print(f"  {mint:<28} {target['p99_ms']:>8.1f} {str(target['timeout_s']):>8} {target['timeouts']:>9}")
+    print(f"  {fake.stalls} stalled calls, {received} of 200 wads received, {timeouts} given up on, "
+          f"slowest call {max(latencies):.2f}s")
+
+    # A create_wads that stalls still hands back the wads it debited
+    fake.stall_rate = 1.0
+    created = await wallet.call_tool("create_wads", {"amount": "0.000001", "asset": "WBTC"})
+    print(f"  a stalled create_wads returned its wads: {bool(created)}")
+    if not (fake.stalls and received == 200 and not timeouts and fast["timeout_s"] is None
+            and fast["p99_ms"] < slow["p99_ms"] and created):
+        checks.append("writes never cut short")
+
+
+async def outage(checks: List[str]):
+    print("\n🔌 Outage: every balance read fails for 100 calls, then the backend recovers")
+    fake = FakeWallet(latency=0.005, seed=3)
+    wallet = ResilientWallet(fake, hedge_reads=False, breaker_cooldown=0.3)
+    await timed_calls(wallet, 30, 5, lambda c, i: c.call_tool("get_all_nodes_balances"))
+    fake.error_rates["get_all_nodes_balances"] = 1.0
+
+    rejected: List[float] = []
+
+    async def read(client, index):
+        started = time.perf_counter()
+        try:
+            await client.call_tool("get_all_nodes_balances")
+        except WalletUnavailableError:
+            rejected.append(time.perf_counter() - started)
+
+    await timed_calls(wallet, 100, 1, read)
+    target = wallet.metrics()["get_all_nodes_balances"]
+    backend_calls = fake.calls["get_all_nodes_balances"] - 30
+    print(f"  circuit {target['state']}, {len(rejected)} calls failed fast in "
+          f"{max(rejected, default=0) * 1e6:.0f}µs at most, {backend_calls} reached the backend")
+    opened = target["state"] == CircuitState.OPEN
+
+    fake.error_rates["get_all_nodes_balances"] = 0.0
+    await asyncio.sleep(0.35)
+    await wallet.call_tool("get_all_nodes_balances")
+    state = wallet.metrics()["get_all_nodes_balances"]["state"]
+    print(f"  after the cooldown a probe succeeded, circuit {state}")
+    if not (opened and len(rejected) >= 80 and backend_calls <= 20 and state == CircuitState.CLOSED):
+        checks.append("circuit breaker")
+
+
+async def main():
+    print("🧪 WALLET RESILIENCE BENCHMARK")
+    print("=" * 50)
+    failures: List[str] = []
+    await hedged_reads(failures)
+    await adaptive_timeouts(failures)
+    await uncut_writes(failures)
+    await outage(failures)
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
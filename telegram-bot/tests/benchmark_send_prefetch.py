@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the speculative balance prefetch of send flows
+
+Users send "send N sats to @bob" through the bot's own handlers, read the
+confirmation for a moment and answer "YES" or "NO", against an in-process
+fake Bot API and a stub wallet whose balance read takes a fixed time.
+Some ask for more than the wallet holds. With the prefetch, the balance
+read starts with the confirmation; the serial reference reads it only
+once "YES" arrives, as a flow without prefetch would. Reports how soon
+insufficient funds are reported, how long "YES" takes to be acknowledged,
+and the prefetch hit and waste counts. Then checks that in a group only
+the member who asked for a send can confirm it, and that users who
+aren't on the wallet's allowlist can't reach it.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Update
+from telegram.ext import Application
+
+from balance_prefetch import BalancePrefetcher
+from cache import Cache, LRUCache
+from fake_bot_api import FakeBotRequest
+from flood_shield import FloodShield
+from telegram_bot import add_handlers
+from wad_reassembly import WadReassembler
+from wallet_jobs import WalletJobQueue
+
+USERS = 100
+ARRIVAL_SECONDS = 2.0
+THINK_SECONDS = 0.4
+BALANCE_LATENCY = 0.15
+BALANCE_SATS = 50000
+INSUFFICIENT = 0.3
+CANCEL = 0.2
+
+
+class StubWallet:
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+
+    async def call_tool(self, name: str, arguments: dict):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if name == "get_all_nodes_balances":
+            await asyncio.sleep(BALANCE_LATENCY)
+            return [{"url": "http://localhost:3338", "balances": [{"unit": "Satoshi", "amount": BALANCE_SATS}]}]
+        await asyncio.sleep(0.05)
+        return {"wads": "cashuB" + "A" * 400}
+
+
+class SerialPrefetcher(BalancePrefetcher):
+    """Reads the balance only when the confirmation arrives, the flow without prefetch."""
+
+    def start(self, chat_id: int):
+        pass
+
+    async def peek(self, chat_id: int, timeout: float):
+        return None
+
+    async def take(self, chat_id: int, timeout: float):
+        self.misses += 1
+        return await self.fetch()
+
+    def discard(self, chat_id: int):
+        pass
+
+
+def message(update_id: int, user: int, text: str, chat: Optional[int] = None) -> dict:
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "text": text,
+        "chat": {"id": chat, "type": "group", "title": "payers"} if chat else {"id": user, "type": "private"},
+        "from": {"id": user, "is_bot": False, "first_name": f"user{user}", "language_code": "en"},
+    }}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+async def build(on_message, wallet: StubWallet, prefetch_class):
+    application = (
+        Application.builder().token("123:fake")
+        .request(FakeBotRequest(on_message=on_message)).get_updates_request(FakeBotRequest())
+        .updater(None).build()
+    )
+    application.bot_data["flood_shield"] = FloodShield()
+    application.bot_data["wad_reassembler"] = WadReassembler()
+    cache = Cache(LRUCache(1000))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    wallet_jobs = WalletJobQueue(wallet, write_workers=8, max_jobs_per_chat=3)
+    await wallet_jobs.start()
+    application.bot_data["wallet_jobs"] = wallet_jobs
+    application.bot_data["wallet_users"] = frozenset([1, 2, *range(1000, 1000 + USERS)])
+    # Each flow reads the balance itself, the cache would hide the difference
+    application.bot_data["balance_prefetch"] = prefetch_class(lambda: wallet.call_tool("get_all_nodes_balances", {}))
+    add_handlers(application)
+    await application.initialize()
+    # Running, so the funds checks started in the background are awaited
+    await application.start()
+    return application
+
+
+async def teardown(application: Application):
+    application.bot_data["balance_prefetch"].close()
+    await application.bot_data["wallet_jobs"].stop()
+    application.bot_data["wad_reassembler"].close()
+    await application.bot_data["cache"].close()
+    await application.stop()
+    await application.shutdown()
+
+
+async def run(label: str, prefetch_class):
+    rng = random.Random(7)
+    sent_at: Dict[int, float] = {}
+    refused: Dict[int, float] = {}
+
+    def on_message(chat_id: int, text: str):
+        if text.startswith("❌ Insufficient Funds") and chat_id not in refused:
+            refused[chat_id] = time.perf_counter() - sent_at[chat_id]
+
+    wallet = StubWallet()
+    application = await build(on_message, wallet, prefetch_class)
+    prefetcher = application.bot_data["balance_prefetch"]
+
+    confirm_times: List[float] = []
+    refused_before_yes = 0
+
+    async def user(index: int):
+        nonlocal refused_before_yes
+        chat_id = 1000 + index
+        await asyncio.sleep(rng.uniform(0, ARRIVAL_SECONDS))
+        amount = BALANCE_SATS * 2 if rng.random() < INSUFFICIENT else rng.randrange(100, 5000)
+        answer = "NO" if rng.random() < CANCEL else "YES"
+        sent_at[chat_id] = time.perf_counter()
+        await application.process_update(
+            Update.de_json(message(index * 2 + 1, chat_id, f"send {amount} sats to @bob"), application.bot)
+        )
+        await asyncio.sleep(THINK_SECONDS)
+        if chat_id in refused:
+            refused_before_yes += 1
+            return
+        started = time.perf_counter()
+        await application.process_update(Update.de_json(message(index * 2 + 2, chat_id, answer), application.bot))
+        if answer == "YES":
+            confirm_times.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(user(index) for index in range(USERS)))
+    await asyncio.sleep(0.2)
+
+    refused_times = list(refused.values())
+    metrics = prefetcher.metrics()
+    print(f"\n▶️  {label}")
+    print(f"  insufficient funds reported: {len(refused_times)}, {refused_before_yes} before \"YES\", "
+          f"p50 {percentile(refused_times, 0.5) * 1000:.0f}ms p99 {percentile(refused_times, 0.99) * 1000:.0f}ms "
+          f"after the send message")
+    print(f"  \"YES\" acknowledged: {len(confirm_times)}, p50 {percentile(confirm_times, 0.5) * 1000:.1f}ms "
+          f"p99 {percentile(confirm_times, 0.99) * 1000:.1f}ms")
+    print(f"  balance reads: {wallet.calls.get('get_all_nodes_balances', 0)}, "
+          f"create_wads: {wallet.calls.get('create_wads', 0)}")
+    print(f"  prefetch: hits {metrics['hits']}, misses {metrics['misses']}, wasted {metrics['wasted']}, "
+          f"cancelled {metrics['cancelled']}, joined {metrics['joined']}")
+
+    await teardown(application)
+
+
+async def group_confirmation() -> List[str]:
+    """A member asks for a send in a group, another one answers "YES" first."""
+    replies: List[str] = []
+    wallet = StubWallet()
+    application = await build(lambda chat_id, text: replies.append(text), wallet, BalancePrefetcher)
+    group, payer, other = -1001, 1, 2
+    updates = iter(range(1, 100))
+
+    async def say(user: int, text: str):
+        await application.process_update(Update.de_json(message(next(updates), user, text, group), application.bot))
+        await asyncio.sleep(0.3)
+
+    await say(payer, "send 100 sats to @bob")
+    await say(other, "YES")
+    hijacked = wallet.calls.get("create_wads", 0)
+    still_pending = "pending_send" in application.chat_data[group]
+    await say(payer, "YES")
+    created = wallet.calls.get("create_wads", 0)
+    await teardown(application)
+
+    print("\n▶️  group send confirmed by another member first")
+    print(f"  wads created after their \"YES\": {hijacked}, still pending: {still_pending}, "
+          f"after the payer's: {created}")
+    failures = []
+    if hijacked or not still_pending:
+        failures.append("another member can't confirm a send")
+    if created != 1 or not any(reply.startswith("✅ Payment for @bob ready") for reply in replies):
+        failures.append("the payer confirms their send")
+    return failures
+
+
+async def stranger_refused() -> List[str]:
+    """A user who isn't on the allowlist asks for the balance, a payment and new wads."""
+    replies: List[str] = []
+    wallet = StubWallet()
+    application = await build(lambda chat_id, text: replies.append(text), wallet, BalancePrefetcher)
+    stranger = 666
+    for update_id, text in enumerate(["show my balance", "send 100 sats to @bob", "create 100 sats",
+                                      "YES", "create 5 wads of 10 sats"], start=1):
+        await application.process_update(Update.de_json(message(update_id, stranger, text), application.bot))
+    await asyncio.sleep(0.3)
+    await teardown(application)
+
+    refused = sum(reply.startswith("🔒 Private Wallet") for reply in replies)
+    print("\n▶️  user outside WALLET_USER_IDS")
+    print(f"  wallet calls: {sum(wallet.calls.values())}, refusals: {refused} of 5 messages")
+    return [] if not wallet.calls and refused == 4 else ["users outside the allowlist refused"]
+
+
+async def main():
+    print("🧪 SEND BALANCE PREFETCH BENCHMARK")
+    print("=" * 50)
+    print(f"{USERS} send flows over {ARRIVAL_SECONDS:.0f}s, {THINK_SECONDS * 1000:.0f}ms to answer the confirmation, "
+          f"balance read {BALANCE_LATENCY * 1000:.0f}ms, {INSUFFICIENT:.0%} over the balance, {CANCEL:.0%} answer NO")
+    await run("serial: balance read when \"YES\" arrives", SerialPrefetcher)
+    await run("speculative: balance read with the confirmation", BalancePrefetcher)
+
+    failures = await group_confirmation()
+    failures += await stranger_refused()
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Bot API HTTP transport
+
+Sends bursts of replies through a local fake Bot API server with three
+request configurations: a bare HTTPXRequest (one connection), the
+ApplicationBuilder default (large pool, httpx's 5s keep-alive and 1s pool
+timeout) and the tuned transport from bot_transport. Reports throughput,
+latency percentiles, failed calls and TCP connections opened, including
+after an idle gap longer than the default keep-alive.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from telegram import Bot
+from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
+
+from bot_transport import build_request
+from fake_bot_api import FakeBotApi
+
+BURST = 300
+CHUNKED_USERS = 30
+CHUNKS = 5
+IDLE_GAP = 6.0
+
+
+async def send(bot: Bot, chat_id: int, text: str, latencies: list, failures: list):
+    started = time.perf_counter()
+    try:
+        await bot.send_message(chat_id, text)
+    except TelegramError as e:
+        failures.append(e)
+        return
+    latencies.append(time.perf_counter() - started)
+
+
+async def chunked_reply(bot: Bot, chat_id: int, latencies: list, failures: list):
+    # Chunks of one long reply go out in order, like send_long_message
+    for index in range(CHUNKS):
+        await send(bot, chat_id, f"chunk {index}", latencies, failures)
+
+
+def report(label: str, elapsed: float, latencies: list, failures: list, connections: int):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(f"  {label:<14} {len(latencies) / elapsed:>8.0f}/s  p50 {p50:>7.1f}ms  p99 {p99:>7.1f}ms  "
+          f"failed {len(failures):>4}  new connections {connections:>4}")
+
+
+async def run(name: str, request: HTTPXRequest):
+    api = FakeBotApi(latency=0.02)
+    await api.start()
+    bot = Bot("123:fake", base_url=api.base_url, request=request)
+    await bot.initialize()
+    print(f"\n⚙️  {name}")
+
+    for label, jobs in (
+        ("burst", lambda l, f: [send(bot, chat, "hello", l, f) for chat in range(BURST)]),
+        ("chunked", lambda l, f: [chunked_reply(bot, chat, l, f) for chat in range(CHUNKED_USERS)]),
+    ):
+        latencies, failures = [], []
+        connections = api.connections
+        started = time.perf_counter()
+        await asyncio.gather(*jobs(latencies, failures))
+        report(label, time.perf_counter() - started, latencies, failures, api.connections - connections)
+
+    await asyncio.sleep(IDLE_GAP)
+    latencies, failures = [], []
+    connections = api.connections
+    started = time.perf_counter()
+    await asyncio.gather(*[send(bot, chat, "hello again", latencies, failures) for chat in range(BURST)])
+    report(f"after {IDLE_GAP:.0f}s idle", time.perf_counter() - started, latencies, failures,
+           api.connections - connections)
+
+    await bot.shutdown()
+    await api.stop()
+
+
+async def main():
+    print("🧪 BOT API TRANSPORT BENCHMARK")
+    print("=" * 50)
+    print(f"Fake Bot API with 20ms per call, bursts of {BURST} sends, "
+          f"{CHUNKED_USERS} users × {CHUNKS} chunks")
+
+    await run("Bare HTTPXRequest (1 connection)", HTTPXRequest())
+    await run("ApplicationBuilder default (256 connections, 5s keep-alive, 1s pool timeout)",
+              HTTPXRequest(connection_pool_size=256))
+    await run("Tuned transport (64 connections, 60s keep-alive, 5s pool timeout)", build_request(64))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark for multi-message wad reassembly
+
+Splits synthetic wads the way Telegram clients do (4096 characters per
+message) and feeds the fragments to a WadReassembler, checking the joined
+text and comparing the cost with appending every fragment to a string.
+Then sends a wad split into more messages than the flood shield allows
+per window through the bot's handlers, with the default shield and
+reassembler limits, and checks that it arrives whole. Last, a flooder
+reopens a wad again and again and sends endless base64 fragments, which
+must count against the message limit and get one "too long" reply.
+
+Exits with status 1 when one of the checks fails.
+"""
+
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Update
+from telegram.ext import Application
+
+from cache import Cache, LRUCache
+from command_patterns import ResponseTemplates
+from fake_bot_api import FakeBotRequest
+from flood_shield import FloodShield
+from telegram_bot import CHUNK_SIZE, add_handlers
+from wad_reassembly import FragmentStatus, WadReassembler
+
+TELEGRAM_SPLIT = 4096
+ALPHABET = string.ascii_letters + string.digits + "-_"
+
+
+def split(text: str):
+    return [text[i:i + TELEGRAM_SPLIT] for i in range(0, len(text), TELEGRAM_SPLIT)]
+
+
+async def no_timeout(text: str):
+    raise AssertionError("wad should complete before the idle timeout")
+
+
+async def reassemble(reassembler: WadReassembler, fragments) -> str:
+    for fragment in fragments:
+        status, joined = reassembler.feed(1, fragment, no_timeout)
+        if status == FragmentStatus.COMPLETE:
+            return joined
+    raise AssertionError(f"wad not completed, last status {status}")
+
+
+def naive(fragments) -> str:
+    # A per-chat dict of strings, every fragment copies the whole buffer
+    buffers = {1: ""}
+    for fragment in fragments:
+        buffers[1] = buffers[1] + fragment
+    return buffers[1]
+
+
+async def main():
+    print("🧪 WAD REASSEMBLY BENCHMARK")
+    print("=" * 50)
+    print(f"{'wad chars':>10} {'fragments':>10} {'reassembler ms':>15} {'naive ms':>10}")
+
+    rng = random.Random(7)
+    reassembler = WadReassembler(max_chat_chars=16 * 1024 * 1024, max_total_chars=16 * 1024 * 1024,
+                                 max_fragments=4096)
+    for size in (10_000, 100_000, 1_000_000, 8_000_000):
+        wad = "Here is your token: cashuB" + "".join(rng.choice(ALPHABET) for _ in range(size))
+        fragments = split(wad)
+        if len(fragments[-1]) >= reassembler.fragment_length:
+            fragments.append("A")
+            wad += "A"
+
+        started = time.perf_counter()
+        joined = await reassemble(reassembler, fragments)
+        reassembled_ms = (time.perf_counter() - started) * 1000
+        assert joined == wad
+
+        started = time.perf_counter()
+        naive(fragments)
+        naive_ms = (time.perf_counter() - started) * 1000
+        print(f"{len(wad):>10} {len(fragments):>10} {reassembled_ms:>15.2f} {naive_ms:>10.2f}")
+
+    print(f"\n📊 {reassembler.metrics()}")
+
+    failures = await through_the_shield(rng)
+    # With a generous message count the character cap is hit first, over and over
+    for max_messages in (20, 200):
+        failures += await fragment_flood(rng, max_messages)
+    print()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All checks passed")
+
+
+async def through_the_shield(rng: random.Random):
+    """A wad of more fragments than the shield's message count, sent through the handlers."""
+    shield = FloodShield()
+    reassembler = WadReassembler(fragment_length=CHUNK_SIZE)
+    wad = "cashuB" + "".join(rng.choice(ALPHABET) for _ in range(29 * TELEGRAM_SPLIT + 2000))
+    fragments = split(wad)
+    replies = []
+    request = FakeBotRequest(
+        on_message=lambda chat_id, text: replies.append(text),
+        on_document=lambda chat_id, filename, content: replies.append(content.decode()),
+    )
+    application = (
+        Application.builder().token("123:fake").request(request)
+        .get_updates_request(FakeBotRequest()).updater(None).build()
+    )
+    application.bot_data["flood_shield"] = shield
+    application.bot_data["wad_reassembler"] = reassembler
+    cache = Cache(LRUCache(100))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    add_handlers(application)
+    await application.initialize()
+
+    # No wallet configured, the joined wad is echoed back
+    for update_id, fragment in enumerate(fragments, 1):
+        await application.process_update(Update.de_json({"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "payer"}, "text": fragment,
+        }}, application.bot))
+    # Messages after the wad are counted again
+    for update_id in range(len(fragments) + 1, len(fragments) + 1 + shield.max_messages):
+        await application.process_update(Update.de_json({"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "payer"}, "text": "hello",
+        }}, application.bot))
+
+    metrics = shield.metrics()
+    print(f"\n▶️  {len(fragments)} fragments through a shield allowing {shield.max_messages} messages per window")
+    print(f"  admitted {metrics['admitted']}, shed for rate {metrics['shed_rate']}, wads completed "
+          f"{reassembler.completed}, overflowed {reassembler.overflowed}")
+    failures = []
+    if len(fragments) <= shield.max_messages or reassembler.completed != 1 or not any(wad in reply for reply in replies):
+        failures.append("wad of more fragments than the message count arrives whole")
+    if metrics["shed_rate"] == 0:
+        failures.append("messages after the wad counted")
+
+    reassembler.close()
+    await cache.close()
+    await application.shutdown()
+    return failures
+
+
+async def fragment_flood(rng: random.Random, max_messages: int):
+    """10 wads opened one after the other, each followed by 300 full-length fragments."""
+    shield = FloodShield(max_messages=max_messages)
+    # Built like the bot builds it, a whole wad costs at most a window's message count
+    reassembler = WadReassembler(fragment_length=CHUNK_SIZE,
+                                 max_fragments=int(shield.max_messages / shield.fragment_weight))
+    replies = []
+    request = FakeBotRequest(on_message=lambda chat_id, text: replies.append(text))
+    application = (
+        Application.builder().token("123:fake").request(request)
+        .get_updates_request(FakeBotRequest()).updater(None).build()
+    )
+    application.bot_data["flood_shield"] = shield
+    application.bot_data["wad_reassembler"] = reassembler
+    cache = Cache(LRUCache(100))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    add_handlers(application)
+    await application.initialize()
+
+    opening = "x" * (TELEGRAM_SPLIT - 100) + " cashuB" + "".join(rng.choice(ALPHABET) for _ in range(93))
+    fragment = "".join(rng.choice(ALPHABET) for _ in range(TELEGRAM_SPLIT))
+    texts = [text for _ in range(10) for text in [opening] + [fragment] * 300]
+    for update_id, text in enumerate(texts, 1):
+        await application.process_update(Update.de_json({"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "chat": {"id": 66, "type": "private"},
+            "from": {"id": 66, "is_bot": False, "first_name": "flooder"}, "text": text,
+        }}, application.bot))
+
+    metrics = shield.metrics()
+    too_long = sum(reply == ResponseTemplates.wad_too_long() for reply in replies)
+    print(f"\n▶️  {len(texts)} messages reopening a wad 10 times, 300 fragments each, "
+          f"{max_messages} messages per window")
+    print(f"  admitted {metrics['admitted']}, shed for rate {metrics['shed_rate']}, overflowed "
+          f"{reassembler.overflowed}, \"too long\" replies {too_long}")
+    failures = []
+    if metrics["admitted"] > reassembler.max_fragments + shield.max_messages:
+        failures.append("fragments count against the message limit")
+    if too_long > 1:
+        failures.append("\"too long\" replies throttled")
+
+    reassembler.close()
+    await cache.close()
+    await application.shutdown()
+    return failures
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
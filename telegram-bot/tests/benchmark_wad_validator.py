@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark for local wad pre-validation
+
+Builds synthetic bundles of cashuB wads in both accepted layouts (NUT-00
+token v4 and the wallet server's compact wads), then reports validation
+throughput for growing bundles and the time taken to reject malformed
+input.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cbor_helpers import encode_wad
+from wad_validator import InvalidWadError, validate_wad, validate_wads
+
+PROOFS_PER_WAD = 8
+
+
+def make_wad(rng: random.Random, compact: bool) -> str:
+    proofs = [
+        {"a": 1 << rng.randrange(12), "s": os.urandom(32).hex(), "c": bytes([2]) + os.urandom(32)}
+        for _ in range(PROOFS_PER_WAD)
+    ]
+    keysets = [{"i": os.urandom(8), "p": proofs}]
+    if compact:
+        token = [{"n": "http://localhost:10003", "u": "millistrk", "p": keysets}]
+    else:
+        token = {"t": keysets, "m": "http://localhost:3338", "u": "sat", "d": "benchmark"}
+    return encode_wad(token)
+
+
+def main():
+    print("🧪 WAD PRE-VALIDATION BENCHMARK")
+    print("=" * 50)
+
+    rng = random.Random(7)
+    print(f"{'wads':>6} {'chars':>10} {'ms':>8} {'wads/s':>10} {'MB/s':>7}")
+    for count in (10, 100, 1000, 5000):
+        bundle = ":".join(make_wad(rng, compact=index % 2 == 1) for index in range(count))
+        started = time.perf_counter()
+        summaries = validate_wads(bundle)
+        elapsed = time.perf_counter() - started
+        assert len(summaries) == count
+        print(f"{count:>6} {len(bundle):>10} {elapsed * 1000:>8.2f} {count / elapsed:>10.0f} "
+              f"{len(bundle) / elapsed / 1e6:>7.1f}")
+
+    valid = make_wad(rng, compact=False)
+    malformed = {
+        "wrong prefix": "cashuA" + valid[6:],
+        "not base64url": valid[:50] + "!" + valid[51:],
+        "truncated": valid[:len(valid) // 2],
+        "bad CBOR tail": valid + "AAAA",
+        "not a wad": encode_wad({"hello": "world"}),
+    }
+    print(f"\n{'malformed input':<16} {'µs to reject':>12}")
+    for name, wad in malformed.items():
+        started = time.perf_counter()
+        for _ in range(1000):
+            try:
+                validate_wad(wad)
+            except InvalidWadError:
+                pass
+            else:
+                raise AssertionError(f"{name} was accepted")
+        print(f"{name:<16} {(time.perf_counter() - started) * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+CBOR encoding of test wads for offline benchmarks
+
+Just enough of a CBOR encoder to build cashuB wads, shared by the
+benchmarks, the replay tool and the fake wallet server so that none of
+them imports another's module for it.
+"""
+
+import base64
+import struct
+
+
+def encode_cbor(value) -> bytes:
+    """Encodes ints, bytes, strings, lists and dicts."""
+    def head(major: int, argument: int) -> bytes:
+        if argument < 24:
+            return bytes([major << 5 | argument])
+        for info, fmt in ((24, ">B"), (25, ">H"), (26, ">I"), (27, ">Q")):
+            if argument < 1 << (8 * struct.calcsize(fmt)):
+                return bytes([major << 5 | info]) + struct.pack(fmt, argument)
+        raise ValueError(argument)
+
+    if isinstance(value, int):
+        return head(0, value)
+    if isinstance(value, bytes):
+        return head(2, len(value)) + value
+    if isinstance(value, str):
+        encoded = value.encode()
+        return head(3, len(encoded)) + encoded
+    if isinstance(value, list):
+        return head(4, len(value)) + b"".join(encode_cbor(item) for item in value)
+    return head(5, len(value)) + b"".join(encode_cbor(k) + encode_cbor(v) for k, v in value.items())
+
+
+def encode_wad(token) -> str:
+    """A cashuB wad of a token, in the unpadded base64url clients paste."""
+    return "cashuB" + base64.urlsafe_b64encode(encode_cbor(token)).decode().rstrip("=")
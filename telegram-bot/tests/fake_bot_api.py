@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Fake Telegram Bot API server for offline benchmarks
+
+A minimal HTTP/1.1 server on localhost answering the Bot API methods the
+bot calls (getMe, sendMessage, sendDocument, editMessageText, getUpdates)
+after a configurable delay, so transport and delivery code can be
+measured without a token or network. It counts calls per method and the
+TCP connections opened by clients. FakeBotRequest answers the same calls
+in-process, for measurements where a socket would get in the way.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_cashu_bot"}
+
+
+class FakeBotApi:
+    """Local stand-in for api.telegram.org."""
+
+    def __init__(self, latency: float = 0.02, updates: Optional[List[Dict[str, Any]]] = None):
+        """
+        Args:
+            latency: Seconds each call takes before answering
+            updates: Updates served by getUpdates, in order
+        """
+        self.latency = latency
+        self.updates = list(updates or [])
+        self.calls: Dict[str, int] = {}
+        self.sent: List[Dict[str, Any]] = []
+        self.connections = 0
+        self.retry_after: Dict[int, int] = {}
+        self.blocked: Set[int] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._message_id = 0
+
+    @property
+    def base_url(self) -> str:
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                method = request_line.split()[1].rsplit("/", 1)[-1]
+
+                status, payload = await self._answer(method, headers.get("content-type", ""), body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    def _parameters(self, content_type: str, body: bytes) -> Dict[str, Any]:
+        if content_type.startswith("application/json"):
+            return json.loads(body or b"{}")
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            from urllib.parse import parse_qsl
+            return dict(parse_qsl(body.decode()))
+        # multipart/form-data: only the text fields are needed
+        parameters = {}
+        for part in body.split(b"\r\n--"):
+            head, _, value = part.partition(b"\r\n\r\n")
+            if b'name="' in head and b"filename=" not in head:
+                name = head.split(b'name="', 1)[1].split(b'"', 1)[0].decode()
+                parameters[name] = value.rstrip(b"\r\n-").decode(errors="replace")
+        return parameters
+
+    async def _answer(self, method: str, content_type: str, body: bytes):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        parameters = self._parameters(content_type, body)
+
+        if method == "getUpdates":
+            offset = int(parameters.get("offset") or 0)
+            limit = int(parameters.get("limit") or 100)
+            pending = [update for update in self.updates if update["update_id"] >= offset][:limit]
+            if not pending:
+                await asyncio.sleep(min(float(parameters.get("timeout") or 0), 0.05))
+            return "200 OK", {"ok": True, "result": pending}
+
+        await asyncio.sleep(self.latency)
+        if method == "getMe":
+            return "200 OK", {"ok": True, "result": BOT_USER}
+
+        chat_id = int(parameters.get("chat_id") or 1)
+        retry_after = self.retry_after.pop(chat_id, 0)
+        if retry_after:
+            return "429 Too Many Requests", {
+                "ok": False, "error_code": 429, "description": "Too Many Requests",
+                "parameters": {"retry_after": retry_after},
+            }
+
+        if chat_id in self.blocked:
+            return "403 Forbidden", {
+                "ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user",
+            }
+
+        self._message_id += 1
+        self.sent.append({"method": method, "chat_id": chat_id, "text": parameters.get("text"), "at": time.monotonic()})
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": parameters.get("text") or "",
+        }
+        return "200 OK", {"ok": True, "result": message}
+
+
+class FakeBotRequest(BaseRequest):
+    """In-process Bot API transport: answers without a server and keeps no copy of what is sent."""
+
+    def __init__(self, files: Optional[Dict[str, bytes]] = None, latency: float = 0.0,
+                 on_message: Optional[Callable[[int, str], None]] = None,
+                 on_document: Optional[Callable[[int, str, bytes], None]] = None):
+        """
+        Args:
+            files: Downloadable file contents by file_id, served by getFile
+            latency: Seconds each call takes before answering
+            on_message: Called with the chat id and text of every sendMessage
+            on_document: Called with the chat id, file name and content of every sendDocument
+        """
+        self.files = dict(files or {})
+        self.latency = latency
+        self.on_message = on_message
+        self.on_document = on_document
+        self.calls: Dict[str, int] = {}
+        self.sent_bytes = 0
+        self._message_id = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        if "/file/bot" in url:
+            # A fresh copy, like the body of a real download
+            return 200, bytes(self.files[url.rsplit("/", 1)[-1]])
+
+        name = url.rsplit("/", 1)[-1]
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        parameters = request_data.parameters if request_data else {}
+        # Serialized like HTTPXRequest does before sending
+        if request_data:
+            self.sent_bytes += len(request_data.json_payload)
+            for _, content, *_ in (request_data.multipart_data or {}).values():
+                self.sent_bytes += len(content)
+
+        if name == "sendMessage" and self.on_message:
+            self.on_message(int(parameters["chat_id"]), parameters["text"])
+        if name == "sendDocument" and self.on_document:
+            filename, content, *_ = request_data.multipart_data["document"]
+            self.on_document(int(parameters["chat_id"]), filename, content)
+
+        if name == "getMe":
+            result: Any = BOT_USER
+        elif name == "getFile":
+            file_id = parameters["file_id"]
+            result = {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self.files[file_id]),
+                      "file_path": f"documents/{file_id}"}
+        else:
+            self._message_id += 1
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(parameters.get("chat_id") or 1), "type": "private"},
+                "from": BOT_USER,
+            }
+        return 200, json.dumps({"ok": True, "result": result}).encode()
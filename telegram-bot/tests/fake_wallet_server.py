@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Fake wallet MCP server
+
+A stand-in for the Rust `server` binary that keeps balances in memory.
+It publishes the same three tools (`get_all_nodes_balances`, `create_wads`
+and `receive_wads`) with the result shapes and JSON-RPC errors of
+server/src/lib.rs, and the `Unit` schema the unit registry is built from.
+Created wads are real cashuB wads that `receive_wads` (and the bot's
+local validation) accept. Each call can be slowed by a latency
+distribution per tool and a delay per mint it touches, fail at a given
+rate or stall, all drawn from a seeded generator so runs are repeatable.
+
+In-process, `FakeWallet.call_tool` behaves like `McpClient.call_tool`.
+Over stdio, the real McpClient spawns it like the Rust server:
+
+    python tests/fake_wallet_server.py --balance http://localhost:3338=Satoshi:100000 \\
+        --latency lognormal:0.05,0.5 --latency create_wads=0.2 \\
+        --error-rate receive_wads=0.05 --mint-delay https://slow.example.com=0.5 --seed 1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cbor_helpers import encode_wad
+from mcp_client import MCP_PROTOCOL_VERSION, McpError
+from unit_registry import BUILTIN_UNIT_SCHEMA
+from wad_validator import InvalidWadError, validate_wads
+
+TOOLS = ("get_all_nodes_balances", "create_wads", "receive_wads")
+
+# JSON-RPC error codes of rmcp's ErrorData
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+METHOD_NOT_FOUND = -32601
+
+# Asset -> (server unit, decimals, unit written in wads), the unit `find_best_unit` picks
+ASSET_UNITS = {
+    "STRK": ("MilliStrk", 6, "millistrk"),
+    "ETH": ("Gwei", 9, "gwei"),
+    "WBTC": ("Satoshi", 8, "sat"),
+    "BTC": ("Satoshi", 8, "sat"),
+    "USDT": ("MicroUsdT", 6, "microusdt"),
+    "USDC": ("MicroUsdC", 6, "microusdc"),
+}
+WAD_UNITS = {wad_unit: unit for unit, _, wad_unit in ASSET_UNITS.values()}
+
+# Serialized like the `Unit` enum: variant names, and {"Other": unit} for the rest
+UNIT_SCHEMA = {"oneOf": BUILTIN_UNIT_SCHEMA["oneOf"] + [{
+    "type": "object", "required": ["Other"], "additionalProperties": False,
+    "properties": {"Other": {"type": "string"}},
+    "description": "An asset that wasn't preconfigured. We have no information about its value.",
+}]}
+
+WADS_SCHEMA = {"type": "string", "description": "Colon separated wads (tokenv4)."}
+
+TOOL_DEFINITIONS = [
+    {
+        "name": "get_all_nodes_balances",
+        "description": "Retrieves the current balance of ecash tokens across all recorded Cashu mints.",
+        "inputSchema": {"type": "object", "properties": {}},
+        "outputSchema": {
+            "type": "array",
+            "items": {"$ref": "#/$defs/MintBalances"},
+            "$defs": {
+                "MintBalances": {"type": "object", "required": ["url", "balances"], "properties": {
+                    "url": {"type": "string", "format": "uri"},
+                    "balances": {"type": "array", "items": {"$ref": "#/$defs/Balance"}},
+                }},
+                "Balance": {"type": "object", "required": ["unit", "amount"], "properties": {
+                    "unit": {"$ref": "#/$defs/Unit"},
+                    "amount": {"type": "integer", "minimum": 1},
+                }},
+                "Unit": UNIT_SCHEMA,
+            },
+        },
+        "annotations": {"readOnlyHint": True, "destructiveHint": False, "idempotentHint": True,
+                        "openWorldHint": False},
+    },
+    {
+        "name": "receive_wads",
+        "description": "Receive money. Use this tool to store the tokens of the wads you received in your wallet.",
+        "inputSchema": {"type": "object", "required": ["wads"], "properties": {"wads": WADS_SCHEMA}},
+        "outputSchema": {
+            "type": "object", "required": ["wads_received"],
+            "properties": {"wads_received": {"type": "array", "items": {"$ref": "#/$defs/WadReceptionInfo"}}},
+            "$defs": {
+                "WadReceptionInfo": {"type": "object", "required": ["mint_url", "amount", "unit"], "properties": {
+                    "mint_url": {"type": "string", "format": "uri"},
+                    "amount": {"type": "integer", "minimum": 0},
+                    "unit": {"$ref": "#/$defs/Unit"},
+                    "memo": {"type": ["string", "null"]},
+                }},
+                "Unit": UNIT_SCHEMA,
+            },
+        },
+        "annotations": {"readOnlyHint": False, "destructiveHint": False, "idempotentHint": False,
+                        "openWorldHint": False},
+    },
+    {
+        "name": "create_wads",
+        "description": "Create wads from the wallet tokens. It will take money out of the wallet to put it into the wads.",
+        "inputSchema": {"type": "object", "required": ["amount", "asset"], "properties": {
+            "amount": {"type": "string", "description": "The quantity of the asset we want to spend."},
+            "asset": {"type": "string", "description": "The asset we want to spend."},
+        }},
+        "outputSchema": {"type": "object", "required": ["wads"], "properties": {"wads": WADS_SCHEMA}},
+        "annotations": {"readOnlyHint": False, "destructiveHint": False, "idempotentHint": False,
+                        "openWorldHint": False},
+    },
+]
+
+Sampler = Callable[[random.Random], float]
+
+
+def parse_latency(spec: Union[str, float, None]) -> Sampler:
+    """
+    Seconds drawn for one call, from a distribution spec.
+
+    "0.05" or "fixed:0.05", "uniform:0.01,0.1", "lognormal:<median>,<sigma>"
+    or "exponential:<mean>".
+    """
+    if spec is None:
+        return lambda rng: 0.0
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    kind, _, values = spec.partition(":")
+    if not values:
+        kind, values = "fixed", kind
+    args = [float(value) for value in values.split(",")]
+    if kind == "fixed":
+        return lambda rng: args[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "lognormal":
+        return lambda rng: args[0] * rng.lognormvariate(0, args[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1 / args[0]) if args[0] else 0.0
+    raise ValueError(f"unknown latency distribution {kind!r}")
+
+
+class ToolError(Exception):
+    """An error response of the server, like rmcp's ErrorData."""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class FakeWallet:
+    """In-memory wallet answering the wallet tools like server/src/lib.rs."""
+
+    def __init__(
+        self,
+        balances: Optional[Dict[str, Dict[str, int]]] = None,
+        latency: Union[str, float, Dict[str, Union[str, float]], None] = None,
+        error_rates: Union[float, Dict[str, float], None] = None,
+        mint_delays: Optional[Dict[str, Union[str, float]]] = None,
+        stall_rate: float = 0.0,
+        stall_seconds: float = 30.0,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            balances: {mint url: {server unit: amount}} held at start
+            latency: Distribution spec for every tool, or {tool: spec}
+            error_rates: Share of calls failing with a server error, for every tool or {tool: rate}
+            mint_delays: {mint url: spec} added to each create or receive touching the mint
+            stall_rate: Share of calls that hang for `stall_seconds` before answering
+            stall_seconds: Length of a stall
+            seed: Seed of the generator drawing delays, errors and stalls
+        """
+        self.balances: Dict[str, Dict[str, int]] = {
+            url: dict(units) for url, units in (balances or {"http://localhost:3338": {"Satoshi": 100000}}).items()
+        }
+        per_tool = latency if isinstance(latency, dict) else {tool: latency for tool in TOOLS}
+        self.latency: Dict[str, Sampler] = {tool: parse_latency(per_tool.get(tool)) for tool in TOOLS}
+        rates = error_rates if isinstance(error_rates, dict) else {tool: error_rates or 0.0 for tool in TOOLS}
+        self.error_rates: Dict[str, float] = {tool: rates.get(tool, 0.0) for tool in TOOLS}
+        self.mint_delays: Dict[str, Sampler] = {url: parse_latency(spec) for url, spec in (mint_delays or {}).items()}
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.rng = random.Random(seed)
+        self.spent: set = set()
+        self.calls: Dict[str, int] = {tool: 0 for tool in TOOLS}
+        self.injected_errors = 0
+        self.stalls = 0
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Answers a tool call, with the structured content McpClient would return.
+
+        Raises:
+            McpError: with the code and message the Rust server would send
+        """
+        try:
+            return await self.handle(name, arguments or {})
+        except ToolError as e:
+            raise McpError(e.message, code=e.code, data=e.data) from None
+
+    async def handle(self, name: str, arguments: Dict[str, Any]) -> Any:
+        if name not in TOOLS:
+            raise ToolError(INVALID_PARAMS, "tool not found")
+        self.calls[name] += 1
+        delay = self.latency[name](self.rng)
+        if self.stall_rate and self.rng.random() < self.stall_rate:
+            self.stalls += 1
+            delay += self.stall_seconds
+        failed = self.rng.random() < self.error_rates[name]
+        await asyncio.sleep(delay)
+        if failed:
+            self.injected_errors += 1
+            if name == "get_all_nodes_balances":
+                raise ToolError(INTERNAL_ERROR, "failed to interact with the database", "database is locked")
+            raise ToolError(INTERNAL_ERROR, "failed to connect to the mint node", "connection reset by peer")
+
+        if name == "get_all_nodes_balances":
+            return self.balance()
+        if name == "receive_wads":
+            return {"wads_received": await self.receive_wads(str(arguments.get("wads", "")))}
+        return {"wads": await self.create_wads(str(arguments.get("amount", "")), str(arguments.get("asset", "")))}
+
+    def balance(self) -> List[Dict[str, Any]]:
+        return [
+            {"url": url, "balances": [{"unit": unit, "amount": amount} for unit, amount in units.items() if amount > 0]}
+            for url, units in self.balances.items()
+        ]
+
+    async def receive_wads(self, wads: str) -> List[Dict[str, Any]]:
+        try:
+            summaries = validate_wads(wads)
+        except InvalidWadError as e:
+            raise ToolError(INVALID_PARAMS, "invalid value for wads parameter", str(e)) from None
+        parts = wads.split(":")
+        if len(parts) != len(summaries) or len(set(parts)) != len(parts):
+            raise ToolError(INVALID_PARAMS, "invalid value for wads parameter", "duplicated wad")
+
+        # In order like the server, the wads before a refused one stay received
+        receipts = []
+        for part, summary in zip(parts, summaries):
+            if part in self.spent:
+                raise ToolError(INTERNAL_ERROR, "failed to receive a wad", "Token already spent")
+            # Spent right away, a concurrent call can't receive the same wad
+            self.spent.add(part)
+            await self._mint_delay(summary.mint_url)
+            unit = WAD_UNITS.get(summary.unit.lower(), {"Other": summary.unit})
+            if isinstance(unit, str):
+                units = self.balances.setdefault(summary.mint_url, {})
+                units[unit] = units.get(unit, 0) + summary.amount
+            receipts.append({"mint_url": summary.mint_url, "amount": summary.amount, "unit": unit,
+                             "memo": summary.memo})
+        return receipts
+
+    async def create_wads(self, amount: str, asset: str) -> str:
+        unit, decimals, wad_unit = ASSET_UNITS.get(asset.upper(), (None, 0, None))
+        if unit is None:
+            raise ToolError(INTERNAL_ERROR, "could not plan spending", f"no unit for asset {asset}")
+        try:
+            units = Decimal(amount).scaleb(decimals)
+        except InvalidOperation:
+            raise ToolError(INVALID_PARAMS, "invalid argument amount", f"invalid amount {amount!r}") from None
+        if units != units.to_integral_value() or units <= 0:
+            raise ToolError(INVALID_PARAMS, "invalid argument amount", f"{amount} {asset} is not a whole {unit}")
+
+        # Spend from the mints in order, debited before the mint round-trips
+        remaining = int(units)
+        plan: List[Tuple[str, int]] = []
+        for url, held in self.balances.items():
+            take = min(held.get(unit, 0), remaining)
+            if take:
+                plan.append((url, take))
+                remaining -= take
+            if not remaining:
+                break
+        if remaining:
+            raise ToolError(INTERNAL_ERROR, "could not plan spending", "not enough funds")
+        for url, take in plan:
+            self.balances[url][unit] -= take
+
+        wads = []
+        for url, take in plan:
+            await self._mint_delay(url)
+            wads.append(self.mint_wad(url, wad_unit, take))
+        return ":".join(wads)
+
+    def mint_wad(self, mint_url: str, wad_unit: str, amount: int) -> str:
+        """A NUT-00 v4 wad of power of two proofs adding up to `amount`."""
+        amounts = [1 << bit for bit in range(amount.bit_length()) if amount >> bit & 1]
+        proofs = [{"a": a, "s": self.rng.randbytes(32).hex(), "c": bytes([2]) + self.rng.randbytes(32)}
+                  for a in amounts]
+        token = {"m": mint_url, "u": wad_unit, "t": [{"i": bytes([0]) + self.rng.randbytes(7), "p": proofs}]}
+        return encode_wad(token)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"calls": dict(self.calls), "injected_errors": self.injected_errors, "stalls": self.stalls,
+                "spent_wads": len(self.spent)}
+
+    async def _mint_delay(self, mint_url: str):
+        sampler = self.mint_delays.get(mint_url)
+        if sampler:
+            await asyncio.sleep(sampler(self.rng))
+
+
+async def serve_stdio(wallet: FakeWallet):
+    """Answers newline-delimited JSON-RPC on stdin/stdout, many calls in flight like rmcp."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=64 * 1024 * 1024)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    write_lock = asyncio.Lock()
+    tasks: set = set()
+
+    async def respond(message: Dict[str, Any]):
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": message["id"]}
+        method = message.get("method")
+        params = message.get("params") or {}
+        try:
+            if method == "initialize":
+                response["result"] = {
+                    "protocolVersion": MCP_PROTOCOL_VERSION,
+                    "capabilities": {"tools": {}},
+                    "serverInfo": {"name": "fake-wallet", "version": "0.1.0"},
+                }
+            elif method == "tools/list":
+                response["result"] = {"tools": TOOL_DEFINITIONS}
+            elif method == "tools/call":
+                structured = await wallet.handle(params.get("name", ""), params.get("arguments") or {})
+                response["result"] = {"content": [{"type": "text", "text": json.dumps(structured)}],
+                                      "structuredContent": structured, "isError": False}
+            elif method == "ping":
+                response["result"] = {}
+            else:
+                raise ToolError(METHOD_NOT_FOUND, f"method not found: {method}")
+        except ToolError as e:
+            response["error"] = {"code": e.code, "message": e.message, "data": e.data}
+        line = json.dumps(response, separators=(",", ":")) + "\n"
+        async with write_lock:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+    while line := await reader.readline():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if "id" in message and "method" in message:
+            task = asyncio.ensure_future(respond(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+
+def _pairs(values: List[str]) -> Tuple[Optional[str], Dict[str, str]]:
+    """Splits "key=value" options from a bare default value."""
+    default = None
+    pairs: Dict[str, str] = {}
+    for value in values:
+        key, sep, rest = value.rpartition("=")
+        if sep:
+            pairs[key] = rest
+        else:
+            default = value
+    return default, pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--balance", action="append", default=[], metavar="URL=UNIT:AMOUNT",
+                        help="Balance held at start, repeatable")
+    parser.add_argument("--latency", action="append", default=[], metavar="[TOOL=]SPEC",
+                        help="Latency of every tool, or of one tool, e.g. lognormal:0.05,0.5")
+    parser.add_argument("--error-rate", action="append", default=[], metavar="[TOOL=]RATE")
+    parser.add_argument("--mint-delay", action="append", default=[], metavar="URL=SPEC")
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    balances: Dict[str, Dict[str, int]] = {}
+    for value in args.balance:
+        url, _, holding = value.rpartition("=")
+        unit, _, amount = holding.partition(":")
+        balances.setdefault(url, {})[unit] = int(amount)
+    latency_default, latency = _pairs(args.latency)
+    rate_default, rates = _pairs(args.error_rate)
+    _, mint_delays = _pairs(args.mint_delay)
+
+    wallet = FakeWallet(
+        balances=balances or None,
+        latency={tool: latency.get(tool, latency_default) for tool in TOOLS},
+        error_rates={tool: float(rates.get(tool, rate_default or 0.0)) for tool in TOOLS},
+        mint_delays=mint_delays,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        seed=args.seed,
+    )
+    asyncio.run(serve_stdio(wallet))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Replay of recorded update streams
+
+Feeds a log written by the bot with RECORD_UPDATES through the bot's own
+handlers, against an in-process fake Bot API and a stub wallet backend,
+at the recorded pace (1x), faster (10x) or as fast as possible (max).
+Updates are processed one at a time, like run_polling does. The time
+from arrival to the end of handling, and the handling time alone, are
+reported per intent, so changes can be checked against real traffic
+shapes. Redacted wads are replaced by freshly generated wads with the
+same mint, unit and amount.
+
+Without a log, a synthetic recording of a mixed traffic is generated
+first (through the recorder's redaction) and replayed.
+
+    python tests/replay_updates.py [updates.jsonl] [--speed 1,10,max]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# telegram_bot refuses to load without a token, and its message logs stay out of the report
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from telegram import Update
+from telegram.ext import Application
+
+from balance_prefetch import BalancePrefetcher
+from cbor_helpers import encode_wad
+from cache import Cache, LRUCache
+from command_patterns import CommandParser, get_unit_registry
+from fake_bot_api import FakeBotRequest
+from fake_wallet_server import FakeWallet
+from flood_shield import FloodShield
+from history_store import HistoryStore
+from intent_matcher import build_intent_matcher
+from locales import setup_locales
+from telegram_bot import BALANCE_CACHE_KEY, CHUNK_SIZE, FLOOD_MAX_MESSAGES, FLOOD_WINDOW_SECONDS, add_handlers
+from update_recorder import read_recording, redact_update
+from wad_reassembly import WadReassembler
+from wallet_jobs import WalletJobQueue
+
+_PLACEHOLDER = re.compile(r"\[wad:(\d+)\]")
+
+
+def make_wad(mint: str, unit: str, amount: int, rng: random.Random) -> str:
+    """A NUT-00 v4 wad with random proofs adding up to `amount`."""
+    amounts = [1 << bit for bit in range(amount.bit_length()) if amount >> bit & 1] or [0]
+    proofs = [{"a": a, "s": rng.randbytes(32).hex(), "c": bytes([2]) + rng.randbytes(32)} for a in amounts]
+    token = {"m": mint, "u": unit, "t": [{"i": rng.randbytes(8), "p": proofs}]}
+    return encode_wad(token)
+
+
+def restore_wad(description: Dict[str, Any], rng: random.Random) -> str:
+    if "error" in description:
+        # Stays malformed, the bot rejects it the same way
+        return "cashuB" + "".join(rng.choices("ABCDEFGHabcdefgh0123456789", k=max(description["chars"] - 6, 1)))
+    return make_wad(description["mint"], description["unit"], description["amount"], rng)
+
+
+def restore_update(entry: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    data = entry["update"]
+    wads = entry.get("wads", [])
+    if wads:
+        def substitute(match):
+            index = int(match.group(1))
+            return restore_wad(wads[index], rng) if index < len(wads) else match.group(0)
+
+        for field in ("message", "edited_message", "channel_post", "edited_channel_post"):
+            message = data.get(field) or {}
+            for key in ("text", "caption"):
+                if message.get(key):
+                    message[key] = _PLACEHOLDER.sub(substitute, message[key])
+    return data
+
+
+def intent_of(data: Dict[str, Any]) -> str:
+    message = data.get("message") or data.get("edited_message")
+    if data.get("callback_query"):
+        return "callback"
+    if not message:
+        return "other"
+    if message.get("document"):
+        return "document"
+    return CommandParser.detect_intent(message.get("text") or "")
+
+
+def synthetic_recording(path: str, updates: int, rate: float, rng: random.Random):
+    """Writes a mixed traffic log like the recorder would, real wads redacted on the way."""
+    traffic = [
+        (25, lambda: "show my balance"), (5, lambda: "/start"), (5, lambda: "/help"),
+        (5, lambda: "help security"), (30, lambda: rng.choice(["hello", "thanks!", "what is cashu?"])),
+        (5, lambda: rng.choice(["shw my balanse", "balnce", "creat 100 sats"])),
+        (3, lambda: "".join(rng.choices("0123456789abcdef", k=rng.randrange(5000, 15000)))),
+        (12, lambda: "here you go " + ":".join(
+            make_wad("https://mint.example.com", "sat", rng.randrange(1, 5000), rng)
+            for _ in range(rng.randrange(1, 4)))),
+        (8, lambda: f"create {rng.choice([100, 1000, 21000])} sats"),
+        (2, None),
+    ]
+    weights = [weight for weight, _ in traffic]
+    at = 0.0
+    with open(path, "w", encoding="utf-8") as f:
+        for update_id in range(1, updates + 1):
+            at += rng.expovariate(rate)
+            user = rng.randrange(1, 200)
+            message = {
+                "message_id": update_id, "date": int(time.time()),
+                "chat": {"id": user, "type": "private"},
+                "from": {"id": user, "is_bot": False, "first_name": f"user{user}", "language_code": "en"},
+            }
+            make_text = rng.choices(traffic, weights)[0][1]
+            if make_text is None:
+                size = rng.randrange(1000, 200_000)
+                message["document"] = {"file_id": f"doc{update_id}", "file_unique_id": f"doc{update_id}",
+                                       "file_name": "wads.txt", "file_size": size}
+            else:
+                message["text"] = make_text()
+            data, wads = redact_update({"update_id": update_id, "message": message})
+            line = {"t": round(at, 3), "update": data}
+            if wads:
+                line["wads"] = wads
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def replay(entries: List[Dict[str, Any]], speed: float, api_latency: float, wallet_latency: float):
+    rng = random.Random(1)
+    request = FakeBotRequest(latency=api_latency)
+    application = (
+        Application.builder().token("123:fake")
+        .request(request).get_updates_request(FakeBotRequest())
+        .updater(None).build()
+    )
+    # The flood window shrinks with the replay speed, so the same users get shed
+    window = FLOOD_WINDOW_SECONDS / speed if speed != float("inf") else 1e-6
+    application.bot_data["flood_shield"] = FloodShield(max_messages=FLOOD_MAX_MESSAGES, window_seconds=window)
+    application.bot_data["wad_reassembler"] = WadReassembler(fragment_length=CHUNK_SIZE)
+    application.bot_data["locales"] = setup_locales(["en"])
+    application.bot_data["intent_matcher"] = build_intent_matcher(get_unit_registry())
+    cache = Cache(LRUCache(1000))
+    await cache.start()
+    application.bot_data["cache"] = cache
+    wallet = FakeWallet(balances={"http://localhost:3338": {"Satoshi": 10 ** 9}},
+                        latency=f"lognormal:{wallet_latency},0.5", seed=1)
+    wallet_jobs = WalletJobQueue(wallet)
+    await wallet_jobs.start()
+    application.bot_data["wallet_jobs"] = wallet_jobs
+    # Everyone in the recording may use the wallet, as they did on the recorded bot
+    application.bot_data["wallet_users"] = frozenset(
+        (entry["update"].get("message") or {}).get("from", {}).get("id") for entry in entries
+    )
+    application.bot_data["balance_prefetch"] = BalancePrefetcher(
+        lambda: wallet.call_tool("get_all_nodes_balances", {}), cache=cache, cache_key=BALANCE_CACHE_KEY
+    )
+    directory = tempfile.TemporaryDirectory()
+    history = HistoryStore(os.path.join(directory.name, "history.db"))
+    await history.start()
+    application.bot_data["history"] = history
+    add_handlers(application)
+    await application.initialize()
+
+    updates = []
+    for entry in entries:
+        data = restore_update(json.loads(json.dumps(entry)), rng)
+        document = (data.get("message") or {}).get("document")
+        if document:
+            request.files[document["file_id"]] = rng.randbytes(document["file_size"] // 2).hex().encode()
+        updates.append((entry["t"], intent_of(data), Update.de_json(data, application.bot)))
+
+    queue: asyncio.Queue = asyncio.Queue()
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    handling: Dict[str, List[float]] = defaultdict(list)
+
+    async def process():
+        # One update at a time, like the polling loop of the real bot
+        while True:
+            arrived, intent, update = await queue.get()
+            started_at = time.perf_counter()
+            await application.process_update(update)
+            latencies[intent].append(time.perf_counter() - arrived)
+            handling[intent].append(time.perf_counter() - started_at)
+            queue.task_done()
+
+    worker = asyncio.create_task(process())
+    started = time.perf_counter()
+    first = updates[0][0] if updates else 0.0
+    for at, intent, update in updates:
+        delay = (at - first) / speed - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        queue.put_nowait((time.perf_counter(), intent, update))
+    await queue.join()
+    elapsed = time.perf_counter() - started
+    worker.cancel()
+
+    label = "max" if speed == float("inf") else f"{speed:g}x"
+    print(f"\n▶️  {label}: {len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:.0f}/s), "
+          f"{sum(request.calls.values())} Bot API calls, wallet calls {dict(wallet.calls)}")
+    print(f"  {'intent':<10} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+          f"   handling {'p50 ms':>7} {'p99 ms':>7}")
+    for intent, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+        values.sort()
+        handled = sorted(handling[intent])
+        print(f"  {intent:<10} {len(values):>6} {percentile(values, 0.5) * 1000:>9.1f} "
+              f"{percentile(values, 0.9) * 1000:>9.1f} {percentile(values, 0.99) * 1000:>9.1f} "
+              f"{values[-1] * 1000:>9.1f}            {percentile(handled, 0.5) * 1000:>7.1f} "
+              f"{percentile(handled, 0.99) * 1000:>7.1f}")
+    queues = wallet_jobs.metrics()
+    shield = application.bot_data["flood_shield"].metrics()
+    print(f"  wallet queue: read avg wait {queues['read']['avg_wait_ms']}ms, "
+          f"write avg wait {queues['write']['avg_wait_ms']}ms, "
+          f"shed {shield['shed_rate'] + shield['shed_bytes'] + shield['shed_oversize']} updates")
+
+    application.bot_data["balance_prefetch"].close()
+    await wallet_jobs.stop()
+    application.bot_data["wad_reassembler"].close()
+    await history.close()
+    await cache.close()
+    await application.shutdown()
+    directory.cleanup()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded update log against a fake Bot API")
+    parser.add_argument("log", nargs="?", help="JSONL log written with RECORD_UPDATES, synthetic if omitted")
+    parser.add_argument("--speed", default="10,max", help="Comma separated speeds: 1, 10, ... or max")
+    parser.add_argument("--api-latency", type=float, default=0.03, help="Seconds per Bot API call")
+    parser.add_argument("--wallet-latency", type=float, default=0.3, help="Median seconds per wallet call")
+    args = parser.parse_args()
+
+    print("🧪 UPDATE REPLAY BENCHMARK")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.log
+        if not path:
+            path = os.path.join(directory, "updates.jsonl")
+            synthetic_recording(path, updates=600, rate=20.0, rng=random.Random(42))
+            print("No log given, replaying 600 synthetic updates recorded over ~30s")
+        entries = read_recording(path)
+        redacted = sum(len(entry.get("wads", [])) for entry in entries)
+        print(f"{len(entries)} updates, {redacted} redacted wads, Bot API {args.api_latency * 1000:.0f}ms per call, "
+              f"wallet ~{args.wallet_latency * 1000:.0f}ms per call")
+
+        for speed in args.speed.split(","):
+            await replay(entries, float("inf") if speed.strip() == "max" else float(speed),
+                         args.api_latency, args.wallet_latency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Unit Registry for Cashu Telegram Bot
+
+The wallet server publishes its `Unit` enum, with each unit's conversion
+rate and base token, in the output schemas of its tools (see
+server/src/balances.rs). The registry is built from those schemas once at
+startup, cached on disk and turned into lookup tables used to parse and
+format amounts.
+"""
+
+import json
+import logging
+import os
+import re
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+
+# Mirror of the `Unit` schema published by the server, used until (or when)
+# the server schemas can't be loaded
+BUILTIN_UNIT_SCHEMA: Dict[str, Any] = {
+    "oneOf": [
+        {"type": "string", "const": "MilliStrk", "description": "A milli strk",
+         "conversion_rate": "10^-6", "base_token": "STRK"},
+        {"type": "string", "const": "Gwei", "description": "A gwei",
+         "conversion_rate": "10^-9", "base_token": "ETH"},
+        {"type": "string", "const": "Satoshi", "description": "A sat",
+         "conversion_rate": "10^-8", "base_token": "WBTC"},
+        {"type": "string", "const": "MicroUsdT", "description": "A micro USDT",
+         "conversion_rate": "10^-6", "base_token": "USDT"},
+        {"type": "string", "const": "MicroUsdC", "description": "A micro USDC",
+         "conversion_rate": "10^-6", "base_token": "USDC"},
+    ]
+}
+
+# Display labels that can't be derived from the unit description
+LABEL_OVERRIDES = {"Satoshi": "sats"}
+
+# Extra words users type for a base token, the amount is then in whole tokens
+ASSET_ALIASES = {"usd": "USDC", "dollar": "USDC", "dollars": "USDC", "btc": "WBTC"}
+
+_CONVERSION_RATE = re.compile(r"^10\^(-?\d+)$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class UnitInfo:
+    """One unit of the server `Unit` enum."""
+
+    def __init__(self, name: str, description: str, decimals: int, base_token: str):
+        """
+        Args:
+            name: Enum variant, as serialized by the server (e.g. "MicroUsdC")
+            description: Schema description (e.g. "A micro USDC")
+            decimals: Number of units in a base token, as a power of ten
+            base_token: Onchain asset the unit represents (e.g. "USDC")
+        """
+        self.name = name
+        self.description = description
+        self.decimals = decimals
+        self.base_token = base_token
+
+        noun = re.sub(r"^(a|an)\s+", "", description.strip(), flags=re.IGNORECASE).lower()
+        self.key = noun.replace(" ", "_")
+        self.label = LABEL_OVERRIDES.get(
+            name, re.sub(re.escape(base_token.lower()), base_token, noun) if base_token else noun
+        )
+
+    def aliases(self) -> Iterable[str]:
+        """Words users may type for this unit."""
+        noun = self.key.replace("_", " ")
+        name = self.name.lower()
+        return {self.key, noun, noun + "s", name, name + "s", self.label.lower()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "decimals": self.decimals,
+            "base_token": self.base_token,
+        }
+
+
+class UnitRegistry:
+    """Lookup tables for the units supported by the wallet server."""
+
+    def __init__(self, units: List[UnitInfo], server_version: Optional[str] = None):
+        self.units: Dict[str, UnitInfo] = {unit.name: unit for unit in units}
+        self.server_version = server_version
+
+        # alias -> unit and alias -> base token, built once
+        self.by_alias: Dict[str, UnitInfo] = {}
+        self.by_key: Dict[str, UnitInfo] = {}
+        self.asset_aliases: Dict[str, str] = {}
+        base_tokens = {unit.base_token for unit in units if unit.base_token}
+        for unit in units:
+            self.by_key[unit.key] = unit
+            for alias in unit.aliases():
+                self.by_alias[alias] = unit
+        for token in base_tokens:
+            self.asset_aliases[token.lower()] = token
+        for alias, token in ASSET_ALIASES.items():
+            if token in base_tokens:
+                self.asset_aliases.setdefault(alias, token)
+
+        # Regex alternation of every alias, longest first so "micro usdc" wins over "usdc"
+        words = sorted(set(self.by_alias) | set(self.asset_aliases), key=len, reverse=True)
+        self.unit_regex = "|".join(re.escape(word).replace(r"\ ", r"\s*") for word in words)
+
+    @classmethod
+    def from_schema(cls, unit_schema: Dict[str, Any], server_version: Optional[str] = None) -> "UnitRegistry":
+        """Build the registry from the JSON schema of the `Unit` enum."""
+        units = []
+        for variant in unit_schema.get("oneOf", []):
+            name = variant.get("const")
+            if name is None and len(variant.get("enum", [])) == 1:
+                name = variant["enum"][0]
+            rate = _CONVERSION_RATE.match(str(variant.get("conversion_rate", "")).replace(" ", ""))
+            if not name or not rate:
+                # `Other(String)` and units without a known value
+                continue
+            units.append(UnitInfo(
+                name, variant.get("description", name), -int(rate.group(1)), variant.get("base_token", "")
+            ))
+        return cls(units, server_version)
+
+    @classmethod
+    def from_tools(cls, tools: List[Dict[str, Any]], server_version: Optional[str] = None) -> "UnitRegistry":
+        """Find the `Unit` schema in the output schemas returned by `tools/list`."""
+        for tool in tools:
+            schema = tool.get("outputSchema") or {}
+            definitions = schema.get("$defs") or schema.get("definitions") or {}
+            if "Unit" in definitions:
+                return cls.from_schema(definitions["Unit"], server_version)
+        raise ValueError("no tool publishes the Unit schema")
+
+    @classmethod
+    def builtin(cls) -> "UnitRegistry":
+        return cls.from_schema(BUILTIN_UNIT_SCHEMA)
+
+    def normalize(self, word: str) -> Optional[str]:
+        """Canonical currency key for a word: a unit key, "usd" or a base token in lowercase."""
+        word = _WHITESPACE.sub(" ", word.lower().strip())
+        unit = self.by_alias.get(word)
+        if unit:
+            return unit.key
+        token = self.asset_aliases.get(word)
+        if token:
+            return "usd" if word in ("usd", "dollar", "dollars") else token.lower()
+        return None
+
+    def resolve(self, currency: str) -> Optional[UnitInfo]:
+        """Unit for a currency key or alias."""
+        return self.by_key.get(currency) or self.by_alias.get(currency.replace("_", " "))
+
+    def from_server_unit(self, value: Any) -> Tuple[Optional[UnitInfo], str]:
+        """Unit for a serialized server `Unit`, and a fallback label for `Other` units."""
+        if isinstance(value, dict):
+            return None, str(next(iter(value.values()), "?"))
+        return self.units.get(value), str(value)
+
+    def from_wad_unit(self, value: str) -> Tuple[Optional[UnitInfo], str]:
+        """Unit for the lowercase unit string stored in a wad ("sat", "millistrk")."""
+        lowered = value.lower()
+        unit = self.by_alias.get(lowered)
+        if unit is None:
+            unit = next((unit for unit in self.units.values() if unit.name.lower() == lowered), None)
+        return unit, value
+
+    def to_asset_amount(self, amount: float, currency: str) -> Optional[Tuple[str, str]]:
+        """Convert an amount to the (asset amount, asset) pair `create_wads` expects."""
+        unit = self.resolve(currency)
+        if unit:
+            asset_amount = Decimal(str(amount)).scaleb(-unit.decimals).normalize()
+            return (f"{asset_amount:f}", unit.base_token)
+        token = self.asset_aliases.get(currency)
+        if token:
+            return (f"{Decimal(str(amount)).normalize():f}", token)
+        return None
+
+    def format_amount(self, amount: float, currency: str) -> str:
+        """Format an amount for display."""
+        if currency == "usd":
+            return f"${amount:.2f} USD"
+        unit = self.resolve(currency)
+        if unit:
+            return f"{amount:,.0f} {unit.label}"
+        token = self.asset_aliases.get(currency)
+        if token:
+            return f"{amount:,} {token}"
+        return f"{amount:,.0f} {currency}"
+
+    def to_cache(self) -> Dict[str, Any]:
+        return {
+            "format": CACHE_FORMAT_VERSION,
+            "server_version": self.server_version,
+            "units": [unit.to_dict() for unit in self.units.values()],
+        }
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "UnitRegistry":
+        units = [
+            UnitInfo(unit["name"], unit["description"], unit["decimals"], unit["base_token"])
+            for unit in data["units"]
+        ]
+        return cls(units, data.get("server_version"))
+
+
+def _server_version(client) -> Optional[str]:
+    info = getattr(client, "server_info", None) or {}
+    if not info:
+        return None
+    return f"{info.get('name', '?')}/{info.get('version', '?')}"
+
+
+def _read_cache(cache_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(cache_path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if data.get("format") == CACHE_FORMAT_VERSION else None
+
+
+async def load_unit_registry(client=None, cache_path: Optional[str] = None) -> UnitRegistry:
+    """
+    Loads the registry once at startup.
+
+    The disk cache is used when it was written for the same server version,
+    otherwise the schemas are read from `tools/list` and the cache refreshed.
+    Without a server, the cache (or the builtin schema) is used as is.
+
+    Args:
+        client: Connected McpClient, or None when no server is configured
+        cache_path: JSON file caching the registry between restarts
+    """
+    cached = _read_cache(cache_path) if cache_path else None
+    version = _server_version(client) if client else None
+
+    if cached and (client is None or cached.get("server_version") == version):
+        logger.info("Unit registry loaded from cache (%d units)", len(cached["units"]),
+                    extra={"event": "unit_registry_loaded"})
+        return UnitRegistry.from_cache(cached)
+
+    if client is None:
+        return UnitRegistry.builtin()
+
+    try:
+        registry = UnitRegistry.from_tools(await client.list_tools(), version)
+    except Exception as e:
+        logger.warning("Could not load units from the server schemas, using builtin ones: %s", e,
+                       extra={"event": "unit_registry_fallback"})
+        return UnitRegistry.from_cache(cached) if cached else UnitRegistry.builtin()
+
+    if cache_path:
+        tmp_path = f"{cache_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(registry.to_cache(), f, indent=2)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning("Could not write the unit registry cache: %s", e,
+                           extra={"event": "unit_registry_cache_failed"})
+
+    logger.info("Unit registry loaded from server %s (%d units)", version, len(registry.units),
+                extra={"event": "unit_registry_loaded"})
+    return registry
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Update Recorder for Cashu Telegram Bot
+
+Writes the incoming updates to a JSONL log, one compact line per update
+with its arrival time, so real traffic can be replayed later against a
+fake Bot API (tests/replay_updates.py). Wads are never written: each one
+is replaced by a `[wad:N]` placeholder and described by its hash, length
+and decoded summary (mint, unit, amount, proof count), which is enough
+for the replayer to put a look-alike wad back. Lines are buffered and
+appended by a dedicated thread, like the history store.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+from command_patterns import CommandPatterns
+from wad_validator import InvalidWadError, validate_wad
+
+logger = logging.getLogger(__name__)
+
+# Update fields that carry a message with user text
+_MESSAGE_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post")
+
+
+def describe_wad(wad: str) -> Dict[str, Any]:
+    """What the replayer needs to rebuild a similar wad, without anything spendable."""
+    description: Dict[str, Any] = {"sha256": hashlib.sha256(wad.encode()).hexdigest()[:16], "chars": len(wad)}
+    try:
+        summary = validate_wad(wad)
+    except InvalidWadError as e:
+        description["error"] = str(e)
+        return description
+    description.update(mint=summary.mint_url, unit=summary.unit, amount=summary.amount, proofs=summary.proofs)
+    return description
+
+
+def redact_update(data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Replaces the wads in message texts and captions by `[wad:N]` placeholders.
+
+    Args:
+        data: Update as returned by `Update.to_dict()`, modified in place
+
+    Returns:
+        The redacted update and the description of each removed wad, by N
+    """
+    wads: List[Dict[str, Any]] = []
+
+    def placeholder(match) -> str:
+        wads.append(describe_wad(match.group(0)))
+        return f"[wad:{len(wads) - 1}]"
+
+    for field in _MESSAGE_FIELDS:
+        message = data.get(field)
+        if not message:
+            continue
+        for key in ("text", "caption"):
+            if message.get(key):
+                message[key] = CommandPatterns.WAD_PATTERN.sub(placeholder, message[key])
+        # Entities point into the original text, their offsets no longer match
+        message.pop("entities", None)
+        message.pop("caption_entities", None)
+    return data, wads
+
+
+class UpdateRecorder:
+    """Appends redacted updates to a JSONL log from a background thread."""
+
+    def __init__(self, path: str, flush_interval: float = 0.5):
+        """
+        Args:
+            path: JSONL file, appended to when it already exists
+            flush_interval: Longest time a line waits in memory
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.written = 0
+        self._started = time.monotonic()
+        self._pending: List[str] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recorder")
+        self._file: Optional[TextIO] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._file = await loop.run_in_executor(self._executor, lambda: open(self.path, "a", encoding="utf-8"))
+        self._started = time.monotonic()
+        self._writer = loop.create_task(self._write_loop())
+
+    async def close(self):
+        """Write what is still pending and close the log."""
+        if self._writer:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        loop = asyncio.get_running_loop()
+        if self._pending:
+            await self._flush(loop)
+        if self._file:
+            await loop.run_in_executor(self._executor, self._file.close)
+            self._file = None
+        self._executor.shutdown()
+
+    def record(self, update: Dict[str, Any]):
+        """Buffers one update, given as `Update.to_dict()`."""
+        data, wads = redact_update(update)
+        line = {"t": round(time.monotonic() - self._started, 3), "update": data}
+        if wads:
+            line["wads"] = wads
+        self._pending.append(json.dumps(line, separators=(",", ":"), ensure_ascii=False))
+        self.recorded += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"recorded": self.recorded, "written": self.written, "pending": len(self._pending)}
+
+    def _write_lines(self, lines: List[str]):
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+    async def _flush(self, loop: asyncio.AbstractEventLoop):
+        lines, self._pending = self._pending, []
+        try:
+            await loop.run_in_executor(self._executor, self._write_lines, lines)
+        except OSError as e:
+            logger.error("Failed to record %d updates: %s", len(lines), e)
+            return
+        self.written += len(lines)
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                await self._flush(loop)
+
+
+def read_recording(path: str) -> List[Dict[str, Any]]:
+    """Loads a recorded log, in arrival order."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Multi-Message Wad Reassembly for Cashu Telegram Bot
+
+Telegram clients split text longer than 4096 characters into several
+messages, so a long cashuB wad arrives as a first fragment ending with the
+wad prefix followed by base64url continuation fragments. Fragments are
+kept per chat as a list of parts and joined once, when a short fragment
+ends the wad or the chat stays idle for a moment.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from command_patterns import CommandPatterns
+
+logger = logging.getLogger(__name__)
+
+# Same alphabet as CommandPatterns.WAD_PATTERN
+_CONTINUATION = re.compile(r"[A-Za-z0-9_\-+/=]+")
+
+OnComplete = Callable[[str], Awaitable[None]]
+
+
+class FragmentStatus:
+    """What `WadReassembler.feed` did with a message."""
+
+    NONE = "none"            # Not a fragment, handle the message as usual
+    STARTED = "started"      # First fragment of a split wad, buffered
+    APPENDED = "appended"    # Continuation fragment, buffered
+    COMPLETE = "complete"    # Last fragment, the joined text is returned
+    OVERFLOW = "overflow"    # Memory cap hit, the chat's buffer was dropped
+
+
+class _Buffer:
+    __slots__ = ("parts", "chars", "on_timeout", "timer")
+
+    def __init__(self, on_timeout: OnComplete):
+        self.parts: List[str] = []
+        self.chars = 0
+        self.on_timeout = on_timeout
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class WadReassembler:
+    """Per-chat buffers joining wads split across consecutive messages."""
+
+    def __init__(
+        self,
+        idle_timeout: float = 3.0,
+        fragment_length: int = 4000,
+        max_chat_chars: int = 1024 * 1024,
+        max_total_chars: int = 32 * 1024 * 1024,
+        max_fragments: int = 200,
+    ):
+        """
+        Args:
+            idle_timeout: Seconds without a new fragment before the buffer is submitted
+            fragment_length: Messages at least this long are assumed to be continued
+            max_chat_chars: Largest wad text buffered for one chat
+            max_total_chars: Characters buffered across all chats
+            max_fragments: Most messages one wad is buffered from
+        """
+        self.idle_timeout = idle_timeout
+        self.fragment_length = fragment_length
+        self.max_chat_chars = max_chat_chars
+        self.max_total_chars = max_total_chars
+        self.max_fragments = max_fragments
+        self._buffers: Dict[int, _Buffer] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.total_chars = 0
+        self.started = 0
+        self.completed = 0
+        self.flushed = 0
+        self.overflowed = 0
+
+    def is_first_fragment(self, text: str) -> bool:
+        """A split-length message whose trailing wad runs up to the cut."""
+        if len(text) < self.fragment_length:
+            return False
+        match = None
+        for match in CommandPatterns.WAD_PATTERN.finditer(text):
+            pass
+        return match is not None and match.end() == len(text.rstrip())
+
+    def is_continuation(self, chat_id: int, text: Optional[str]) -> bool:
+        """Whether a message would be appended to the chat's buffered wad."""
+        return chat_id in self._buffers and bool(text) and _CONTINUATION.fullmatch(text.strip()) is not None
+
+    def feed(self, chat_id: int, text: str, on_timeout: OnComplete) -> Tuple[str, Optional[str]]:
+        """
+        Offers a message to the chat's buffer.
+
+        Args:
+            chat_id: Chat the message came from
+            text: Message text
+            on_timeout: Called with the joined text if the wad is never finished
+
+        Returns:
+            (FragmentStatus, joined text when COMPLETE)
+        """
+        buffer = self._buffers.get(chat_id)
+
+        if buffer is None:
+            if not self.is_first_fragment(text):
+                return (FragmentStatus.NONE, None)
+            buffer = self._buffers[chat_id] = _Buffer(on_timeout)
+            self.started += 1
+            status = FragmentStatus.STARTED
+        elif _CONTINUATION.fullmatch(text.strip()):
+            text = text.strip()
+            buffer.on_timeout = on_timeout
+            status = FragmentStatus.APPENDED
+        else:
+            # The user moved on, submit what was collected and handle this message normally
+            self._submit_expired(chat_id)
+            return (FragmentStatus.NONE, None)
+
+        if (buffer.chars + len(text) > self.max_chat_chars or self.total_chars + len(text) > self.max_total_chars
+                or len(buffer.parts) >= self.max_fragments):
+            self._drop(chat_id)
+            self.overflowed += 1
+            return (FragmentStatus.OVERFLOW, None)
+
+        buffer.parts.append(text)
+        buffer.chars += len(text)
+        self.total_chars += len(text)
+
+        if status == FragmentStatus.APPENDED and len(text) < self.fragment_length:
+            self.completed += 1
+            return (FragmentStatus.COMPLETE, "".join(self._drop(chat_id).parts))
+
+        if buffer.timer:
+            buffer.timer.cancel()
+        buffer.timer = asyncio.get_running_loop().call_later(self.idle_timeout, self._submit_expired, chat_id)
+        return (status, None)
+
+    def close(self):
+        """Cancel every pending timer, buffered fragments are discarded."""
+        for chat_id in list(self._buffers):
+            self._drop(chat_id)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "open_buffers": len(self._buffers),
+            "buffered_chars": self.total_chars,
+            "started": self.started,
+            "completed": self.completed,
+            "flushed": self.flushed,
+            "overflowed": self.overflowed,
+        }
+
+    def _drop(self, chat_id: int) -> _Buffer:
+        buffer = self._buffers.pop(chat_id)
+        if buffer.timer:
+            buffer.timer.cancel()
+        self.total_chars -= buffer.chars
+        return buffer
+
+    def _submit_expired(self, chat_id: int):
+        buffer = self._drop(chat_id)
+        self.flushed += 1
+        task = asyncio.get_running_loop().create_task(buffer.on_timeout("".join(buffer.parts)))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("Reassembled wad handler failed: %s", task.exception(), exc_info=task.exception())
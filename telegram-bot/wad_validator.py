@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Local Wad Pre-Validation for Cashu Telegram Bot
+
+Decodes `cashuB` wads (base64url encoded CBOR) in pure Python before they
+are sent to `receive_wads`, so malformed input is rejected without a
+round-trip to the mint and the user sees what is being received.
+
+Two layouts are accepted, the NUT-00 token v4 map
+    {m: mint url, u: unit, d: memo, t: [{i: keyset id, p: [{a, s, c}]}]}
+and the compact map used by the wallet server
+    {n: mint url, u: unit, m: memo, p: [{i: keyset id, p: [{a, s, c}]}]}
+the latter optionally wrapped in a one element array.
+"""
+
+import base64
+import binascii
+import re
+import struct
+from typing import Any, List, Optional, Tuple
+
+_WAD_PREFIX = "cashuB"
+_BASE64URL = re.compile(r"[A-Za-z0-9_\-]+={0,2}")
+_MAX_DEPTH = 8
+
+
+class InvalidWadError(ValueError):
+    """A wad that can't be received, raised before any network call."""
+
+
+class WadSummary:
+    """What a wad holds, read from its own encoding."""
+
+    __slots__ = ("mint_url", "unit", "amount", "memo", "proofs")
+
+    def __init__(self, mint_url: str, unit: str, amount: int, memo: Optional[str], proofs: int):
+        self.mint_url = mint_url
+        self.unit = unit
+        self.amount = amount
+        self.memo = memo
+        self.proofs = proofs
+
+    def __repr__(self) -> str:
+        return f"WadSummary({self.amount} {self.unit} from {self.mint_url}, {self.proofs} proofs)"
+
+
+def _decode_cbor(data: bytes, offset: int, depth: int) -> Tuple[Any, int]:
+    """Decodes the CBOR item at `offset`, returns it and the offset after it."""
+    if depth > _MAX_DEPTH:
+        raise InvalidWadError("wad nesting too deep")
+    try:
+        initial = data[offset]
+    except IndexError:
+        raise InvalidWadError("truncated wad") from None
+    major, info = initial >> 5, initial & 0x1F
+    offset += 1
+
+    if major == 7:
+        if info == 20:
+            return False, offset
+        if info == 21:
+            return True, offset
+        if info in (22, 23):
+            return None, offset
+        if info in (25, 26, 27):
+            size = 1 << (info - 24)
+            if offset + size > len(data):
+                raise InvalidWadError("truncated wad")
+            value = struct.unpack(">" + "xefd"[info - 24], data[offset:offset + size])[0]
+            return value, offset + size
+        raise InvalidWadError(f"unsupported CBOR simple value {info}")
+
+    if info < 24:
+        argument = info
+    elif info < 28:
+        size = 1 << (info - 24)
+        if offset + size > len(data):
+            raise InvalidWadError("truncated wad")
+        argument = int.from_bytes(data[offset:offset + size], "big")
+        offset += size
+    elif info == 31 and major in (4, 5):
+        argument = None
+    else:
+        raise InvalidWadError("malformed CBOR length")
+
+    if major == 0:
+        return argument, offset
+    if major == 1:
+        return -1 - argument, offset
+    if major in (2, 3):
+        end = offset + argument
+        if end > len(data):
+            raise InvalidWadError("truncated wad")
+        if major == 2:
+            return data[offset:end], end
+        try:
+            return data[offset:end].decode("utf-8"), end
+        except UnicodeDecodeError:
+            raise InvalidWadError("invalid UTF-8 in wad") from None
+    if major == 4:
+        items = []
+        if argument is None:
+            while offset < len(data) and data[offset] != 0xFF:
+                item, offset = _decode_cbor(data, offset, depth + 1)
+                items.append(item)
+            return items, offset + 1
+        # Every item takes at least one byte, a larger count is garbage
+        if argument > len(data) - offset:
+            raise InvalidWadError("truncated wad")
+        for _ in range(argument):
+            item, offset = _decode_cbor(data, offset, depth + 1)
+            items.append(item)
+        return items, offset
+    if major == 5:
+        entries = {}
+        if argument is None:
+            count = len(data)
+        elif 2 * argument > len(data) - offset:
+            raise InvalidWadError("truncated wad")
+        else:
+            count = argument
+        for _ in range(count):
+            if argument is None and (offset >= len(data) or data[offset] == 0xFF):
+                return entries, offset + 1
+            key, offset = _decode_cbor(data, offset, depth + 1)
+            if not isinstance(key, (str, int)):
+                raise InvalidWadError("invalid CBOR map key")
+            entries[key], offset = _decode_cbor(data, offset, depth + 1)
+        return entries, offset
+    # Tags (major 6) carry no meaning in wads, the tagged item is kept
+    return _decode_cbor(data, offset, depth + 1)
+
+
+def decode_cbor(data: bytes) -> Any:
+    """Decodes a complete CBOR document, trailing bytes are an error."""
+    value, offset = _decode_cbor(data, 0, 0)
+    if offset != len(data):
+        raise InvalidWadError("trailing bytes after wad")
+    return value
+
+
+def _summarize(token: Any) -> WadSummary:
+    if isinstance(token, list) and len(token) == 1:
+        token = token[0]
+    if not isinstance(token, dict):
+        raise InvalidWadError("wad is not a CBOR map")
+
+    if "t" in token:
+        mint_url, memo, keysets = token.get("m"), token.get("d"), token["t"]
+    else:
+        mint_url, memo, keysets = token.get("n"), token.get("m"), token.get("p")
+    unit = token.get("u")
+
+    if not isinstance(mint_url, str) or not mint_url.startswith(("http://", "https://")):
+        raise InvalidWadError("missing or invalid mint URL")
+    if not isinstance(unit, str) or not unit:
+        raise InvalidWadError("missing unit")
+    if memo is not None and not isinstance(memo, str):
+        raise InvalidWadError("invalid memo")
+    if not isinstance(keysets, list) or not keysets:
+        raise InvalidWadError("wad holds no proofs")
+
+    amount = proofs = 0
+    for keyset in keysets:
+        if not isinstance(keyset, dict) or not isinstance(keyset.get("i"), bytes):
+            raise InvalidWadError("invalid keyset id")
+        keyset_proofs = keyset.get("p")
+        if not isinstance(keyset_proofs, list) or not keyset_proofs:
+            raise InvalidWadError("keyset holds no proofs")
+        for proof in keyset_proofs:
+            if not isinstance(proof, dict):
+                raise InvalidWadError("invalid proof")
+            value = proof.get("a")
+            if type(value) is not int or value <= 0:
+                raise InvalidWadError("invalid proof amount")
+            if not isinstance(proof.get("s"), str) or not proof["s"]:
+                raise InvalidWadError("invalid proof secret")
+            signature = proof.get("c")
+            if not isinstance(signature, bytes) or len(signature) != 33:
+                raise InvalidWadError("invalid proof signature")
+            amount += value
+            proofs += 1
+
+    return WadSummary(mint_url, unit, amount, memo, proofs)
+
+
+def validate_wad(wad: str) -> WadSummary:
+    """
+    Checks one `cashuB` wad without contacting its mint.
+
+    Raises:
+        InvalidWadError: If the wad can't be decoded
+    """
+    if not wad.startswith(_WAD_PREFIX):
+        raise InvalidWadError("wad must start with cashuB")
+    encoded = wad[len(_WAD_PREFIX):]
+    if not _BASE64URL.fullmatch(encoded) or len(encoded.rstrip("=")) % 4 == 1:
+        raise InvalidWadError("wad is not valid base64url")
+    try:
+        data = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    except (binascii.Error, ValueError):
+        raise InvalidWadError("wad is not valid base64url") from None
+    return _summarize(decode_cbor(data))
+
+
+def validate_wads(wads: str) -> List[WadSummary]:
+    """
+    Checks colon separated wads, as `receive_wads` takes them.
+
+    Raises:
+        InvalidWadError: On the first invalid wad, numbered from 1
+    """
+    summaries = []
+    for index, wad in enumerate(wads.split(":"), 1):
+        try:
+            summaries.append(validate_wad(wad))
+        except InvalidWadError as e:
+            raise InvalidWadError(f"wad {index}: {e}") from None
+    return summaries
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Wallet Job Queue for Cashu Telegram Bot
+
+Wallet operations are slow, network-bound MCP tool calls. Handlers submit
+them here and reply with a quick acknowledgement while a bounded pool of
+workers runs the calls and delivers the results back to the chat.
+
+Jobs are split in two lanes: read-only jobs (balance) have their own
+workers so they never wait behind heavy `create_wads`/`receive_wads` calls.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobKind(Enum):
+    """Wallet operations, mapped to the MCP tool they call."""
+
+    BALANCE = "get_all_nodes_balances"
+    CREATE_WADS = "create_wads"
+    RECEIVE_WADS = "receive_wads"
+
+    @property
+    def read_only(self) -> bool:
+        return self is JobKind.BALANCE
+
+
+class QueueFullError(Exception):
+    """Raised when a job is rejected because its lane or chat is saturated."""
+
+
+class WalletJob:
+    """A wallet operation waiting for, or running on, a worker."""
+
+    def __init__(
+        self,
+        job_id: int,
+        kind: JobKind,
+        chat_id: int,
+        arguments: Dict[str, Any],
+        on_result: Callable[[Any], Awaitable[None]],
+        on_error: Optional[Callable[[Exception], Awaitable[None]]] = None,
+        run: Optional[Callable[[Any], Awaitable[Any]]] = None,
+    ):
+        self.job_id = job_id
+        self.kind = kind
+        self.chat_id = chat_id
+        self.arguments = arguments
+        self.on_result = on_result
+        self.on_error = on_error
+        self.run = run
+        self.enqueued_at = time.monotonic()
+
+
+class _Lane:
+    """One queue with its own workers and counters."""
+
+    def __init__(self, name: str, workers: int, max_size: int):
+        self.name = name
+        self.workers = workers
+        self.max_size = max_size
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.tasks: List[asyncio.Task] = []
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    def metrics(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "running": self.running,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / finished * 1000, 1) if finished else 0.0,
+            "avg_run_ms": round(self.total_run / finished * 1000, 1) if finished else 0.0,
+        }
+
+
+class WalletJobQueue:
+    """Bounded worker pool running wallet tool calls against the MCP server."""
+
+    def __init__(
+        self,
+        client,
+        read_workers: int = 2,
+        write_workers: int = 4,
+        max_queue_size: int = 100,
+        max_jobs_per_chat: int = 3,
+    ):
+        """
+        Args:
+            client: Object with an async `call_tool(name, arguments)` method
+            read_workers: Workers dedicated to read-only jobs
+            write_workers: Workers running wallet mutations
+            max_queue_size: Pending jobs allowed per lane before rejecting
+            max_jobs_per_chat: Pending or running jobs allowed per chat
+        """
+        self.client = client
+        self.max_jobs_per_chat = max_jobs_per_chat
+        self._read_lane = _Lane("read", read_workers, max_queue_size)
+        self._write_lane = _Lane("write", write_workers, max_queue_size)
+        self._per_chat: Dict[int, int] = {}
+        self._ids = itertools.count(1)
+
+    def _lane_for(self, kind: JobKind) -> _Lane:
+        return self._read_lane if kind.read_only else self._write_lane
+
+    async def start(self):
+        """Spawn the worker tasks."""
+        for lane in (self._read_lane, self._write_lane):
+            for i in range(lane.workers):
+                lane.tasks.append(asyncio.create_task(
+                    self._worker(lane), name=f"wallet-{lane.name}-{i}"
+                ))
+        logger.info(
+            "Wallet job queue started (%d read, %d write workers)",
+            self._read_lane.workers, self._write_lane.workers,
+            extra={"event": "wallet_jobs_started"},
+        )
+
+    async def stop(self):
+        """Cancel the workers, pending jobs are dropped."""
+        tasks = self._read_lane.tasks + self._write_lane.tasks
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._read_lane.tasks.clear()
+        self._write_lane.tasks.clear()
+
+    def submit(
+        self,
+        kind: JobKind,
+        chat_id: int,
+        arguments: Optional[Dict[str, Any]],
+        on_result: Callable[[Any], Awaitable[None]],
+        on_error: Optional[Callable[[Exception], Awaitable[None]]] = None,
+        run: Optional[Callable[[Any], Awaitable[Any]]] = None,
+    ) -> WalletJob:
+        """
+        Enqueues a wallet operation.
+
+        Args:
+            kind: The wallet operation, which picks the lane
+            chat_id: Chat the job counts against
+            arguments: Arguments of the MCP tool call
+            on_result: Called with the result
+            on_error: Called with the exception when the job fails
+            run: Called with the client instead of the single tool call, for jobs made of
+                many calls such as a bulk payout
+
+        Raises:
+            QueueFullError: if the lane or the chat has too many pending jobs
+        """
+        lane = self._lane_for(kind)
+
+        if lane.queue.qsize() >= lane.max_size or self._per_chat.get(chat_id, 0) >= self.max_jobs_per_chat:
+            lane.rejected += 1
+            raise QueueFullError(f"{lane.name} queue is full")
+
+        job = WalletJob(next(self._ids), kind, chat_id, arguments or {}, on_result, on_error, run)
+        self._per_chat[chat_id] = self._per_chat.get(chat_id, 0) + 1
+        lane.queue.put_nowait(job)
+        lane.submitted += 1
+        lane.max_depth = max(lane.max_depth, lane.queue.qsize())
+        return job
+
+    def pending_for_chat(self, chat_id: int) -> int:
+        return self._per_chat.get(chat_id, 0)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of the queue counters, per lane."""
+        return {
+            "read": self._read_lane.metrics(),
+            "write": self._write_lane.metrics(),
+        }
+
+    async def _worker(self, lane: _Lane):
+        while True:
+            job: WalletJob = await lane.queue.get()
+            started = time.monotonic()
+            lane.total_wait += started - job.enqueued_at
+            lane.running += 1
+            try:
+                if job.run:
+                    result = await job.run(self.client)
+                else:
+                    result = await self.client.call_tool(job.kind.value, job.arguments)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                lane.failed += 1
+                logger.error("Wallet job %d (%s) failed: %s", job.job_id, job.kind.value, e,
+                             extra={"event": "wallet_job_failed"})
+                if job.on_error:
+                    await self._deliver(job.on_error(e))
+            else:
+                lane.completed += 1
+                await self._deliver(job.on_result(result))
+            finally:
+                lane.running -= 1
+                lane.total_run += time.monotonic() - started
+                self._release(job.chat_id)
+                lane.queue.task_done()
+
+    async def _deliver(self, reply: Awaitable[None]):
+        # A failing reply must never take a worker down
+        try:
+            await reply
+        except Exception as e:
+            logger.error("Failed to deliver wallet job result: %s", e, extra={"event": "wallet_job_delivery_failed"})
+
+    def _release(self, chat_id: int):
+        remaining = self._per_chat.get(chat_id, 1) - 1
+        if remaining > 0:
+            self._per_chat[chat_id] = remaining
+        else:
+            self._per_chat.pop(chat_id, None)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Wallet Call Resilience for Cashu Telegram Bot
+
+Every wallet tool call goes through `ResilientWallet`, which keeps the
+recent latencies of each operation, and of each mint a `receive_wads`
+call touches. Idempotent reads (the balance) are bounded by a timeout
+derived from their p99 instead of a fixed two minutes, and hedged: when
+the first request is slower than usual, a second one is sent and the
+first answer wins. Writes are neither: a `create_wads` given up on would
+still debit the wallet on the server while the wads it returns are
+dropped, so they wait for the client's own request timeout. Failures of
+both feed a circuit breaker per operation and per mint: once too many
+recent calls failed, calls fail fast for a cooldown, then a single probe
+decides whether to close it.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from mcp_client import McpError
+from wad_validator import InvalidWadError, validate_wads
+
+logger = logging.getLogger(__name__)
+
+# Errors about the request itself say nothing about the backend's health
+INVALID_PARAMS = -32602
+
+# Latency samples needed before a percentile replaces the default timeout
+MIN_SAMPLES = 20
+
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class WalletUnavailableError(McpError):
+    """Raised without calling the backend while its circuit is open."""
+
+
+class WalletTimeoutError(McpError):
+    """A wallet read that outlived its adaptive timeout, or a call the client gave up on."""
+
+
+class LatencyWindow:
+    """The most recent latencies of one operation or mint."""
+
+    __slots__ = ("samples",)
+
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """The latency under which `fraction` of the calls finished, None until there are enough."""
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """Opens when the error rate of the recent calls is too high, probes after a cooldown."""
+
+    __slots__ = ("window", "min_calls", "error_rate", "cooldown", "outcomes", "state", "opened_at", "probing",
+                 "opened")
+
+    def __init__(self, window: int, min_calls: int, error_rate: float, cooldown: float):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened = 0
+
+    def allows(self, now: float) -> bool:
+        """Whether a call may go through, a cooled down circuit lets one probe in."""
+        if self.state == CircuitState.OPEN and now - self.opened_at >= self.cooldown:
+            self.state = CircuitState.HALF_OPEN
+            self.probing = False
+        if self.state == CircuitState.HALF_OPEN:
+            return not self.probing
+        return self.state == CircuitState.CLOSED
+
+    def record(self, failed: bool, now: float):
+        if self.state == CircuitState.HALF_OPEN and self.probing:
+            self.probing = False
+            if failed:
+                self._open(now)
+            else:
+                self.state = CircuitState.CLOSED
+                self.outcomes.clear()
+            return
+        self.outcomes.append(failed)
+        if (self.state == CircuitState.CLOSED and len(self.outcomes) >= self.min_calls
+                and sum(self.outcomes) / len(self.outcomes) >= self.error_rate):
+            self._open(now)
+
+    def _open(self, now: float):
+        self.state = CircuitState.OPEN
+        self.opened_at = now
+        self.opened += 1
+
+
+class _Target:
+    """Latencies, breaker and counters of one operation, or of one operation on one mint."""
+
+    __slots__ = ("latency", "breaker", "calls", "failures", "timeouts", "rejected")
+
+    def __init__(self, latency: LatencyWindow, breaker: CircuitBreaker):
+        self.latency = latency
+        self.breaker = breaker
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+
+class ResilientWallet:
+    """Adaptive timeouts, circuit breakers and hedged reads around a wallet client."""
+
+    def __init__(
+        self,
+        client,
+        read_only_tools: Iterable[str] = ("get_all_nodes_balances",),
+        timeout_factor: float = 3.0,
+        min_timeout: float = 2.0,
+        max_timeout: float = 120.0,
+        latency_window: int = 256,
+        breaker_window: int = 20,
+        breaker_min_calls: int = 10,
+        breaker_error_rate: float = 0.5,
+        breaker_cooldown: float = 15.0,
+        hedge_reads: bool = True,
+        hedge_percentile: float = 0.95,
+    ):
+        """
+        Args:
+            client: Object with an async `call_tool(name, arguments)` method
+            read_only_tools: Idempotent tools, the only ones given an adaptive timeout and hedged
+            timeout_factor: Timeout as a multiple of the p99 latency
+            min_timeout: Shortest timeout of a read
+            max_timeout: Longest timeout of a read, also used until enough latencies are known
+            latency_window: Latencies kept per operation and per mint
+            breaker_window: Recent calls the error rate is computed on
+            breaker_min_calls: Calls needed in the window before the circuit can open
+            breaker_error_rate: Share of failed calls that opens the circuit
+            breaker_cooldown: Seconds the circuit stays open before a probe
+            hedge_reads: Send a second read when the first is slower than `hedge_percentile`
+            hedge_percentile: Latency percentile after which a read is hedged
+        """
+        self.client = client
+        self.read_only_tools = frozenset(read_only_tools)
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.latency_window = latency_window
+        self.breaker_settings = (breaker_window, breaker_min_calls, breaker_error_rate, breaker_cooldown)
+        self.hedge_reads = hedge_reads
+        self.hedge_percentile = hedge_percentile
+        self._targets: Dict[str, _Target] = {}
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.last_success = 0.0
+        self.last_failure = 0.0
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Calls a wallet tool, like the wrapped client does.
+
+        Raises:
+            WalletUnavailableError: right away, while the operation's or a mint's circuit is open
+            WalletTimeoutError: when a read outlives its adaptive timeout, or the client times out
+            McpError: errors of the wrapped client
+        """
+        targets = [self._target(name)] + [self._target(f"{name} {mint}") for mint in self._mints(name, arguments)]
+        now = time.monotonic()
+        if not all(target.breaker.allows(now) for target in targets):
+            for target in targets:
+                target.rejected += 1
+            raise WalletUnavailableError(f"Wallet {name} is unavailable, its recent calls failed")
+        for target in targets:
+            if target.breaker.state == CircuitState.HALF_OPEN:
+                target.breaker.probing = True
+
+        read = name in self.read_only_tools
+        timeout = max(self.timeout(target, name) for target in targets) if read else None
+        started = time.monotonic()
+        failed: Optional[bool] = True
+        try:
+            if read and self.hedge_reads:
+                call = self._hedged(name, arguments, targets[0])
+            else:
+                call = self.client.call_tool(name, arguments)
+            # A write cut short here could still complete on the server, with its result lost
+            result = await (asyncio.wait_for(call, timeout) if read else call)
+            failed = False
+            return result
+        except asyncio.TimeoutError:
+            for target in targets:
+                target.timeouts += 1
+            elapsed = time.monotonic() - started
+            logger.warning(
+                "Wallet %s timed out after %.1fs", name, elapsed,
+                extra={"event": "wallet_timeout", "tool": name, "timeout": round(elapsed, 3)},
+            )
+            raise WalletTimeoutError(f"Wallet {name} timed out after {elapsed:.1f}s") from None
+        except McpError as e:
+            # Refused arguments aren't a sign of a sick backend
+            failed = e.code != INVALID_PARAMS
+            raise
+        except asyncio.CancelledError:
+            # Given up by the caller, not an outcome of the backend
+            failed = None
+            for target in targets:
+                target.breaker.probing = False
+            raise
+        finally:
+            if failed is not None:
+                self._record(name, targets, failed, time.monotonic() - started, timeout)
+
+    def timeout(self, target: _Target, name: str) -> Optional[float]:
+        """Seconds a read may take: a multiple of the p99 latency, within the bounds. None for writes."""
+        if name not in self.read_only_tools:
+            return None
+        p99 = target.latency.percentile(0.99)
+        if p99 is None:
+            return self.max_timeout
+        return min(max(p99 * self.timeout_factor, self.min_timeout), self.max_timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {"hedged": self.hedged, "hedge_wins": self.hedge_wins}
+        for key, target in sorted(self._targets.items()):
+            p50 = target.latency.percentile(0.5)
+            p99 = target.latency.percentile(0.99)
+            timeout = self.timeout(target, key.split(" ")[0])
+            metrics[key] = {
+                "state": target.breaker.state,
+                "calls": target.calls,
+                "failures": target.failures,
+                "timeouts": target.timeouts,
+                "rejected": target.rejected,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+                "timeout_s": round(timeout, 2) if timeout is not None else None,
+            }
+        return metrics
+
+    def reachability(self) -> Dict[str, Any]:
+        """Whether the backend answered its latest call, from the calls already made."""
+        last = max(self.last_success, self.last_failure)
+        open_operations = sorted(
+            key for key, target in self._targets.items()
+            if " " not in key and target.breaker.state == CircuitState.OPEN
+        )
+        return {
+            "reachable": None if not last else self.last_success >= self.last_failure and not open_operations,
+            "last_call_s": round(time.monotonic() - last, 1) if last else None,
+            "open_circuits": open_operations,
+        }
+
+    async def _hedged(self, name: str, arguments: Optional[Dict[str, Any]], target: _Target) -> Any:
+        delay = target.latency.percentile(self.hedge_percentile)
+        first = asyncio.ensure_future(self.client.call_tool(name, arguments))
+        if delay is None:
+            return await first
+        tasks: List[asyncio.Task] = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                tasks.append(asyncio.ensure_future(self.client.call_tool(name, arguments)))
+            # The first success wins, a failure only counts once both have failed
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _record(self, name: str, targets: List[_Target], failed: bool, elapsed: float, timeout: Optional[float]):
+        now = time.monotonic()
+        if failed:
+            self.last_failure = now
+        else:
+            self.last_success = now
+        for target in targets:
+            target.calls += 1
+            if failed:
+                target.failures += 1
+            # Timed out reads say nothing of how long they would have taken
+            if timeout is None or elapsed < timeout:
+                target.latency.add(elapsed)
+            was_closed = target.breaker.state != CircuitState.OPEN
+            target.breaker.record(failed, now)
+            if was_closed and target.breaker.state == CircuitState.OPEN:
+                logger.warning(
+                    "Wallet circuit opened for %s", name,
+                    extra={"event": "wallet_circuit_open", "tool": name},
+                )
+
+    def _target(self, key: str) -> _Target:
+        target = self._targets.get(key)
+        if target is None:
+            target = _Target(LatencyWindow(self.latency_window), CircuitBreaker(*self.breaker_settings))
+            self._targets[key] = target
+        return target
+
+    @staticmethod
+    def _mints(name: str, arguments: Optional[Dict[str, Any]]) -> List[str]:
+        # Only received wads tell which mints a call will talk to
+        if name != "receive_wads" or not arguments:
+            return []
+        try:
+            return sorted({summary.mint_url for summary in validate_wads(arguments.get("wads", ""))})
+        except InvalidWadError:
+            return []